@@ -0,0 +1,328 @@
+"""
+executar_benchmarks.py
+
+Benchmarks das etapas 4 a 8 com comparação contra uma baseline.
+
+Cada cenário roda numa cópia isolada de scripts/ e utils/ (sem as
+credenciais do config_automacao.json), com a pasta dados/ montada a partir de:
+    amostra         arquivos de exemplo em automacao_etl/dados
+    sintetico:N     carga sintética de utils/gerador_carga.py na escala N
+                    (gerada uma vez e guardada em benchmarks/.cache)
+
+Cada etapa roda como subprocesso, como na operação normal, com
+ETL_INSTRUMENTACAO=1; além do tempo da etapa entram no resultado os trechos
+medidos por utils/instrumentacao.py (tratar_arquivo, consolidar_dia,
+separar_por_clusters, criar_mapa_padrao...). Com --repeticoes N vale a
+mediana.
+
+A baseline fica em benchmarks/baseline.json. Sem --salvar-baseline, cada
+métrica é comparada com ela e conta como regressão quando fica mais de
+--limiar (fração) acima E mais de TOLERANCIA_MINIMA_S segundos acima; nesse
+caso o script sai com código 1.
+
+Uso:
+    python benchmarks/executar_benchmarks.py --salvar-baseline
+    python benchmarks/executar_benchmarks.py --cenario amostra --cenario sintetico:10
+    python benchmarks/executar_benchmarks.py --etapas 4,5 --repeticoes 3 --limiar 0.1
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ETL_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTADOS_DIR = os.path.join(BENCH_DIR, "resultados")
+CACHE_DIR = os.path.join(BENCH_DIR, ".cache")
+
+if ETL_DIR not in sys.path:
+    sys.path.insert(0, ETL_DIR)
+
+ETAPAS = {
+    "4": "4_TratamentoSolinftec.py",
+    "5": "5_SepararPorDia.py",
+    "6": "6_ProcessarCase.py",
+    "7": "7_ConsolidarJSON.py",
+    "8": "8_GerarMapasFrotas.py",
+}
+
+# Etapas que precisam rodar antes (as saídas delas são a entrada da etapa)
+PRE_REQUISITOS = {"5": ["4"], "7": ["5", "6"], "8": ["7"]}
+
+# Dependências opcionais sem as quais a etapa nem importa
+DEPENDENCIAS_ETAPA = {"8": ["folium"]}
+# Dependências que a etapa só usa com uma opção ligada: (variável, padrão)
+DEPENDENCIAS_CONDICIONAIS = {"8": {"sklearn": ("ETL_MAPAS_CLUSTERING", "1")}}
+
+LIMIAR_PADRAO = 0.15
+TOLERANCIA_MINIMA_S = 0.5
+ARQUIVOS_ENTRADA = ["*.xlsx", "Case*.zip", "Colhedora_*.zip"]
+
+
+# ─── Ambiente isolado ──────────────────────────────────────────────────────────
+
+def etapas_com_pre_requisitos(etapas):
+    """Etapas pedidas + pré-requisitos, na ordem de execução."""
+    necessarias = set()
+    pendentes = list(etapas)
+    while pendentes:
+        etapa = pendentes.pop()
+        if etapa not in necessarias:
+            necessarias.add(etapa)
+            pendentes.extend(PRE_REQUISITOS.get(etapa, []))
+    return [e for e in ETAPAS if e in necessarias]
+
+
+def _dependencias_ausentes(etapa):
+    import importlib.util
+    necessarias = list(DEPENDENCIAS_ETAPA.get(etapa, []))
+    for modulo, (variavel, padrao) in DEPENDENCIAS_CONDICIONAIS.get(etapa, {}).items():
+        if os.environ.get(variavel, padrao) != "0":
+            necessarias.append(modulo)
+    return [m for m in necessarias if importlib.util.find_spec(m) is None]
+
+
+def _periodo_dados(pasta_dados):
+    """Primeiro e último dia (DD/MM/AAAA) da carga sintética, pelo manifesto."""
+    manifesto = os.path.join(pasta_dados, "manifesto_carga.json")
+    if os.path.exists(manifesto):
+        with open(manifesto, "r", encoding="utf-8") as f:
+            p = json.load(f)["parametros"]
+        inicio = datetime.strptime(p["data_inicio"], "%Y-%m-%d")
+        fim = inicio.toordinal() + p["dias"] - 1
+        return inicio.strftime("%d/%m/%Y"), datetime.fromordinal(fim).strftime("%d/%m/%Y")
+    return None, None
+
+
+def preparar_dados(cenario):
+    """Pasta com os dados de entrada do cenário."""
+    if cenario == "amostra":
+        return os.path.join(ETL_DIR, "dados")
+
+    if not cenario.startswith("sintetico:"):
+        raise ValueError(f"Cenário desconhecido: {cenario}")
+    escala = float(cenario.split(":", 1)[1])
+    pasta = os.path.join(CACHE_DIR, f"sintetico_x{escala:g}")
+    if not os.path.exists(os.path.join(pasta, "manifesto_carga.json")):
+        from utils.gerador_carga import FROTAS_REFERENCIA, gerar_carga
+
+        print(f"🧪 Gerando carga sintética x{escala:g} em {pasta}...")
+        gerar_carga(pasta_saida=pasta, frotas=max(3, round(FROTAS_REFERENCIA * escala)))
+    return pasta
+
+
+def montar_workspace(pasta_dados):
+    """Cópia de scripts/ e utils/ com dados/ do cenário e config sem credenciais."""
+    workspace = tempfile.mkdtemp(prefix="bench_etl_")
+    ignorar = shutil.ignore_patterns("__pycache__", "config_automacao.json", "*.tmp")
+    shutil.copytree(os.path.join(ETL_DIR, "scripts"), os.path.join(workspace, "scripts"), ignore=ignorar)
+    shutil.copytree(os.path.join(ETL_DIR, "utils"), os.path.join(workspace, "utils"), ignore=ignorar)
+
+    dados = os.path.join(workspace, "dados")
+    os.makedirs(dados)
+    for padrao in ARQUIVOS_ENTRADA:
+        for arquivo in glob.glob(os.path.join(pasta_dados, padrao)):
+            nome = os.path.basename(arquivo)
+            # Só entradas brutas: saídas de execuções anteriores ficam de fora
+            if "_tratado" not in nome and not nome.startswith("Consolidado_Case_"):
+                shutil.copy2(arquivo, dados)
+
+    # A etapa 8 filtra as datas pelo config; sem período conhecido processa tudo
+    data_ini, data_fim = _periodo_dados(pasta_dados)
+    if data_ini:
+        config = {"automacao": {"parametros": {
+            "extrair_semanal": False, "extrair_ontem": False,
+            "data_inicial": data_ini, "data_final": data_fim,
+        }}}
+        with open(os.path.join(workspace, "utils", "config_automacao.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+    return workspace
+
+
+# ─── Execução ──────────────────────────────────────────────────────────────────
+
+def executar_etapa(workspace, etapa):
+    """Roda a etapa como subprocesso; devolve (segundos, resumo dos trechos, ok)."""
+    pasta_relatorios = os.path.join(workspace, "desempenho", etapa)
+    env = dict(os.environ, ETL_INSTRUMENTACAO="1", ETL_INSTRUMENTACAO_DIR=pasta_relatorios, PYTHONUNBUFFERED="1")
+    log = os.path.join(workspace, f"etapa_{etapa}.log")
+
+    inicio = time.perf_counter()
+    with open(log, "w", encoding="utf-8") as saida:
+        processo = subprocess.run(
+            [sys.executable, os.path.join("scripts", ETAPAS[etapa])],
+            cwd=workspace, env=env, stdout=saida, stderr=subprocess.STDOUT,
+        )
+    segundos = time.perf_counter() - inicio
+
+    trechos = {}
+    for relatorio in glob.glob(os.path.join(pasta_relatorios, "*.json")):
+        with open(relatorio, "r", encoding="utf-8") as f:
+            for nome, dados in json.load(f).get("resumo", {}).items():
+                trechos[nome] = dados["parede_s"]
+        os.remove(relatorio)
+    return segundos, trechos, processo.returncode == 0
+
+
+def _limpar_saidas(workspace):
+    dados = os.path.join(workspace, "dados")
+    shutil.rmtree(os.path.join(dados, "separados"), ignore_errors=True)
+    shutil.rmtree(os.path.join(workspace, "mapas"), ignore_errors=True)
+    for padrao in ("*_tratado.xlsx", "Consolidado_Case_*.xlsx"):
+        for arquivo in glob.glob(os.path.join(dados, padrao)):
+            os.remove(arquivo)
+
+
+def executar_cenario(cenario, etapas, repeticoes):
+    """Métricas (mediana em segundos) do cenário: etapa:<n> e funcao:<trecho>."""
+    pasta_dados = preparar_dados(cenario)
+    workspace = montar_workspace(pasta_dados)
+    amostras = {}
+    status = {}
+    try:
+        for rodada in range(repeticoes):
+            _limpar_saidas(workspace)
+            for etapa in etapas_com_pre_requisitos(etapas):
+                medir = etapa in etapas
+                ausentes = _dependencias_ausentes(etapa)
+                if ausentes:
+                    status[etapa] = f"pulada (sem {', '.join(ausentes)})"
+                    continue
+                segundos, trechos, ok = executar_etapa(workspace, etapa)
+                status[etapa] = "ok" if ok else "falhou"
+                rotulo = "" if medir else ", pré-requisito"
+                print(f"  [{cenario}] rodada {rodada + 1}/{repeticoes} etapa {etapa}: {segundos:.1f}s ({status[etapa]}{rotulo})")
+                if not ok:
+                    print(f"     log: {os.path.join(workspace, f'etapa_{etapa}.log')}")
+                    continue
+                if not medir:
+                    continue
+                amostras.setdefault(f"etapa:{etapa}", []).append(segundos)
+                for nome, valor in trechos.items():
+                    amostras.setdefault(f"funcao:{nome}", []).append(valor)
+    finally:
+        if all(s == "ok" or s.startswith("pulada") for s in status.values()):
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    metricas = {nome: round(statistics.median(v), 3) for nome, v in sorted(amostras.items())}
+    return {"metricas": metricas, "status": status}
+
+
+# ─── Baseline ──────────────────────────────────────────────────────────────────
+
+def carregar_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_json(caminho, conteudo):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, caminho)
+
+
+def comparar(atual, base, limiar):
+    """Linhas de comparação (métrica, base, atual, variação, regressão?)."""
+    linhas = []
+    for nome, valor in atual.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            linhas.append((nome, None, valor, None, False))
+            continue
+        variacao = (valor - anterior) / anterior if anterior > 0 else 0.0
+        regressao = variacao > limiar and (valor - anterior) > TOLERANCIA_MINIMA_S
+        linhas.append((nome, anterior, valor, variacao, regressao))
+    return linhas
+
+
+def imprimir_comparacao(cenario, linhas):
+    print(f"\n📊 {cenario}")
+    print(f"  {'métrica':<40} {'baseline':>10} {'atual':>10} {'variação':>9}")
+    for nome, anterior, valor, variacao, regressao in linhas:
+        base_txt = f"{anterior:.2f}s" if anterior is not None else "-"
+        var_txt = f"{variacao:+.0%}" if variacao is not None else "novo"
+        marca = "  ❌ REGRESSÃO" if regressao else ""
+        print(f"  {nome:<40} {base_txt:>10} {valor:>9.2f}s {var_txt:>9}{marca}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas 4 a 8 do ETL.")
+    parser.add_argument("--cenario", action="append",
+                        help="amostra ou sintetico:<escala> (pode repetir; padrão: amostra e sintetico:10)")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="Etapas a medir (ex.: 4,5,6)")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--limiar", type=float, default=LIMIAR_PADRAO,
+                        help="Aumento relativo tolerado antes de acusar regressão (0.15 = 15%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os resultados como nova baseline")
+    args = parser.parse_args()
+
+    cenarios = args.cenario or ["amostra", "sintetico:10"]
+    etapas = [e.strip() for e in args.etapas.split(",") if e.strip()]
+    invalidas = [e for e in etapas if e not in ETAPAS]
+    if invalidas:
+        parser.error(f"Etapas inválidas: {', '.join(invalidas)}")
+
+    print("=" * 60)
+    print("⏱️  BENCHMARKS ETL")
+    print("=" * 60)
+
+    resultados = {
+        "executado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "repeticoes": args.repeticoes,
+        "cenarios": {},
+    }
+    for cenario in cenarios:
+        print(f"\n▶️  Cenário {cenario}")
+        resultados["cenarios"][cenario] = executar_cenario(cenario, etapas, args.repeticoes)
+
+    nome = f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    salvar_json(os.path.join(RESULTADOS_DIR, nome), resultados)
+
+    baseline = carregar_baseline()
+    if args.salvar_baseline:
+        for cenario, dados in resultados["cenarios"].items():
+            baseline.setdefault("cenarios", {})[cenario] = dados["metricas"]
+        baseline["atualizado_em"] = resultados["executado_em"]
+        salvar_json(BASELINE_FILE, baseline)
+        print(f"\n💾 Baseline gravada em {BASELINE_FILE}")
+        return
+
+    if not baseline:
+        print("\n⚠️  Sem baseline para comparar. Rode com --salvar-baseline.")
+        return
+
+    regressoes = 0
+    for cenario, dados in resultados["cenarios"].items():
+        base = baseline.get("cenarios", {}).get(cenario)
+        if not base:
+            print(f"\n⚠️  Cenário {cenario} não está na baseline.")
+            continue
+        linhas = comparar(dados["metricas"], base, args.limiar)
+        imprimir_comparacao(cenario, linhas)
+        regressoes += sum(1 for linha in linhas if linha[4])
+
+    falhas = sum(
+        1 for dados in resultados["cenarios"].values() for s in dados["status"].values() if s == "falhou"
+    )
+    if regressoes or falhas:
+        print(f"\n❌ {regressoes} regressão(ões), {falhas} etapa(s) com falha (limiar {args.limiar:.0%})")
+        sys.exit(1)
+    print(f"\n✅ Sem regressões (limiar {args.limiar:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+0_ExecutarPipeline.py
+
+Executa as etapas de processamento (4 a 8) num único processo, como um grafo
+de dependências:
+
+    4 Tratamento Solinftec ──> 5 Separar por dia ──┐
+                                                   ├──> 7 Consolidar JSON ──> 8 Mapas
+    6 Processar Case ──────────────────────────────┘
+
+- As abas geradas pela etapa 4 vão em memória para a 5 (o XLSX "_tratado" só
+  é gravado com --salvar-tratado) e as abas Case da etapa 6 vão em memória
+  para a 7. Os arquivos finais (XLSX/JSON diários, Consolidado_Case, mapas)
+  continuam sendo gravados normalmente.
+- Os ramos independentes (Solinftec x Case) rodam em paralelo.
+- Ao final imprime o tempo de parede de cada etapa e grava o resumo em
+  logs/pipeline_tempos.json. Com --instrumentar (ou ETL_INSTRUMENTACAO=1)
+  também grava o relatório por trecho de utils/instrumentacao.py.
+
+Modo monitor (--monitorar): o processo fica aberto observando dados/ (inotify
+no Linux, varredura nos demais) com os módulos das etapas já importados. A
+cada lote de downloads concluídos roda só as etapas afetadas:
+
+    Linha do tempo Solinftec (.xlsx / .zip)  -> 4, 5, 7, 8 (dias do período)
+    Case*.zip                                -> 6, 7, 8
+    Colhedora_*.zip (OPC)                    -> 8
+
+Uso:
+    python scripts/0_ExecutarPipeline.py                 # etapas 4 a 8
+    python scripts/0_ExecutarPipeline.py --etapas 4,5    # só a cadeia Solinftec
+    python scripts/0_ExecutarPipeline.py --sequencial --salvar-tratado
+    python scripts/0_ExecutarPipeline.py --monitorar     # fica aguardando downloads
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+DADOS_DIR = os.path.join(BASE_DIR, "dados")
+TEMPOS_FILE = os.path.join(LOGS_DIR, "pipeline_tempos.json")
+
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils import arquivos_zip, compressao, instrumentacao
+from utils.entradas import classificar_arquivo
+
+_modulos = {}
+_modulos_lock = threading.Lock()
+
+
+def carregar_etapa(arquivo):
+    """Importa o script da etapa (nome começa com dígito, então via importlib)."""
+    with _modulos_lock:
+        if arquivo not in _modulos:
+            nome = "etapa_" + re.sub(r"\W", "_", os.path.splitext(arquivo)[0])
+            spec = importlib.util.spec_from_file_location(nome, os.path.join(SCRIPTS_DIR, arquivo))
+            modulo = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(modulo)
+            _modulos[arquivo] = modulo
+        return _modulos[arquivo]
+
+
+def nome_logico(arquivo):
+    """Nome do arquivo; para planilha dentro de ZIP, o do ZIP (que traz período e lote)."""
+    return os.path.basename(arquivos_zip.caminho_logico(arquivo))
+
+
+def selecionar_arquivos_linha_tempo(arquivos):
+    """
+    Arquivo bruto mais recente e, se ele vier da extração fragmentada,
+    os demais fragmentos do mesmo lote (mesma regra da etapa 5).
+    """
+    mais_recente = max(arquivos, key=arquivos_zip.mtime)
+    match = re.search(r"__lote-(\d+)__frag-", nome_logico(mais_recente))
+    if not match:
+        return [mais_recente]
+    marcador = f"__lote-{match.group(1)}__frag-"
+    return sorted(a for a in arquivos if marcador in nome_logico(a))
+
+
+# ─── Etapas ────────────────────────────────────────────────────────────────────
+
+def etapa_tratamento(resultados, opcoes):
+    m4 = carregar_etapa("4_TratamentoSolinftec.py")
+    m5 = carregar_etapa("5_SepararPorDia.py")
+    diretorio = m4.DIRETORIO_ENTRADA
+    if not m4.validar_diretorio(diretorio):
+        raise RuntimeError(f"Diretório de entrada inválido: {diretorio}")
+
+    # Planilhas soltas e as que continuam dentro dos ZIPs da Linha do Tempo (lidas sem extrair)
+    # (só exportações brutas da Solinftec: Consolidado_Case_*.xlsx, gravado pela etapa 6 na mesma
+    # pasta, e os "_tratado" ficam de fora pela mesma regra do modo monitor)
+    arquivos = m4.obter_arquivos_xlsx(diretorio) + m4.obter_membros_zip(m4.obter_arquivos_zip(diretorio))
+    arquivos = [a for a in arquivos if classificar_arquivo(nome_logico(a)) == "solinftec"]
+    if not arquivos:
+        print("Nenhum arquivo .xlsx bruto encontrado na pasta dados.")
+        return None
+
+    arquivos = selecionar_arquivos_linha_tempo(arquivos)
+    lista_abas = []
+    for arquivo in arquivos:
+        if opcoes.salvar_tratado:
+            base, ext = os.path.splitext(arquivos_zip.caminho_logico(arquivo))
+            caminho = arquivos_zip.copiar(arquivo, f"{base}_tratado{ext}")
+            abas = m4.tratar_arquivo(caminho, salvar=True)
+        else:
+            abas = m4.tratar_arquivo(arquivo, salvar=False)
+        if abas is None:
+            raise RuntimeError(f"Falha ao tratar {nome_logico(arquivo)}")
+        lista_abas.append(abas)
+
+    return {"arquivos": arquivos, "abas": m5.concatenar_abas(lista_abas)}
+
+
+def etapa_separar_por_dia(resultados, opcoes):
+    m5 = carregar_etapa("5_SepararPorDia.py")
+    tratado = resultados.get("4")
+    if not tratado:
+        # Etapa 4 fora desta execução: lê o tratado mais recente do disco
+        m5.main()
+        return None
+    dt_inicio, dt_fim = m5.periodo_dos_arquivos(tratado["arquivos"])
+    abas = {nome: m5.tipos_como_excel(df) for nome, df in tratado["abas"].items()}
+    m5.separar_abas(abas, dt_inicio, dt_fim)
+    return None
+
+
+def etapa_processar_case(resultados, opcoes):
+    m6 = carregar_etapa("6_ProcessarCase.py")
+    return m6.processar_ultimo_arquivo_case()
+
+
+def etapa_consolidar_json(resultados, opcoes):
+    m7 = carregar_etapa("7_ConsolidarJSON.py")
+    datas = getattr(opcoes, "datas", None)
+    if datas is not None:
+        datas = {d.strftime("%d-%m-%Y") for d in datas}
+    case = resultados.get("6") or {}
+    m7.main(abas_case=case.get("abas"), datas=datas, arquivo_case=case.get("arquivo"))
+    return None
+
+
+def etapa_mapas(resultados, opcoes):
+    m8 = carregar_etapa("8_GerarMapasFrotas.py")
+    m8.main(filtro_datas=getattr(opcoes, "datas", None))
+    return None
+
+
+ETAPAS = {
+    "4": {"nome": "Tratamento Solinftec", "depende": [], "funcao": etapa_tratamento},
+    "5": {"nome": "Separar por dia", "depende": ["4"], "funcao": etapa_separar_por_dia},
+    "6": {"nome": "Processar Case", "depende": [], "funcao": etapa_processar_case},
+    "7": {"nome": "Consolidar JSON", "depende": ["5", "6"], "funcao": etapa_consolidar_json},
+    "8": {"nome": "Mapas das frotas", "depende": ["7"], "funcao": etapa_mapas},
+}
+
+
+# ─── Execução ──────────────────────────────────────────────────────────────────
+
+def executar_pipeline(selecionadas, opcoes):
+    resultados = {}
+    status = {}
+    tempos = {}
+
+    def rodar(codigo):
+        etapa = ETAPAS[codigo]
+        print(f"\n▶️  Etapa {codigo} - {etapa['nome']}")
+        inicio = time.perf_counter()
+        try:
+            with instrumentacao.medir(f"etapa.{codigo}", rotulo=etapa["nome"]):
+                resultados[codigo] = etapa["funcao"](resultados, opcoes)
+            status[codigo] = "ok"
+        except (Exception, SystemExit) as e:
+            status[codigo] = "falhou"
+            print(f"❌ Etapa {codigo} falhou: {e}")
+            traceback.print_exc()
+        tempos[codigo] = time.perf_counter() - inicio
+        print(f"⏱️  Etapa {codigo} - {etapa['nome']}: {tempos[codigo]:.1f}s ({status[codigo]})")
+
+    pendentes = [c for c in ETAPAS if c in selecionadas]
+    max_paralelo = 1 if opcoes.sequencial else len(pendentes) or 1
+    inicio_total = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix="etapa") as executor:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            for codigo in list(pendentes):
+                deps = [d for d in ETAPAS[codigo]["depende"] if d in selecionadas]
+                if any(status.get(d) in ("falhou", "pulada") for d in deps):
+                    status[codigo] = "pulada"
+                    tempos[codigo] = 0.0
+                    pendentes.remove(codigo)
+                    print(f"⏭️  Etapa {codigo} pulada (dependência falhou)")
+                elif all(status.get(d) == "ok" for d in deps):
+                    pendentes.remove(codigo)
+                    em_execucao[executor.submit(rodar, codigo)] = codigo
+            if not em_execucao:
+                break
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                em_execucao.pop(futuro)
+
+    total = time.perf_counter() - inicio_total
+    registrar_tempos(status, tempos, total)
+    return status
+
+
+def registrar_tempos(status, tempos, total):
+    print("\n" + "=" * 60)
+    print("⏱️  TEMPO POR ETAPA")
+    print("=" * 60)
+    for codigo in ETAPAS:
+        if codigo in status:
+            print(f"  {codigo} {ETAPAS[codigo]['nome']:<25} {tempos[codigo]:>8.1f}s  {status[codigo]}")
+    print(f"  {'Total (parede)':<27} {total:>8.1f}s")
+
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    resumo = {
+        "executado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total_s": round(total, 3),
+        "etapas": {
+            codigo: {
+                "nome": ETAPAS[codigo]["nome"],
+                "status": status[codigo],
+                "segundos": round(tempos[codigo], 3),
+            }
+            for codigo in ETAPAS if codigo in status
+        },
+    }
+    with open(TEMPOS_FILE, "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+
+
+# ─── Modo monitor ──────────────────────────────────────────────────────────────
+
+FONTES = {
+    "solinftec": {"nome": "Solinftec", "etapas": {"4", "5", "7", "8"}},
+    "case": {"nome": "Case IH", "etapas": {"6", "7", "8"}},
+    "opc": {"nome": "OPC", "etapas": {"8"}},
+}
+
+
+def datas_afetadas(arquivos_solinftec):
+    """Dias do período dos arquivos Solinftec, ou None se não der para inferir."""
+    m5 = carregar_etapa("5_SepararPorDia.py")
+    inicio, fim = m5.periodo_dos_arquivos(arquivos_solinftec)
+    if inicio is None:
+        return None
+    return {inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)}
+
+
+def coletar_lote(observador, janela):
+    """
+    Bloqueia até o primeiro download concluído e junta os que chegarem em
+    seguida (fragmentos de um mesmo lote, vários shapes OPC...) até `janela`
+    segundos sem novidade.
+    """
+    lote = []
+    while not lote:
+        arquivo = observador.aguardar(timeout=3600)
+        if arquivo:
+            lote.append(arquivo)
+    while True:
+        arquivo = observador.aguardar(timeout=janela)
+        if not arquivo:
+            return lote
+        lote.append(arquivo)
+
+
+def processar_lote(lote, observador, opcoes):
+    por_fonte = {}
+    for arquivo in lote:
+        fonte = classificar_arquivo(os.path.basename(arquivo))
+        if fonte:
+            por_fonte.setdefault(fonte, []).append(arquivo)
+        else:
+            print(f"   (ignorado) {os.path.basename(arquivo)}")
+    if not por_fonte:
+        return None
+
+    selecionadas = set().union(*(FONTES[f]["etapas"] for f in por_fonte))
+    datas = None
+    if set(por_fonte) == {"solinftec"}:
+        # Só a Solinftec mudou: 7 e 8 ficam restritas aos dias do arquivo
+        datas = datas_afetadas(por_fonte["solinftec"])
+
+    print("\n" + "=" * 60)
+    print(f"📥 {datetime.now():%d/%m/%Y %H:%M:%S} - {len(lote)} arquivo(s): "
+          + ", ".join(FONTES[f]["nome"] for f in por_fonte))
+    for arquivo in lote:
+        print(f"   {os.path.basename(arquivo)}")
+    if datas:
+        print(f"   Dias: {', '.join(d.strftime('%d/%m/%Y') for d in sorted(datas))}")
+    print("🚀 Etapas " + ", ".join(c for c in ETAPAS if c in selecionadas))
+    print("=" * 60)
+
+    opcoes_lote = argparse.Namespace(**vars(opcoes))
+    opcoes_lote.datas = datas
+    inicio = time.perf_counter()
+    status = executar_pipeline(selecionadas, opcoes_lote)
+    compressao.aguardar()
+    # Shapes OPC consumidos pela etapa 8 podem ser baixados de novo com o mesmo nome
+    observador.esquecer_removidos()
+    print(f"\n📡 Lote processado em {time.perf_counter() - inicio:.1f}s. Aguardando novos arquivos...")
+    return status
+
+
+def monitorar(opcoes):
+    from utils.downloads import ObservadorDownloads
+
+    with ObservadorDownloads(DADOS_DIR) as observador:
+        # Importa as etapas uma vez: os lotes seguintes já encontram
+        # pandas/openpyxl e os próprios scripts carregados
+        for arquivo in ("4_TratamentoSolinftec.py", "5_SepararPorDia.py", "6_ProcessarCase.py", "7_ConsolidarJSON.py"):
+            carregar_etapa(arquivo)
+
+        modo = "inotify" if observador.usa_inotify else "varredura"
+        print("=" * 60)
+        print(f"📡 MONITORANDO {DADOS_DIR} ({modo})")
+        print("   Ctrl+C para encerrar")
+        print("=" * 60)
+        try:
+            while True:
+                lote = coletar_lote(observador, opcoes.janela)
+                try:
+                    processar_lote(lote, observador, opcoes)
+                except Exception as e:
+                    print(f"❌ Falha ao processar lote: {e}")
+                    traceback.print_exc()
+        except KeyboardInterrupt:
+            print("\n👋 Monitor encerrado.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa as etapas 4 a 8 do ETL num único processo.")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="Etapas a executar (ex.: 4,5,7)")
+    parser.add_argument("--sequencial", action="store_true", help="Não paraleliza ramos independentes")
+    parser.add_argument("--salvar-tratado", action="store_true", help="Também grava o XLSX _tratado da etapa 4")
+    parser.add_argument(
+        "--instrumentar", nargs="?", const="basico", choices=["basico", "memoria"],
+        help="Gera relatório de desempenho por trecho em dados/desempenho (o mesmo que ETL_INSTRUMENTACAO)",
+    )
+    parser.add_argument(
+        "--monitorar", action="store_true",
+        help="Fica observando dados/ e roda só as etapas afetadas a cada novo download",
+    )
+    parser.add_argument(
+        "--janela", type=float, default=5.0,
+        help="Segundos sem novos arquivos para fechar um lote no modo monitor (padrão: 5)",
+    )
+    opcoes = parser.parse_args()
+    if opcoes.instrumentar:
+        instrumentacao.ativar(memoria=opcoes.instrumentar == "memoria")
+    if opcoes.monitorar:
+        monitorar(opcoes)
+        return
+
+    selecionadas = {e.strip() for e in opcoes.etapas.split(",") if e.strip()}
+    invalidas = selecionadas - set(ETAPAS)
+    if invalidas:
+        parser.error(f"Etapas inválidas: {', '.join(sorted(invalidas))}")
+
+    print("=" * 60)
+    print("🚀 PIPELINE ETL (etapas " + ", ".join(c for c in ETAPAS if c in selecionadas) + ")")
+    print("=" * 60)
+
+    status = executar_pipeline(selecionadas, opcoes)
+    if any(s != "ok" for s in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
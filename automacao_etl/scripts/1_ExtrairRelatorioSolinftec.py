@@ -1,15 +1,17 @@
 import os
-import time
 import json
 from datetime import datetime, timedelta
 import logging
 import traceback
 import sys
 import shutil
+import copy
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
     TimeoutException,
@@ -36,6 +38,20 @@ logging.basicConfig(
     ],
 )
 
+if base_dir not in sys.path:
+    sys.path.insert(0, base_dir)
+from utils.esperas import (
+    esperar_selenium,
+    esperar_documento_pronto,
+    esperar_sem_loader,
+    esperar_atributo_mudar,
+)
+from utils import arquivos_zip
+from utils.downloads import ObservadorDownloads, descrever_vazao, eh_parcial
+
+# Indicador de carregamento do portal exibido entre telas
+SELETOR_LOADER = ".router-animation-loader"
+
 XPATHS = {
     "login": {
         "username": "/html/body/div[1]/div/div/div/div/form/fieldset/section[1]/label[2]/input",
@@ -155,19 +171,20 @@ def carregar_configuracoes():
         return None
 
 
-def abrir_navegador_com_perfil_padrao(config=None):
+def abrir_navegador_com_perfil_padrao(config=None, headless=False, download_path=None, user_data_dir=None):
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
     # Define pasta de download (padrão 'dados' ou via config)
-    nome_pasta_download = "dados"
-    if config:
-        try:
-            nome_pasta_download = config["automacao"]["parametros"].get("download_dir", "dados")
-        except KeyError:
-            pass
-            
-    nome_pasta_download = normalizar_pasta_download(nome_pasta_download)
-    download_path = os.path.join(base_dir, nome_pasta_download)
+    if not download_path:
+        nome_pasta_download = "dados"
+        if config:
+            try:
+                nome_pasta_download = config["automacao"]["parametros"].get("download_dir", "dados")
+            except KeyError:
+                pass
+                
+        nome_pasta_download = normalizar_pasta_download(nome_pasta_download)
+        download_path = os.path.join(base_dir, nome_pasta_download)
     os.makedirs(download_path, exist_ok=True)
     logging.info(f"Pasta de download configurada: {download_path}")
 
@@ -178,7 +195,12 @@ def abrir_navegador_com_perfil_padrao(config=None):
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
     chrome_options.add_argument("--disable-infobars")
-    chrome_options.add_experimental_option("detach", True)
+    if headless:
+        # --headless=new mantém extensões do perfil e downloads habilitados
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+    else:
+        chrome_options.add_experimental_option("detach", True)
 
     prefs = {
         "download.default_directory": download_path,
@@ -188,7 +210,8 @@ def abrir_navegador_com_perfil_padrao(config=None):
     }
     chrome_options.add_experimental_option("prefs", prefs)
 
-    user_data_dir = preparar_perfil_selenium()
+    if not user_data_dir:
+        user_data_dir = preparar_perfil_selenium()
     chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
     chrome_options.add_argument("--profile-directory=Default")
 
@@ -213,7 +236,11 @@ def abrir_navegador_com_perfil_padrao(config=None):
             "useAutomationExtension", False
         )
         chrome_options_fallback.add_argument("--disable-infobars")
-        chrome_options_fallback.add_experimental_option("detach", True)
+        if headless:
+            chrome_options_fallback.add_argument("--headless=new")
+            chrome_options_fallback.add_argument("--window-size=1920,1080")
+        else:
+            chrome_options_fallback.add_experimental_option("detach", True)
         chrome_options_fallback.add_experimental_option("prefs", prefs)
 
         driver = webdriver.Chrome(options=chrome_options_fallback)
@@ -234,16 +261,8 @@ def abrir_url(driver, url, timeout=20):
         logging.error(f"Erro ao tentar navegar para {url}: {e}")
         return
 
-    limite = time.time() + timeout
-    while time.time() < limite:
-        try:
-            estado = driver.execute_script("return document.readyState")
-            if estado == "complete":
-                logging.info("Página carregada (readyState=complete).")
-                break
-        except Exception:
-            pass
-        time.sleep(0.5)
+    if esperar_documento_pronto(driver, "solinftec.abrir_url", padrao_s=timeout):
+        logging.info("Página carregada (readyState=complete).")
 
     logging.info(f"Título da página atual: {driver.title}")
 
@@ -270,7 +289,7 @@ def fazer_login(driver, config):
 
     abrir_url(driver, url_login, timeout=25)
 
-    espera = WebDriverWait(driver, dados_login.get("timeout", 10))
+    timeout_login = dados_login.get("timeout", 10)
 
     try:
         def preencher(campo, texto):
@@ -280,30 +299,37 @@ def fazer_login(driver, config):
             campo.send_keys(texto)
 
         logging.info("Procurando campo de usuário...")
-        campo_usuario = espera.until(
-            EC.visibility_of_element_located((By.XPATH, dados_login["username"]))
+        campo_usuario = esperar_selenium(
+            driver,
+            EC.visibility_of_element_located((By.XPATH, dados_login["username"])),
+            "solinftec.login.usuario", timeout_login,
         )
         logging.info("Campo de usuário encontrado. Preenchendo.")
         preencher(campo_usuario, usuario)
 
         logging.info("Procurando campo de senha...")
-        campo_senha = espera.until(
-            EC.visibility_of_element_located((By.XPATH, dados_login["password"]))
+        campo_senha = esperar_selenium(
+            driver,
+            EC.visibility_of_element_located((By.XPATH, dados_login["password"])),
+            "solinftec.login.senha", timeout_login,
         )
         preencher(campo_senha, senha)
 
         logging.info("Procurando botão de entrar...")
-        botao_entrar = espera.until(
-            EC.element_to_be_clickable((By.XPATH, dados_login["submit_button"]))
+        botao_entrar = esperar_selenium(
+            driver,
+            EC.element_to_be_clickable((By.XPATH, dados_login["submit_button"])),
+            "solinftec.login.entrar", timeout_login,
         )
         botao_entrar.click()
         logging.info("Botão de entrar clicado.")
 
         if dados_nav.get("menu_relatorios"):
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.XPATH, dados_nav["menu_relatorios"]))
+            esperar_selenium(
+                driver,
+                EC.presence_of_element_located((By.XPATH, dados_nav["menu_relatorios"])),
+                "solinftec.login.menu", 30,
             )
-        time.sleep(1)
     except TimeoutException:
         logging.warning("Tempo esgotado procurando campos de login.")
         logging.warning(
@@ -317,32 +343,34 @@ def fazer_login(driver, config):
 
 def ir_para_tela_de_relatorios(driver):
     dados_nav = XPATHS["navegacao"]
-    espera = WebDriverWait(driver, 10)
 
     logging.info("--- Iniciando navegação pelos menus ---")
 
     try:
         if dados_nav.get("menu_relatorios"):
             logging.info(f"Buscando menu Relatórios: {dados_nav['menu_relatorios']}")
-            menu_relatorios = espera.until(
-                EC.element_to_be_clickable((By.XPATH, dados_nav["menu_relatorios"]))
+            menu_relatorios = esperar_selenium(
+                driver,
+                EC.element_to_be_clickable((By.XPATH, dados_nav["menu_relatorios"])),
+                "solinftec.menu.relatorios", 10,
             )
             menu_relatorios.click()
             logging.info("Menu Relatórios clicado.")
-            time.sleep(2)
 
         if dados_nav.get("menu_gerador_relatorios"):
             logging.info(
                 f"Buscando Gerador de Relatórios: {dados_nav['menu_gerador_relatorios']}"
             )
-            menu_gerador = espera.until(
+            menu_gerador = esperar_selenium(
+                driver,
                 EC.element_to_be_clickable(
                     (By.XPATH, dados_nav["menu_gerador_relatorios"])
-                )
+                ),
+                "solinftec.menu.gerador", 10,
             )
             menu_gerador.click()
             logging.info("Gerador de Relatórios clicado.")
-            time.sleep(2)
+            esperar_sem_loader(driver, SELETOR_LOADER, "solinftec.menu.carregar")
 
         logging.info("Navegação de menus finalizada com sucesso.")
     except Exception as e:
@@ -352,53 +380,41 @@ def ir_para_tela_de_relatorios(driver):
 
 def preencher_assistente_geracao(driver):
     dados_assistente = XPATHS["assistente_geracao"]
-    espera = WebDriverWait(driver, 10)
+
+    def clicavel(xpath, passo):
+        return esperar_selenium(
+            driver, EC.element_to_be_clickable((By.XPATH, xpath)), passo, 10
+        )
 
     logging.info("--- Iniciando preenchimento do Assistente de Geração ---")
 
     try:
         # 1. Selecionar Tipo de Relatório
         logging.info("Abrindo dropdown 'Tipo de Relatório'...")
-        dropdown_tipo = espera.until(
-            EC.element_to_be_clickable((By.XPATH, dados_assistente["tipo_relatorio"]))
-        )
+        dropdown_tipo = clicavel(dados_assistente["tipo_relatorio"], "solinftec.assistente.tipo")
         dropdown_tipo.click()
-        time.sleep(1)
 
         logging.info("Selecionando opção de Tipo de Relatório...")
-        opcao_tipo = espera.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, dados_assistente["opcao_tipo_relatorio"])
-            )
-        )
+        opcao_tipo = clicavel(dados_assistente["opcao_tipo_relatorio"], "solinftec.assistente.opcao_tipo")
         opcao_tipo.click()
         logging.info("Tipo de Relatório selecionado.")
-        time.sleep(2)
 
         # 2. Selecionar Relatório
         logging.info("Abrindo dropdown 'Relatório'...")
-        dropdown_relatorio = espera.until(
-            EC.element_to_be_clickable((By.XPATH, dados_assistente["relatorio"]))
-        )
+        dropdown_relatorio = clicavel(dados_assistente["relatorio"], "solinftec.assistente.relatorio")
         dropdown_relatorio.click()
-        time.sleep(1)
 
         logging.info("Selecionando opção de Relatório...")
-        opcao_relatorio = espera.until(
-            EC.element_to_be_clickable((By.XPATH, dados_assistente["opcao_relatorio"]))
-        )
+        opcao_relatorio = clicavel(dados_assistente["opcao_relatorio"], "solinftec.assistente.opcao_relatorio")
         opcao_relatorio.click()
         logging.info("Relatório selecionado.")
-        time.sleep(2)
 
         # 3. Clicar em Próximo
         logging.info("Clicando em 'Próximo'...")
-        botao_prox = espera.until(
-            EC.element_to_be_clickable((By.XPATH, dados_assistente["botao_proximo"]))
-        )
+        botao_prox = clicavel(dados_assistente["botao_proximo"], "solinftec.assistente.proximo")
         botao_prox.click()
         logging.info("Botão 'Próximo' clicado.")
-        time.sleep(3)
+        esperar_sem_loader(driver, SELETOR_LOADER, "solinftec.assistente.carregar")
 
         logging.info("Assistente de geração preenchido com sucesso.")
 
@@ -410,7 +426,6 @@ def preencher_assistente_geracao(driver):
 def selecionar_equipamentos(driver, config):
     dados_selecao = XPATHS["selecao_equipamentos"]
     cfg_selecao = config["automacao"]["selecao_equipamentos"]
-    espera = WebDriverWait(driver, 20)
 
     logging.info("--- Iniciando seleção de equipamentos ---")
 
@@ -419,21 +434,26 @@ def selecionar_equipamentos(driver, config):
             return " ".join((s or "").split()).lower()
 
         def clicar(xpath, espera_click=True):
-            try:
-                WebDriverWait(driver, 30).until(
-                    EC.invisibility_of_element_located((By.CSS_SELECTOR, ".router-animation-loader"))
-                )
-            except TimeoutException:
-                pass
-            espera.until(EC.visibility_of_element_located((By.XPATH, xpath)))
-            el = espera.until(EC.element_to_be_clickable((By.XPATH, xpath)))
+            esperar_sem_loader(driver, SELETOR_LOADER, "solinftec.selecao.loader")
+            el = esperar_selenium(
+                driver, EC.element_to_be_clickable((By.XPATH, xpath)),
+                "solinftec.selecao.clicavel", 20,
+            )
             driver.execute_script(
                 "arguments[0].scrollIntoView({block: 'center'});", el
             )
-            time.sleep(0.5)
             el.click()
             if espera_click:
-                time.sleep(1)
+                esperar_sem_loader(driver, SELETOR_LOADER, "solinftec.selecao.loader")
+
+        def clicar_checkbox(cb, label):
+            # Aguarda o checkbox refletir o clique (classe muda) em vez de pausa fixa
+            classe_antes = cb.get_attribute("class")
+            try:
+                label.click()
+            except Exception:
+                driver.execute_script("arguments[0].click();", label)
+            esperar_atributo_mudar(driver, cb, "class", classe_antes, "solinftec.selecao.checkbox")
 
         botao_inicio = dados_selecao.get("botao_selecionar_inicio")
         if botao_inicio:
@@ -470,8 +490,9 @@ def selecionar_equipamentos(driver, config):
                     f"Frentes desejadas (config): {', '.join(str(x) for x in frente_cfg)}"
                 )
 
-                container_frente = espera.until(
-                    EC.visibility_of_element_located((By.XPATH, lista_frente_xpath))
+                container_frente = esperar_selenium(
+                    driver, EC.visibility_of_element_located((By.XPATH, lista_frente_xpath)),
+                    "solinftec.selecao.lista_frente", 20,
                 )
 
                 alvos_frente = {normalizar_texto(str(t)) for t in frente_cfg}
@@ -504,12 +525,7 @@ def selecionar_equipamentos(driver, config):
                     driver.execute_script(
                         "arguments[0].scrollIntoView({block: 'center'});", label
                     )
-                    time.sleep(0.2)
-                    try:
-                        label.click()
-                    except Exception:
-                        driver.execute_script("arguments[0].click();", label)
-                    time.sleep(0.4)
+                    clicar_checkbox(cb, label)
 
         tipos_config = cfg_selecao.get("tipo_equipamento", [])
         if tipos_config:
@@ -519,8 +535,9 @@ def selecionar_equipamentos(driver, config):
                     f"Tipos de equipamento desejados (config): {', '.join(tipos_config)}"
                 )
 
-                container = espera.until(
-                    EC.visibility_of_element_located((By.XPATH, lista_xpath))
+                container = esperar_selenium(
+                    driver, EC.visibility_of_element_located((By.XPATH, lista_xpath)),
+                    "solinftec.selecao.lista_tipo", 20,
                 )
 
                 alvos_normalizados = {normalizar_texto(t) for t in tipos_config}
@@ -560,12 +577,10 @@ def selecionar_equipamentos(driver, config):
                             driver.execute_script(
                                 "arguments[0].scrollIntoView(true);", alvo_click
                             )
-                            time.sleep(0.5)
 
                         if alvo_click.is_enabled():
-                            alvo_click.click()
+                            clicar_checkbox(cb, alvo_click)
                             logging.info(f"Clique realizado em: {combinado}")
-                            time.sleep(1.0)
                     except Exception as e:
                         logging.warning(
                             f"Falha ao clicar na opção de equipamento '{combinado}': {e}"
@@ -592,8 +607,9 @@ def selecionar_equipamentos(driver, config):
                     f"Frotas desejadas (config): {', '.join(str(x) for x in frota_cfg)}"
                 )
 
-                container_frota = espera.until(
-                    EC.visibility_of_element_located((By.XPATH, lista_frota_xpath))
+                container_frota = esperar_selenium(
+                    driver, EC.visibility_of_element_located((By.XPATH, lista_frota_xpath)),
+                    "solinftec.selecao.lista_frota", 20,
                 )
                 alvos_frota = {normalizar_texto(str(t)) for t in frota_cfg}
 
@@ -627,26 +643,19 @@ def selecionar_equipamentos(driver, config):
                     driver.execute_script(
                         "arguments[0].scrollIntoView({block: 'center'});", label
                     )
-                    time.sleep(0.2)
-                    try:
-                        label.click()
-                    except Exception:
-                        driver.execute_script("arguments[0].click();", label)
-                    time.sleep(0.4)
+                    clicar_checkbox(cb, label)
 
         # Clicar em "Selecionar" (Confirmar seleção)
         xpath_botao_selecionar = dados_selecao.get("botao_selecionar")
         if xpath_botao_selecionar:
             logging.info("Confirmando seleção de equipamentos (Botão Selecionar)...")
-            clicar(xpath_botao_selecionar, espera_click=False)
-            time.sleep(2)
+            clicar(xpath_botao_selecionar)
 
         # Clicar em "Próximo"
         xpath_botao_proximo = dados_selecao.get("botao_proximo")
         if xpath_botao_proximo:
             logging.info("Avançando para próxima etapa (Botão Próximo)...")
-            clicar(xpath_botao_proximo, espera_click=False)
-            time.sleep(2)
+            clicar(xpath_botao_proximo)
 
         logging.info("Seleção de equipamentos finalizada.")
 
@@ -658,23 +667,17 @@ def selecionar_equipamentos(driver, config):
 def selecionar_data_uib_datepicker(driver, xpath_botao_calendario, data_alvo):
     import datetime
 
-    espera = WebDriverWait(driver, 20)
-
     dt_alvo = datetime.datetime.strptime(data_alvo, "%d/%m/%Y")
     dia_alvo = dt_alvo.day
     mes_alvo = dt_alvo.month
     ano_alvo = dt_alvo.year
 
-    try:
-        WebDriverWait(driver, 30).until(
-            EC.invisibility_of_element_located((By.CSS_SELECTOR, ".router-animation-loader"))
-        )
-    except TimeoutException:
-        pass
-    espera.until(EC.visibility_of_element_located((By.XPATH, xpath_botao_calendario)))
-    botao = espera.until(EC.element_to_be_clickable((By.XPATH, xpath_botao_calendario)))
+    esperar_sem_loader(driver, SELETOR_LOADER, "solinftec.datepicker.loader")
+    botao = esperar_selenium(
+        driver, EC.element_to_be_clickable((By.XPATH, xpath_botao_calendario)),
+        "solinftec.datepicker.botao", 20,
+    )
     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", botao)
-    time.sleep(0.5)
     try:
         botao.click()
     except Exception:
@@ -693,7 +696,7 @@ def selecionar_data_uib_datepicker(driver, xpath_botao_calendario, data_alvo):
                 continue
         return None
 
-    popup = espera.until(lambda d: obter_popup_visivel(d))
+    popup = esperar_selenium(driver, lambda d: obter_popup_visivel(d), "solinftec.datepicker.popup", 20)
 
     meses = {
         "janeiro": 1,
@@ -732,9 +735,8 @@ def selecionar_data_uib_datepicker(driver, xpath_botao_calendario, data_alvo):
             popup.find_element(By.CSS_SELECTOR, "button.uib-right").click()
         else:
             popup.find_element(By.CSS_SELECTOR, "button.uib-left").click()
-        espera.until(lambda d: ler_mes_ano() != (mes_ant, ano_ant))
+        esperar_selenium(driver, lambda d: ler_mes_ano() != (mes_ant, ano_ant), "solinftec.datepicker.mes", 20)
         mes_atual, ano_atual = ler_mes_ano()
-        time.sleep(0.1)
 
     xpath_dia = (
         ".//td[contains(@class,'uib-day')]//button[not(@disabled)]"
@@ -742,59 +744,71 @@ def selecionar_data_uib_datepicker(driver, xpath_botao_calendario, data_alvo):
     )
     dia_btn = popup.find_element(By.XPATH, xpath_dia)
     driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", dia_btn)
-    time.sleep(0.2)
     try:
         dia_btn.click()
     except Exception:
         driver.execute_script("arguments[0].click();", dia_btn)
 
-    time.sleep(0.3)
+    # O popup fecha ao escolher o dia
+    esperar_selenium(
+        driver, EC.invisibility_of_element(popup), "solinftec.datepicker.fechar", 5, obrigatorio=False
+    )
 
 
-def gerar_relatorio(driver, config):
+def calcular_periodo(cfg_parametros):
+    """Retorna (data_inicial, data_final) em DD/MM/YYYY conforme o modo configurado."""
+    # --- LÓGICA DE DATAS (PRIORIDADE: SEMANAL > ONTEM > MANUAL) ---
+    extrair_semanal = cfg_parametros.get("extrair_semanal", False)
+    extrair_ontem = cfg_parametros.get("extrair_ontem", False)
+    
+    hoje = datetime.now()
+    ontem = hoje - timedelta(days=1)
+    
+    val_data_ini = ""
+    val_data_fim = ""
+    
+    if extrair_semanal:
+        # Semanal: Últimos 7 dias (terminando ontem)
+        dt_inicio = ontem - timedelta(days=6)
+        val_data_ini = dt_inicio.strftime("%d/%m/%Y")
+        val_data_fim = ontem.strftime("%d/%m/%Y")
+        logging.info(f"Modo SEMANAL ativado. Periodo: {val_data_ini} a {val_data_fim}")
+        
+    elif extrair_ontem:
+        # Ontem: Apenas data de ontem
+        val_data_ini = ontem.strftime("%d/%m/%Y")
+        val_data_fim = ontem.strftime("%d/%m/%Y")
+        logging.info(f"Modo ONTEM ativado. Data: {val_data_ini}")
+        
+    else:
+        # Manual ou Fallback
+        val_data_ini = cfg_parametros.get("data_inicial") or cfg_parametros.get("data_inicio") or ""
+        val_data_fim = cfg_parametros.get("data_final") or cfg_parametros.get("data_fim") or ""
+        
+        if not val_data_ini or not val_data_fim:
+            # Fallback de segurança: Ontem
+            val_data_ini = ontem.strftime("%d/%m/%Y")
+            val_data_fim = ontem.strftime("%d/%m/%Y")
+            logging.info(f"Modo Manual vazio. Usando Fallback (Ontem): {val_data_ini}")
+        else:
+            logging.info(f"Modo MANUAL. Periodo: {val_data_ini} a {val_data_fim}")
+
+    return val_data_ini, val_data_fim
+
+
+def gerar_relatorio(driver, config, periodo=None, sufixo_nome="", download_path=None):
     dados_parametros = XPATHS["parametros"]
-    espera = WebDriverWait(driver, 20)
 
     logging.info("--- Iniciando geração do relatório ---")
 
     try:
         cfg_parametros = config.get("automacao", {}).get("parametros", {})
         
-        # --- LÓGICA DE DATAS (PRIORIDADE: SEMANAL > ONTEM > MANUAL) ---
-        extrair_semanal = cfg_parametros.get("extrair_semanal", False)
-        extrair_ontem = cfg_parametros.get("extrair_ontem", False)
-        
-        hoje = datetime.now()
-        ontem = hoje - timedelta(days=1)
-        
-        val_data_ini = ""
-        val_data_fim = ""
-        
-        if extrair_semanal:
-            # Semanal: Últimos 7 dias (terminando ontem)
-            dt_inicio = ontem - timedelta(days=6)
-            val_data_ini = dt_inicio.strftime("%d/%m/%Y")
-            val_data_fim = ontem.strftime("%d/%m/%Y")
-            logging.info(f"Modo SEMANAL ativado. Periodo: {val_data_ini} a {val_data_fim}")
-            
-        elif extrair_ontem:
-            # Ontem: Apenas data de ontem
-            val_data_ini = ontem.strftime("%d/%m/%Y")
-            val_data_fim = ontem.strftime("%d/%m/%Y")
-            logging.info(f"Modo ONTEM ativado. Data: {val_data_ini}")
-            
+        if periodo:
+            val_data_ini, val_data_fim = periodo
+            logging.info(f"Período do fragmento: {val_data_ini} a {val_data_fim}")
         else:
-            # Manual ou Fallback
-            val_data_ini = cfg_parametros.get("data_inicial") or cfg_parametros.get("data_inicio") or ""
-            val_data_fim = cfg_parametros.get("data_final") or cfg_parametros.get("data_fim") or ""
-            
-            if not val_data_ini or not val_data_fim:
-                # Fallback de segurança: Ontem
-                val_data_ini = ontem.strftime("%d/%m/%Y")
-                val_data_fim = ontem.strftime("%d/%m/%Y")
-                logging.info(f"Modo Manual vazio. Usando Fallback (Ontem): {val_data_ini}")
-            else:
-                logging.info(f"Modo MANUAL. Periodo: {val_data_ini} a {val_data_fim}")
+            val_data_ini, val_data_fim = calcular_periodo(cfg_parametros)
 
         xpath_botao_ini = dados_parametros.get("data_inicial")
         xpath_botao_fim = dados_parametros.get("data_final")
@@ -834,89 +848,72 @@ def gerar_relatorio(driver, config):
         logging.info(f"DEBUG: Tipo Arquivo (config): '{val_tipo_arq}'")
 
         if xpath_dropdown and val_tipo_arq:
-            dropdown = espera.until(EC.element_to_be_clickable((By.XPATH, xpath_dropdown)))
+            dropdown = esperar_selenium(
+                driver, EC.element_to_be_clickable((By.XPATH, xpath_dropdown)),
+                "solinftec.parametros.tipo_arquivo", 20,
+            )
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", dropdown)
-            time.sleep(0.5)
             try:
                 dropdown.click()
             except Exception:
                 driver.execute_script("arguments[0].click();", dropdown)
-            time.sleep(0.5)
 
             if xpath_opcao:
-                espera.until(EC.visibility_of_element_located((By.XPATH, xpath_opcao)))
-                opcao = espera.until(EC.element_to_be_clickable((By.XPATH, xpath_opcao)))
+                opcao = esperar_selenium(
+                    driver, EC.element_to_be_clickable((By.XPATH, xpath_opcao)),
+                    "solinftec.parametros.tipo_arquivo_opcao", 20,
+                )
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", opcao)
-                time.sleep(0.2)
                 try:
                     opcao.click()
                 except Exception:
                     driver.execute_script("arguments[0].click();", opcao)
-                time.sleep(0.5)
+                # Dropdown fecha após a escolha
+                esperar_selenium(
+                    driver, EC.invisibility_of_element(opcao),
+                    "solinftec.parametros.tipo_arquivo_fechar", 5, obrigatorio=False,
+                )
 
         xpath_botao_gerar = dados_parametros.get("botao_gerar")
         if not xpath_botao_gerar:
             logging.error("XPath do botão Gerar não está configurado.")
             return
 
-        nome_pasta_download = cfg_parametros.get("download_dir", "dados")
-        nome_pasta_download = normalizar_pasta_download(nome_pasta_download)
-        download_path = os.path.join(base_dir, nome_pasta_download)
+        if not download_path:
+            nome_pasta_download = cfg_parametros.get("download_dir", "dados")
+            nome_pasta_download = normalizar_pasta_download(nome_pasta_download)
+            download_path = os.path.join(base_dir, nome_pasta_download)
         os.makedirs(download_path, exist_ok=True)
 
-        try:
-            arquivos_antes = set(os.listdir(download_path))
-        except Exception:
-            arquivos_antes = set()
+        # Observa a pasta antes do clique: só arquivos novos contam como download
+        observador = ObservadorDownloads(download_path)
+        captcha_avisado = []
 
-        def esperar_download(timeout=240):
-            limite = time.time() + timeout
-            while time.time() < limite:
-                try:
-                    atuais = set(os.listdir(download_path))
-                except Exception:
-                    atuais = set()
-
-                novos = [
-                    f
-                    for f in (atuais - arquivos_antes)
-                    if not f.lower().endswith(".crdownload")
-                ]
-                if novos:
-                    caminhos = [os.path.join(download_path, f) for f in novos]
-                    try:
-                        return max(caminhos, key=os.path.getmtime)
-                    except Exception:
-                        return caminhos[0]
-
-                if any(f.lower().endswith(".crdownload") for f in atuais):
-                    time.sleep(1.0)
-                    continue
-
-                if driver.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha'], iframe[src*='hcaptcha']"):
-                    time.sleep(1.0)
-                    continue
-
-                time.sleep(1.0)
-            return None
+        def avisar_captcha():
+            if not captcha_avisado and driver.find_elements(
+                By.CSS_SELECTOR, "iframe[src*='recaptcha'], iframe[src*='hcaptcha']"
+            ):
+                logging.info("Captcha presente; aguardando resolução...")
+                captcha_avisado.append(True)
 
         logging.info("Clicando no botão Gerar...")
-        botao_gerar = espera.until(
-            EC.element_to_be_clickable((By.XPATH, xpath_botao_gerar))
+        botao_gerar = esperar_selenium(
+            driver, EC.element_to_be_clickable((By.XPATH, xpath_botao_gerar)),
+            "solinftec.parametros.gerar", 20,
         )
         driver.execute_script(
             "arguments[0].scrollIntoView({block: 'center'});", botao_gerar
         )
-        time.sleep(0.5)
         try:
             botao_gerar.click()
         except Exception:
             driver.execute_script("arguments[0].click();", botao_gerar)
 
         logging.info("Botão Gerar clicado. Aguardando captcha finalizar e download...")
-        arquivo_baixado = esperar_download(timeout=240)
+        with observador:
+            arquivo_baixado = observador.aguardar(timeout=240, ao_esperar=avisar_captcha)
         if arquivo_baixado:
-            logging.info(f"Download concluído: {arquivo_baixado}")
+            logging.info(f"Download concluído: {arquivo_baixado} - {descrever_vazao(observador.estatisticas)}")
 
             def formatar_data_nome(data_str):
                 return str(data_str).strip().replace("/", "-")
@@ -929,7 +926,7 @@ def gerar_relatorio(driver, config):
             if not ext:
                 ext = ".xlsx"
 
-            nome_base = f"{prefixo}-{data_ini_nome}_{data_fim_nome}{ext}"
+            nome_base = f"{prefixo}-{data_ini_nome}_{data_fim_nome}{sufixo_nome}{ext}"
             destino = os.path.join(download_path, nome_base)
             arquivo_final = arquivo_baixado
 
@@ -938,7 +935,7 @@ def gerar_relatorio(driver, config):
                     i = 1
                     while True:
                         candidato = os.path.join(
-                            download_path, f"{prefixo}-{data_ini_nome}_{data_fim_nome}-{i}{ext}"
+                            download_path, f"{prefixo}-{data_ini_nome}_{data_fim_nome}{sufixo_nome}-{i}{ext}"
                         )
                         if not os.path.exists(candidato):
                             destino = candidato
@@ -956,66 +953,41 @@ def gerar_relatorio(driver, config):
             if str(arquivo_final).lower().endswith(".zip"):
                 import zipfile
 
+                # A planilha fica dentro do ZIP: a etapa 4 lê o membro direto
+                # (utils/arquivos_zip.py), sem extrair. Aqui só valida a integridade.
                 try:
-                    with zipfile.ZipFile(arquivo_final, "r") as zf:
-                        erro_zip = zf.testzip()
+                    with arquivos_zip.abrir_zip(arquivo_final) as zf:
+                        erro_zip = zf.testar()
                         if erro_zip:
                             logging.error(
                                 f"Arquivo ZIP baixado está corrompido, entrada com erro: {erro_zip}"
                             )
                             return
 
-                        membros = [
-                            n
-                            for n in zf.namelist()
-                            if n.lower().endswith(".xls") or n.lower().endswith(".xlsx")
-                        ]
+                        membros = zf.nomes((".xls", ".xlsx"))
 
                         if not membros:
                             logging.warning("ZIP baixado não contém arquivo .xls/.xlsx.")
                         else:
-                            membro = membros[0]
-                            ext_interno = os.path.splitext(membro)[1] or ".xls"
-                            base_zip = os.path.splitext(os.path.basename(arquivo_final))[0]
-                            destino_xls = os.path.join(download_path, f"{base_zip}{ext_interno}")
-
-                            if os.path.exists(destino_xls):
-                                i = 1
-                                while True:
-                                    candidato = os.path.join(
-                                        download_path, f"{base_zip}-{i}{ext_interno}"
-                                    )
-                                    if not os.path.exists(candidato):
-                                        destino_xls = candidato
-                                        break
-                                    i += 1
-
-                            with zf.open(membro, "r") as src, open(destino_xls, "wb") as dst:
-                                shutil.copyfileobj(src, dst)
-
-                            logging.info(f"Arquivo extraído: {destino_xls}")
-
-                            if ext_interno.lower() == ".xlsx":
+                            for membro in membros:
+                                if not membro.lower().endswith(".xlsx"):
+                                    continue
                                 try:
-                                    with zipfile.ZipFile(destino_xls, "r") as zf_xlsx:
+                                    # .xlsx também é ZIP: testa em memória
+                                    with zipfile.ZipFile(zf.abrir(membro), "r") as zf_xlsx:
                                         erro_xlsx = zf_xlsx.testzip()
                                     if erro_xlsx:
                                         logging.error(
-                                            f"Arquivo Excel extraído está corrompido, entrada com erro: {erro_xlsx}"
+                                            f"Arquivo Excel no ZIP está corrompido, entrada com erro: {erro_xlsx}"
                                         )
                                         return
                                 except Exception as e:
                                     logging.error(
-                                        f"Falha ao validar integridade do Excel extraído: {e}"
+                                        f"Falha ao validar integridade do Excel no ZIP: {e}"
                                     )
-
-                    try:
-                        os.remove(arquivo_final)
-                        logging.info(f"ZIP deletado: {arquivo_final}")
-                    except Exception as e:
-                        logging.warning(f"Falha ao deletar ZIP: {e}")
+                            logging.info(f"Planilha mantida no ZIP: {arquivo_final} ({', '.join(membros)})")
                 except Exception as e:
-                    logging.warning(f"Falha ao extrair ZIP baixado: {e}")
+                    logging.warning(f"Falha ao validar ZIP baixado: {e}")
         else:
             logging.warning("Timeout aguardando download após clicar em Gerar.")
         return
@@ -1025,6 +997,158 @@ def gerar_relatorio(driver, config):
         logging.error(traceback.format_exc())
 
 
+def preparar_perfil_sessao(slot):
+    """
+    Cópia do perfil Selenium para a sessão paralela `slot`.
+    O Chrome não abre duas instâncias no mesmo user-data-dir.
+    """
+    base = preparar_perfil_selenium()
+    destino = f"{base} {slot}"
+    marcador = os.path.join(destino, ".perfil_copiado_ok")
+    if os.path.exists(marcador) or not os.path.exists(base):
+        return destino
+
+    logging.info(f"Copiando perfil Selenium para a sessão {slot}: {destino}")
+    try:
+        shutil.copytree(
+            base, destino, dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns("Singleton*", "*.lock", "Cache", "Code Cache", "GPUCache"),
+        )
+        with open(marcador, "w", encoding="utf-8") as f:
+            f.write("ok")
+    except Exception as e:
+        logging.error(f"Erro ao copiar perfil da sessão {slot}: {e}")
+    return destino
+
+
+def slug_fragmento(texto):
+    return re.sub(r"[^a-z0-9]+", "-", str(texto).lower()).strip("-") or "x"
+
+
+def montar_fragmentos(config, periodo):
+    """
+    Divide a extração em fragmentos independentes:
+    - por "dia": um relatório por dia do período;
+    - por "frente": um relatório do período inteiro por frente configurada.
+    Cada fragmento é {"id", "periodo", "config"}.
+    """
+    cfg_frag = config["automacao"]["parametros"].get("extracao_fragmentada", {})
+    modo = cfg_frag.get("por", "dia")
+
+    if modo == "frente":
+        frentes = config["automacao"]["selecao_equipamentos"].get("frente")
+        if isinstance(frentes, list):
+            frentes = [f for f in frentes if " ".join(str(f).split()).lower() != "selecionar tudo"]
+        if isinstance(frentes, list) and frentes:
+            fragmentos = []
+            for frente in frentes:
+                cfg = copy.deepcopy(config)
+                cfg["automacao"]["selecao_equipamentos"]["frente"] = [frente]
+                fragmentos.append({"id": f"frente-{slug_fragmento(frente)}", "periodo": periodo, "config": cfg})
+            return fragmentos
+        logging.warning("Fragmentação por frente exige lista explícita de frentes; usando fragmentação por dia.")
+
+    dt_ini = datetime.strptime(periodo[0], "%d/%m/%Y")
+    dt_fim = datetime.strptime(periodo[1], "%d/%m/%Y")
+    fragmentos = []
+    dia = dt_ini
+    while dia <= dt_fim:
+        data = dia.strftime("%d/%m/%Y")
+        fragmentos.append({"id": dia.strftime("%Y%m%d"), "periodo": (data, data), "config": config})
+        dia += timedelta(days=1)
+    return fragmentos
+
+
+def executar_fragmento(fragmento, lote, slots, pasta_final, headless):
+    """Executa login + assistente + geração numa sessão própria e move o arquivo para a pasta final."""
+    slot = slots.get()
+    pasta_fragmento = os.path.join(pasta_final, "fragmentos", lote, fragmento["id"])
+    driver = None
+    try:
+        logging.info(f"[{fragmento['id']}] Iniciando na sessão {slot} ({fragmento['periodo'][0]} a {fragmento['periodo'][1]})")
+        cfg = fragmento["config"]
+        driver = abrir_navegador_com_perfil_padrao(
+            cfg, headless=headless, download_path=pasta_fragmento,
+            user_data_dir=preparar_perfil_sessao(slot),
+        )
+        fazer_login(driver, cfg)
+        ir_para_tela_de_relatorios(driver)
+        preencher_assistente_geracao(driver)
+        selecionar_equipamentos(driver, cfg)
+        gerar_relatorio(
+            driver, cfg,
+            periodo=fragmento["periodo"],
+            sufixo_nome=f"__lote-{lote}__frag-{fragmento['id']}",
+            download_path=pasta_fragmento,
+        )
+
+        movidos = []
+        for nome in os.listdir(pasta_fragmento):
+            if eh_parcial(nome):
+                continue
+            destino = os.path.join(pasta_final, nome)
+            os.replace(os.path.join(pasta_fragmento, nome), destino)
+            movidos.append(destino)
+        logging.info(f"[{fragmento['id']}] Concluído: {[os.path.basename(m) for m in movidos]}")
+        return movidos
+    finally:
+        if driver:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        slots.put(slot)
+        shutil.rmtree(pasta_fragmento, ignore_errors=True)
+
+
+def executar_extracao_fragmentada(config):
+    """Extrai os fragmentos em sessões headless paralelas (limitadas por max_sessoes)."""
+    cfg_parametros = config["automacao"]["parametros"]
+    cfg_frag = cfg_parametros.get("extracao_fragmentada", {})
+    max_sessoes = max(1, int(cfg_frag.get("max_sessoes", 3)))
+    headless = cfg_frag.get("headless", True)
+
+    periodo = calcular_periodo(cfg_parametros)
+    fragmentos = montar_fragmentos(config, periodo)
+    lote = datetime.now().strftime("%Y%m%d%H%M%S")
+    pasta_final = os.path.join(base_dir, normalizar_pasta_download(cfg_parametros.get("download_dir", "dados")))
+
+    logging.info(
+        f"Extração fragmentada: {len(fragmentos)} fragmentos, até {max_sessoes} sessões, lote {lote}"
+    )
+
+    # Perfil base pronto antes das cópias por sessão
+    preparar_perfil_selenium()
+    slots = queue.Queue()
+    for slot in range(1, max_sessoes + 1):
+        slots.put(slot)
+
+    arquivos = []
+    falhas = []
+    with ThreadPoolExecutor(max_workers=max_sessoes, thread_name_prefix="fragmento") as executor:
+        futuros = {
+            executor.submit(executar_fragmento, frag, lote, slots, pasta_final, headless): frag
+            for frag in fragmentos
+        }
+        for futuro in as_completed(futuros):
+            frag = futuros[futuro]
+            try:
+                movidos = futuro.result()
+                if movidos:
+                    arquivos.extend(movidos)
+                else:
+                    falhas.append(frag["id"])
+            except Exception as e:
+                logging.error(f"[{frag['id']}] Falhou: {e}")
+                falhas.append(frag["id"])
+
+    shutil.rmtree(os.path.join(pasta_final, "fragmentos", lote), ignore_errors=True)
+    logging.info(f"Fragmentos concluídos: {len(fragmentos) - len(falhas)}/{len(fragmentos)}")
+    if falhas:
+        logging.warning(f"Fragmentos sem arquivo: {', '.join(sorted(falhas))}")
+    return arquivos
+
+
 def main():
     logging.info(">>> Iniciando automação <<<")
 
@@ -1035,6 +1159,11 @@ def main():
             logging.error("Configurações inválidas. Encerrando.")
             return
 
+        if config["automacao"]["parametros"].get("extracao_fragmentada", {}).get("ativo"):
+            executar_extracao_fragmentada(config)
+            logging.info(">>> Automação concluída <<<")
+            return
+
         driver = abrir_navegador_com_perfil_padrao(config)
 
         fazer_login(driver, config)
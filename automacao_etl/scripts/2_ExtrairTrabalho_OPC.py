@@ -1,8 +1,10 @@
 import json
 import os
 import re
-import time
 import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from playwright.sync_api import sync_playwright
 
@@ -10,20 +12,23 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "dados")
 ESTADO_FILE = os.path.join(BASE_DIR, "utils", "processos_opc_case.json")
 
-COLHEDORAS_IDS = {"369", "375", "444", "469", "547", "517", "560"}
-
-def identificar_tipo_frota(nome_completo, nome_frota_limpo):
-    nome_lower = str(nome_completo).lower()
-    if "colhedora" in nome_lower:
-        return "Colhedora"
-    if "trator" in nome_lower:
-        return "Trator"
-    match = re.search(r'(\d+)', str(nome_frota_limpo))
-    if not match:
-        match = re.search(r'(\d+)', nome_lower)
-    if match and match.group(1) in COLHEDORAS_IDS:
-        return "Colhedora"
-    return "Trator"
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils.esperas import (
+    esperar_estado,
+    esperar_rede_ociosa,
+    esperar_primeiro_visivel,
+    esperar_resposta,
+)
+from utils.downloads import descrever_vazao, salvar_download
+from utils.registro_frotas import obter_registro
+
+# Intervalo entre verificações da aba 'Outros' (backoff exponencial)
+INTERVALO_MONITOR_MIN_S = 10
+INTERVALO_MONITOR_MAX_S = 120
+
+# Protege o processos_opc_case.json quando há várias páginas exportando ao mesmo tempo
+ESTADO_LOCK = threading.RLock()
 
 def load_config():
     config_path = os.path.join(BASE_DIR, "utils", "config_automacao.json")
@@ -31,17 +36,32 @@ def load_config():
         return json.load(f)
 
 def carregar_estado_processo():
-    if os.path.exists(ESTADO_FILE):
-        try:
-            with open(ESTADO_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            pass
+    with ESTADO_LOCK:
+        if os.path.exists(ESTADO_FILE):
+            try:
+                with open(ESTADO_FILE, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except:
+                pass
     return {"processo_id": "", "arquivos_esperados": [], "arquivos_baixados": []}
 
 def salvar_estado_processo(estado):
-    with open(ESTADO_FILE, 'w', encoding='utf-8') as f:
-        json.dump(estado, f, indent=4)
+    # Grava em arquivo temporário e substitui: leitores nunca veem JSON pela metade
+    with ESTADO_LOCK:
+        tmp = f"{ESTADO_FILE}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=4)
+        os.replace(tmp, ESTADO_FILE)
+
+def registrar_arquivos_esperados(novos_arquivos):
+    """Acrescenta arquivos ao estado compartilhado (seguro entre threads)."""
+    with ESTADO_LOCK:
+        estado = carregar_estado_processo()
+        for arq in novos_arquivos:
+            if arq not in estado["arquivos_esperados"]:
+                estado["arquivos_esperados"].append(arq)
+        salvar_estado_processo(estado)
+        return estado
 
 def limpar_estado_processo():
     estado_vazio = {"processo_id": "", "arquivos_esperados": [], "arquivos_baixados": []}
@@ -87,10 +107,11 @@ def monitorar_e_baixar_arquivos(page, arquivos_esperados):
         print("Navegando para Files Manager...")
         if "files.deere.com" not in page.url:
             page.goto("https://files.deere.com/", wait_until="domcontentloaded")
-            page.wait_for_timeout(5000)
+            esperar_rede_ociosa(page, "opc.files.abrir")
         
-        # Loop de monitoramento
+        # Loop de monitoramento (intervalo cresce enquanto nada novo aparece)
         tentativa = 0
+        intervalo = INTERVALO_MONITOR_MIN_S
         while arquivos_pendentes:
             tentativa += 1
             print(f"\n--- Ciclo de Verificação {tentativa} ---")
@@ -103,7 +124,7 @@ def monitorar_e_baixar_arquivos(page, arquivos_esperados):
             except:
                 page.get_by_text("Outros").click()
             
-            page.wait_for_timeout(5000) # Espera lista carregar
+            esperar_rede_ociosa(page, "opc.files.lista") # Espera lista carregar
             
             novos_downloads = []
             
@@ -124,29 +145,25 @@ def monitorar_e_baixar_arquivos(page, arquivos_esperados):
                         # 1. Clica no arquivo para selecionar/abrir detalhes
                         print(f"Selecionando arquivo: {arquivo_nome}")
                         elemento_arquivo.first.click()
-                        page.wait_for_timeout(2000)
 
                         # 2. Clica em "Baixar Arquivo" (Botão que abre a modal de escolha)
                         print("Tentando clicar no botão de iniciar download...")
                         
-                        # Tenta encontrar o botão de download
-                        btn_download_inicial = None
-                        if page.get_by_role("button", name="Baixar Arquivo").is_visible():
-                            btn_download_inicial = page.get_by_role("button", name="Baixar Arquivo")
-                        elif page.get_by_text("Baixar Arquivo").is_visible():
-                            btn_download_inicial = page.get_by_text("Baixar Arquivo")
-                        elif page.get_by_role("button", name="Download").is_visible(): # Fallback comum
-                            btn_download_inicial = page.get_by_role("button", name="Download")
+                        # Tenta encontrar o botão de download (aguarda o painel de detalhes)
+                        btn_download_inicial = esperar_primeiro_visivel(page, [
+                            page.get_by_role("button", name="Baixar Arquivo"),
+                            page.get_by_text("Baixar Arquivo"),
+                            page.get_by_role("button", name="Download"), # Fallback comum
+                        ], "opc.files.detalhe", padrao_s=10)
                         
                         if btn_download_inicial:
-                            btn_download_inicial.click()
+                            btn_download_inicial.first.click()
                         else:
                             print("AVISO: Botão 'Baixar Arquivo' não encontrado explicitamente. Tentando fluxo direto ou buscando ícone...")
-                        
-                        page.wait_for_timeout(2000)
 
                         # 3. Modal "Que tipo de arquivo gostaria de baixar?"
-                        if page.get_by_text("Que tipo de arquivo gostaria de baixar?").is_visible():
+                        modal_tipo = page.get_by_text("Que tipo de arquivo gostaria de baixar?")
+                        if esperar_estado(modal_tipo, "opc.files.modal_tipo", padrao_s=10):
                             print("Modal de seleção de tipo detectada.")
                             
                             # Garante ZIP selecionado (data-testid="zip-radio")
@@ -157,15 +174,14 @@ def monitorar_e_baixar_arquivos(page, arquivos_esperados):
                                 
                             print("Confirmando download na modal...")
                             # Botão final "Baixar" na modal
-                            with page.expect_download(timeout=60000) as download_info:
-                                page.get_by_role("button", name="Baixar").click()
-                                
-                            download = download_info.value
-                            caminho_final = os.path.join(DATA_DIR, download.suggested_filename)
-                            os.makedirs(DATA_DIR, exist_ok=True)
-                            download.save_as(caminho_final)
+                            estatisticas = salvar_download(
+                                page,
+                                lambda: page.get_by_role("button", name="Baixar").click(),
+                                DATA_DIR,
+                                timeout_s=60,
+                            )
                             
-                            print(f"Download concluído com SUCESSO: {caminho_final}")
+                            print(f"Download concluído com SUCESSO: {estatisticas['arquivo']} - {descrever_vazao(estatisticas)}")
                             estado["arquivos_baixados"].append(arquivo_nome)
                             novos_downloads.append(arquivo_nome)
                             salvar_estado_processo(estado)
@@ -185,15 +201,24 @@ def monitorar_e_baixar_arquivos(page, arquivos_esperados):
                 break
             
             print(f"Arquivos restantes: {arquivos_pendentes}")
-            print("Aguardando 30 segundos para próxima verificação...")
+            if novos_downloads:
+                intervalo = INTERVALO_MONITOR_MIN_S
+            else:
+                intervalo = min(intervalo * 2, INTERVALO_MONITOR_MAX_S)
+            print(f"Aguardando {intervalo} segundos para próxima verificação...")
             print("Pressione Ctrl+C no terminal para interromper se necessário.")
-            
-            # Espera 30 segundos
-            time.sleep(30)
+            page.wait_for_timeout(intervalo * 1000)
             
             print("Atualizando página...")
-            page.reload()
-            page.wait_for_timeout(5000)
+            # Aguarda a resposta da listagem de arquivos em vez de um tempo fixo
+            resposta = esperar_resposta(
+                page,
+                lambda r: r.request.resource_type in ("xhr", "fetch") and "file" in r.url.lower(),
+                page.reload,
+                "opc.files.recarregar",
+            )
+            if not resposta:
+                esperar_rede_ociosa(page, "opc.files.recarregar_ocioso")
 
     except Exception as e:
         print(f"Erro no monitoramento: {e}")
@@ -215,15 +240,12 @@ def obter_lista_equipamentos(page):
         tab_equipamento = page.get_by_role("tab", name="Equipamento")
         tab_equipamento.wait_for(state="visible", timeout=10000)
         tab_equipamento.click()
-        page.wait_for_timeout(5000)
         
         print("📋 Extraindo lista de equipamentos...")
         
         # Baseado no snippet do usuário: .MuiDataGrid-root
-        grid = page.locator(".MuiDataGrid-root")
-        try:
-            grid.wait_for(state="visible", timeout=15000)
-        except:
+        # Espera as linhas (gridcell) e não só o contêiner do grid
+        if not esperar_estado(page.locator(".MuiDataGrid-root [role='gridcell']"), "opc.grid.linhas", padrao_s=15):
              print("Aviso: DataGrid não apareceu. Tentando continuar...")
 
         # No MUI DataGrid, as linhas têm role="row"
@@ -271,6 +293,10 @@ def obter_lista_equipamentos(page):
         print(f"❌ Erro ao obter lista de equipamentos: {e}")
         return []
 
+def aguardar_lista_equipamentos(page):
+    """Aguarda a lista de equipamentos voltar a exibir linhas."""
+    return esperar_estado(page.locator(".MuiDataGrid-root [role='gridcell']"), "opc.voltar_lista", padrao_s=10)
+
 def clicar_voltar_lista(page):
     """Clica para fechar painel ou voltar à lista."""
     try:
@@ -283,7 +309,7 @@ def clicar_voltar_lista(page):
             if btn_voltar_user.is_visible():
                 btn_voltar_user.click()
                 print("✅ Voltou usando seletor gravado pelo usuário.")
-                page.wait_for_timeout(2000)
+                aguardar_lista_equipamentos(page)
                 return True
         except:
              pass
@@ -294,7 +320,7 @@ def clicar_voltar_lista(page):
             if fechar_btn.is_visible():
                 fechar_btn.click()
                 print("✅ Painel fechado via botão 'Fechar'")
-                page.wait_for_timeout(2000)
+                aguardar_lista_equipamentos(page)
                 return True
         except:
              pass
@@ -303,13 +329,13 @@ def clicar_voltar_lista(page):
         breadcrumb = page.locator('[data-testid="drill-in-breadcrumb"]')
         if breadcrumb.count() > 0 and breadcrumb.first.is_visible():
             breadcrumb.first.click()
-            page.wait_for_timeout(2000)
+            aguardar_lista_equipamentos(page)
             return True
             
         # Fallback antigo
         print("⚠️  Tentando fechar via ícone genérico (fallback)...")
         page.get_by_role("img").first.click()
-        page.wait_for_timeout(2000)
+        aguardar_lista_equipamentos(page)
         return True
             
     except Exception as e:
@@ -335,22 +361,18 @@ def realizar_export(page, nome_arquivo):
         textbox_nome.fill(nome_arquivo)
         # Importante: Sair do campo para validar
         textbox_nome.press("Tab")
-        page.wait_for_timeout(1000)
         
         print("   Tentando clicar em 'Exportar Dados do Trabalho'...")
         
         # Estratégia de clique robusta
         # O botão pode estar na pagina principal (rodapé do dialog) ou no frame
-        botao_exportar = None
-        
-        # 1. Tenta na página (baseado no snippet)
-        if page.get_by_role("button", name="Exportar Dados do Trabalho").is_visible():
-            botao_exportar = page.get_by_role("button", name="Exportar Dados do Trabalho")
+        # (1. página, baseado no snippet; 2. iframe)
+        botao_pagina = page.get_by_role("button", name="Exportar Dados do Trabalho")
+        botao_frame = frame.get_by_role("button", name="Exportar Dados do Trabalho")
+        botao_exportar = esperar_primeiro_visivel(page, [botao_pagina, botao_frame], "opc.export.botao", padrao_s=10)
+        if botao_exportar is botao_pagina:
             print("   -> Botão encontrado na página principal.")
-            
-        # 2. Tenta no iframe
-        elif frame.get_by_role("button", name="Exportar Dados do Trabalho").is_visible():
-             botao_exportar = frame.get_by_role("button", name="Exportar Dados do Trabalho")
+        elif botao_exportar is botao_frame:
              print("   -> Botão encontrado no iframe.")
              
         if botao_exportar:
@@ -358,7 +380,7 @@ def realizar_export(page, nome_arquivo):
                 print("   ⚠️ AVISO: Botão encontrado mas está DESABILITADO. Tentando forçar interação...")
                 textbox_nome.click()
                 textbox_nome.press("Enter")
-                page.wait_for_timeout(1000)
+                esperar_rede_ociosa(page, "opc.export.habilitar", padrao_s=5)
             
             botao_exportar.click(force=True)
             print("   -> Clique realizado.")
@@ -368,19 +390,20 @@ def realizar_export(page, nome_arquivo):
             page.locator("text=Exportar Dados do Trabalho").last.click()
         
         print("   Aguardando processamento...")
-        page.wait_for_timeout(5000)
         
         # Concluído
         try:
-             # Pode demorar para aparecer o Concluído
-             btn_concluido = page.get_by_role("button", name="Concluído")
-             if not btn_concluido.is_visible():
-                  btn_concluido = frame.get_by_role("button", name="Concluído")
+             # Pode demorar para aparecer o Concluído (página ou iframe)
+             btn_concluido = esperar_primeiro_visivel(page, [
+                 page.get_by_role("button", name="Concluído"),
+                 frame.get_by_role("button", name="Concluído"),
+             ], "opc.export.processamento", padrao_s=35)
+             if not btn_concluido:
+                  raise TimeoutError("botão 'Concluído' não apareceu")
                   
-             btn_concluido.wait_for(state="visible", timeout=30000)
-             btn_concluido.click()
+             btn_concluido.first.click()
              print("✅ Export concluído!")
-             page.wait_for_timeout(2000)
+             esperar_estado(page.get_by_role("dialog"), "opc.export.fechar", estado="hidden", padrao_s=10)
              return True
         except Exception as e:
              print(f"⚠️ Erro ao clicar em Concluído: {e}")
@@ -391,16 +414,14 @@ def realizar_export(page, nome_arquivo):
         print(f"❌ Erro no export: {e}")
         return False
 
-def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, operacao_anterior=None):
-    print(f"\n>>> INICIANDO OPERAÇÃO: {tipo_operacao} (Anterior: {operacao_anterior}) <<<")
-    nome_final = None
-    
+def aplicar_operacao_e_filtros(page, tipo_operacao, dt_inicial, dt_final):
+    """Seleciona a operação e o período no Analisador. Retorna False se não houver dados."""
     # --- 0. GARANTIA DE ESTADO ---
     try:
         if page.get_by_role("dialog").is_visible():
             print("Fechando modal remanescente...")
             page.keyboard.press("Escape")
-            page.wait_for_timeout(1000)
+            esperar_estado(page.get_by_role("dialog"), "opc.filtros.fechar_modal", estado="hidden", padrao_s=5)
     except:
         pass
 
@@ -410,7 +431,10 @@ def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, ope
         seletor = page.get_by_test_id("operation-selector").get_by_test_id("multiselect-button")
         seletor.wait_for(state="visible", timeout=10000)
         seletor.click(force=True)
-        page.wait_for_timeout(1000)
+        esperar_estado(
+            page.get_by_role("button", name=tipo_operacao).or_(page.locator(f"text={tipo_operacao}")),
+            "opc.filtros.menu_operacao", padrao_s=10,
+        )
         
         print(f"Tentando selecionar atual: {tipo_operacao}")
         botoes_atual = page.get_by_role("button", name=tipo_operacao)
@@ -431,7 +455,7 @@ def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, ope
         
         print("Fechando seletor...")
         seletor.click(force=True)
-        page.wait_for_timeout(1000)
+        esperar_rede_ociosa(page, "opc.filtros.operacao", padrao_s=15)
         
     except Exception as e:
          print(f"ERRO CRÍTICO na seleção da operação: {e}")
@@ -457,39 +481,46 @@ def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, ope
         
         page.get_by_role("button", name="Concluído").click()
         
-        print("Aguardando carregamento dos dados após filtro (5s)...")
-        page.wait_for_timeout(5000)
+        print("Aguardando carregamento dos dados após filtro...")
+        esperar_rede_ociosa(page, "opc.filtros.dados")
         
         if page.get_by_text("Sem Informações Operacionais").is_visible():
             print(f"ALERTA: 'Sem Informações Operacionais' detectado para {tipo_operacao}. Pulando...")
-            return None
+            return False
         
     except Exception as e:
         print(f"Erro nos filtros de data: {e}")
 
-    # --- 3. ITERAÇÃO POR EQUIPAMENTOS E EXPORTAÇÃO ---
-    print("\n" + "="*80)
-    print("🚜 INICIANDO ITERAÇÃO POR EQUIPAMENTOS")
-    print("="*80)
-    
-    # Obtém lista de equipamentos
-    equipamentos = obter_lista_equipamentos(page)
-    
-    if not equipamentos:
-        print("❌ Nenhum equipamento encontrado! Abortando...")
-        return None
+    return True
+
+def nome_arquivo_equipamento(nome_completo):
+    """Nome do export: {Tipo}_MB{numero} (ex.: 'MB 547 ...' -> Colhedora_MB547)."""
+    registro = obter_registro()
+    numero = registro.chave(nome_completo)
     
+    if numero:
+        nome_frota_limpo = f"MB{numero}"
+    else:
+        # Fallback: primeira palavra limpa
+        nome_frota_limpo = re.sub(r'[^a-zA-Z0-9]', '', nome_completo.split()[0])
+
+    # Colhedora/Trator pelo nome ou pelas frotas cadastradas (utils/registro_frotas.py)
+    tipo_frota = registro.tipo(nome_completo, padrao="Trator")
+    return f"{tipo_frota}_{nome_frota_limpo}"
+
+def exportar_equipamentos(page, equipamentos, prefixo=""):
+    """Clica em cada equipamento da lista, exporta e volta. Retorna os arquivos esperados."""
     arquivos_exportados = []
     
     # Itera por cada equipamento
     for indice_equipamento, equipamento in enumerate(equipamentos):
-        print(f"\n{'='*80}")
-        print(f"📍 EQUIPAMENTO [{indice_equipamento+1}/{len(equipamentos)}]: {equipamento['nome']}")
-        print(f"{'='*80}")
+        print(f"\n{prefixo}{'='*80}")
+        print(f"{prefixo}📍 EQUIPAMENTO [{indice_equipamento+1}/{len(equipamentos)}]: {equipamento['nome']}")
+        print(f"{prefixo}{'='*80}")
         
         try:
             # Clica no equipamento (célula específica)
-            print(f"🖱️  Clicando no equipamento: {equipamento['nome']}")
+            print(f"{prefixo}🖱️  Clicando no equipamento: {equipamento['nome']}")
             
             # Se tivermos a referência direta da célula, usamos ela
             if 'celula' in equipamento:
@@ -502,39 +533,29 @@ def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, ope
                  # Fallback antigo
                  equipamento['linha'].click()
                  
-            page.wait_for_timeout(3000)
-            
-            # Extrai nome da frota com Regex (MB + números)
-            # Padrão: MB\s*(\d+) -> ex: MB 547 -> MB547
-            nome_completo = equipamento['nome']
-            match = re.search(r'MB\s*(\d+)', nome_completo, re.IGNORECASE)
+            # Painel do equipamento aberto = botão de exportação disponível
+            esperar_estado(page.get_by_role("button", name="Compartilhar/Exportar"), "opc.equipamento.painel", padrao_s=15)
             
-            if match:
-                numero = match.group(1)
-                nome_frota_limpo = f"MB{numero}"
-            else:
-                # Fallback: primeira palavra limpa
-                nome_frota_limpo = re.sub(r'[^a-zA-Z0-9]', '', nome_completo.split()[0])
-
-            tipo_frota = identificar_tipo_frota(nome_completo, nome_frota_limpo)
-            nome_arquivo = f"{tipo_frota}_{nome_frota_limpo}"
+            nome_arquivo = nome_arquivo_equipamento(equipamento['nome'])
             
             # Realiza export
             sucesso = realizar_export(page, nome_arquivo)
             
             if sucesso:
                 arquivos_exportados.append(nome_arquivo + ".zip") # Assume zip
-                print(f"✅ Export solicitado para {equipamento['nome']}")
+                # Registra já no estado: se o processo cair, o monitoramento sabe o que esperar
+                registrar_arquivos_esperados([nome_arquivo + ".zip"])
+                print(f"{prefixo}✅ Export solicitado para {equipamento['nome']}")
             
             # Volta para lista
             if indice_equipamento < len(equipamentos) - 1:
                 if not clicar_voltar_lista(page):
                      # Se falhar voltar, tenta re-navegar para aba
                      page.get_by_role("tab", name="Equipamento").click()
-                     page.wait_for_timeout(2000)
+                     aguardar_lista_equipamentos(page)
 
         except Exception as e:
-            print(f"❌ Erro no equipamento {equipamento['nome']}: {e}")
+            print(f"{prefixo}❌ Erro no equipamento {equipamento['nome']}: {e}")
             try:
                 clicar_voltar_lista(page)
             except:
@@ -543,6 +564,114 @@ def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, ope
 
     return arquivos_exportados
 
+def _exportar_lote_paralelo(indice, nomes_lote, sessao, tipo_operacao, dt_inicial, dt_final, headless):
+    """
+    Worker: abre um navegador próprio com a sessão (cookies) da página principal,
+    refaz operação/filtros e exporta apenas os equipamentos do seu lote.
+    Retorna (arquivos_exportados, nomes_nao_processados).
+    """
+    prefixo = f"[P{indice}] "
+    # Cada thread precisa da sua própria instância do Playwright (API sync não é thread-safe)
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        try:
+            context = browser.new_context(storage_state=sessao, viewport={'width': 1366, 'height': 768}, permissions=['geolocation'])
+            page = context.new_page()
+
+            abrir_analisador_trabalho(page)
+            if "map.deere.com" not in page.url:
+                print(f"{prefixo}⚠️ Sessão não reaproveitada (redirecionou para {page.url}).")
+                return [], list(nomes_lote)
+
+            if not aplicar_operacao_e_filtros(page, tipo_operacao, dt_inicial, dt_final):
+                return [], list(nomes_lote)
+
+            equipamentos = [e for e in obter_lista_equipamentos(page) if e['nome'] in nomes_lote]
+            encontrados = {e['nome'] for e in equipamentos}
+            nao_encontrados = [n for n in nomes_lote if n not in encontrados]
+
+            print(f"{prefixo}🚜 {len(equipamentos)} equipamentos no lote")
+            return exportar_equipamentos(page, equipamentos, prefixo=prefixo), nao_encontrados
+        except Exception as e:
+            print(f"{prefixo}❌ Erro no lote paralelo: {e}")
+            return [], list(nomes_lote)
+        finally:
+            browser.close()
+
+def exportar_equipamentos_em_paralelo(page, equipamentos, tipo_operacao, dt_inicial, dt_final, paralelo):
+    """
+    Distribui os equipamentos entre N navegadores (limitado por 'max_paginas'),
+    todos com a sessão já autenticada da página principal.
+    O que algum worker não conseguir processar é exportado em seguida pela página principal.
+    """
+    max_paginas = max(1, int(paralelo.get("max_paginas", 3)))
+    n_paginas = min(max_paginas, len(equipamentos))
+    nomes = [e['nome'] for e in equipamentos]
+    # Round-robin: lotes com tamanhos equilibrados
+    lotes = [nomes[i::n_paginas] for i in range(n_paginas)]
+
+    print(f"\n⚡ Exportação paralela: {len(nomes)} equipamentos em {n_paginas} páginas")
+    sessao = page.context.storage_state()
+
+    arquivos_exportados = []
+    pendentes = []
+    with ThreadPoolExecutor(max_workers=n_paginas) as executor:
+        futuros = [
+            executor.submit(
+                _exportar_lote_paralelo, i + 1, lote, sessao,
+                tipo_operacao, dt_inicial, dt_final, paralelo.get("headless", True),
+            )
+            for i, lote in enumerate(lotes)
+        ]
+        for futuro in futuros:
+            exportados, nao_processados = futuro.result()
+            arquivos_exportados.extend(exportados)
+            pendentes.extend(nao_processados)
+
+    if pendentes:
+        print(f"\n⚠️ {len(pendentes)} equipamentos não processados em paralelo. Exportando na página principal...")
+        restantes = [e for e in equipamentos if e['nome'] in pendentes]
+        arquivos_exportados.extend(exportar_equipamentos(page, restantes))
+
+    return arquivos_exportados
+
+def configurar_filtros_e_exportar(page, tipo_operacao, dt_inicial, dt_final, operacao_anterior=None, paralelo=None):
+    print(f"\n>>> INICIANDO OPERAÇÃO: {tipo_operacao} (Anterior: {operacao_anterior}) <<<")
+
+    if not aplicar_operacao_e_filtros(page, tipo_operacao, dt_inicial, dt_final):
+        return None
+
+    # --- 3. ITERAÇÃO POR EQUIPAMENTOS E EXPORTAÇÃO ---
+    print("\n" + "="*80)
+    print("🚜 INICIANDO ITERAÇÃO POR EQUIPAMENTOS")
+    print("="*80)
+    
+    # Obtém lista de equipamentos
+    equipamentos = obter_lista_equipamentos(page)
+    
+    if not equipamentos:
+        print("❌ Nenhum equipamento encontrado! Abortando...")
+        return None
+
+    if paralelo and paralelo.get("ativo") and len(equipamentos) > 1:
+        return exportar_equipamentos_em_paralelo(page, equipamentos, tipo_operacao, dt_inicial, dt_final, paralelo)
+
+    return exportar_equipamentos(page, equipamentos)
+
+def abrir_analisador_trabalho(page):
+    """Navega (já autenticado) até o Analisador de Trabalho do map.deere.com."""
+    if "map.deere.com" not in page.url:
+        page.goto("https://map.deere.com/", wait_until="domcontentloaded")
+    
+    esperar_rede_ociosa(page, "opc.mapa.abrir")
+    try:
+        menu_frame = page.frame_locator("iframe[title='Menu de navegação']")
+        menu_frame.get_by_role("button", name="Analisar").click()
+        menu_frame.get_by_role("link", name="Analisador de Trabalho").click()
+    except:
+        pass 
+    esperar_estado(page.get_by_role("tab", name="Equipamento"), "opc.mapa.analisador", padrao_s=30)
+
 def run():
     # Limpa estado de execuções anteriores para evitar contaminação
     limpar_estado_processo()
@@ -587,9 +716,11 @@ def run():
             dt_inicial = ontem
     
     tipos_operacao = automacao['parametros'].get('tipos_operacao', ["Colheita", "Semeadura", "Aplicação", "Preparo do Solo"])
+    # Exportação concorrente: N navegadores com a mesma sessão (ver exportar_equipamentos_em_paralelo)
+    paralelo = params.get('exportacao_paralela', {"ativo": False})
 
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=1000, args=["--start-maximized"])
+        browser = p.chromium.launch(headless=False, args=["--start-maximized"])
         context = browser.new_context(viewport={'width': 1366, 'height': 768}, permissions=['geolocation'])
         page = context.new_page()
         
@@ -602,20 +733,9 @@ def run():
             page.get_by_role("button", name="Próximo").click()
             page.get_by_role("textbox", name="Senha").fill(senha)
             page.get_by_role("button", name="Entrar").click()
-            page.wait_for_load_state("networkidle")
-            page.wait_for_timeout(5000)
-            
-            if "map.deere.com" not in page.url:
-                page.goto("https://map.deere.com/", wait_until="domcontentloaded")
+            esperar_rede_ociosa(page, "opc.login", padrao_s=60)
             
-            page.wait_for_timeout(5000)
-            try:
-                menu_frame = page.frame_locator("iframe[title='Menu de navegação']")
-                menu_frame.get_by_role("button", name="Analisar").click()
-                menu_frame.get_by_role("link", name="Analisador de Trabalho").click()
-            except:
-                pass 
-            page.wait_for_timeout(5000)
+            abrir_analisador_trabalho(page)
 
             arquivos_capturados = []
             operacao_anterior = None
@@ -630,18 +750,16 @@ def run():
             for operacao in ["Colheita", "Semeadura", "Aplicação", "Preparo do Solo"]:
                 if operacao in tipos_operacao:
                     
-                    lista_arquivos = configurar_filtros_e_exportar(page, operacao, dt_inicial, dt_final, operacao_anterior)
+                    lista_arquivos = configurar_filtros_e_exportar(page, operacao, dt_inicial, dt_final, operacao_anterior, paralelo)
                     operacao_anterior = operacao
                     
                     if lista_arquivos: 
                         print(f"✅ Arquivos gerados nesta etapa: {lista_arquivos}")
                         arquivos_capturados.extend(lista_arquivos)
-                        # Salva estado parcial
-                        estado["arquivos_esperados"] = list(set(arquivos_capturados))
-                        salvar_estado_processo(estado)
+                        # Salva estado parcial (mescla com o que os workers já registraram)
+                        registrar_arquivos_esperados(lista_arquivos)
                         
-                    print("Aguardando 5s antes da próxima operação...")
-                    time.sleep(5)
+                    esperar_rede_ociosa(page, "opc.proxima_operacao", padrao_s=15)
 
             print(f"Arquivos gerados/esperados TOTAL: {arquivos_capturados}")
             
@@ -654,6 +772,7 @@ def run():
             page.pause()
         finally:
             browser.close()
+            obter_registro().salvar()
 
 if __name__ == "__main__":
     run()
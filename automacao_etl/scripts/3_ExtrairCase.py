@@ -10,6 +10,7 @@ Data: 2026-02-08
 
 import json
 import os
+import sys
 import time
 from datetime import datetime, timedelta
 from playwright.sync_api import sync_playwright
@@ -19,6 +20,17 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "dados")
 CONFIG_PATH = os.path.join(BASE_DIR, "utils", "config_automacao.json")
 
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils.esperas import (
+    cronometrar,
+    esperar_estado,
+    esperar_rede_ociosa,
+    esperar_texto_diferente,
+    timeout_adaptativo,
+)
+from utils.downloads import descrever_vazao, salvar_download
+
 
 def load_config():
     with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
@@ -50,7 +62,7 @@ def fechar_overlay_cookies(page):
             if btn.is_visible():
                 print(f"      Clicando em: {seletor}")
                 btn.click(timeout=5000)
-                page.wait_for_timeout(1000)
+                esperar_estado(btn, "case.cookies.fechar", estado="hidden", padrao_s=5)
                 return True
         except:
             pass
@@ -69,7 +81,6 @@ def fechar_overlay_cookies(page):
             if (banner2) banner2.style.display = 'none';
         """)
         print("      Overlay removido via JavaScript")
-        page.wait_for_timeout(500)
         return True
     except:
         pass
@@ -78,15 +89,14 @@ def fechar_overlay_cookies(page):
 
 
 def esperar_elemento(page, locator, descricao, timeout=90000):
-    """Aguarda um elemento ficar visível."""
+    """Aguarda um elemento ficar visível (timeout adaptativo pelo histórico do passo)."""
     print(f"   ⏳ Aguardando: {descricao}...")
-    try:
-        locator.wait_for(state="visible", timeout=timeout)
+    passo = "case." + descricao.lower().replace(" ", "_")
+    if esperar_estado(locator, passo, padrao_s=timeout / 1000):
         print(f"   ✅ Encontrado: {descricao}")
         return True
-    except:
-        print(f"   ❌ Timeout aguardando: {descricao}")
-        return False
+    print(f"   ❌ Timeout aguardando: {descricao}")
+    return False
 
 
 def clicar_com_fallback(page, locator, descricao, timeout=30000):
@@ -118,7 +128,6 @@ def selecionar_data_datepicker(page, campo_id, data_alvo):
     # Clica no ícone do calendário para abrir o datepicker
     icone = page.locator(f"#{campo_id}").locator("xpath=..").locator(".input-group-addon")
     icone.click()
-    page.wait_for_timeout(1000)
     
     mes_alvo = data_alvo.month
     ano_alvo = data_alvo.year
@@ -131,11 +140,10 @@ def selecionar_data_datepicker(page, campo_id, data_alvo):
     }
     
     datepicker = page.locator(".datetimepicker:visible")
+    esperar_estado(datepicker, "case.datepicker.abrir", padrao_s=10)
     
     max_tentativas = 24
     for _ in range(max_tentativas):
-        page.wait_for_timeout(300)
-        
         switch = datepicker.locator(".datetimepicker-days .switch")
         texto_switch = switch.text_content().strip()
         
@@ -160,12 +168,12 @@ def selecionar_data_datepicker(page, campo_id, data_alvo):
             else:
                 print(f"      → Navegando para próximo mês...")
                 datepicker.locator(".datetimepicker-days .next").click()
+            # Aguarda o título do calendário trocar de mês
+            esperar_texto_diferente(page, switch, texto_switch, "case.datepicker.mes")
         else:
             print(f"      ⚠️ Formato não reconhecido: {texto_switch}")
             break
     
-    page.wait_for_timeout(500)
-    
     dias = datepicker.locator(".datetimepicker-days td.day:not(.old):not(.new)")
     
     encontrou = False
@@ -185,7 +193,8 @@ def selecionar_data_datepicker(page, campo_id, data_alvo):
         if dias.count() > 0:
             dias.first.click()
     
-    page.wait_for_timeout(500)
+    # O datepicker fecha ao escolher o dia
+    esperar_estado(datepicker, "case.datepicker.fechar", estado="hidden", padrao_s=5)
     return encontrou
 
 
@@ -241,7 +250,6 @@ def run():
     with sync_playwright() as p:
         browser = p.chromium.launch(
             headless=False,
-            slow_mo=500,
             args=["--start-maximized"]
         )
         context = browser.new_context(
@@ -256,7 +264,7 @@ def run():
             # --- LOGIN ---
             print("\n🔑 Iniciando Login...")
             page.goto(url_relatorios, timeout=90000, wait_until="domcontentloaded")
-            page.wait_for_timeout(8000)  # Espera mais para página carregar
+            esperar_rede_ociosa(page, "case.login.pagina")  # Redirecionamentos para o SSO
 
             if "sso.cc.cnh.com" in page.url or "adfs" in page.url:
                 print("   Detectada página de login CNH.")
@@ -266,24 +274,25 @@ def run():
                     return
 
                 campo_usuario.fill(username)
-                page.wait_for_timeout(500)
 
                 campo_senha = page.get_by_role("textbox", name="Senha")
                 campo_senha.fill(senha)
-                page.wait_for_timeout(500)
 
                 btn_login = page.get_by_role("button", name="INÍCIO DE SESSÃO")
                 btn_login.click()
                 print("   Login submetido. Aguardando...")
-                page.wait_for_timeout(15000)  # Mais tempo após login
+                esperar_rede_ociosa(page, "case.login.sessao", padrao_s=60)
             else:
                 print("   Já logado ou redirecionamento diferente.")
 
             # --- FECHAR OVERLAYS DE COOKIES ---
             print("\n🍪 Tratando overlays de cookies...")
-            page.wait_for_timeout(5000)
+            # O banner OneTrust é injetado de forma assíncrona
+            esperar_estado(
+                page.locator("#onetrust-banner-sdk, #onetrust-accept-btn-handler, .onetrust-pc-dark-filter"),
+                "case.cookies.banner", padrao_s=10,
+            )
             fechar_overlay_cookies(page)
-            page.wait_for_timeout(2000)
             fechar_overlay_cookies(page)  # Segunda tentativa
 
             # --- NAVEGAR PARA ANÁLISE ---
@@ -294,10 +303,9 @@ def run():
                 if not clicar_com_fallback(page, link_analise, "Link Análise"):
                     # Fallback: navegar diretamente
                     page.goto(url_relatorios, wait_until="domcontentloaded")
-                page.wait_for_timeout(8000)
             else:
                 page.goto(url_relatorios, wait_until="domcontentloaded")
-                page.wait_for_timeout(8000)
+            esperar_rede_ociosa(page, "case.analise")
 
             # Fechar overlays novamente após navegação
             fechar_overlay_cookies(page)
@@ -310,39 +318,36 @@ def run():
             dropdown_tipo = page.get_by_role("combobox", name="Agronômico")
             if esperar_elemento(page, dropdown_tipo, "Dropdown Tipo"):
                 clicar_com_fallback(page, dropdown_tipo, "Dropdown Tipo")
-                page.wait_for_timeout(1000)
-                page.locator("#bs-select-23-1").click()
-                page.wait_for_timeout(2000)
+                opcao_frota = page.locator("#bs-select-23-1")
+                esperar_estado(opcao_frota, "case.form.tipo_opcoes", padrao_s=10)
+                opcao_frota.click()
+                # Troca de tipo recarrega os campos do formulário
+                esperar_rede_ociosa(page, "case.form.tipo", padrao_s=15)
 
             # 2. Intervalo de Datas via Datepicker
             print(f"   2. Configurando datas via datepicker...")
             
             selecionar_data_datepicker(page, "dazRepo1Date1", dt_inicial)
-            page.wait_for_timeout(1000)
             
             selecionar_data_datepicker(page, "dazRepo1Date2", dt_final)
-            page.wait_for_timeout(1000)
 
             # 3. Nome do Relatório
             print(f"   3. Nome do Relatório: {nome_relatorio}")
             campo_nome = page.locator("#txtReportName")
             if esperar_elemento(page, campo_nome, "Campo Nome"):
                 campo_nome.fill(nome_relatorio)
-                page.wait_for_timeout(500)
 
             # 4. Equipamento: Selecionar Tudo
             print("   4. Selecionando Equipamentos: Todos")
             btn_equipamento = page.locator("#rowTelemetryReportVehicle button.multiselect")
             if esperar_elemento(page, btn_equipamento, "Dropdown Equipamento"):
                 btn_equipamento.click()
-                page.wait_for_timeout(1500)
                 selecionar_tudo = page.locator("#rowTelemetryReportVehicle a.multiselect-all")
-                if selecionar_tudo.is_visible():
+                if esperar_estado(selecionar_tudo, "case.form.equipamentos", padrao_s=5):
                     selecionar_tudo.click()
-                    page.wait_for_timeout(1000)
                 # Fechar dropdown clicando no próprio botão novamente
                 btn_equipamento.click()
-                page.wait_for_timeout(1500)
+                esperar_estado(selecionar_tudo, "case.form.equipamentos_fechar", estado="hidden", padrao_s=5)
 
             # 5. Gerar Exportação
             print("   5. Clicando em 'Gerar Exportação'...")
@@ -350,30 +355,28 @@ def run():
             if esperar_elemento(page, btn_gerar, "Botão Gerar"):
                 # Usar force=True para ignorar elementos sobrepostos
                 btn_gerar.click(force=True)
-                page.wait_for_timeout(8000)
 
             # --- DOWNLOAD ---
             print("\n⬇️ (Fase 1/3) Aguardando link de Download aparecer...")
             link_download = page.locator("#btnDownloadUrl")
 
-            max_espera = 300  # 5 minutos
+            # 5 minutos sem histórico; depois, ajustado pelo tempo que o portal costuma levar
+            max_espera = timeout_adaptativo("case.relatorio.processamento", 300)
             inicio = time.time()
             link_visivel = False
 
-            while time.time() - inicio < max_espera:
-                try:
-                    if link_download.is_visible():
+            with cronometrar("case.relatorio.processamento"):
+                while time.time() - inicio < max_espera:
+                    try:
+                        # Espera condicional em fatias de 10s, só para dar feedback de progresso
+                        restante = max_espera - (time.time() - inicio)
+                        link_download.wait_for(state="visible", timeout=max(1, min(10, restante)) * 1000)
                         print("   ✅ Link de download disponível!")
                         link_visivel = True
                         break
-                except:
-                    pass
-                
-                # Feedback de progresso a cada 10s
-                decorrido = int(time.time() - inicio)
-                if decorrido % 10 == 0:
-                    print(f"   ⏳ Processando... ({decorrido}s aguardando)")
-                page.wait_for_timeout(2000)
+                    except:
+                        decorrido = int(time.time() - inicio)
+                        print(f"   ⏳ Processando... ({decorrido}s aguardando)")
             
             if not link_visivel:
                 print("❌ Tempo limite atingido aguardando o link de download aparecer. O relatório demorou demais ou falhou.")
@@ -383,17 +386,16 @@ def run():
             
             # Tenta clicar no download, lidando com overlays se necessário
             try:
-                with page.expect_download(timeout=120000) as download_info:
-                    clicar_com_fallback(page, link_download, "Botão Download")
-
-                print("   (Fase 3/3) Salvando arquivo...")
-                download = download_info.value
-                path_final = os.path.join(DATA_DIR, f"{nome_relatorio}.zip")
-                print(f"   Salvando em: {path_final}")
-                download.save_as(path_final)
+                estatisticas = salvar_download(
+                    page,
+                    lambda: clicar_com_fallback(page, link_download, "Botão Download"),
+                    DATA_DIR,
+                    f"{nome_relatorio}.zip",
+                )
 
                 print(f"\n✅ Download concluído com sucesso!")
-                print(f"   Arquivo: {path_final}")
+                print(f"   Arquivo: {estatisticas['arquivo']}")
+                print(f"   {descrever_vazao(estatisticas)}")
                 
             except Exception as e:
                 print(f"❌ Erro ao baixar ou salvar o arquivo: {e}")
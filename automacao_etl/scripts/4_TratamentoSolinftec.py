@@ -1,9 +1,7 @@
 import os
 import sys
-import shutil
 import warnings
 import unicodedata
-import zipfile
 import re
 from datetime import datetime
 import pandas as pd
@@ -18,6 +16,13 @@ warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DIRETORIO_ENTRADA = os.path.join(BASE_DIR, "dados")
 
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils import agregados, arquivos_zip, compactacao_intervalos, historico, topk, utilizacao_horaria
+from utils.entradas import classificar_arquivo, ha_entradas_novas, registrar_entradas
+from utils.dim_operacoes import obter_dimensao
+from utils.instrumentacao import instrumentar, registrar_linhas
+
 # Colunas a serem removidas na etapa 1
 COLUNAS_PARA_REMOVER = [
     "Descrição Regional",
@@ -29,8 +34,16 @@ COLUNAS_PARA_REMOVER = [
     "Descrição da Fazenda",
     "Horímetro/Odometro Secundário"
 ]
+# Quantidade de ofensores por (tipo de equipamento, dia) nas abas Top5Ofensores_*
+TOP_OFENSORES = 5
 # ----------------------------
 
+# Entradas observadas pelo --check: exportações Solinftec brutas (soltas ou em ZIP)
+PADROES_ENTRADA = [os.path.join(DIRETORIO_ENTRADA, "*.xlsx"), os.path.join(DIRETORIO_ENTRADA, "*.zip")]
+
+def eh_entrada(nome):
+    return classificar_arquivo(nome) == "solinftec"
+
 def validar_diretorio(caminho):
     """Verifica se o diretório de entrada existe."""
     if not os.path.exists(caminho):
@@ -71,19 +84,12 @@ def obter_arquivos_zip(diretorio):
     ]
     return arquivos
 
-def extrair_zips(diretorio, arquivos_zip):
-    for arquivo_zip in arquivos_zip:
-        try:
-            with zipfile.ZipFile(arquivo_zip, "r") as zf:
-                membros = [
-                    n for n in zf.namelist()
-                    if n.lower().endswith(".xls") or n.lower().endswith(".xlsx")
-                ]
-                for membro in membros:
-                    zf.extract(membro, diretorio)
-            print(f"ZIP extraído: {os.path.basename(arquivo_zip)}")
-        except Exception as e:
-            print(f"ERRO ao extrair ZIP {os.path.basename(arquivo_zip)}: {e}")
+def obter_membros_zip(arquivos_zip_linha_tempo):
+    """Planilhas dentro dos ZIPs, como caminhos "zip!membro" (lidas sem extrair)."""
+    membros = arquivos_zip.entradas(arquivos_zip_linha_tempo, (".xlsx",))
+    for membro in membros:
+        print(f"Planilha no ZIP: {os.path.basename(arquivos_zip.caminho_logico(membro))}")
+    return membros
 
 def ajustar_largura_colunas(worksheet):
     """
@@ -135,42 +141,57 @@ def normalizar_numero_serie(serie):
     serie_texto = serie_texto.str.replace(" ", "", regex=False).str.replace(",", ".", regex=False)
     return pd.to_numeric(serie_texto, errors="coerce").fillna(0)
 
-def formatar_nome_grupo(grupo_norm):
-    return str(grupo_norm).strip().title().replace(" ", "_")
-
-def encontrar_coluna_horas_manut(df):
-    for col in df.columns:
-        col_norm = normalizar_texto(col).replace("_", "")
-        if col_norm.startswith("horasmanut"):
-            return col
-    return None
-
-def ordenar_colunas(df, cols_base, cols_ordem):
-    cols = [c for c in cols_base if c in df.columns]
-    for c in cols_ordem:
-        if c in df.columns and c not in cols:
-            cols.append(c)
-    for c in df.columns:
-        if c not in cols:
-            cols.append(c)
-    return df[cols]
-
-def tratar_arquivo(caminho_arquivo):
+def formatar_colunas_intervalos(ws, col_data):
+    """Formata Data (dd/mm/yyyy) e Início/Fim (dd/mm/yyyy hh:mm:ss) nas abas de intervalos."""
+    formatos = {col_data: "dd/mm/yyyy", "Início": "dd/mm/yyyy hh:mm:ss", "Fim": "dd/mm/yyyy hh:mm:ss"}
+    for cell in ws[1]:
+        formato = formatos.get(cell.value)
+        if formato is None:
+            continue
+        for row in range(2, ws.max_row + 1):
+            celula = ws.cell(row=row, column=cell.column)
+            if celula.value:
+                celula.number_format = formato
+
+def escrever_abas(caminho_arquivo, abas, formatos, col_data):
+    """Grava as abas tratadas no próprio arquivo (substituindo a aba bruta 'Plan1')."""
+    with pd.ExcelWriter(caminho_arquivo, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
+        for nome_aba, df in abas.items():
+            df.to_excel(writer, sheet_name=nome_aba, index=False)
+            if formatos.get(nome_aba) == "data":
+                formatar_coluna_data(writer.sheets[nome_aba])
+            elif formatos.get(nome_aba) == "intervalos":
+                formatar_colunas_intervalos(writer.sheets[nome_aba], col_data)
+
+        if "Plan1" in writer.book.sheetnames:
+            del writer.book["Plan1"]
+
+        for sheet_name in writer.book.sheetnames:
+            ajustar_largura_colunas(writer.book[sheet_name])
+
+@instrumentar("4.tratar_arquivo")
+def tratar_arquivo(caminho_arquivo, salvar=True):
     """
     Abre o arquivo Excel, remove colunas especificadas e salva em uma nova aba.
+    Retorna as abas geradas (nome -> DataFrame); com salvar=False nada é gravado
+    no disco (usado pelo orquestrador, que repassa as abas em memória).
+    `caminho_arquivo` pode ser uma planilha dentro de ZIP ("zip!membro", só leitura).
     """
-    print(f"\nIniciando processamento: {os.path.basename(caminho_arquivo)}")
+    nome_arquivo = os.path.basename(arquivos_zip.caminho_logico(caminho_arquivo))
+    print(f"\nIniciando processamento: {nome_arquivo}")
     
     try:
         # Carrega a planilha original (primeira aba)
         # Usamos engine='openpyxl' para garantir compatibilidade
-        df_original = pd.read_excel(caminho_arquivo, sheet_name=0, engine="openpyxl")
+        with arquivos_zip.abrir(caminho_arquivo) as f:
+            df_original = pd.read_excel(f, sheet_name=0, engine="openpyxl")
+        registrar_linhas(entrada=len(df_original))
         
         # Identifica quais colunas da lista realmente existem no arquivo
         colunas_existentes = [col for col in COLUNAS_PARA_REMOVER if col in df_original.columns]
         
         # Filtro por período extraído do nome do arquivo (Aplicar ao df_original também para garantir consistência)
-        dt_inicio_filtro, dt_fim_filtro = extrair_periodo_nome_arquivo(os.path.basename(caminho_arquivo))
+        dt_inicio_filtro, dt_fim_filtro = extrair_periodo_nome_arquivo(nome_arquivo)
         if dt_inicio_filtro and dt_fim_filtro:
             print(f"  Filtrando dados pelo período: {dt_inicio_filtro} a {dt_fim_filtro}")
             
@@ -278,30 +299,40 @@ def tratar_arquivo(caminho_arquivo):
         op_col = "Descrição da Operação"
 
         df_calc["dur_total"] = df_calc["Duracao_min"]
+        duracao = df_calc["Duracao_min"].to_numpy()
         grupo_series = df_calc[grupo_col] if grupo_col in df_calc.columns else pd.Series("", index=df_calc.index)
-        grupo_norm = grupo_series.astype(str).str.strip().str.upper()
-        df_calc["dur_prod"] = np.where(grupo_norm == "PRODUTIVA", df_calc["Duracao_min"], 0)
-        df_calc["dur_improd"] = np.where(grupo_norm == "IMPRODUTIVA", df_calc["Duracao_min"], 0)
-        grupos_extra = sorted([g for g in grupo_norm.dropna().unique() if g and g not in ["PRODUTIVA", "IMPRODUTIVA"]])
+        op_series = df_calc[op_col] if op_col in df_calc.columns else pd.Series("", index=df_calc.index)
+
+        # Dimensão de operações: texto -> código inteiro, uma vez por valor único
+        dim = obter_dimensao()
+        cod_grupo = dim.codificar("grupo", grupo_series)
+        cod_op = dim.codificar("operacao", op_series, grupos=grupo_series)
+
+        def duracao_onde(mascara):
+            return np.where(mascara, duracao, 0)
+
+        df_calc["dur_prod"] = duracao_onde(dim.mascara("grupo", cod_grupo, "produtiva"))
+        df_calc["dur_improd"] = duracao_onde(dim.mascara("grupo", cod_grupo, "improdutiva"))
+
+        # Colunas por grupo extra: compara códigos locais em vez de strings por linha
+        cod_grupo_local, grupos_unicos = pd.factorize(grupo_series.astype(str))
+        grupos_unicos_norm = [str(g).strip().upper() for g in grupos_unicos]
+        grupos_extra = sorted({g for g in grupos_unicos_norm if g and g not in ["PRODUTIVA", "IMPRODUTIVA"]})
         dur_grupo_cols = []
-        horas_grupo_cols = []
         for grupo in grupos_extra:
             col_dur = f"dur_grupo_{grupo}"
-            df_calc[col_dur] = np.where(grupo_norm == grupo, df_calc["Duracao_min"], 0)
+            idx_grupo = [i for i, g in enumerate(grupos_unicos_norm) if g == grupo]
+            df_calc[col_dur] = duracao_onde(np.isin(cod_grupo_local, idx_grupo))
             dur_grupo_cols.append(col_dur)
-            horas_grupo_cols.append(f"Horas_{formatar_nome_grupo(grupo)}")
-
-        df_calc["dur_manobra"] = np.where(df_calc.get(op_col, "") == "MANOBRA", df_calc["Duracao_min"], 0)
-        df_calc["dur_transbordo"] = np.where(df_calc.get(op_col, "") == "TRANSBORDANDO CANA", df_calc["Duracao_min"], 0)
-        df_calc["dur_sem_apont"] = np.where(df_calc.get(op_col, "") == "SEM APONTAMENTO", df_calc["Duracao_min"], 0)
 
-        df_calc["dur_colheita"] = np.where(
-            df_calc.get(op_col, "").isin(["CARREGANDO CANA", "COLHENDO CANA"]),
-            df_calc["Duracao_min"],
-            0,
-        )
-        df_calc["dur_vazio"] = np.where(df_calc.get(op_col, "") == "DESL VAZIO", df_calc["Duracao_min"], 0)
-        df_calc["dur_carregado"] = np.where(df_calc.get(op_col, "") == "DESL CARREGADO", df_calc["Duracao_min"], 0)
+        mask_manobra = dim.mascara("operacao", cod_op, "manobra")
+        mask_transbordo = dim.mascara("operacao", cod_op, "transbordo")
+        df_calc["dur_manobra"] = duracao_onde(mask_manobra)
+        df_calc["dur_transbordo"] = duracao_onde(mask_transbordo)
+        df_calc["dur_sem_apont"] = duracao_onde(dim.mascara("operacao", cod_op, "sem_apontamento"))
+        df_calc["dur_colheita"] = duracao_onde(dim.mascara("operacao", cod_op, "colheita"))
+        df_calc["dur_vazio"] = duracao_onde(dim.mascara("operacao", cod_op, "desl_vazio"))
+        df_calc["dur_carregado"] = duracao_onde(dim.mascara("operacao", cod_op, "desl_carregado"))
 
         vm_series = df_calc.get("Velocidade Média")
         vm = normalizar_numero_serie(vm_series) if vm_series is not None else pd.Series(0, index=df_calc.index)
@@ -328,7 +359,7 @@ def tratar_arquivo(caminho_arquivo):
         mask_motor_ocioso = (
             mask_horimetro
             & (vm == 0)
-            & (grupo_norm == "IMPRODUTIVA")
+            & dim.mascara("grupo", cod_grupo, "improdutiva")
         )
         df_calc["dur_motor_ocioso"] = np.where(mask_motor_ocioso, df_calc["Duracao_min"], 0)
         df_calc["dur_motor_ocioso_h"] = df_calc["dur_motor_ocioso"] / 60
@@ -372,8 +403,8 @@ def tratar_arquivo(caminho_arquivo):
         df_calc["vel_vazio_x_min"] = np.where(df_calc["dur_vazio"] > 0, vm * df_calc["dur_vazio"], 0)
         df_calc["vel_carregado_x_min"] = np.where(df_calc["dur_carregado"] > 0, vm * df_calc["dur_carregado"], 0)
 
-        df_calc["cnt_manobra"] = np.where(df_calc.get(op_col, "") == "MANOBRA", 1, 0)
-        df_calc["cnt_transbordo"] = np.where(df_calc.get(op_col, "") == "TRANSBORDANDO CANA", 1, 0)
+        df_calc["cnt_manobra"] = mask_manobra.astype(int)
+        df_calc["cnt_transbordo"] = mask_transbordo.astype(int)
 
         col_data = "Data"
         col_equip = "Código Equipamento"
@@ -381,187 +412,57 @@ def tratar_arquivo(caminho_arquivo):
         col_op_cod = "Código de Operador"
         col_op_nome = "Nome"
 
+        agg_parcial = {
+            "dur_total_min": ("dur_total", "sum"),
+            "dur_prod_min": ("dur_prod", "sum"),
+            "dur_improd_min": ("dur_improd", "sum"),
+            "dur_manobra_min": ("dur_manobra", "sum"),
+            "dur_transbordo_min": ("dur_transbordo", "sum"),
+            "dur_sem_apont_min": ("dur_sem_apont", "sum"),
+            "dur_colheita_min": ("dur_colheita", "sum"),
+            "dur_vazio_min": ("dur_vazio", "sum"),
+            "dur_carregado_min": ("dur_carregado", "sum"),
+            "dur_motor_ocioso_min": ("dur_motor_ocioso", "sum"),
+            "dur_motor_ligado_min": ("dur_motor_ligado", "sum"),
+            "vel_colheita_x_min": ("vel_colheita_x_min", "sum"),
+            "vel_vazio_x_min": ("vel_vazio_x_min", "sum"),
+            "vel_carregado_x_min": ("vel_carregado_x_min", "sum"),
+            "cnt_manobra": ("cnt_manobra", "sum"),
+            "cnt_transbordo": ("cnt_transbordo", "sum"),
+        }
+        for col_dur in dur_grupo_cols:
+            agg_parcial[col_dur] = (col_dur, "sum")
+
         # --- 3.Dia_Frota ---
+        # Parciais do dia (só somas) ficam gravados para os rollups de período
+        parciais_frota = pd.DataFrame()
         df_dia_frota = pd.DataFrame()
         if all(c in df_calc.columns for c in [col_data, col_equip]):
             group_cols_frota = [c for c in [col_data, col_equip, col_equip_desc] if c in df_calc.columns]
-            agg_frota = {
-                "dur_total_min": ("dur_total", "sum"),
-                "dur_prod_min": ("dur_prod", "sum"),
-                "dur_improd_min": ("dur_improd", "sum"),
-                "dur_manobra_min": ("dur_manobra", "sum"),
-                "dur_transbordo_min": ("dur_transbordo", "sum"),
-                "dur_sem_apont_min": ("dur_sem_apont", "sum"),
-                "dur_colheita_min": ("dur_colheita", "sum"),
-                "dur_vazio_min": ("dur_vazio", "sum"),
-                "dur_carregado_min": ("dur_carregado", "sum"),
-                "dur_motor_ocioso_min": ("dur_motor_ocioso", "sum"),
-                "dur_motor_ligado_min": ("dur_motor_ligado", "sum"),
-                "vel_colheita_x_min": ("vel_colheita_x_min", "sum"),
-                "vel_vazio_x_min": ("vel_vazio_x_min", "sum"),
-                "vel_carregado_x_min": ("vel_carregado_x_min", "sum"),
-                "cnt_manobra": ("cnt_manobra", "sum"),
-                "cnt_transbordo": ("cnt_transbordo", "sum"),
-            }
-            for col_dur in dur_grupo_cols:
-                agg_frota[col_dur] = (col_dur, "sum")
-            df_dia_frota = df_calc.groupby(group_cols_frota).agg(**agg_frota).reset_index()
-
-            # Converter para horas e renomear
-            df_dia_frota["Horas_Registradas"] = df_dia_frota["dur_total_min"] / 60
-            df_dia_frota["Horas_Produtivas"] = df_dia_frota["dur_prod_min"] / 60
-            df_dia_frota["Horas_Improdutivas"] = df_dia_frota["dur_improd_min"] / 60
-            df_dia_frota["Horas_Motor_Ocioso"] = df_dia_frota["dur_motor_ocioso_min"] / 60
-            df_dia_frota["Horas_Motor_Ligado"] = df_dia_frota["dur_motor_ligado_min"] / 60
-            for col_dur, col_horas in zip(dur_grupo_cols, horas_grupo_cols):
-                df_dia_frota[col_horas] = df_dia_frota[col_dur] / 60
-            df_dia_frota["Tempo_Sem_Apontamento_h"] = df_dia_frota["dur_sem_apont_min"] / 60
-            
-            df_dia_frota["Porcentagem_Motor_Ligado"] = np.where(
-                df_dia_frota["Horas_Registradas"] > 0,
-                (df_dia_frota["Horas_Motor_Ligado"] / df_dia_frota["Horas_Registradas"]) * 100,
-                0,
-            )
-            df_dia_frota["Porcentagem_Motor_Ocioso"] = np.where(
-                df_dia_frota["Horas_Registradas"] > 0,
-                (df_dia_frota["Horas_Motor_Ocioso"] / df_dia_frota["Horas_Registradas"]) * 100,
-                0,
-            )
-            df_dia_frota["Porcentagem_Sem_Apontamento"] = np.where(
-                df_dia_frota["Horas_Registradas"] > 0,
-                (df_dia_frota["Tempo_Sem_Apontamento_h"] / df_dia_frota["Horas_Registradas"]) * 100,
-                0,
-            )
-            
-            # Manter métricas de manobra/transbordo em minutos (geralmente são curtos) ou converter se desejado            
-            df_dia_frota["Tempo_Manobra_total_h"] = df_dia_frota["dur_manobra_min"] / 60
-            df_dia_frota["Tempo_Manobra_medio_min"] = np.where(
-                df_dia_frota["cnt_manobra"] > 0,
-                df_dia_frota["dur_manobra_min"] / df_dia_frota["cnt_manobra"],
-                0,
-            )
-
-            df_dia_frota["Tempo_Transbordo_total_h"] = df_dia_frota["dur_transbordo_min"] / 60
-            df_dia_frota["Tempo_Transbordo_medio_min"] = np.where(
-                df_dia_frota["cnt_transbordo"] > 0,
-                df_dia_frota["dur_transbordo_min"] / df_dia_frota["cnt_transbordo"],
-                0,
-            )
-
-            df_dia_frota.rename(
-                columns={
-                    "cnt_manobra": "Quantidade_Manobras",
-                    "cnt_transbordo": "Quantidade_Transbordos",
-                    "Tempo_Manobra_total_h": "Tempo_Total_Manobras_h",
-                    "Tempo_Manobra_medio_min": "Tempo_Medio_Manobras_min",
-                    "Tempo_Transbordo_total_h": "Tempo_Total_Transbordo_h",
-                    "Tempo_Transbordo_medio_min": "Tempo_Medio_Transbordo_min",
-                },
-                inplace=True,
-            )
-
-            col_manut_frota = encontrar_coluna_horas_manut(df_dia_frota)
-            if col_manut_frota:
-                df_dia_frota["Disponibilidade_Mecanica"] = np.where(
-                    df_dia_frota["Horas_Registradas"] > 0,
-                    1 - (df_dia_frota[col_manut_frota] / df_dia_frota["Horas_Registradas"]),
-                    0,
-                )
-            df_dia_frota["Eficiencia_Energetica"] = np.where(
-                df_dia_frota["Horas_Motor_Ligado"] > 0,
-                df_dia_frota["Horas_Produtivas"] / df_dia_frota["Horas_Motor_Ligado"],
-                0,
-            )
-            df_dia_frota["Eficiencia_Operacional"] = np.where(
-                df_dia_frota["Horas_Registradas"] > 0,
-                df_dia_frota["Horas_Produtivas"] / df_dia_frota["Horas_Registradas"],
-                0,
-            )
-
-            df_dia_frota["Vel_Colheita_media"] = np.where(
-                df_dia_frota["dur_colheita_min"] > 0,
-                df_dia_frota["vel_colheita_x_min"] / df_dia_frota["dur_colheita_min"],
-                np.nan,
-            )
-            df_dia_frota["Vel_Desl_Vazio_media"] = np.where(
-                df_dia_frota["dur_vazio_min"] > 0,
-                df_dia_frota["vel_vazio_x_min"] / df_dia_frota["dur_vazio_min"],
-                np.nan,
-            )
-            df_dia_frota["Vel_Desl_Carregado_media"] = np.where(
-                df_dia_frota["dur_carregado_min"] > 0,
-                df_dia_frota["vel_carregado_x_min"] / df_dia_frota["dur_carregado_min"],
-                np.nan,
-            )
-            
-            # Remover colunas auxiliares em minutos que não são mais necessárias
-            cols_drop = [
-                "dur_total_min", "dur_prod_min", "dur_improd_min", "dur_motor_ocioso_min", "dur_motor_ligado_min", "dur_sem_apont_min",
-                "dur_manobra_min", "dur_transbordo_min", "dur_colheita_min",
-                "dur_vazio_min", "dur_carregado_min", "vel_colheita_x_min",
-                "vel_vazio_x_min", "vel_carregado_x_min"
-            ]
-            cols_drop.extend(dur_grupo_cols)
-            df_dia_frota.drop(columns=cols_drop, inplace=True, errors="ignore")
-            horas_ordem = [
-                "Horas_Registradas",
-                "Horas_Produtivas",
-                "Horas_Improdutivas",
-            ]
-            for col in horas_grupo_cols:
-                horas_ordem.append(col)
-                if col_manut_frota and col == col_manut_frota:
-                    horas_ordem.append("Disponibilidade_Mecanica")
-            
-            horas_ordem.extend([
-                "Horas_Motor_Ligado",
-                "Porcentagem_Motor_Ligado",
-                "Horas_Motor_Ocioso",
-                "Porcentagem_Motor_Ocioso",
-                "Tempo_Sem_Apontamento_h",
-                "Porcentagem_Sem_Apontamento",
-                "Eficiencia_Energetica",
-                "Eficiencia_Operacional",
-                "Tempo_Total_Manobras_h",
-                "Quantidade_Manobras",
-                "Tempo_Medio_Manobras_min",
-                "Tempo_Total_Transbordo_h",
-                "Quantidade_Transbordos",
-                "Tempo_Medio_Transbordo_min",
-            ])
-            # Caso Disponibilidade_Mecanica não tenha sido inserida (coluna de manutenção não encontrada nos grupos)
-            if "Disponibilidade_Mecanica" in df_dia_frota.columns and "Disponibilidade_Mecanica" not in horas_ordem:
-                horas_ordem.append("Disponibilidade_Mecanica")
-            df_dia_frota = ordenar_colunas(df_dia_frota, group_cols_frota, horas_ordem)
+            parciais_frota = df_calc.groupby(group_cols_frota).agg(**agg_parcial).reset_index()
+            agregados.salvar_parciais("frota", parciais_frota, group_cols_frota[1:])
+            df_dia_frota = agregados.derivar_indicadores(parciais_frota, group_cols_frota)
+            historico.registrar_dia("solinftec", "frota", df_dia_frota, col_chave=col_equip,
+                                    col_data=col_data, col_tipo=col_equip_desc)
+
+            # Minutos por categoria e faixa do dia, por frota (somáveis nos períodos)
+            if "dt_inicial" in df_calc.columns:
+                utilizacao_horaria.salvar(utilizacao_horaria.calcular(
+                    df_calc, utilizacao_horaria.categorizar(dim, cod_grupo, cod_op),
+                    col_data=col_data, col_chave=col_equip, col_tipo=col_equip_desc,
+                ))
 
         # --- 4.Dia_Operador ---
+        parciais_operador = pd.DataFrame()
         df_dia_operador = pd.DataFrame()
         if all(c in df_calc.columns for c in [col_data, col_op_cod, col_op_nome]):
             group_cols_op = [col_data, col_op_cod, col_op_nome]
             if col_equip_desc in df_calc.columns:
                 group_cols_op.append(col_equip_desc)
-            
-            agg_operador = {
-                "dur_total_min": ("dur_total", "sum"),
-                "dur_prod_min": ("dur_prod", "sum"),
-                "dur_improd_min": ("dur_improd", "sum"),
-                "dur_manobra_min": ("dur_manobra", "sum"),
-                "dur_transbordo_min": ("dur_transbordo", "sum"),
-                "dur_sem_apont_min": ("dur_sem_apont", "sum"),
-                "dur_colheita_min": ("dur_colheita", "sum"),
-                "dur_vazio_min": ("dur_vazio", "sum"),
-                "dur_carregado_min": ("dur_carregado", "sum"),
-                "dur_motor_ocioso_min": ("dur_motor_ocioso", "sum"),
-                "dur_motor_ligado_min": ("dur_motor_ligado", "sum"),
-                "vel_colheita_x_min": ("vel_colheita_x_min", "sum"),
-                "vel_vazio_x_min": ("vel_vazio_x_min", "sum"),
-                "vel_carregado_x_min": ("vel_carregado_x_min", "sum"),
-                "cnt_manobra": ("cnt_manobra", "sum"),
-                "cnt_transbordo": ("cnt_transbordo", "sum"),
-            }
-            for col_dur in dur_grupo_cols:
-                agg_operador[col_dur] = (col_dur, "sum")
-            df_dia_operador = df_calc.groupby(group_cols_op).agg(**agg_operador).reset_index()
+
+            parciais_operador = df_calc.groupby(group_cols_op).agg(**agg_parcial).reset_index()
+            agregados.salvar_parciais("operador", parciais_operador, group_cols_op[1:])
+            df_dia_operador = parciais_operador
 
             if col_equip in df_calc.columns:
                 frotas = (
@@ -572,334 +473,81 @@ def tratar_arquivo(caminho_arquivo):
                 df_dia_operador = df_dia_operador.merge(frotas, on=group_cols_op, how="left")
                 df_dia_operador.rename(columns={col_equip: "Frotas_no_dia"}, inplace=True)
 
-            df_dia_operador["Horas_Registradas"] = df_dia_operador["dur_total_min"] / 60
-            df_dia_operador["Horas_Produtivas"] = df_dia_operador["dur_prod_min"] / 60
-            df_dia_operador["Horas_Improdutivas"] = df_dia_operador["dur_improd_min"] / 60
-            df_dia_operador["Horas_Motor_Ocioso"] = df_dia_operador["dur_motor_ocioso_min"] / 60
-            df_dia_operador["Horas_Motor_Ligado"] = df_dia_operador["dur_motor_ligado_min"] / 60
-            for col_dur, col_horas in zip(dur_grupo_cols, horas_grupo_cols):
-                df_dia_operador[col_horas] = df_dia_operador[col_dur] / 60
-            df_dia_operador["Tempo_Sem_Apontamento_h"] = df_dia_operador["dur_sem_apont_min"] / 60
-            
-            df_dia_operador["Porcentagem_Motor_Ligado"] = np.where(
-                df_dia_operador["Horas_Registradas"] > 0,
-                (df_dia_operador["Horas_Motor_Ligado"] / df_dia_operador["Horas_Registradas"]) * 100,
-                0,
-            )
-            df_dia_operador["Porcentagem_Motor_Ocioso"] = np.where(
-                df_dia_operador["Horas_Registradas"] > 0,
-                (df_dia_operador["Horas_Motor_Ocioso"] / df_dia_operador["Horas_Registradas"]) * 100,
-                0,
-            )
-            df_dia_operador["Porcentagem_Sem_Apontamento"] = np.where(
-                df_dia_operador["Horas_Registradas"] > 0,
-                (df_dia_operador["Tempo_Sem_Apontamento_h"] / df_dia_operador["Horas_Registradas"]) * 100,
-                0,
-            )
-
-            df_dia_operador["Tempo_Manobra_total_h"] = df_dia_operador["dur_manobra_min"] / 60
-            df_dia_operador["Tempo_Manobra_medio_min"] = np.where(
-                df_dia_operador["cnt_manobra"] > 0,
-                df_dia_operador["dur_manobra_min"] / df_dia_operador["cnt_manobra"],
-                0,
-            )
-
-            df_dia_operador["Tempo_Transbordo_total_h"] = df_dia_operador["dur_transbordo_min"] / 60
-            df_dia_operador["Tempo_Transbordo_medio_min"] = np.where(
-                df_dia_operador["cnt_transbordo"] > 0,
-                df_dia_operador["dur_transbordo_min"] / df_dia_operador["cnt_transbordo"],
-                0,
-            )
-
-            df_dia_operador.rename(
-                columns={
-                    "cnt_manobra": "Quantidade_Manobras",
-                    "cnt_transbordo": "Quantidade_Transbordos",
-                    "Tempo_Manobra_total_h": "Tempo_Total_Manobras_h",
-                    "Tempo_Manobra_medio_min": "Tempo_Medio_Manobras_min",
-                    "Tempo_Transbordo_total_h": "Tempo_Total_Transbordo_h",
-                    "Tempo_Transbordo_medio_min": "Tempo_Medio_Transbordo_min",
-                },
-                inplace=True,
-            )
-
-            # col_manut_operador = encontrar_coluna_horas_manut(df_dia_operador)
-            # if col_manut_operador:
-            #     df_dia_operador["Disponibilidade_Mecanica"] = np.where(
-            #         df_dia_operador["Horas_Registradas"] > 0,
-            #         df_dia_operador[col_manut_operador] / df_dia_operador["Horas_Registradas"],
-            #         0,
-            #     )
-            df_dia_operador["Eficiencia_Energetica"] = np.where(
-                df_dia_operador["Horas_Motor_Ligado"] > 0,
-                df_dia_operador["Horas_Produtivas"] / df_dia_operador["Horas_Motor_Ligado"],
-                0,
-            )
-            df_dia_operador["Eficiencia_Operacional"] = np.where(
-                df_dia_operador["Horas_Registradas"] > 0,
-                df_dia_operador["Horas_Produtivas"] / df_dia_operador["Horas_Registradas"],
-                0,
-            )
-
-            df_dia_operador["Vel_Colheita_media"] = np.where(
-                df_dia_operador["dur_colheita_min"] > 0,
-                df_dia_operador["vel_colheita_x_min"] / df_dia_operador["dur_colheita_min"],
-                np.nan,
-            )
-            df_dia_operador["Vel_Desl_Vazio_media"] = np.where(
-                df_dia_operador["dur_vazio_min"] > 0,
-                df_dia_operador["vel_vazio_x_min"] / df_dia_operador["dur_vazio_min"],
-                np.nan,
-            )
-            df_dia_operador["Vel_Desl_Carregado_media"] = np.where(
-                df_dia_operador["dur_carregado_min"] > 0,
-                df_dia_operador["vel_carregado_x_min"] / df_dia_operador["dur_carregado_min"],
-                np.nan,
-            )
-
-            cols_drop = [
-                "dur_total_min", "dur_prod_min", "dur_improd_min", "dur_motor_ocioso_min", "dur_motor_ligado_min", "dur_sem_apont_min",
-                "dur_manobra_min", "dur_transbordo_min", "dur_colheita_min",
-                "dur_vazio_min", "dur_carregado_min", "vel_colheita_x_min",
-                "vel_vazio_x_min", "vel_carregado_x_min"
-            ]
-            cols_drop.extend(dur_grupo_cols)
-            df_dia_operador.drop(columns=cols_drop, inplace=True, errors="ignore")
-            horas_ordem = [
-                "Horas_Registradas",
-                "Horas_Produtivas",
-                "Horas_Improdutivas",
-                *horas_grupo_cols,
-                "Horas_Motor_Ligado",
-                "Porcentagem_Motor_Ligado",
-                "Horas_Motor_Ocioso",
-                "Porcentagem_Motor_Ocioso",
-                "Tempo_Sem_Apontamento_h",
-                "Porcentagem_Sem_Apontamento",
-                # "Disponibilidade_Mecanica",
-                "Eficiencia_Energetica",
-                "Eficiencia_Operacional",
-                "Tempo_Total_Manobras_h",
-                "Quantidade_Manobras",
-                "Tempo_Medio_Manobras_min",
-                "Tempo_Total_Transbordo_h",
-                "Quantidade_Transbordos",
-                "Tempo_Medio_Transbordo_min",
-            ]
-            df_dia_operador = ordenar_colunas(df_dia_operador, group_cols_op, horas_ordem)
+            df_dia_operador = agregados.derivar_indicadores(df_dia_operador, group_cols_op, disponibilidade=False)
+            historico.registrar_dia("solinftec", "operador", df_dia_operador, col_chave=col_op_cod,
+                                    col_data=col_data, col_tipo=col_equip_desc, col_rotulo=col_op_nome)
 
+        # --- Período: soma dos parciais diários, razões derivadas no fim ---
         df_periodo_frota = pd.DataFrame()
-        if not df_dia_frota.empty and col_data in df_dia_frota.columns:
-            group_cols = [c for c in [col_equip, col_equip_desc] if c in df_dia_frota.columns]
-            if group_cols:
-                cols_totais = [
-                    "Horas_Registradas",
-                    "Horas_Produtivas",
-                    "Horas_Improdutivas",
-                    *horas_grupo_cols,
-                    "Horas_Motor_Ligado",
-                    "Horas_Motor_Ocioso",
-                    "Tempo_Sem_Apontamento_h",
-                ]
-                agg_periodo = {
-                    f"{col}_total": (col, "sum")
-                    for col in cols_totais
-                    if col in df_dia_frota.columns
-                }
-                agg_periodo["Dias_com_dados"] = (col_data, "nunique")
-                df_periodo_frota = df_dia_frota.groupby(group_cols).agg(**agg_periodo).reset_index()
-                df_periodo_frota["Horas_media_por_dia"] = np.where(
-                    df_periodo_frota["Dias_com_dados"] > 0,
-                    df_periodo_frota["Horas_Registradas_total"] / df_periodo_frota["Dias_com_dados"],
-                    0,
-                )
-                df_periodo_frota["Horas_Motor_Ocioso_media_por_dia"] = np.where(
-                    df_periodo_frota["Dias_com_dados"] > 0,
-                    df_periodo_frota["Horas_Motor_Ocioso_total"] / df_periodo_frota["Dias_com_dados"],
-                    0,
-                )
-                col_manut_periodo_frota = encontrar_coluna_horas_manut(df_periodo_frota)
-                if col_manut_periodo_frota:
-                    df_periodo_frota["Disponibilidade_Mecanica"] = np.where(
-                        df_periodo_frota["Horas_Registradas_total"] > 0,
-                        1 - (df_periodo_frota[col_manut_periodo_frota] / df_periodo_frota["Horas_Registradas_total"]),
-                        0,
-                    )
-                df_periodo_frota["Eficiencia_Energetica"] = np.where(
-                    df_periodo_frota["Horas_Motor_Ligado_total"] > 0,
-                    df_periodo_frota["Horas_Produtivas_total"] / df_periodo_frota["Horas_Motor_Ligado_total"],
-                    0,
-                )
-                df_periodo_frota["Eficiencia_Operacional"] = np.where(
-                    df_periodo_frota["Horas_Registradas_total"] > 0,
-                    df_periodo_frota["Horas_Produtivas_total"] / df_periodo_frota["Horas_Registradas_total"],
-                    0,
-                )
-
-                df_periodo_frota["Porcentagem_Motor_Ligado"] = np.where(
-                    df_periodo_frota["Horas_Registradas_total"] > 0,
-                    (df_periodo_frota["Horas_Motor_Ligado_total"] / df_periodo_frota["Horas_Registradas_total"]) * 100,
-                    0,
-                )
-                df_periodo_frota["Porcentagem_Motor_Ocioso"] = np.where(
-                    df_periodo_frota["Horas_Registradas_total"] > 0,
-                    (df_periodo_frota["Horas_Motor_Ocioso_total"] / df_periodo_frota["Horas_Registradas_total"]) * 100,
-                    0,
-                )
-                df_periodo_frota["Porcentagem_Sem_Apontamento"] = np.where(
-                    df_periodo_frota["Horas_Registradas_total"] > 0,
-                    (df_periodo_frota["Tempo_Sem_Apontamento_h_total"] / df_periodo_frota["Horas_Registradas_total"]) * 100,
-                    0,
-                )
-
-                horas_total_ordem = [
-                    "Horas_Registradas_total",
-                    "Horas_Produtivas_total",
-                    "Horas_Improdutivas_total",
-                ]
-                for col in horas_grupo_cols:
-                    col_total = f"{col}_total"
-                    horas_total_ordem.append(col_total)
-                    if col_manut_periodo_frota and col_total == col_manut_periodo_frota:
-                        horas_total_ordem.append("Disponibilidade_Mecanica")
-                
-                horas_total_ordem.extend([
-                    "Horas_Motor_Ligado_total",
-                    "Porcentagem_Motor_Ligado",
-                    "Horas_Motor_Ocioso_total",
-                    "Porcentagem_Motor_Ocioso",
-                    "Tempo_Sem_Apontamento_h_total",
-                    "Porcentagem_Sem_Apontamento",
-                    "Eficiencia_Energetica",
-                    "Eficiencia_Operacional",
-                ])
-                if "Disponibilidade_Mecanica" in df_periodo_frota.columns and "Disponibilidade_Mecanica" not in horas_total_ordem:
-                    horas_total_ordem.append("Disponibilidade_Mecanica")
-                df_periodo_frota = ordenar_colunas(df_periodo_frota, group_cols, horas_total_ordem)
-
-        df_periodo_operador = pd.DataFrame()
-        if not df_dia_operador.empty and col_data in df_dia_operador.columns:
-            group_cols = [col_op_cod, col_op_nome]
-            if col_equip_desc in df_dia_operador.columns:
-                group_cols.append(col_equip_desc)
-
-            cols_totais = [
-                "Horas_Registradas",
-                "Horas_Produtivas",
-                "Horas_Improdutivas",
-                *horas_grupo_cols,
-                "Horas_Motor_Ligado",
-                "Horas_Motor_Ocioso",
-                "Tempo_Sem_Apontamento_h",
-            ]
-            agg_periodo = {
-                f"{col}_total": (col, "sum")
-                for col in cols_totais
-                if col in df_dia_operador.columns
-            }
-            agg_periodo["Dias_com_dados"] = (col_data, "nunique")
-            df_periodo_operador = df_dia_operador.groupby(group_cols).agg(**agg_periodo).reset_index()
-            df_periodo_operador["Horas_media_por_dia"] = np.where(
-                df_periodo_operador["Dias_com_dados"] > 0,
-                df_periodo_operador["Horas_Registradas_total"] / df_periodo_operador["Dias_com_dados"],
-                0,
-            )
-            df_periodo_operador["Horas_Motor_Ocioso_media_por_dia"] = np.where(
-                df_periodo_operador["Dias_com_dados"] > 0,
-                df_periodo_operador["Horas_Motor_Ocioso_total"] / df_periodo_operador["Dias_com_dados"],
-                0,
-            )
-            # col_manut_periodo_operador = encontrar_coluna_horas_manut(df_periodo_operador)
-            # if col_manut_periodo_operador:
-            #     df_periodo_operador["Disponibilidade_Mecanica"] = np.where(
-            #         df_periodo_operador["Horas_Registradas_total"] > 0,
-            #         df_periodo_operador[col_manut_periodo_operador] / df_periodo_operador["Horas_Registradas_total"],
-            #         0,
-            #     )
-            df_periodo_operador["Eficiencia_Energetica"] = np.where(
-                df_periodo_operador["Horas_Motor_Ligado_total"] > 0,
-                df_periodo_operador["Horas_Produtivas_total"] / df_periodo_operador["Horas_Motor_Ligado_total"],
-                0,
-            )
-            df_periodo_operador["Eficiencia_Operacional"] = np.where(
-                df_periodo_operador["Horas_Registradas_total"] > 0,
-                df_periodo_operador["Horas_Produtivas_total"] / df_periodo_operador["Horas_Registradas_total"],
-                0,
+        if not parciais_frota.empty:
+            group_cols = [c for c in [col_equip, col_equip_desc] if c in parciais_frota.columns]
+            df_periodo_frota = agregados.derivar_indicadores(
+                agregados.combinar(parciais_frota, group_cols), group_cols, periodo=True
             )
 
-            df_periodo_operador["Porcentagem_Motor_Ligado"] = np.where(
-                df_periodo_operador["Horas_Registradas_total"] > 0,
-                (df_periodo_operador["Horas_Motor_Ligado_total"] / df_periodo_operador["Horas_Registradas_total"]) * 100,
-                0,
-            )
-            df_periodo_operador["Porcentagem_Motor_Ocioso"] = np.where(
-                df_periodo_operador["Horas_Registradas_total"] > 0,
-                (df_periodo_operador["Horas_Motor_Ocioso_total"] / df_periodo_operador["Horas_Registradas_total"]) * 100,
-                0,
-            )
-            df_periodo_operador["Porcentagem_Sem_Apontamento"] = np.where(
-                df_periodo_operador["Horas_Registradas_total"] > 0,
-                (df_periodo_operador["Tempo_Sem_Apontamento_h_total"] / df_periodo_operador["Horas_Registradas_total"]) * 100,
-                0,
+        df_periodo_operador = pd.DataFrame()
+        if not parciais_operador.empty:
+            group_cols = group_cols_op[1:]
+            df_periodo_operador = agregados.derivar_indicadores(
+                agregados.combinar(parciais_operador, group_cols), group_cols, periodo=True, disponibilidade=False
             )
 
-            horas_total_ordem = [
-                "Horas_Registradas_total",
-                "Horas_Produtivas_total",
-                "Horas_Improdutivas_total",
-                *[f"{col}_total" for col in horas_grupo_cols],
-                "Horas_Motor_Ligado_total",
-                "Porcentagem_Motor_Ligado",
-                "Horas_Motor_Ocioso_total",
-                "Porcentagem_Motor_Ocioso",
-                "Tempo_Sem_Apontamento_h_total",
-                "Porcentagem_Sem_Apontamento",
-                # "Disponibilidade_Mecanica",
-                "Eficiencia_Energetica",
-                "Eficiencia_Operacional",
-            ]
-            df_periodo_operador = ordenar_colunas(df_periodo_operador, group_cols, horas_total_ordem)
-
         # --- 3.Top5Ofensores ---
         df_top5_ofensores = pd.DataFrame()
         # Verificar colunas necessárias
         if all(c in df_calc.columns for c in [col_equip_desc, col_data, grupo_col, op_col]):
-            # Filtrar apenas o que é improdutivo (Ofensores)
-            df_improd_only = df_calc[df_calc["dur_improd"] > 0].copy()
-            
-            if not df_improd_only.empty:
-                # 1. Calcular Total de Horas por (Equipamento, Data) - usando df_calc completo (todo o tempo)
-                # Isso servirá de denominador para a porcentagem
-                df_total_dia = df_calc.groupby([col_equip_desc, col_data])["Duracao_min"].sum().reset_index()
-                df_total_dia.rename(columns={"Duracao_min": "Total_Horas_Dia_min"}, inplace=True)
-                
-                # 2. Agrupar por (Equipamento, Data, Operação) - usando apenas improdutivos
-                # Incluímos grupo_col apenas para referência
-                df_grp = df_improd_only.groupby([col_equip_desc, col_data, op_col, grupo_col]).agg(
-                    Duracao_Improd_min=("dur_improd", "sum")
-                ).reset_index()
-                
-                # 3. Merge com o Tempo Total do Dia
-                df_grp = df_grp.merge(df_total_dia, on=[col_equip_desc, col_data], how="left")
-                
-                # 4. Calcular Porcentagem
-                df_grp["Porcentagem_Improdutiva"] = np.where(
-                    df_grp["Total_Horas_Dia_min"] > 0,
-                    (df_grp["Duracao_Improd_min"] / df_grp["Total_Horas_Dia_min"]) * 100,
-                    0
-                )
-                
-                # 5. Ordenar por Duração Improdutiva (Desc) e pegar Top 5
-                df_grp = df_grp.sort_values([col_equip_desc, col_data, "Duracao_Improd_min"], ascending=[True, True, False])
-                df_top5_ofensores = df_grp.groupby([col_equip_desc, col_data]).head(5).reset_index(drop=True)
-                
-                # 6. Converter para Horas
-                df_top5_ofensores["Duracao_Improd_h"] = df_top5_ofensores["Duracao_Improd_min"] / 60
-                df_top5_ofensores["Total_Horas_Dia_h"] = df_top5_ofensores["Total_Horas_Dia_min"] / 60
-                
-                # 7. Selecionar e Renomear Colunas
-                cols_top5 = [col_equip_desc, col_data, op_col, "Duracao_Improd_h", "Total_Horas_Dia_h", "Porcentagem_Improdutiva"]
-                df_top5_ofensores = df_top5_ofensores[cols_top5]
+            mask_improd = df_calc["dur_improd"] > 0
+            if mask_improd.any():
+                # Denominador: tempo total do (Equipamento, Data), com todo o tempo registrado
+                totais_dia = df_calc.groupby([col_equip_desc, col_data])["Duracao_min"].sum()
+
+                # Somas improdutivas por (Equipamento, Data, Operação, Grupo) e top-K por
+                # (Equipamento, Data) com heap limitado, sem ordenar o conjunto todo
+                somas = df_calc.loc[mask_improd].groupby([col_equip_desc, col_data, op_col, grupo_col])["dur_improd"].sum()
+                ranking = topk.TopK(k=TOP_OFENSORES)
+                for (tipo, data, operacao, grupo), dur in somas.items():
+                    ranking.adicionar((tipo, data), (operacao, grupo), dur)
+
+                linhas_top = []
+                for (tipo, data), itens in ranking.resultado().items():
+                    total_min = totais_dia.get((tipo, data), np.nan)
+                    for (operacao, _), dur_min in itens:
+                        linhas_top.append({
+                            col_equip_desc: tipo,
+                            col_data: data,
+                            op_col: operacao,
+                            "Duracao_Improd_h": dur_min / 60,
+                            "Total_Horas_Dia_h": total_min / 60,
+                            "Porcentagem_Improdutiva": (dur_min / total_min) * 100 if total_min > 0 else 0,
+                        })
+                df_top5_ofensores = pd.DataFrame(linhas_top)
+
+                # Estado do dia no grão mais fino (tipo, frota, operador, frente) gravado:
+                # ofensores de período, por operador-semana ou por frente saem da
+                # mescla dos dias. A frente vem do fragmento (__frag-frente-<slug>).
+                if col_equip in df_calc.columns:
+                    match_frente = re.search(r"__frag-frente-([^_.]+)", nome_arquivo)
+                    frente = match_frente.group(1) if match_frente else None
+                    df_estado = df_calc[[col_equip_desc, col_equip, col_data, op_col, grupo_col, "dur_improd", "Duracao_min"]].copy()
+                    df_estado["operador"] = (
+                        pd.to_numeric(df_calc[col_op_cod], errors="coerce").astype("Int64").astype(str).fillna("")
+                        if col_op_cod in df_calc.columns else ""
+                    )
+                    cols_estado = [col_equip_desc, col_equip, "operador", col_data]
+
+                    def chave_estado(tipo, frota, operador, data):
+                        return topk.chave_grao(topk.GRAO_DIA, {
+                            "tipo": tipo, "frota": str(frota), "operador": operador or None,
+                            "frente": frente, "data": data,
+                        })
+
+                    estado = topk.TopK(k=TOP_OFENSORES)
+                    somas_estado = df_estado.loc[mask_improd].groupby(cols_estado + [op_col, grupo_col])["dur_improd"].sum()
+                    for (tipo, frota, operador, data, operacao, grupo), dur in somas_estado.items():
+                        estado.adicionar(chave_estado(tipo, frota, operador, data), (operacao, grupo), float(dur))
+                    for (tipo, frota, operador, data), total in df_estado.groupby(cols_estado)["Duracao_min"].sum().items():
+                        estado.adicionar_total(chave_estado(tipo, frota, operador, data), float(total))
+                    topk.salvar_dias(estado)
 
         df_frota_intervalos = pd.DataFrame()
         req_cols_gantt = [col_data, col_equip, col_equip_desc, "dt_inicial", "dt_final", "Descrição do Grupo da Operação"]
@@ -920,13 +568,8 @@ def tratar_arquivo(caminho_arquivo):
             df_frota_intervalos.rename(columns=rename_map, inplace=True)
             
             if "Grupo" in df_frota_intervalos.columns:
-                s = df_frota_intervalos["Grupo"].astype(str).str.upper().str.strip()
-                
-                cond_prod = s.str.contains("PRODUTIVA", na=False) & ~s.str.contains("IMPRODUTIVA", na=False)
-                cond_manut = s.str.contains("MANUTEN", na=False)
-                
-                df_frota_intervalos["Grupo"] = np.where(cond_prod, "PRODUTIVA",
-                                               np.where(cond_manut, "MANUTENCAO", "DISPONIVEL"))
+                # Categoria do Gantt vem da dimensão (mesma ordem de linhas de df_calc)
+                df_frota_intervalos["Grupo"] = dim.atributo("grupo", cod_grupo, "categoria", "DISPONIVEL")
             
             sort_cols = ["Frota"]
             if "Início" in df_frota_intervalos.columns:
@@ -934,157 +577,107 @@ def tratar_arquivo(caminho_arquivo):
             
             df_frota_intervalos.sort_values(sort_cols, inplace=True)
 
-        with pd.ExcelWriter(caminho_arquivo, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            nome_aba_original = "Original"
-            df_original.to_excel(writer, sheet_name=nome_aba_original, index=False)
-            ajustar_largura_colunas(writer.sheets[nome_aba_original])
-
-            nome_aba_tratado = "Tratado"
-            df_tratado.to_excel(writer, sheet_name=nome_aba_tratado, index=False)
-            ajustar_largura_colunas(writer.sheets[nome_aba_tratado])
-
-            if not df_dia_frota.empty:
-                tipo_col = col_equip_desc
-                if tipo_col in df_dia_frota.columns:
-                    tipos = [t for t in df_dia_frota[tipo_col].dropna().unique()]
-                    for tipo in tipos:
-                        df_tipo = df_dia_frota[df_dia_frota[tipo_col] == tipo].copy()
-                        
-                        # Remover colunas que estão totalmente vazias ou zeradas para este tipo
-                        cols_validas = [c for c in df_tipo.columns if not (pd.api.types.is_numeric_dtype(df_tipo[c]) and (df_tipo[c].sum() == 0))]
-                        df_tipo = df_tipo[cols_validas]
-
-                        # Remover Vel_Colheita_media para TRANSBORDO (antigo TRATOR TRANSBORDO)
-                        if "TRANSBORDO" in str(tipo).upper():
-                             if "Vel_Colheita_media" in df_tipo.columns:
-                                 df_tipo = df_tipo.drop(columns=["Vel_Colheita_media"])
-                        
-                        # Remove a coluna de descrição do equipamento pois já está separada por aba
-                        if tipo_col in df_tipo.columns:
-                            df_tipo = df_tipo.drop(columns=[tipo_col])
-
-                        safe_tipo = str(tipo).replace("/", "-").replace("\\", "-")
-                        sufixo = "_Dia"
-                        max_len = 31 - len(sufixo)
-                        safe_tipo = safe_tipo[:max_len]
-                        nome_aba = f"{safe_tipo}{sufixo}"
-                        
-                        df_tipo.to_excel(writer, sheet_name=nome_aba, index=False)
-                        ajustar_largura_colunas(writer.sheets[nome_aba])
-                        formatar_coluna_data(writer.sheets[nome_aba])
-                else:
-                    df_dia_frota.to_excel(writer, sheet_name="Equipamentos_Dia", index=False)
-                    ajustar_largura_colunas(writer.sheets["Equipamentos_Dia"])
-                    formatar_coluna_data(writer.sheets["Equipamentos_Dia"])
-
-            if not df_dia_operador.empty:
-                tipo_col = col_equip_desc
-                if tipo_col in df_dia_operador.columns:
-                    tipos = [t for t in df_dia_operador[tipo_col].dropna().unique()]
-                    for tipo in tipos:
-                        df_tipo = df_dia_operador[df_dia_operador[tipo_col] == tipo].copy()
-                        
-                        cols_validas = [c for c in df_tipo.columns if not (pd.api.types.is_numeric_dtype(df_tipo[c]) and (df_tipo[c].sum() == 0))]
-                        df_tipo = df_tipo[cols_validas]
-
-                        if "TRANSBORDO" in str(tipo).upper():
-                             if "Vel_Colheita_media" in df_tipo.columns:
-                                 df_tipo = df_tipo.drop(columns=["Vel_Colheita_media"])
-
-                        safe_tipo = str(tipo).replace("/", "-").replace("\\", "-")
-                        prefixo = "Operadores_"
-                        max_len = 31 - len(prefixo)
-                        safe_tipo = safe_tipo[:max_len]
-                        nome_aba = f"{prefixo}{safe_tipo}"
-                        
-                        df_tipo.to_excel(writer, sheet_name=nome_aba, index=False)
-                        ajustar_largura_colunas(writer.sheets[nome_aba])
-                        formatar_coluna_data(writer.sheets[nome_aba])
-                else:
-                    df_dia_operador.to_excel(writer, sheet_name="Operadores", index=False)
-                    ajustar_largura_colunas(writer.sheets["Operadores"])
-                    formatar_coluna_data(writer.sheets["Operadores"])
-
-            if not df_periodo_frota.empty:
-                df_periodo_frota.to_excel(writer, sheet_name="Periodo_Equipamentos", index=False)
-                ajustar_largura_colunas(writer.sheets["Periodo_Equipamentos"])
-
-            if not df_periodo_operador.empty:
-                df_periodo_operador.to_excel(writer, sheet_name="Periodo_Operadores", index=False)
-                ajustar_largura_colunas(writer.sheets["Periodo_Operadores"])
-
-            if not df_top5_ofensores.empty:
-                tipo_col = col_equip_desc
-                if tipo_col in df_top5_ofensores.columns:
-                    tipos = [t for t in df_top5_ofensores[tipo_col].dropna().unique()]
-                    for tipo in tipos:
-                        df_tipo = df_top5_ofensores[df_top5_ofensores[tipo_col] == tipo].copy()
-                        
-                        safe_tipo = str(tipo).replace("/", "-").replace("\\", "-")
-                        prefixo = "Top5Ofensores_"
-                        max_len = 31 - len(prefixo)
-                        safe_tipo = safe_tipo[:max_len]
-                        nome_aba = f"{prefixo}{safe_tipo}"
-                        
-                        df_tipo.to_excel(writer, sheet_name=nome_aba, index=False)
-                        ajustar_largura_colunas(writer.sheets[nome_aba])
-                        formatar_coluna_data(writer.sheets[nome_aba])
-                else:
-                    df_top5_ofensores.to_excel(writer, sheet_name="Top5_Ofensores", index=False)
-                    ajustar_largura_colunas(writer.sheets["Top5_Ofensores"])
-                    formatar_coluna_data(writer.sheets["Top5_Ofensores"])
-
-            if not df_frota_intervalos.empty:
-                tipo_col = col_equip_desc
-                if tipo_col in df_frota_intervalos.columns:
-                    tipos = [t for t in df_frota_intervalos[tipo_col].dropna().unique()]
-                    for tipo in tipos:
-                        df_tipo = df_frota_intervalos[df_frota_intervalos[tipo_col] == tipo].copy()
-                        safe_tipo = str(tipo).replace("/", "-").replace("\\", "-")
-                        prefixo = "Intervalos_"
-                        max_len = 31 - len(prefixo)
-                        safe_tipo = safe_tipo[:max_len]
-                        nome_aba = f"{prefixo}{safe_tipo}"
-                        df_tipo.to_excel(writer, sheet_name=nome_aba, index=False)
-                        ws2 = writer.sheets[nome_aba]
-                        ajustar_largura_colunas(ws2)
-
-                        col_data_idx = None
-                        for cell in ws2[1]:
-                            if cell.value == col_data:
-                                col_data_idx = cell.column
-                                break
-                        if col_data_idx is not None:
-                            for row in range(2, ws2.max_row + 1):
-                                cell = ws2.cell(row=row, column=col_data_idx)
-                                if cell.value:
-                                    cell.number_format = "dd/mm/yyyy"
-                        
-                        for col_name in ["Início", "Fim"]:
-                            col_idx = None
-                            for cell in ws2[1]:
-                                if cell.value == col_name:
-                                    col_idx = cell.column
-                                    break
-                            if col_idx is not None:
-                                for row in range(2, ws2.max_row + 1):
-                                    cell = ws2.cell(row=row, column=col_idx)
-                                    if cell.value:
-                                        cell.number_format = "dd/mm/yyyy hh:mm:ss"
-                else:
-                    df_frota_intervalos.to_excel(writer, sheet_name="Intervalos_Geral", index=False)
-                    ajustar_largura_colunas(writer.sheets["Intervalos_Geral"])
-
-            if "Plan1" in writer.book.sheetnames:
-                del writer.book["Plan1"]
-
-            for sheet_name in writer.book.sheetnames:
-                ajustar_largura_colunas(writer.book[sheet_name])
-
-        print(f"  Processamento finalizado para {os.path.basename(caminho_arquivo)}")
+            # Junta trechos seguidos da mesma frota/grupo/operação (coluna Registros)
+            if compactacao_intervalos.ativo() and {"Início", "Fim"} <= set(df_frota_intervalos.columns):
+                df_frota_intervalos = compactacao_intervalos.compactar_intervalos(
+                    df_frota_intervalos,
+                    chaves=["Frota", col_data, col_equip_desc, "Grupo", "Descrição da Operação"],
+                )
+
+        # Abas de saída (nome -> DataFrame), na ordem em que vão para o Excel
+        abas = {}
+        formatos = {}
+
+        def adicionar_aba(nome_aba, df, formato=None):
+            abas[nome_aba] = df
+            formatos[nome_aba] = formato
+
+        def nome_aba_tipo(tipo, prefixo="", sufixo=""):
+            safe_tipo = str(tipo).replace("/", "-").replace("\\", "-")
+            safe_tipo = safe_tipo[:31 - len(prefixo) - len(sufixo)]
+            return f"{prefixo}{safe_tipo}{sufixo}"
+
+        adicionar_aba("Original", df_original)
+        adicionar_aba("Tratado", df_tratado)
+
+        if not df_dia_frota.empty:
+            tipo_col = col_equip_desc
+            if tipo_col in df_dia_frota.columns:
+                tipos = [t for t in df_dia_frota[tipo_col].dropna().unique()]
+                for tipo in tipos:
+                    df_tipo = df_dia_frota[df_dia_frota[tipo_col] == tipo].copy()
+                    
+                    # Remover colunas que estão totalmente vazias ou zeradas para este tipo
+                    cols_validas = [c for c in df_tipo.columns if not (pd.api.types.is_numeric_dtype(df_tipo[c]) and (df_tipo[c].sum() == 0))]
+                    df_tipo = df_tipo[cols_validas]
+
+                    # Remover Vel_Colheita_media para TRANSBORDO (antigo TRATOR TRANSBORDO)
+                    if "TRANSBORDO" in str(tipo).upper():
+                         if "Vel_Colheita_media" in df_tipo.columns:
+                             df_tipo = df_tipo.drop(columns=["Vel_Colheita_media"])
+                    
+                    # Remove a coluna de descrição do equipamento pois já está separada por aba
+                    if tipo_col in df_tipo.columns:
+                        df_tipo = df_tipo.drop(columns=[tipo_col])
+
+                    adicionar_aba(nome_aba_tipo(tipo, sufixo="_Dia"), df_tipo, "data")
+            else:
+                adicionar_aba("Equipamentos_Dia", df_dia_frota, "data")
+
+        if not df_dia_operador.empty:
+            tipo_col = col_equip_desc
+            if tipo_col in df_dia_operador.columns:
+                tipos = [t for t in df_dia_operador[tipo_col].dropna().unique()]
+                for tipo in tipos:
+                    df_tipo = df_dia_operador[df_dia_operador[tipo_col] == tipo].copy()
+                    
+                    cols_validas = [c for c in df_tipo.columns if not (pd.api.types.is_numeric_dtype(df_tipo[c]) and (df_tipo[c].sum() == 0))]
+                    df_tipo = df_tipo[cols_validas]
+
+                    if "TRANSBORDO" in str(tipo).upper():
+                         if "Vel_Colheita_media" in df_tipo.columns:
+                             df_tipo = df_tipo.drop(columns=["Vel_Colheita_media"])
+
+                    adicionar_aba(nome_aba_tipo(tipo, prefixo="Operadores_"), df_tipo, "data")
+            else:
+                adicionar_aba("Operadores", df_dia_operador, "data")
+
+        if not df_periodo_frota.empty:
+            adicionar_aba("Periodo_Equipamentos", df_periodo_frota)
+
+        if not df_periodo_operador.empty:
+            adicionar_aba("Periodo_Operadores", df_periodo_operador)
+
+        if not df_top5_ofensores.empty:
+            tipo_col = col_equip_desc
+            if tipo_col in df_top5_ofensores.columns:
+                tipos = [t for t in df_top5_ofensores[tipo_col].dropna().unique()]
+                for tipo in tipos:
+                    df_tipo = df_top5_ofensores[df_top5_ofensores[tipo_col] == tipo].copy()
+                    adicionar_aba(nome_aba_tipo(tipo, prefixo="Top5Ofensores_"), df_tipo, "data")
+            else:
+                adicionar_aba("Top5_Ofensores", df_top5_ofensores, "data")
+
+        if not df_frota_intervalos.empty:
+            tipo_col = col_equip_desc
+            if tipo_col in df_frota_intervalos.columns:
+                tipos = [t for t in df_frota_intervalos[tipo_col].dropna().unique()]
+                for tipo in tipos:
+                    df_tipo = df_frota_intervalos[df_frota_intervalos[tipo_col] == tipo].copy()
+                    adicionar_aba(nome_aba_tipo(tipo, prefixo="Intervalos_"), df_tipo, "intervalos")
+            else:
+                adicionar_aba("Intervalos_Geral", df_frota_intervalos)
+
+        if salvar:
+            escrever_abas(caminho_arquivo, abas, formatos, col_data)
+
+        dim.salvar()
+        print(f"  Processamento finalizado para {nome_arquivo}")
+        return abas
         
     except Exception as e:
         print(f"  ERRO ao processar arquivo: {e}")
+        return None
 
 def main():
     print("=== INICIANDO TRATAMENTO DE DADOS ===")
@@ -1093,13 +686,13 @@ def main():
     if not validar_diretorio(DIRETORIO_ENTRADA):
         sys.exit(1)
         
-    arquivos = obter_arquivos_xlsx(DIRETORIO_ENTRADA)
-
-    if not arquivos:
-        arquivos_zip = obter_arquivos_zip(DIRETORIO_ENTRADA)
-        if arquivos_zip:
-            extrair_zips(DIRETORIO_ENTRADA, arquivos_zip)
-            arquivos = obter_arquivos_xlsx(DIRETORIO_ENTRADA)
+    # Planilhas soltas e as que continuam dentro dos ZIPs baixados pela etapa 1;
+    # só exportações Solinftec brutas (tratados e consolidados da Case ficam de fora)
+    arquivos = obter_arquivos_xlsx(DIRETORIO_ENTRADA) + obter_membros_zip(obter_arquivos_zip(DIRETORIO_ENTRADA))
+    arquivos = [
+        a for a in arquivos
+        if classificar_arquivo(os.path.basename(arquivos_zip.caminho_logico(a))) == "solinftec"
+    ]
 
     if not arquivos:
         print("Nenhum arquivo .xlsx encontrado na pasta dados.")
@@ -1107,22 +700,41 @@ def main():
         
     print(f"Encontrados {len(arquivos)} arquivos para processar.")
     
+    falhas = 0
     for arquivo in arquivos:
         try:
-            dir_name = os.path.dirname(arquivo)
-            base = os.path.splitext(os.path.basename(arquivo))[0]
-            ext = os.path.splitext(arquivo)[1]
+            caminho = arquivos_zip.caminho_logico(arquivo)
+            dir_name = os.path.dirname(caminho)
+            base = os.path.splitext(os.path.basename(caminho))[0]
+            ext = os.path.splitext(caminho)[1]
             novo_nome = f"{base}_tratado{ext}"
             novo_caminho = os.path.join(dir_name, novo_nome)
             if os.path.exists(novo_caminho):
                 os.remove(novo_caminho)
-            shutil.copy2(arquivo, novo_caminho)
+            arquivos_zip.copiar(arquivo, novo_caminho)
             print(f"Gerada cópia para tratamento: {os.path.basename(novo_caminho)}")
-            tratar_arquivo(novo_caminho)
+            if tratar_arquivo(novo_caminho) is None:
+                falhas += 1
         except Exception as e:
-            print(f"ERRO ao copiar/tratar arquivo {os.path.basename(arquivo)}: {e}")
-        
+            falhas += 1
+            print(f"ERRO ao copiar/tratar arquivo {os.path.basename(arquivos_zip.caminho_logico(arquivo))}: {e}")
+
+    # Só com tudo tratado: arquivo que falhou continua "novo" para o --check
+    if not falhas:
+        registrar_entradas("4", PADROES_ENTRADA, eh_entrada)
     print("\n=== TRATAMENTO CONCLUÍDO ===")
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trata as planilhas Solinftec da pasta dados.")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Só executa se houver planilhas novas/alteradas desde o último tratamento",
+    )
+    args = parser.parse_args()
+
+    if args.check and not ha_entradas_novas("4", PADROES_ENTRADA, eh_entrada):
+        print("⏭️  Nenhuma planilha nova para tratar.")
+        sys.exit(0)
     main()
@@ -1,6 +1,7 @@
 import os
 import sys
 import pandas as pd
+from pandas.io.parsers import TextParser
 import glob
 import warnings
 import re
@@ -18,6 +19,16 @@ DIRETORIO_SAIDA = os.path.join(DIRETORIO_DADOS, "separados")
 DIRETORIO_XLSX = os.path.join(DIRETORIO_SAIDA, "xlsx")
 DIRETORIO_JSON = os.path.join(DIRETORIO_SAIDA, "json")
 
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils import agregados, arquivos_zip, catalogo, compressao, intervalos_colunar, topk, utilizacao_horaria
+from utils.entradas import eh_tratado_solinftec, ha_entradas_novas, registrar_entradas
+from utils.instrumentacao import instrumentar, medir, registrar_linhas
+from utils.registro_frotas import campo_frota, obter_registro
+
+# Entradas observadas pelo --check: os tratados Solinftec gravados pela etapa 4
+PADROES_ENTRADA = [os.path.join(DIRETORIO_DADOS, "*_tratado.xlsx")]
+
 def extrair_periodo_nome_arquivo(nome_arquivo):
     """
     Extrai datas de início e fim do nome do arquivo.
@@ -64,22 +75,17 @@ def formatar_coluna_data(worksheet, df):
                 cell.number_format = 'DD/MM/YYYY'
 
 def encontrar_ultimo_tratado():
-    """Encontra o arquivo tratado mais recente na pasta dados."""
+    """Encontra o tratado Solinftec mais recente na pasta dados."""
     if not os.path.exists(DIRETORIO_DADOS):
         print(f"ERRO: Diretório de dados não encontrado: {DIRETORIO_DADOS}")
         return None
 
-    # Tenta padrões diferentes para garantir que encontre o arquivo
-    padroes = ["*tratado*.xlsx", "*_tratado.xlsx"]
-    arquivos = []
-    
-    for p in padroes:
-        caminho_padrao = os.path.join(DIRETORIO_DADOS, p)
-        encontrados = glob.glob(caminho_padrao)
-        arquivos.extend(encontrados)
-    
-    # Remove duplicatas
-    arquivos = list(set(arquivos))
+    # Só tratados de planilhas Solinftec: consolidados da Case e tratados
+    # de tratados (de execuções antigas) não são base para a separação
+    arquivos = [
+        a for a in glob.glob(os.path.join(DIRETORIO_DADOS, "*_tratado.xlsx"))
+        if eh_tratado_solinftec(a)
+    ]
     
     if not arquivos:
         return None
@@ -88,6 +94,78 @@ def encontrar_ultimo_tratado():
     arquivos.sort(key=os.path.getmtime, reverse=True)
     return arquivos[0]
 
+def arquivos_do_mesmo_lote(arquivo):
+    """
+    Se o arquivo veio da extração fragmentada (nome com __lote-<id>__frag-<id>),
+    retorna todos os tratados do mesmo lote; senão, apenas o próprio arquivo.
+    """
+    match = re.search(r"__lote-(\d+)__frag-", os.path.basename(arquivo))
+    if not match:
+        return [arquivo]
+    padrao = os.path.join(DIRETORIO_DADOS, f"*__lote-{match.group(1)}__frag-*_tratado.xlsx")
+    return sorted(a for a in set(glob.glob(padrao)) if eh_tratado_solinftec(a)) or [arquivo]
+
+def concatenar_abas(lista_abas):
+    """Concatena, aba a aba, os dicts nome_aba -> DataFrame de vários fragmentos."""
+    partes = {}
+    for abas in lista_abas:
+        for sheet, df in abas.items():
+            partes.setdefault(sheet, []).append(df)
+    return {
+        sheet: lista[0] if len(lista) == 1 else pd.concat(lista, ignore_index=True)
+        for sheet, lista in partes.items()
+    }
+
+@instrumentar("5.carregar_abas")
+def carregar_abas(arquivos):
+    """Lê todas as abas dos arquivos e concatena os fragmentos aba a aba."""
+    lista_abas = []
+    for arquivo in arquivos:
+        xl = pd.ExcelFile(arquivo, engine='openpyxl')
+        print(f"  {os.path.basename(arquivo)}: {xl.sheet_names}")
+        lista_abas.append({sheet: xl.parse(sheet) for sheet in xl.sheet_names})
+    return concatenar_abas(lista_abas)
+
+def tipos_como_excel(df):
+    """
+    Ajusta um DataFrame recebido em memória para os mesmos tipos que
+    pd.read_excel devolveria após gravar/reler o tratado. Só mexe nas colunas
+    cujo tipo muda na ida e volta do XLSX: datas (date) viram datetime64,
+    colunas de texto passam, inteiras, pelo mesmo TextParser do read_excel
+    (coluna só com números vira número, "NA" e afins viram vazio, as demais
+    ficam texto),
+    floats ficam com 16 dígitos significativos e floats inteiros (sem vazios)
+    viram int. Assim a saída (XLSX/JSON) é idêntica à do fluxo por arquivo.
+    """
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        serie = df[col]
+        valores = serie.dropna()
+        if valores.empty:
+            continue
+        if serie.dtype == object or pd.api.types.is_string_dtype(serie):
+            inferido = pd.api.types.infer_dtype(valores, skipna=False)
+            if inferido in ("date", "datetime"):
+                df[col] = pd.to_datetime(serie).astype("datetime64[us]")
+                continue
+            if inferido != "string":
+                continue
+            serie = TextParser([[v] for v in serie.tolist()], header=None).read().iloc[:, 0]
+            df[col] = serie
+        if pd.api.types.is_float_dtype(serie):
+            serie = serie.map(lambda v: float(f"{v:.16g}"), na_action="ignore")
+            df[col] = serie
+            if serie.notna().all() and (serie % 1 == 0).all():
+                df[col] = serie.astype("int64")
+    return df
+
+def periodo_dos_arquivos(arquivos):
+    """União dos períodos indicados nos nomes dos arquivos (de planilha dentro de ZIP, o do ZIP)."""
+    periodos = [extrair_periodo_nome_arquivo(os.path.basename(arquivos_zip.caminho_logico(a))) for a in arquivos]
+    if not periodos or any(d1 is None for d1, _ in periodos):
+        return None, None
+    return min(d1 for d1, _ in periodos), max(d2 for _, d2 in periodos)
+
 def normalizar_nome_pasta(txt):
     if not txt: return "outros"
     txt = str(txt).lower().strip()
@@ -95,647 +173,747 @@ def normalizar_nome_pasta(txt):
     if txt in ["trator transbordo", "transbordo", "tratores"]: return "tratores"
     return txt.replace(" ", "_").replace("/", "-")
 
-def main():
-    print("=== INICIANDO SEPARAÇÃO COMPLETA POR DIA ===")
+def anexar_utilizacao(dados_frota_agrupados, matrizes):
+    """Utilizacao_Horaria (categorias × faixas do dia) em cada frota que tiver matriz."""
+    if not matrizes:
+        return
+    for id_frota, conteudo in dados_frota_agrupados.items():
+        matriz = utilizacao_horaria.bloco(matrizes, id_frota)
+        if matriz is not None:
+            conteudo["Utilizacao_Horaria"] = matriz
+
+def anexar_ofensores(dados_frota_agrupados, ofensores, tipo):
+    """Top5Ofensores do período em "Geral", da mescla dos estados diários gravados pela etapa 4."""
+    if ofensores is None:
+        return
+    grupo = topk.chave_grao("tipo-periodo", {"tipo": tipo})
+    itens = ofensores.maiores(grupo)
+    if not itens:
+        return
+    total_min = ofensores.total(grupo)
+    dados_frota_agrupados.setdefault("Geral", {})["Top5Ofensores"] = [
+        {
+            "Descrição do Equipamento": tipo,
+            "Descrição da Operação": operacao,
+            "Duracao_Improd_h": dur_min / 60,
+            "Total_Horas_Periodo_h": total_min / 60,
+            "Porcentagem_Improdutiva": (dur_min / total_min) * 100 if total_min > 0 else 0,
+        }
+        for (operacao, _), dur_min in itens
+    ]
+
+def salvar_periodo_frota(df_p_frota, periodo, periodo_str, utilizacao=None, ofensores=None):
+    """JSON de período por tipo de equipamento, agrupado por frota. Retorna os caminhos gravados."""
+    gerados = []
+
+    # Tentar identificar coluna de tipo de frota
+    col_tipo = None
+    for c in ["Descrição do Equipamento", "Grupo", "Tipo"]:
+        if c in df_p_frota.columns:
+            col_tipo = c
+            break
     
-    # 1. Encontrar o arquivo
-    arquivo_input = encontrar_ultimo_tratado()
-    
-    if not arquivo_input:
-        print(f"ERRO: Nenhum arquivo tratado encontrado em: {DIRETORIO_DADOS}")
-        print("Execute o script 2_Tratamento.py primeiro.")
-        sys.exit(1)
-        
-    print(f"Lendo arquivo base: {os.path.basename(arquivo_input)}")
+    if col_tipo:
+        grupos = df_p_frota[col_tipo].dropna().unique()
+        for tipo in grupos:
+            df_tipo = df_p_frota[df_p_frota[col_tipo] == tipo].copy()
+            
+            # Remover a coluna de tipo para economizar espaço
+            df_tipo = df_tipo.drop(columns=[col_tipo])
+            
+            nome_tipo_norm = normalizar_nome_pasta(tipo)
+            
+            # Preparar estrutura JSON (agrupada por ID da frota ou Geral)
+            # Usar to_json/loads para garantir serialização correta de datas e NaNs
+            json_str = df_tipo.to_json(orient='records', date_format='iso', default_handler=str)
+            records = json.loads(json_str)
+            
+            dados_frota_agrupados = {}
+            
+            for item in records:
+                # Identificar ID: coluna da frota (Frota / Código Equipamento / Equipamento) e chave canônica
+                chave_frota_encontrada, id_frota = campo_frota(item)
+                
+                if id_frota is not None:
+                    id_frota_str = obter_registro().chave_ou(id_frota, str(id_frota))
+                    if id_frota_str not in dados_frota_agrupados:
+                        dados_frota_agrupados[id_frota_str] = {}
+                    
+                    # No período, geralmente é um resumo único por frota
+                    if "Resumo_Periodo" not in dados_frota_agrupados[id_frota_str]:
+                        dados_frota_agrupados[id_frota_str]["Resumo_Periodo"] = []
+                    
+                    item_limpo = item.copy()
+                    if chave_frota_encontrada:
+                        del item_limpo[chave_frota_encontrada]
+                    
+                    dados_frota_agrupados[id_frota_str]["Resumo_Periodo"].append(item_limpo)
+                else:
+                     if "Geral" not in dados_frota_agrupados:
+                         dados_frota_agrupados["Geral"] = {}
+                     if "Resumo_Periodo" not in dados_frota_agrupados["Geral"]:
+                         dados_frota_agrupados["Geral"]["Resumo_Periodo"] = []
+                     dados_frota_agrupados["Geral"]["Resumo_Periodo"].append(item)
+
+            anexar_utilizacao(dados_frota_agrupados, utilizacao)
+            anexar_ofensores(dados_frota_agrupados, ofensores, tipo)
+
+            # Salvar
+            dir_frota = os.path.join(DIRETORIO_JSON, nome_tipo_norm, "frotas", periodo)
+            if not os.path.exists(dir_frota):
+                os.makedirs(dir_frota)
+                
+            nome_arquivo = f"{nome_tipo_norm}_frota_periodo_{periodo_str}.json"
+            caminho_arquivo = os.path.join(dir_frota, nome_arquivo)
+            
+            try:
+                catalogo.gravar_json(caminho_arquivo, dados_frota_agrupados, etapa="5")
+                print(f"    -> Salvo: {caminho_arquivo}")
+                gerados.append(caminho_arquivo)
+            except Exception as e:
+                print(f"    -> Erro ao salvar {nome_arquivo}: {e}")
+    return gerados
+
+def salvar_periodo_operadores(df_p_op, periodo, periodo_str):
+    """JSON de período por tipo de equipamento, agrupado por operador. Retorna os caminhos gravados."""
+    gerados = []
+    col_tipo = None
+    for c in ["Descrição do Equipamento", "Grupo", "Tipo"]:
+        if c in df_p_op.columns:
+            col_tipo = c
+            break
     
-    try:
-        # 2. Ler todas as abas do arquivo Excel
-        xl = pd.ExcelFile(arquivo_input, engine='openpyxl')
-        sheet_names = xl.sheet_names
-        print(f"Abas encontradas: {sheet_names}")
+    lista_tipos = []
+    if col_tipo:
+        lista_tipos = df_p_op[col_tipo].dropna().unique()
+    else:
+        lista_tipos = ["Geral"]
+
+    for tipo in lista_tipos:
+        if col_tipo:
+            df_tipo = df_p_op[df_p_op[col_tipo] == tipo].copy()
+            df_tipo = df_tipo.drop(columns=[col_tipo])
+            nome_tipo_norm = normalizar_nome_pasta(tipo)
+        else:
+            df_tipo = df_p_op.copy()
+            nome_tipo_norm = "geral"
+
+        json_str = df_tipo.to_json(orient='records', date_format='iso', default_handler=str)
+        records = json.loads(json_str)
+        dados_operadores_agrupados = {}
         
-        # Carregar todas as abas em um dicionário de DataFrames
-        dfs = {}
-        for sheet in sheet_names:
-            print(f"  Carregando aba: {sheet}")
-            dfs[sheet] = pd.read_excel(arquivo_input, sheet_name=sheet, engine='openpyxl')
+        for item in records:
+            # Identificar ID e Nome
+            id_op = None
+            chave_op_encontrada = None
+            for k in ["Código de Operador", "Codigo Operador", "Cod Operador"]:
+                if k in item:
+                    id_op = item[k]
+                    chave_op_encontrada = k
+                    break
+            
+            nome_op = "Desconhecido"
+            chave_nome_encontrada = None
+            for k in ["Nome", "Nome Operador", "Nome do Operador", "Operador"]:
+                if k in item:
+                    nome_op = item[k]
+                    chave_nome_encontrada = k
+                    break
+            
+            if id_op is not None:
+                chave_final = f"{id_op} - {nome_op}"
+                item_limpo = item.copy()
+                if chave_op_encontrada:
+                    del item_limpo[chave_op_encontrada]
+                if chave_nome_encontrada:
+                    del item_limpo[chave_nome_encontrada]
+                    
+                dados_operadores_agrupados[chave_final] = item_limpo
+            else:
+                if "SemCodigo" not in dados_operadores_agrupados:
+                    dados_operadores_agrupados["SemCodigo"] = []
+                dados_operadores_agrupados["SemCodigo"].append(item)
         
-        # 3. Identificar dias únicos (usando a aba 'Tratado' ou 'Original' como referência)
-        # Preferência por 'Tratado' pois já passou pelo filtro de datas do 2_Tratamento.py
-        df_ref = None
-        if 'Tratado' in dfs:
-            df_ref = dfs['Tratado']
-        elif 'Original' in dfs:
-            df_ref = dfs['Original']
-        else:
-            # Se não tiver Tratado nem Original, pega a primeira
-            df_ref = dfs[sheet_names[0]]
+        # Salvar
+        dir_frota = os.path.join(DIRETORIO_JSON, nome_tipo_norm, "operadores", periodo)
+        if not os.path.exists(dir_frota):
+            os.makedirs(dir_frota)
             
-        # Encontrar coluna de data na referência
-        col_data_ref = None
+        nome_arquivo = f"{nome_tipo_norm}_operadores_periodo_{periodo_str}.json"
+        caminho_arquivo = os.path.join(dir_frota, nome_arquivo)
+        
+        try:
+            catalogo.gravar_json(caminho_arquivo, dados_operadores_agrupados, etapa="5")
+            print(f"    -> Salvo: {caminho_arquivo}")
+            gerados.append(caminho_arquivo)
+        except Exception as e:
+            print(f"    -> Erro ao salvar {nome_arquivo}: {e}")
+    return gerados
+
+def remover_rollups_antigos(caminho_novo, inicio_janela=None, fim_janela=None):
+    """
+    Apaga os arquivos da mesma janela (mensal/safra) gravados antes com um
+    intervalo menor, deixando só o rollup mais recente (e suas cópias .gz/.br).
+    Só sai o que cabe inteiro em [inicio_janela, fim_janela]: reprocessar um
+    lote antigo não apaga o mensal/safra de períodos posteriores. Sem janela
+    (semanal), só saem os "_periodo_periodo_desconhecido" de versões antigas.
+    """
+    pasta = os.path.dirname(caminho_novo)
+    prefixo = os.path.basename(caminho_novo).split("_periodo_")[0] + "_periodo_"
+    removidos = []
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        if not nome.startswith(prefixo) or not nome.endswith(".json") or caminho == caminho_novo:
+            continue
+        if nome != f"{prefixo}periodo_desconhecido.json":
+            if inicio_janela is None:
+                continue
+            d1, d2 = extrair_periodo_nome_arquivo(nome)
+            if not (d1 and d2 and inicio_janela <= d1 and d2 <= fim_janela):
+                continue
+        for alvo in [caminho] + [caminho + ext for ext in compressao.EXTENSOES.values()]:
+            if os.path.exists(alvo):
+                os.remove(alvo)
+        removidos.append(caminho)
+    catalogo.remover(removidos)
+
+def gerar_periodos(dfs, dia_inicio, dia_fim):
+    """
+    JSONs de período, todos somando os parciais diários gravados pela etapa 4
+    (utils/agregados.py) e nomeados pelo intervalo real de dias com dados:
+    semanal (dias do lote), mensal e safra (do início do mês / da safra até o
+    último dia do lote). Sem parciais, o semanal sai das abas Periodo_*.
+    """
+    janelas = [
+        ("semanal", dia_inicio),
+        ("mensal", agregados.inicio_mes(dia_fim)),
+        ("safra", agregados.inicio_safra(dia_fim)),
+    ]
+    saidas = [
+        ("frota", "Periodo_Equipamentos", salvar_periodo_frota),
+        ("operador", "Periodo_Operadores", salvar_periodo_operadores),
+    ]
+    for periodo, inicio in janelas:
+        for entidade, aba, salvar in saidas:
+            df_periodo, intervalo = agregados.rollup(entidade, inicio, dia_fim)
+            if df_periodo is not None:
+                df_periodo = tipos_como_excel(df_periodo)
+            elif periodo == "semanal" and aba in dfs:
+                df_periodo, intervalo = dfs[aba], (dia_inicio, dia_fim)
+            else:
+                continue
+            periodo_str = agregados.nome_periodo(*intervalo)
+            print(f"  Processando {aba} ({periodo}: {periodo_str})...")
+            extras = {}
+            if entidade == "frota":
+                extras = {
+                    "utilizacao": utilizacao_horaria.periodo(*intervalo),
+                    "ofensores": topk.periodo(*intervalo, grao="tipo-periodo"),
+                }
+            for caminho in salvar(df_periodo, periodo, periodo_str, **extras):
+                if periodo == "semanal":
+                    remover_rollups_antigos(caminho)
+                else:
+                    remover_rollups_antigos(caminho, inicio, dia_fim)
+
+@instrumentar("5.separar_abas")
+def separar_abas(dfs, dt_inicio_filtro=None, dt_fim_filtro=None):
+    """
+    Gera os XLSX/JSON diários e de período a partir das abas do tratado
+    (dict nome_aba -> DataFrame), lidas do disco ou recebidas em memória.
+    """
+    sheet_names = list(dfs.keys())
+    print(f"Abas encontradas: {sheet_names}")
+    registrar_linhas(entrada=sum(len(df) for df in dfs.values()))
+    
+    # 3. Identificar dias únicos (usando a aba 'Tratado' ou 'Original' como referência)
+    # Preferência por 'Tratado' pois já passou pelo filtro de datas do 2_Tratamento.py
+    df_ref = None
+    if 'Tratado' in dfs:
+        df_ref = dfs['Tratado']
+    elif 'Original' in dfs:
+        df_ref = dfs['Original']
+    else:
+        # Se não tiver Tratado nem Original, pega a primeira
+        df_ref = dfs[sheet_names[0]]
+        
+    # Encontrar coluna de data na referência
+    col_data_ref = None
+    for col in df_ref.columns:
+        if str(col).lower().strip() == 'data':
+            col_data_ref = col
+            break
+    
+    # Se não achou 'Data', tenta criar a partir de 'Data Hora Local'
+    if not col_data_ref:
+        print("  Coluna 'Data' explícita não encontrada na referência. Tentando derivar de 'Data Hora Local'...")
         for col in df_ref.columns:
-            if str(col).lower().strip() == 'data':
-                col_data_ref = col
+            if str(col).lower().strip() == 'data hora local':
+                # Criar coluna Data no df_ref
+                df_ref['Data'] = pd.to_datetime(df_ref[col], dayfirst=True, errors='coerce').dt.date
+                col_data_ref = 'Data'
                 break
-        
-        # Se não achou 'Data', tenta criar a partir de 'Data Hora Local'
-        if not col_data_ref:
-            print("  Coluna 'Data' explícita não encontrada na referência. Tentando derivar de 'Data Hora Local'...")
-            for col in df_ref.columns:
-                if str(col).lower().strip() == 'data hora local':
-                    # Criar coluna Data no df_ref
-                    df_ref['Data'] = pd.to_datetime(df_ref[col], dayfirst=True, errors='coerce').dt.date
-                    col_data_ref = 'Data'
-                    break
 
-        if not col_data_ref:
-            # Tentar procurar em outras abas que sabemos que têm Data
-            print("  'Data' não encontrada em Tratado/Original. Procurando em outras abas...")
-            for sheet_name, df_temp in dfs.items():
-                if "_Dia" in sheet_name or "Intervalos" in sheet_name:
-                    for col in df_temp.columns:
-                         if str(col).lower().strip() == 'data':
-                            print(f"  Usando aba '{sheet_name}' como referência de datas.")
-                            df_ref = df_temp
-                            col_data_ref = col
-                            break
-                if col_data_ref:
-                    break
+    if not col_data_ref:
+        # Tentar procurar em outras abas que sabemos que têm Data
+        print("  'Data' não encontrada em Tratado/Original. Procurando em outras abas...")
+        for sheet_name, df_temp in dfs.items():
+            if "_Dia" in sheet_name or "Intervalos" in sheet_name:
+                for col in df_temp.columns:
+                     if str(col).lower().strip() == 'data':
+                        print(f"  Usando aba '{sheet_name}' como referência de datas.")
+                        df_ref = df_temp
+                        col_data_ref = col
+                        break
+            if col_data_ref:
+                break
 
-        if not col_data_ref:
-            print("ERRO: Coluna 'Data' não encontrada na aba de referência para identificar os dias.")
-            sys.exit(1)
-            
-        # Converter para datetime e pegar dias únicos
-        df_ref[col_data_ref] = pd.to_datetime(df_ref[col_data_ref], errors='coerce')
-        datas_unicas = df_ref[col_data_ref].dropna().unique()
+    if not col_data_ref:
+        print("ERRO: Coluna 'Data' não encontrada na aba de referência para identificar os dias.")
+        sys.exit(1)
         
-        if len(datas_unicas) == 0:
-            print("ERRO: Nenhuma data válida encontrada na aba de referência.")
-            sys.exit(1)
-
-        # Filtrar datas com base no nome do arquivo (se disponível)
-        dt_inicio_filtro, dt_fim_filtro = extrair_periodo_nome_arquivo(os.path.basename(arquivo_input))
-        if dt_inicio_filtro and dt_fim_filtro:
-            print(f"  Filtrando dias pelo período do arquivo: {dt_inicio_filtro} a {dt_fim_filtro}")
-            datas_filtradas = []
-            for d in datas_unicas:
-                 # d é numpy.datetime64, converte para datetime.date
-                 d_dt = pd.to_datetime(d).date()
-                 if dt_inicio_filtro <= d_dt <= dt_fim_filtro:
-                     datas_filtradas.append(d)
-            
-            if not datas_filtradas:
-                 print(f"AVISO: Nenhuma data encontrada dentro do período {dt_inicio_filtro} a {dt_fim_filtro}.")
-                 # Se filtrar tudo, talvez seja melhor não filtrar e avisar, ou sair. 
-                 # O usuário quer remover dias fora. Se todos estão fora, gera vazio.
-            
-            datas_unicas = datas_filtradas
-            
-        print(f"Encontrados {len(datas_unicas)} dias únicos: {[pd.to_datetime(d).strftime('%d/%m') for d in datas_unicas]}")
+    # Converter para datetime e pegar dias únicos
+    df_ref[col_data_ref] = pd.to_datetime(df_ref[col_data_ref], errors='coerce')
+    datas_unicas = df_ref[col_data_ref].dropna().unique()
+    
+    if len(datas_unicas) == 0:
+        print("ERRO: Nenhuma data válida encontrada na aba de referência.")
+        sys.exit(1)
 
-        # 4. Criar diretórios de saída
-        if not os.path.exists(DIRETORIO_SAIDA):
-            os.makedirs(DIRETORIO_SAIDA)
+    # Filtrar datas com base no nome do arquivo (se disponível)
+    if dt_inicio_filtro and dt_fim_filtro:
+        print(f"  Filtrando dias pelo período do arquivo: {dt_inicio_filtro} a {dt_fim_filtro}")
+        datas_filtradas = []
+        for d in datas_unicas:
+             # d é numpy.datetime64, converte para datetime.date
+             d_dt = pd.to_datetime(d).date()
+             if dt_inicio_filtro <= d_dt <= dt_fim_filtro:
+                 datas_filtradas.append(d)
         
-        if not os.path.exists(DIRETORIO_XLSX):
-            os.makedirs(DIRETORIO_XLSX)
-            
-        if not os.path.exists(DIRETORIO_JSON):
-            os.makedirs(DIRETORIO_JSON)
+        if not datas_filtradas:
+             print(f"AVISO: Nenhuma data encontrada dentro do período {dt_inicio_filtro} a {dt_fim_filtro}.")
+             # Se filtrar tudo, talvez seja melhor não filtrar e avisar, ou sair. 
+             # O usuário quer remover dias fora. Se todos estão fora, gera vazio.
+        
+        datas_unicas = datas_filtradas
+        
+    print(f"Encontrados {len(datas_unicas)} dias únicos: {[pd.to_datetime(d).strftime('%d/%m') for d in datas_unicas]}")
 
-        print(f"Diretórios de saída configurados em: {DIRETORIO_SAIDA}")
-            
-        # 5. Separar e Salvar
-        arquivos_gerados = []
+    # 4. Criar diretórios de saída
+    if not os.path.exists(DIRETORIO_SAIDA):
+        os.makedirs(DIRETORIO_SAIDA)
+    
+    if not os.path.exists(DIRETORIO_XLSX):
+        os.makedirs(DIRETORIO_XLSX)
         
-        for data_val in sorted(datas_unicas):
-            ts = pd.to_datetime(data_val)
-            data_str = ts.strftime("%d-%m-%Y")
-            nome_arquivo = f"{data_str}.xlsx"
-            caminho_saida = os.path.join(DIRETORIO_XLSX, nome_arquivo)
-            
-            print(f"\nGerando arquivos para: {data_str}")
+    if not os.path.exists(DIRETORIO_JSON):
+        os.makedirs(DIRETORIO_JSON)
+
+    print(f"Diretórios de saída configurados em: {DIRETORIO_SAIDA}")
+        
+    # 5. Separar e Salvar
+    arquivos_gerados = []
+    
+    for data_val in sorted(datas_unicas):
+        ts = pd.to_datetime(data_val)
+        data_str = ts.strftime("%d-%m-%Y")
+        nome_arquivo = f"{data_str}.xlsx"
+        utilizacao_dia = utilizacao_horaria.periodo(ts.date(), ts.date())
+        caminho_saida = os.path.join(DIRETORIO_XLSX, nome_arquivo)
+        
+        print(f"\nGerando arquivos para: {data_str}")
+        
+        with medir("5.separar_dia", rotulo=data_str) as span_dia, \
+                pd.ExcelWriter(caminho_saida, engine='openpyxl') as writer:
+            sheets_salvas = 0
+            dados_dia_json = {}
             
-            with pd.ExcelWriter(caminho_saida, engine='openpyxl') as writer:
-                sheets_salvas = 0
-                dados_dia_json = {}
+            for sheet_name, df in dfs.items():
+                # Ignorar abas de Periodo e as abas brutas (Original/Tratado) no JSON/XLSX diário
+                if "Periodo" in sheet_name or sheet_name in ["Original", "Tratado"]:
+                    # print(f"    (Ignorando aba {sheet_name} - agregação de período ou dados brutos)")
+                    continue
+                    
+                # Tentar filtrar por data
+                col_data_sheet = None
+                for col in df.columns:
+                    if str(col).lower().strip() == 'data':
+                        col_data_sheet = col
+                        break
                 
-                for sheet_name, df in dfs.items():
-                    # Ignorar abas de Periodo e as abas brutas (Original/Tratado) no JSON/XLSX diário
-                    if "Periodo" in sheet_name or sheet_name in ["Original", "Tratado"]:
-                        # print(f"    (Ignorando aba {sheet_name} - agregação de período ou dados brutos)")
-                        continue
-                        
-                    # Tentar filtrar por data
-                    col_data_sheet = None
+                # Se não tem 'Data', tenta 'Data Hora Local'
+                temp_col_created = False
+                if not col_data_sheet:
                     for col in df.columns:
-                        if str(col).lower().strip() == 'data':
-                            col_data_sheet = col
+                        if str(col).lower().strip() == 'data hora local':
+                            # Criar coluna temporária para filtro
+                            df['_temp_data_filter_'] = pd.to_datetime(df[col], dayfirst=True, errors='coerce').dt.date
+                            col_data_sheet = '_temp_data_filter_'
+                            temp_col_created = True
                             break
+                
+                df_to_save = None
+                
+                if col_data_sheet:
+                    # Se tem coluna Data, filtra
+                    if not temp_col_created:
+                        # Garantir tipo datetime se for a coluna original
+                        df[col_data_sheet] = pd.to_datetime(df[col_data_sheet], errors='coerce')
                     
-                    # Se não tem 'Data', tenta 'Data Hora Local'
-                    temp_col_created = False
-                    if not col_data_sheet:
-                        for col in df.columns:
-                            if str(col).lower().strip() == 'data hora local':
-                                # Criar coluna temporária para filtro
-                                df['_temp_data_filter_'] = pd.to_datetime(df[col], dayfirst=True, errors='coerce').dt.date
-                                col_data_sheet = '_temp_data_filter_'
-                                temp_col_created = True
-                                break
+                    # Filtrar (se for temp, já é date object; se for original, é datetime)
+                    # ts é datetime. Precisa comparar com date se a coluna for date, ou datetime se datetime.
+                    # Melhor normalizar tudo para .date() na comparação
                     
-                    df_to_save = None
+                    if temp_col_created:
+                         df_filtered = df[df[col_data_sheet] == ts.date()].copy()
+                         # Remove a coluna temporária
+                         df_filtered = df_filtered.drop(columns=['_temp_data_filter_'])
+                    else:
+                         # Comparação direta de datetime (pode falhar se tiver hora). 
+                         # Vamos converter para date para garantir
+                         df_temp_compare = df[col_data_sheet].dt.date
+                         df_filtered = df[df_temp_compare == ts.date()].copy()
                     
-                    if col_data_sheet:
-                        # Se tem coluna Data, filtra
-                        if not temp_col_created:
-                            # Garantir tipo datetime se for a coluna original
-                            df[col_data_sheet] = pd.to_datetime(df[col_data_sheet], errors='coerce')
-                        
-                        # Filtrar (se for temp, já é date object; se for original, é datetime)
-                        # ts é datetime. Precisa comparar com date se a coluna for date, ou datetime se datetime.
-                        # Melhor normalizar tudo para .date() na comparação
-                        
-                        if temp_col_created:
-                             df_filtered = df[df[col_data_sheet] == ts.date()].copy()
-                             # Remove a coluna temporária
-                             df_filtered = df_filtered.drop(columns=['_temp_data_filter_'])
-                        else:
-                             # Comparação direta de datetime (pode falhar se tiver hora). 
-                             # Vamos converter para date para garantir
-                             df_temp_compare = df[col_data_sheet].dt.date
-                             df_filtered = df[df_temp_compare == ts.date()].copy()
-                        
-                        if not df_filtered.empty:
-                            df_to_save = df_filtered
-                        else:
-                            # Se não tem dados para esse dia nesta aba, pular
-                            continue
+                    if not df_filtered.empty:
+                        df_to_save = df_filtered
                     else:
-                        # Se não tem coluna Data
-                        # Pode ser uma aba de configuração ou resumo sem data.
-                        # Como o usuário pediu "todas as planilhas existentes", e removemos Periodo,
-                        # se sobrar algo sem data, copiamos integralmente?
-                        # Risco: duplicar dados de outros dias.
-                        # Decisão: Por segurança, se não tem Data e não é Periodo, avisamos e não salvamos, 
-                        # a menos que seja algo conhecido como "Operadores" (tem data), "Equipamentos" (tem data).
-                        # Top5 tem data. Intervalos tem data.
-                        # Se não tiver data, provavelmente não deve ir para o arquivo diário específico.
-                        # print(f"    (Ignorando aba {sheet_name} - sem coluna Data)")
+                        # Se não tem dados para esse dia nesta aba, pular
                         continue
+                else:
+                    # Se não tem coluna Data
+                    # Pode ser uma aba de configuração ou resumo sem data.
+                    # Como o usuário pediu "todas as planilhas existentes", e removemos Periodo,
+                    # se sobrar algo sem data, copiamos integralmente?
+                    # Risco: duplicar dados de outros dias.
+                    # Decisão: Por segurança, se não tem Data e não é Periodo, avisamos e não salvamos, 
+                    # a menos que seja algo conhecido como "Operadores" (tem data), "Equipamentos" (tem data).
+                    # Top5 tem data. Intervalos tem data.
+                    # Se não tiver data, provavelmente não deve ir para o arquivo diário específico.
+                    # print(f"    (Ignorando aba {sheet_name} - sem coluna Data)")
+                    continue
+                
+                if df_to_save is not None:
+                    # Salvar aba no Excel (mantendo objetos datetime para formatação nativa do Excel)
+                    df_to_save.to_excel(writer, sheet_name=sheet_name, index=False)
+                    sheets_salvas += 1
+                    span_dia.linhas_saida = (span_dia.linhas_saida or 0) + len(df_to_save)
                     
-                    if df_to_save is not None:
-                        # Salvar aba no Excel (mantendo objetos datetime para formatação nativa do Excel)
-                        df_to_save.to_excel(writer, sheet_name=sheet_name, index=False)
-                        sheets_salvas += 1
-                        
-                        # Preparar DataFrame para JSON
-                        df_json = df_to_save.copy()
-                        
-                        # 1. Formatar colunas de tempo (Início, Fim) para DD/MM/YYYY HH:MM:SS
-                        for col in ["Início", "Fim"]:
-                            if col in df_json.columns and pd.api.types.is_datetime64_any_dtype(df_json[col]):
-                                df_json[col] = df_json[col].dt.strftime('%d/%m/%Y %H:%M:%S')
-
-                        # 2. Remover colunas redundantes (Descrição do Equipamento, Data)
-                        # O usuário solicitou remover pois já constam no nome do arquivo/aba
-                        cols_to_remove = ["Descrição do Equipamento"]
-                        if col_data_sheet:
-                            cols_to_remove.append(col_data_sheet)
-                        
-                        cols_existing = [c for c in cols_to_remove if c in df_json.columns]
-                        if cols_existing:
-                            df_json = df_json.drop(columns=cols_existing)
+                    # Preparar DataFrame para JSON
+                    df_json = df_to_save.copy()
+                    
+                    # 1. Formatar colunas de tempo (Início, Fim) para DD/MM/YYYY HH:MM:SS
+                    for col in ["Início", "Fim"]:
+                        if col in df_json.columns and pd.api.types.is_datetime64_any_dtype(df_json[col]):
+                            df_json[col] = df_json[col].dt.strftime('%d/%m/%Y %H:%M:%S')
+
+                    # 2. Remover colunas redundantes (Descrição do Equipamento, Data)
+                    # O usuário solicitou remover pois já constam no nome do arquivo/aba
+                    cols_to_remove = ["Descrição do Equipamento"]
+                    if col_data_sheet:
+                        cols_to_remove.append(col_data_sheet)
+                    
+                    cols_existing = [c for c in cols_to_remove if c in df_json.columns]
+                    if cols_existing:
+                        df_json = df_json.drop(columns=cols_existing)
 
-                        # Formatar a coluna de data principal (caso ela NÃO tenha sido removida por algum motivo)
-                        if col_data_sheet and col_data_sheet in df_json.columns:
-                             if pd.api.types.is_datetime64_any_dtype(df_json[col_data_sheet]):
-                                 df_json[col_data_sheet] = df_json[col_data_sheet].dt.strftime('%d/%m/%Y')
+                    # Formatar a coluna de data principal (caso ela NÃO tenha sido removida por algum motivo)
+                    if col_data_sheet and col_data_sheet in df_json.columns:
+                         if pd.api.types.is_datetime64_any_dtype(df_json[col_data_sheet]):
+                             df_json[col_data_sheet] = df_json[col_data_sheet].dt.strftime('%d/%m/%Y')
 
-                        # Adicionar ao JSON (convertendo para dict serializável)
-                        # Usar to_json e depois loads para garantir conversão correta de datas e NaNs (NaN vira null)
-                        try:
-                            json_str = df_json.to_json(orient='records', date_format='iso', default_handler=str)
-                            dados_dia_json[sheet_name] = json.loads(json_str)
-                        except Exception as e_json:
-                            print(f"    AVISO: Falha ao serializar aba {sheet_name} para JSON: {e_json}")
-
-                        # Formatação
-                        worksheet = writer.sheets[sheet_name]
-                        ajustar_largura_colunas(worksheet)
-                        formatar_coluna_data(worksheet, df_to_save)
+                    # Adicionar ao JSON (convertendo para dict serializável)
+                    # Usar to_json e depois loads para garantir conversão correta de datas e NaNs (NaN vira null)
+                    try:
+                        json_str = df_json.to_json(orient='records', date_format='iso', default_handler=str)
+                        dados_dia_json[sheet_name] = json.loads(json_str)
+                    except Exception as e_json:
+                        print(f"    AVISO: Falha ao serializar aba {sheet_name} para JSON: {e_json}")
+
+                    # Formatação
+                    worksheet = writer.sheets[sheet_name]
+                    ajustar_largura_colunas(worksheet)
+                    formatar_coluna_data(worksheet, df_to_save)
+            
+            if sheets_salvas > 0:
+                print(f"  -> Arquivo Excel salvo com {sheets_salvas} abas.")
+                arquivos_gerados.append(nome_arquivo)
                 
-                if sheets_salvas > 0:
-                    print(f"  -> Arquivo Excel salvo com {sheets_salvas} abas.")
-                    arquivos_gerados.append(nome_arquivo)
-                    
-                    # --- GERAR JSONs ESPECÍFICOS POR TIPO DE FROTA E ORGANIZAR EM PASTAS ---
+                # --- GERAR JSONs ESPECÍFICOS POR TIPO DE FROTA E ORGANIZAR EM PASTAS ---
+                
+                # Função auxiliar para garantir o nome do diretório normalizado
+                def obter_nome_diretorio(nome):
+                    return normalizar_texto_simples(nome)
+
+                # Função para normalizar texto para nomes de pasta/arquivo
+                def normalizar_texto_simples(txt):
+                    if not txt: return "outros"
+                    # Remove acentos e caracteres especiais
+                    txt = str(txt).lower().strip()
+                    # Mapeamento simples para garantir consistência com o Tratamento
+                    if txt == "colhedora de cana": return "colhedora"
+                    if txt in ["trator transbordo", "transbordo", "tratores"]: return "tratores"
+                    return txt.replace(" ", "_").replace("/", "-")
+
+                # Dicionário para agrupar dados por tipo de frota
+                # Estrutura: { "colhedora": { "Resumo_Dia": [...], "Operadores": [...], ... }, ... }
+                dados_por_tipo = {}
+
+                # Função auxiliar para adicionar dados ao agrupamento
+                def adicionar_ao_grupo(tipo, chave, dados):
+                    nome_tipo = obter_nome_diretorio(tipo)
+                    if nome_tipo not in dados_por_tipo:
+                        dados_por_tipo[nome_tipo] = {}
+                    dados_por_tipo[nome_tipo][chave] = dados
+
+                # Iterar sobre as abas carregadas para distribuir nos grupos
+                for key_aba, dados_lista in dados_dia_json.items():
                     
-                    # Função auxiliar para garantir o nome do diretório normalizado
-                    def obter_nome_diretorio(nome):
-                        return normalizar_texto_simples(nome)
-
-                    # Função para normalizar texto para nomes de pasta/arquivo
-                    def normalizar_texto_simples(txt):
-                        if not txt: return "outros"
-                        # Remove acentos e caracteres especiais
-                        txt = str(txt).lower().strip()
-                        # Mapeamento simples para garantir consistência com o Tratamento
-                        if txt == "colhedora de cana": return "colhedora"
-                        if txt in ["trator transbordo", "transbordo", "tratores"]: return "tratores"
-                        return txt.replace(" ", "_").replace("/", "-")
-
-                    # Dicionário para agrupar dados por tipo de frota
-                    # Estrutura: { "colhedora": { "Resumo_Dia": [...], "Operadores": [...], ... }, ... }
-                    dados_por_tipo = {}
-
-                    # Função auxiliar para adicionar dados ao agrupamento
-                    def adicionar_ao_grupo(tipo, chave, dados):
-                        nome_tipo = obter_nome_diretorio(tipo)
-                        if nome_tipo not in dados_por_tipo:
-                            dados_por_tipo[nome_tipo] = {}
-                        dados_por_tipo[nome_tipo][chave] = dados
-
-                    # Iterar sobre as abas carregadas para distribuir nos grupos
-                    for key_aba, dados_lista in dados_dia_json.items():
+                    # 1. Abas de Resumo Diário (_Dia) -> Ex: COLHEDORA_Dia
+                    if key_aba.endswith("_Dia"):
+                        tipo_frota = key_aba.replace("_Dia", "")
                         
-                        # 1. Abas de Resumo Diário (_Dia) -> Ex: COLHEDORA_Dia
-                        if key_aba.endswith("_Dia"):
-                            tipo_frota = key_aba.replace("_Dia", "")
-                            
-                            # Filtrar colunas principais para o Resumo
-                            dados_filtrados = []
-                            if isinstance(dados_lista, list):
-                                for item in dados_lista:
-                                    novo_item = {}
-                                    # Chaves identificadoras
-                                    if "Frota" in item: novo_item["Frota"] = item["Frota"]
-                                    elif "Código Equipamento" in item: novo_item["Frota"] = item["Código Equipamento"]
-                                    
-                                    for k, v in item.items():
-                                        k_lower = k.lower()
-                                        if (k.startswith("Horas_") or 
-                                            k.startswith("Porcentagem_") or 
-                                            k.startswith("Disponibilidade_") or
-                                            k.startswith("Eficiencia_") or
-                                            k.startswith("Manobras_") or
-                                            k.startswith("Basculamento_") or
-                                            k.startswith("Velocidade_") or
-                                            k.startswith("Media_") or
-                                            k.startswith("Producao_") or
-                                            k.startswith("Toneladas_") or
-                                            k.startswith("Consumo_") or
-                                            k.startswith("Uso_") or
-                                            k_lower == "motor ligado" or
-                                            k_lower == "motor ocioso" or
-                                            "velocidade" in k_lower or
-                                            "producao" in k_lower or
-                                            "produção" in k_lower or
-                                            "eficiencia" in k_lower or
-                                            "eficiência" in k_lower or
-                                            "manobras" in k_lower or
-                                            "basculamento" in k_lower or
-                                            "gps" in k_lower):
-                                            novo_item[k] = v
-                                    
-                                    if novo_item:
-                                        dados_filtrados.append(novo_item)
-                            
-                            adicionar_ao_grupo(tipo_frota, "Resumo_Dia", dados_filtrados)
-
-                        # 2. Operadores (Separado por aba) -> Ex: Operadores_COLHEDORA
-                        elif key_aba.startswith("Operadores_"):
-                            tipo_frota = key_aba.replace("Operadores_", "")
-                            adicionar_ao_grupo(tipo_frota, "Operadores", dados_lista)
-
-                        # 3. Top5Ofensores (Separado por aba) -> Ex: Top5Ofensores_COLHEDORA
-                        elif key_aba.startswith("Top5Ofensores_"):
-                            tipo_frota = key_aba.replace("Top5Ofensores_", "")
-                            adicionar_ao_grupo(tipo_frota, "Top5Ofensores", dados_lista)
-
-                        # 4. Intervalos (Separado por aba) -> Ex: Intervalos_COLHEDORA
-                        elif key_aba.startswith("Intervalos_"):
-                            tipo_frota = key_aba.replace("Intervalos_", "")
-                            adicionar_ao_grupo(tipo_frota, "Intervalos", dados_lista)
-                        
-                        # Casos genéricos (se o tratamento não separou por abas)
-                        elif key_aba == "Equipamentos_Dia":
-                            # Tentar separar manualmente se houver campo de descrição
-                            # Se não, joga em "outros" ou "geral"
-                            pass # Implementar se necessário, mas o foco é na estrutura nova
+                        # Filtrar colunas principais para o Resumo
+                        dados_filtrados = []
+                        if isinstance(dados_lista, list):
+                            for item in dados_lista:
+                                novo_item = {}
+                                # Chaves identificadoras
+                                if "Frota" in item: novo_item["Frota"] = item["Frota"]
+                                elif "Código Equipamento" in item: novo_item["Frota"] = item["Código Equipamento"]
+                                
+                                for k, v in item.items():
+                                    k_lower = k.lower()
+                                    if (k.startswith("Horas_") or 
+                                        k.startswith("Porcentagem_") or 
+                                        k.startswith("Disponibilidade_") or
+                                        k.startswith("Eficiencia_") or
+                                        k.startswith("Manobras_") or
+                                        k.startswith("Basculamento_") or
+                                        k.startswith("Velocidade_") or
+                                        k.startswith("Media_") or
+                                        k.startswith("Producao_") or
+                                        k.startswith("Toneladas_") or
+                                        k.startswith("Consumo_") or
+                                        k.startswith("Uso_") or
+                                        k_lower == "motor ligado" or
+                                        k_lower == "motor ocioso" or
+                                        "velocidade" in k_lower or
+                                        "producao" in k_lower or
+                                        "produção" in k_lower or
+                                        "eficiencia" in k_lower or
+                                        "eficiência" in k_lower or
+                                        "manobras" in k_lower or
+                                        "basculamento" in k_lower or
+                                        "gps" in k_lower):
+                                        novo_item[k] = v
+                                
+                                if novo_item:
+                                    dados_filtrados.append(novo_item)
                         
-                        elif key_aba == "Operadores":
-                             pass
+                        adicionar_ao_grupo(tipo_frota, "Resumo_Dia", dados_filtrados)
+
+                    # 2. Operadores (Separado por aba) -> Ex: Operadores_COLHEDORA
+                    elif key_aba.startswith("Operadores_"):
+                        tipo_frota = key_aba.replace("Operadores_", "")
+                        adicionar_ao_grupo(tipo_frota, "Operadores", dados_lista)
+
+                    # 3. Top5Ofensores (Separado por aba) -> Ex: Top5Ofensores_COLHEDORA
+                    elif key_aba.startswith("Top5Ofensores_"):
+                        tipo_frota = key_aba.replace("Top5Ofensores_", "")
+                        adicionar_ao_grupo(tipo_frota, "Top5Ofensores", dados_lista)
+
+                    # 4. Intervalos (Separado por aba) -> Ex: Intervalos_COLHEDORA
+                    elif key_aba.startswith("Intervalos_"):
+                        tipo_frota = key_aba.replace("Intervalos_", "")
+                        adicionar_ao_grupo(tipo_frota, "Intervalos", dados_lista)
+                    
+                    # Casos genéricos (se o tratamento não separou por abas)
+                    elif key_aba == "Equipamentos_Dia":
+                        # Tentar separar manualmente se houver campo de descrição
+                        # Se não, joga em "outros" ou "geral"
+                        pass # Implementar se necessário, mas o foco é na estrutura nova
+                    
+                    elif key_aba == "Operadores":
+                         pass
 
-                    # Salvar os arquivos JSON agrupados e separados por tipo (Frota vs Operadores)
-                    for tipo_frota, conteudo_json in dados_por_tipo.items():
-                        
-                        # Separar dados de Operadores
-                        dados_operadores = None
-                        if "Operadores" in conteudo_json:
-                            dados_operadores = conteudo_json.pop("Operadores")
-                        
-                        dados_frota = conteudo_json # O que sobrou é frota
+                # Salvar os arquivos JSON agrupados e separados por tipo (Frota vs Operadores)
+                for tipo_frota, conteudo_json in dados_por_tipo.items():
+                    
+                    # Separar dados de Operadores
+                    dados_operadores = None
+                    if "Operadores" in conteudo_json:
+                        dados_operadores = conteudo_json.pop("Operadores")
+                    
+                    dados_frota = conteudo_json # O que sobrou é frota
 
-                        # 1. Salvar arquivo de Frota (se houver dados)
-                        if dados_frota:
-                            # Criar pasta específica: json/colhedora/frotas/diario
-                            dir_frota = os.path.join(DIRETORIO_JSON, tipo_frota, "frotas", "diario")
-                            if not os.path.exists(dir_frota):
-                                os.makedirs(dir_frota)
+                    # 1. Salvar arquivo de Frota (se houver dados)
+                    if dados_frota:
+                        # Criar pasta específica: json/colhedora/frotas/diario
+                        dir_frota = os.path.join(DIRETORIO_JSON, tipo_frota, "frotas", "diario")
+                        if not os.path.exists(dir_frota):
+                            os.makedirs(dir_frota)
 
-                            # Reestruturar dados_frota para agrupar por Frota (chave principal)
-                            dados_frota_agrupados = {}
+                        # Reestruturar dados_frota para agrupar por Frota (chave principal)
+                        dados_frota_agrupados = {}
+                        
+                        # Categorias esperadas: Resumo_Dia, Top5Ofensores, Intervalos
+                        for categoria, lista_itens in dados_frota.items():
+                            if not isinstance(lista_itens, list):
+                                # Se não for lista, não sabemos lidar, mantém na raiz de "Geral" ou similar?
+                                # Por segurança, vamos pular ou tratar diferente. Mas aqui espera-se listas.
+                                continue
                             
-                            # Categorias esperadas: Resumo_Dia, Top5Ofensores, Intervalos
-                            for categoria, lista_itens in dados_frota.items():
-                                if not isinstance(lista_itens, list):
-                                    # Se não for lista, não sabemos lidar, mantém na raiz de "Geral" ou similar?
-                                    # Por segurança, vamos pular ou tratar diferente. Mas aqui espera-se listas.
-                                    continue
+                            for item in lista_itens:
+                                # Identificar ID da Frota: coluna da frota (Frota / Código Equipamento / Equipamento) e chave canônica
+                                chave_frota_encontrada, id_frota = campo_frota(item)
                                 
-                                for item in lista_itens:
-                                    # Identificar ID da Frota
-                                    id_frota = None
-                                    chave_frota_encontrada = None
+                                if id_frota is not None:
+                                    id_frota_str = obter_registro().chave_ou(id_frota, str(id_frota))
                                     
-                                    # Tentativas de encontrar a chave de frota
-                                    for k in ["Frota", "Código Equipamento", "Equipamento"]:
-                                        if k in item:
-                                            id_frota = item[k]
-                                            chave_frota_encontrada = k
-                                            break
+                                    # Cria entrada da frota se não existir
+                                    if id_frota_str not in dados_frota_agrupados:
+                                        dados_frota_agrupados[id_frota_str] = {}
                                     
-                                    if id_frota is not None:
-                                        id_frota_str = str(id_frota)
-                                        
-                                        # Cria entrada da frota se não existir
-                                        if id_frota_str not in dados_frota_agrupados:
-                                            dados_frota_agrupados[id_frota_str] = {}
-                                        
-                                        # Cria categoria dentro da frota se não existir
-                                        if categoria not in dados_frota_agrupados[id_frota_str]:
-                                            dados_frota_agrupados[id_frota_str][categoria] = []
-                                        
-                                        # Cria cópia do item para remover a chave da frota (evitar redundância)
-                                        item_limpo = item.copy()
-                                        if chave_frota_encontrada:
-                                            del item_limpo[chave_frota_encontrada]
-                                        
-                                        dados_frota_agrupados[id_frota_str][categoria].append(item_limpo)
-                                    else:
-                                        # Se não achou frota, joga num grupo "Geral"
-                                        if "Geral" not in dados_frota_agrupados:
-                                            dados_frota_agrupados["Geral"] = {}
-                                        if categoria not in dados_frota_agrupados["Geral"]:
-                                            dados_frota_agrupados["Geral"][categoria] = []
-                                        dados_frota_agrupados["Geral"][categoria].append(item)
-
-                            nome_arquivo_frota = f"{tipo_frota}_frota_{data_str}.json"
-                            caminho_frota = os.path.join(dir_frota, nome_arquivo_frota)
-                            try:
-                                with open(caminho_frota, 'w', encoding='utf-8') as f:
-                                    json.dump(dados_frota_agrupados, f, ensure_ascii=False, indent=2)
-                                print(f"  -> JSON Frota salvo: {caminho_frota}")
-                            except Exception as e_esp:
-                                print(f"  -> ERRO ao salvar {nome_arquivo_frota}: {e_esp}")
-
-                        # 2. Salvar arquivo de Operadores (se houver dados)
-                        if dados_operadores:
-                            # Criar pasta específica: json/colhedora/operadores/diario
-                            dir_ops = os.path.join(DIRETORIO_JSON, tipo_frota, "operadores", "diario")
-                            if not os.path.exists(dir_ops):
-                                os.makedirs(dir_ops)
-
-                            # Reestruturar dados_operadores para indexar por "Código - Nome"
-                            dados_operadores_agrupados = {}
-                            
-                            # dados_operadores é uma lista de dicionários
-                            if isinstance(dados_operadores, list):
-                                for item in dados_operadores:
-                                    # Identificar ID do Operador
-                                    id_op = None
-                                    chave_op_encontrada = None
+                                    # Cria categoria dentro da frota se não existir
+                                    if categoria not in dados_frota_agrupados[id_frota_str]:
+                                        dados_frota_agrupados[id_frota_str][categoria] = []
                                     
-                                    # Busca chave do código do operador
-                                    # Baseado no arquivo lido: "Código de Operador"
-                                    for k in ["Código de Operador", "Codigo Operador", "Cod Operador"]:
-                                        if k in item:
-                                            id_op = item[k]
-                                            chave_op_encontrada = k
-                                            break
+                                    # Cria cópia do item para remover a chave da frota (evitar redundância)
+                                    item_limpo = item.copy()
+                                    if chave_frota_encontrada:
+                                        del item_limpo[chave_frota_encontrada]
                                     
-                                    # Identificar Nome do Operador
-                                    nome_op = "Desconhecido"
-                                    chave_nome_encontrada = None
-                                    for k in ["Nome", "Nome Operador", "Nome do Operador", "Operador"]:
-                                        if k in item:
-                                            nome_op = item[k]
-                                            chave_nome_encontrada = k
-                                            break
+                                    dados_frota_agrupados[id_frota_str][categoria].append(item_limpo)
+                                else:
+                                    # Se não achou frota, joga num grupo "Geral"
+                                    if "Geral" not in dados_frota_agrupados:
+                                        dados_frota_agrupados["Geral"] = {}
+                                    if categoria not in dados_frota_agrupados["Geral"]:
+                                        dados_frota_agrupados["Geral"][categoria] = []
+                                    dados_frota_agrupados["Geral"][categoria].append(item)
+
+                        anexar_utilizacao(dados_frota_agrupados, utilizacao_dia)
+
+                        nome_arquivo_frota = f"{tipo_frota}_frota_{data_str}.json"
+                        caminho_frota = os.path.join(dir_frota, nome_arquivo_frota)
+                        try:
+                            if intervalos_colunar.ativo():
+                                catalogo.gravar_json(
+                                    caminho_frota, intervalos_colunar.compactar_relatorio(dados_frota_agrupados),
+                                    etapa="5", compacto=True,
+                                )
+                            else:
+                                catalogo.gravar_json(caminho_frota, dados_frota_agrupados, etapa="5")
+                            print(f"  -> JSON Frota salvo: {caminho_frota}")
+                        except Exception as e_esp:
+                            print(f"  -> ERRO ao salvar {nome_arquivo_frota}: {e_esp}")
+
+                    # 2. Salvar arquivo de Operadores (se houver dados)
+                    if dados_operadores:
+                        # Criar pasta específica: json/colhedora/operadores/diario
+                        dir_ops = os.path.join(DIRETORIO_JSON, tipo_frota, "operadores", "diario")
+                        if not os.path.exists(dir_ops):
+                            os.makedirs(dir_ops)
+
+                        # Reestruturar dados_operadores para indexar por "Código - Nome"
+                        dados_operadores_agrupados = {}
+                        
+                        # dados_operadores é uma lista de dicionários
+                        if isinstance(dados_operadores, list):
+                            for item in dados_operadores:
+                                # Identificar ID do Operador
+                                id_op = None
+                                chave_op_encontrada = None
+                                
+                                # Busca chave do código do operador
+                                # Baseado no arquivo lido: "Código de Operador"
+                                for k in ["Código de Operador", "Codigo Operador", "Cod Operador"]:
+                                    if k in item:
+                                        id_op = item[k]
+                                        chave_op_encontrada = k
+                                        break
+                                
+                                # Identificar Nome do Operador
+                                nome_op = "Desconhecido"
+                                chave_nome_encontrada = None
+                                for k in ["Nome", "Nome Operador", "Nome do Operador", "Operador"]:
+                                    if k in item:
+                                        nome_op = item[k]
+                                        chave_nome_encontrada = k
+                                        break
+                                
+                                if id_op is not None:
+                                    # Formatar chave: "Cód - Nome"
+                                    chave_final = f"{id_op} - {nome_op}"
                                     
-                                    if id_op is not None:
-                                        # Formatar chave: "Cód - Nome"
-                                        chave_final = f"{id_op} - {nome_op}"
-                                        
-                                        # Cria cópia para remover redundância
-                                        item_limpo = item.copy()
-                                        
-                                        # Remover chaves usadas na composição do ID principal (se desejado remover redundância)
-                                        if chave_op_encontrada:
-                                            del item_limpo[chave_op_encontrada]
+                                    # Cria cópia para remover redundância
+                                    item_limpo = item.copy()
+                                    
+                                    # Remover chaves usadas na composição do ID principal (se desejado remover redundância)
+                                    if chave_op_encontrada:
+                                        del item_limpo[chave_op_encontrada]
+                                    
+                                    # Opcional: Remover o nome também se já está na chave?
+                                    # O usuário pediu para "não repetir em todas as entradas" no caso da frota.
+                                    # Vamos manter a consistência e remover se encontrou a chave exata.
+                                    if chave_nome_encontrada:
+                                        del item_limpo[chave_nome_encontrada]
                                         
-                                        # Opcional: Remover o nome também se já está na chave?
-                                        # O usuário pediu para "não repetir em todas as entradas" no caso da frota.
-                                        # Vamos manter a consistência e remover se encontrou a chave exata.
-                                        if chave_nome_encontrada:
-                                            del item_limpo[chave_nome_encontrada]
-                                            
-                                        # Como é um resumo por dia/tipo, assume-se 1 entrada por operador.
-                                        dados_operadores_agrupados[chave_final] = item_limpo
-                                    else:
-                                        # Sem código (improvável se vier do tratamento correto)
-                                        if "SemCodigo" not in dados_operadores_agrupados:
-                                            dados_operadores_agrupados["SemCodigo"] = []
-                                        dados_operadores_agrupados["SemCodigo"].append(item)
-                            
-                            nome_arquivo_ops = f"{tipo_frota}_operadores_{data_str}.json"
-                            caminho_ops = os.path.join(dir_ops, nome_arquivo_ops)
-                            try:
-                                with open(caminho_ops, 'w', encoding='utf-8') as f:
-                                    json.dump(dados_operadores_agrupados, f, ensure_ascii=False, indent=2)
-                                print(f"  -> JSON Operadores salvo: {caminho_ops}")
-                            except Exception as e_esp:
-                                print(f"  -> ERRO ao salvar {nome_arquivo_ops}: {e_esp}")
+                                    # Como é um resumo por dia/tipo, assume-se 1 entrada por operador.
+                                    dados_operadores_agrupados[chave_final] = item_limpo
+                                else:
+                                    # Sem código (improvável se vier do tratamento correto)
+                                    if "SemCodigo" not in dados_operadores_agrupados:
+                                        dados_operadores_agrupados["SemCodigo"] = []
+                                    dados_operadores_agrupados["SemCodigo"].append(item)
+                        
+                        nome_arquivo_ops = f"{tipo_frota}_operadores_{data_str}.json"
+                        caminho_ops = os.path.join(dir_ops, nome_arquivo_ops)
+                        try:
+                            catalogo.gravar_json(caminho_ops, dados_operadores_agrupados, etapa="5")
+                            print(f"  -> JSON Operadores salvo: {caminho_ops}")
+                        except Exception as e_esp:
+                            print(f"  -> ERRO ao salvar {nome_arquivo_ops}: {e_esp}")
 
-                    # --------------------------------------------------------------------------
+                # --------------------------------------------------------------------------
 
-                else:
-                    print(f"  -> AVISO: Nenhuma aba gerada para {data_str}. Arquivo não salvo.")
-            
-        # --- 6. Gerar JSONs de Período (Semanal/Mensal) ---
-        print("\n=== GERANDO ARQUIVOS DE PERÍODO ===")
-        
-        # Definir string do período
-        periodo_str = "periodo_desconhecido"
-        if dt_inicio_filtro and dt_fim_filtro:
-            periodo_str = f"{dt_inicio_filtro.strftime('%d-%m-%Y')}_{dt_fim_filtro.strftime('%d-%m-%Y')}"
-        
-        # Processar Frota (Periodo)
-        if "Periodo_Equipamentos" in dfs:
-            print(f"  Processando Periodo_Equipamentos...")
-            df_p_frota = dfs["Periodo_Equipamentos"]
-            
-            # Tentar identificar coluna de tipo de frota
-            col_tipo = None
-            for c in ["Descrição do Equipamento", "Grupo", "Tipo"]:
-                if c in df_p_frota.columns:
-                    col_tipo = c
-                    break
-            
-            if col_tipo:
-                grupos = df_p_frota[col_tipo].dropna().unique()
-                for tipo in grupos:
-                    df_tipo = df_p_frota[df_p_frota[col_tipo] == tipo].copy()
-                    
-                    # Remover a coluna de tipo para economizar espaço
-                    df_tipo = df_tipo.drop(columns=[col_tipo])
-                    
-                    nome_tipo_norm = normalizar_nome_pasta(tipo)
-                    
-                    # Preparar estrutura JSON (agrupada por ID da frota ou Geral)
-                    # Usar to_json/loads para garantir serialização correta de datas e NaNs
-                    json_str = df_tipo.to_json(orient='records', date_format='iso', default_handler=str)
-                    records = json.loads(json_str)
-                    
-                    dados_frota_agrupados = {}
-                    
-                    for item in records:
-                        # Identificar ID
-                        id_frota = None
-                        chave_frota_encontrada = None
-                         # Tentativas de encontrar a chave de frota
-                        for k in ["Frota", "Código Equipamento", "Equipamento"]:
-                            if k in item:
-                                id_frota = item[k]
-                                chave_frota_encontrada = k
-                                break
-                        
-                        if id_frota is not None:
-                            id_frota_str = str(id_frota)
-                            if id_frota_str not in dados_frota_agrupados:
-                                dados_frota_agrupados[id_frota_str] = {}
-                            
-                            # No período, geralmente é um resumo único por frota
-                            if "Resumo_Periodo" not in dados_frota_agrupados[id_frota_str]:
-                                dados_frota_agrupados[id_frota_str]["Resumo_Periodo"] = []
-                            
-                            item_limpo = item.copy()
-                            if chave_frota_encontrada:
-                                del item_limpo[chave_frota_encontrada]
-                            
-                            dados_frota_agrupados[id_frota_str]["Resumo_Periodo"].append(item_limpo)
-                        else:
-                             if "Geral" not in dados_frota_agrupados:
-                                 dados_frota_agrupados["Geral"] = {}
-                             if "Resumo_Periodo" not in dados_frota_agrupados["Geral"]:
-                                 dados_frota_agrupados["Geral"]["Resumo_Periodo"] = []
-                             dados_frota_agrupados["Geral"]["Resumo_Periodo"].append(item)
-
-                    # Salvar
-                    dir_frota = os.path.join(DIRETORIO_JSON, nome_tipo_norm, "frotas", "semanal")
-                    if not os.path.exists(dir_frota):
-                        os.makedirs(dir_frota)
-                        
-                    nome_arquivo = f"{nome_tipo_norm}_frota_periodo_{periodo_str}.json"
-                    caminho_arquivo = os.path.join(dir_frota, nome_arquivo)
-                    
-                    try:
-                        with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-                            json.dump(dados_frota_agrupados, f, ensure_ascii=False, indent=2)
-                        print(f"    -> Salvo: {caminho_arquivo}")
-                    except Exception as e:
-                        print(f"    -> Erro ao salvar {nome_arquivo}: {e}")
-
-        # Processar Operadores (Periodo)
-        if "Periodo_Operadores" in dfs:
-            print(f"  Processando Periodo_Operadores...")
-            df_p_op = dfs["Periodo_Operadores"]
-            
-            col_tipo = None
-            for c in ["Descrição do Equipamento", "Grupo", "Tipo"]:
-                if c in df_p_op.columns:
-                    col_tipo = c
-                    break
-            
-            lista_tipos = []
-            if col_tipo:
-                lista_tipos = df_p_op[col_tipo].dropna().unique()
             else:
-                lista_tipos = ["Geral"]
+                print(f"  -> AVISO: Nenhuma aba gerada para {data_str}. Arquivo não salvo.")
 
-            for tipo in lista_tipos:
-                if col_tipo:
-                    df_tipo = df_p_op[df_p_op[col_tipo] == tipo].copy()
-                    df_tipo = df_tipo.drop(columns=[col_tipo])
-                    nome_tipo_norm = normalizar_nome_pasta(tipo)
-                else:
-                    df_tipo = df_p_op.copy()
-                    nome_tipo_norm = "geral"
+        if os.path.exists(caminho_saida):
+            catalogo.registrar(caminho_saida, etapa="5", tipo="planilha", periodo="diario", data=data_str)
+        
+    # --- 6. Gerar JSONs de Período (Semanal/Mensal/Safra) ---
+    print("\n=== GERANDO ARQUIVOS DE PERÍODO ===")
+    dias = sorted(pd.to_datetime(d).date() for d in datas_unicas)
+    if dias:
+        gerar_periodos(dfs, dias[0], dias[-1])
+    obter_registro().salvar()
 
-                json_str = df_tipo.to_json(orient='records', date_format='iso', default_handler=str)
-                records = json.loads(json_str)
-                dados_operadores_agrupados = {}
-                
-                for item in records:
-                    # Identificar ID e Nome
-                    id_op = None
-                    chave_op_encontrada = None
-                    for k in ["Código de Operador", "Codigo Operador", "Cod Operador"]:
-                        if k in item:
-                            id_op = item[k]
-                            chave_op_encontrada = k
-                            break
-                    
-                    nome_op = "Desconhecido"
-                    chave_nome_encontrada = None
-                    for k in ["Nome", "Nome Operador", "Nome do Operador", "Operador"]:
-                        if k in item:
-                            nome_op = item[k]
-                            chave_nome_encontrada = k
-                            break
-                    
-                    if id_op is not None:
-                        chave_final = f"{id_op} - {nome_op}"
-                        item_limpo = item.copy()
-                        if chave_op_encontrada:
-                            del item_limpo[chave_op_encontrada]
-                        if chave_nome_encontrada:
-                            del item_limpo[chave_nome_encontrada]
-                            
-                        dados_operadores_agrupados[chave_final] = item_limpo
-                    else:
-                        if "SemCodigo" not in dados_operadores_agrupados:
-                            dados_operadores_agrupados["SemCodigo"] = []
-                        dados_operadores_agrupados["SemCodigo"].append(item)
-                
-                # Salvar
-                dir_frota = os.path.join(DIRETORIO_JSON, nome_tipo_norm, "operadores", "semanal")
-                if not os.path.exists(dir_frota):
-                    os.makedirs(dir_frota)
-                    
-                nome_arquivo = f"{nome_tipo_norm}_operadores_periodo_{periodo_str}.json"
-                caminho_arquivo = os.path.join(dir_frota, nome_arquivo)
-                
-                try:
-                    with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-                        json.dump(dados_operadores_agrupados, f, ensure_ascii=False, indent=2)
-                    print(f"    -> Salvo: {caminho_arquivo}")
-                except Exception as e:
-                    print(f"    -> Erro ao salvar {nome_arquivo}: {e}")
-
-        print(f"\nSucesso! Arquivos Excel e JSON gerados nas pastas 'separados/xlsx' e 'separados/json'.")
+    print(f"\nSucesso! Arquivos Excel e JSON gerados nas pastas 'separados/xlsx' e 'separados/json'.")
+
+def main():
+    print("=== INICIANDO SEPARAÇÃO COMPLETA POR DIA ===")
+    
+    # 1. Encontrar o arquivo
+    arquivo_input = encontrar_ultimo_tratado()
+    
+    if not arquivo_input:
+        print(f"ERRO: Nenhum arquivo tratado encontrado em: {DIRETORIO_DADOS}")
+        print("Execute o script 2_Tratamento.py primeiro.")
+        sys.exit(1)
+        
+    print(f"Lendo arquivo base: {os.path.basename(arquivo_input)}")
+    arquivos_input = arquivos_do_mesmo_lote(arquivo_input)
+    if len(arquivos_input) > 1:
+        print(f"Extração fragmentada: {len(arquivos_input)} fragmentos no lote")
+    
+    try:
+        # 2. Ler todas as abas (de todos os fragmentos do lote) num dicionário de DataFrames
+        dfs = carregar_abas(arquivos_input)
+        dt_inicio_filtro, dt_fim_filtro = periodo_dos_arquivos(arquivos_input)
+        separar_abas(dfs, dt_inicio_filtro, dt_fim_filtro)
+        registrar_entradas("5", PADROES_ENTRADA, eh_tratado_solinftec)
             
     except Exception as e:
         print(f"\nERRO FATAL: {e}")
@@ -743,4 +921,16 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Separa o último tratado Solinftec por dia (XLSX/JSON).")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Só executa se houver tratados novos/alterados desde a última separação",
+    )
+    args = parser.parse_args()
+
+    if args.check and not ha_entradas_novas("5", PADROES_ENTRADA, eh_tratado_solinftec):
+        print("⏭️  Nenhum tratado novo para separar.")
+        sys.exit(0)
     main()
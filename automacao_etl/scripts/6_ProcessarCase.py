@@ -1,10 +1,8 @@
 import os
-import zipfile
+import sys
 import pandas as pd
 import glob
 import re
-import tempfile
-import shutil
 import warnings
 
 # Suppress warnings
@@ -14,6 +12,18 @@ warnings.filterwarnings("ignore")
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "dados")
 
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils import arquivos_zip, catalogo, historico
+from utils.dim_operacoes import obter_dimensao
+from utils.entradas import ha_entradas_novas, registrar_entradas
+from utils.registro_frotas import obter_registro
+from utils.instrumentacao import instrumentar
+
+# Entradas observadas pelo --check: os ZIPs de CSV baixados da Case
+PADROES_ENTRADA = [os.path.join(DATA_DIR, "Case*.zip")]
+
+@instrumentar("6.processar_case")
 def processar_ultimo_arquivo_case():
     print("="*80)
     print("🛠️  PROCESSADOR DE DADOS CASE IH")
@@ -32,21 +42,18 @@ def processar_ultimo_arquivo_case():
     arquivo_recente = max(arquivos, key=os.path.getctime)
     print(f"📂 Arquivo mais recente encontrado: {os.path.basename(arquivo_recente)}")
     
-    # 2. Extrair em pasta temporária
-    print("📦 Extraindo conteúdo...")
+    # 2. Abrir o ZIP (CSVs lidos direto dos membros, sem extrair)
+    print("📦 Lendo conteúdo do ZIP...")
     
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            with zipfile.ZipFile(arquivo_recente, 'r') as zip_ref:
-                nomes_arquivos = zip_ref.namelist()
-                csvs = [n for n in nomes_arquivos if n.lower().endswith('.csv')]
-                
-                if not csvs:
-                    print("❌ Nenhum CSV encontrado dentro do ZIP.")
-                    return
-                
-                zip_ref.extractall(temp_dir)
-                print(f"   {len(csvs)} arquivos CSV encontrados (extraídos temporariamente).")
+        with arquivos_zip.abrir_zip(arquivo_recente) as zip_ref:
+            csvs = zip_ref.nomes(('.csv',))
+            
+            if not csvs:
+                print("❌ Nenhum CSV encontrado dentro do ZIP.")
+                return
+            
+            print(f"   {len(csvs)} arquivos CSV encontrados.")
             
             # 3. Ler e Consolidar com Pandas
             lista_original = []
@@ -57,13 +64,14 @@ def processar_ultimo_arquivo_case():
             print(f"\n📊 Lendo e processando arquivos CSV...")
             
             for csv_file in csvs:
-                path_csv = os.path.join(temp_dir, csv_file)
                 try:
                     # Tenta detectar encoding e separador
-                    try:
-                        df_temp = pd.read_csv(path_csv, sep=None, engine='python', encoding='utf-8-sig')
-                    except:
-                        df_temp = pd.read_csv(path_csv, sep=';', encoding='latin1')
+                    with zip_ref.abrir(csv_file) as f:
+                        try:
+                            df_temp = pd.read_csv(f, sep=None, engine='python', encoding='utf-8-sig')
+                        except:
+                            f.seek(0)
+                            df_temp = pd.read_csv(f, sep=';', encoding='latin1')
                     
                     # 4. Processamento Individual por Arquivo (Frotas separadas)
                     if df_temp.empty:
@@ -73,11 +81,7 @@ def processar_ultimo_arquivo_case():
                     # Extração da Frota (nickname)
                     if 'nickname' in df_temp.columns and not df_temp['nickname'].empty:
                         nickname = str(df_temp['nickname'].iloc[0])
-                        match = re.search(r'(?:MB\s*|FROTA\s*|NO\.\s*|^)(\d+)', nickname, re.IGNORECASE)
-                        if match:
-                            frota = match.group(1)
-                        else:
-                            frota = "DESCONHECIDO"
+                        frota = obter_registro().chave_ou(nickname, "DESCONHECIDO")
                     else:
                         frota = "SEM_NICKNAME"
                         
@@ -192,6 +196,13 @@ def processar_ultimo_arquivo_case():
                             df_final = df_final[cols]
 
                         # --- CÁLCULOS DO RESUMO (DUPLO) ---
+
+                        # Status codificados uma única vez (dimensão de operações);
+                        # os resumos diários reutilizam os códigos por fatia
+                        dim = obter_dimensao()
+                        if 'STATUS_DUTY' in df_final.columns and 'STATUS_DEVICE' in df_final.columns:
+                            df_final['_cod_duty'] = dim.codificar('status_duty', df_final['STATUS_DUTY'])
+                            df_final['_cod_device'] = dim.codificar('status_device', df_final['STATUS_DEVICE'])
                         
                         def calcular_stats(df, label_data=None):
                             stats = {}
@@ -222,31 +233,31 @@ def processar_ultimo_arquivo_case():
                                     stats['Dias Únicos Registrados'] = len(datas_unicas)
                                 except: pass
 
-                            col_status_duty = 'STATUS_DUTY' if 'STATUS_DUTY' in df.columns else None
-                            col_status_device = 'STATUS_DEVICE' if 'STATUS_DEVICE' in df.columns else None
-                            
                             horas_produtivas = 0
                             motor_ocioso = 0
                             motor_desligado = 0
                             
-                            if col_status_duty and col_status_device:
+                            if '_cod_duty' in df.columns and '_cod_device' in df.columns:
                                 s_velocidade = pd.Series(0, index=df.index)
                                 if 'Velocidade' in df.columns:
                                     s_velocidade = pd.to_numeric(df['Velocidade'], errors='coerce').fillna(0)
 
+                                cod_duty = df['_cod_duty'].to_numpy()
+                                device_on = dim.mascara('status_device', df['_cod_device'].to_numpy(), 'ligado')
+
                                 # Produtivo
-                                mask_prod = (df[col_status_device].astype(str).str.lower() == 'on') & \
-                                            (df[col_status_duty].astype(str).str.upper() == 'WORKING') & \
-                                            (s_velocidade > 0)
+                                mask_prod = device_on & \
+                                            dim.mascara('status_duty', cod_duty, 'trabalhando') & \
+                                            (s_velocidade > 0).to_numpy()
                                 horas_produtivas = df.loc[mask_prod, 'Duração'].sum()
                                 
                                 # Ocioso
-                                mask_ocioso = (df[col_status_device].astype(str).str.lower() == 'on') & \
-                                              ( (df[col_status_duty].astype(str).str.upper() == 'KEYON') | (s_velocidade == 0) )
+                                mask_ocioso = device_on & \
+                                              ( dim.mascara('status_duty', cod_duty, 'chave_ligada') | (s_velocidade == 0).to_numpy() )
                                 motor_ocioso = df.loc[mask_ocioso, 'Duração'].sum()
                                 
                                 # Desligado
-                                mask_off = (df[col_status_duty].astype(str).str.upper() == 'OFF')
+                                mask_off = dim.mascara('status_duty', cod_duty, 'desligado')
                                 motor_desligado = df.loc[mask_off, 'Duração'].sum()
                             
                             stats['Horas Produtivas'] = horas_produtivas
@@ -319,11 +330,13 @@ def processar_ultimo_arquivo_case():
                             "Transmission Status CVT", "Transmission Status Powershift", "Veloc. TDP dianteira", 
                             "Velocidade da TDP traseira",
                             "Combustível por distância - Média", "GPS_FIX", "Nível de Combustível", "Potência motor",
-                            "STATUS_DUTY_CODE", "Data" # Remove Data auxiliar do 'Dados' clean
+                            "STATUS_DUTY_CODE", "Data", # Remove Data auxiliar do 'Dados' clean
+                            "_cod_duty", "_cod_device"
                         ]
                         
                         cols_remover = [c for c in colunas_excluir if c in df_final.columns]
                         df_limpo = df_final.drop(columns=cols_remover)
+                        df_final = df_final.drop(columns=['_cod_duty', '_cod_device'], errors='ignore')
                         print(f"      🧹 Colunas removidas: {len(cols_remover)}")
 
                     except Exception as e:
@@ -358,6 +371,9 @@ def processar_ultimo_arquivo_case():
             df_resumo_geral_consol = pd.concat(lista_resumo_geral, ignore_index=True)
             df_resumo_diario_consol = pd.concat(lista_resumo_diario, ignore_index=True)
             
+            obter_dimensao().salvar()
+            obter_registro().salvar()
+
             # Define nome do arquivo consolidado
             nome_saida = f"Consolidado_Case_{data_periodo}.xlsx"
             path_saida = os.path.join(DATA_DIR, nome_saida)
@@ -390,11 +406,46 @@ def processar_ultimo_arquivo_case():
                         adjusted_width = (max_length + 2)
                         worksheet.column_dimensions[column_letter].width = adjusted_width
 
+            periodo = re.fullmatch(r"(\d{2})_(\d{2})-(\d{2}-\d{4})", data_periodo)
+            catalogo.registrar(
+                path_saida, etapa="6", categoria="case", tipo="consolidado", periodo="semanal",
+                data=f"{periodo.group(1)}-{periodo.group(3)}" if periodo else None,
+                data_fim=f"{periodo.group(2)}-{periodo.group(3)}" if periodo else None,
+                frotas=df_resumo_geral_consol["Frota"].dropna().astype(str).unique().tolist()
+                if "Frota" in df_resumo_geral_consol.columns else None,
+            )
+
+            historico.registrar_dia("case", "frota", df_resumo_diario_consol, col_chave="Frota")
+
             print(f"✅ Processamento CONSOLIDADO concluído com sucesso!")
+            registrar_entradas("6", PADROES_ENTRADA)
+
+            # Abas também em memória, para o orquestrador repassar às etapas seguintes
+            return {
+                'arquivo': path_saida,
+                'abas': {
+                    'Resumo': df_resumo_geral_consol,
+                    'Resumo Diário': df_resumo_diario_consol,
+                    'Original': df_final_consol,
+                    'Dados': df_dados_consol,
+                },
+            }
             
     except Exception as e:
         print(f"❌ Erro durante processamento: {e}")
         return
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Processa o ZIP mais recente da Case IH.")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Só executa se houver ZIP da Case novo/alterado desde o último processamento",
+    )
+    args = parser.parse_args()
+
+    if args.check and not ha_entradas_novas("6", PADROES_ENTRADA):
+        print("⏭️  Nenhum ZIP novo da Case para processar.")
+        sys.exit(0)
     processar_ultimo_arquivo_case()
@@ -22,14 +22,6 @@ import sys
 from datetime import datetime
 from collections import defaultdict
 
-try:
-    import openpyxl
-except ImportError:
-    print("Instalando openpyxl...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "openpyxl"])
-    import openpyxl
-
 
 # ─── Paths ──────────────────────────────────────────────────────────────────────
 
@@ -48,6 +40,33 @@ LINHA_TEMPO_DIR = os.path.join(ETL_ROOT, "dados")
 
 OUTPUT_DIR = SOLINFTEC_JSON_DIR
 
+if ETL_ROOT not in sys.path:
+    sys.path.insert(0, ETL_ROOT)
+from utils import catalogo
+from utils.dependencias import importar_tardio
+from utils.dim_operacoes import obter_dimensao
+from utils.entradas import ha_entradas_novas, registrar_entradas
+from utils import compactacao_intervalos, intervalos_colunar, metricas_trajeto, topk, utilizacao_horaria
+from utils.instrumentacao import instrumentar
+from utils.registro_frotas import obter_registro
+
+# Entradas observadas pelo --check (as métricas de trajeto vêm da etapa 8)
+PADROES_ENTRADA = [
+    os.path.join(SOLINFTEC_JSON_DIR, "*.json"),
+    os.path.join(CASE_DIR, "Consolidado_Case_*.xlsx"),
+    os.path.join(OPC_XLSX_DIR, "*.xlsx"),
+    os.path.join(metricas_trajeto.PASTA_TRAJETOS, "*.json"),
+]
+
+# Carregado só quando há planilha para ler (Case / OPC)
+openpyxl = importar_tardio("openpyxl")
+
+DIM_OPERACOES = obter_dimensao()
+REGISTRO_FROTAS = obter_registro()
+
+FRENTE = "frente5"
+TOP_OFENSORES = 5
+
 # Metas default (mesmas do frontend config/metas.json)
 METAS_DEFAULT = {
     "eficienciaEnergetica": 85,
@@ -99,6 +118,11 @@ def calc_duration_hours(start_str: str, end_str: str) -> float:
     return 0.0
 
 
+def chave_frota(valor) -> str:
+    """Chave canônica da frota (utils/registro_frotas); textos sem número ficam como estão."""
+    return REGISTRO_FROTAS.chave_ou(valor, str(valor if valor is not None else "").strip())
+
+
 def safe_float(val, default=0.0) -> float:
     """Convert to float safely."""
     try:
@@ -111,116 +135,166 @@ def safe_float(val, default=0.0) -> float:
 
 def load_solinftec(date_str: str) -> dict | None:
     """Carrega JSON Solinftec bruto para a data (DD-MM-YYYY)."""
-    pattern = os.path.join(SOLINFTEC_JSON_DIR, f"*{date_str}*.json")
-    files = glob.glob(pattern)
+    files = catalogo.localizar(categoria="colhedora", tipo="frotas", periodo="diario", formato="json", data=date_str)
+    if not files:
+        # Pasta gerada antes do catálogo
+        files = glob.glob(os.path.join(SOLINFTEC_JSON_DIR, f"*{date_str}*.json"))
     if not files:
         return None
     with open(files[0], "r", encoding="utf-8") as f:
-        return json.load(f)
+        # Intervalos podem ter sido gravados no formato colunar (etapa 5 ou 7)
+        return intervalos_colunar.expandir_relatorio(json.load(f))
 
 
 # ─── Case IH ───────────────────────────────────────────────────────────────────
 
-def load_case_data() -> dict:
+ABAS_CASE = ("Resumo", "Resumo Diário", "Dados")
+
+def linhas_dataframe(df) -> list:
+    """
+    Linhas de um DataFrame no mesmo formato de ws.iter_rows(values_only=True):
+    cabeçalho primeiro, vazios como None e tipos nativos do Python.
+    """
+    linhas = [tuple(df.columns)]
+    for row in df.astype(object).itertuples(index=False, name=None):
+        linhas.append(tuple(_valor_celula(v) for v in row))
+    return linhas
+
+
+def _valor_celula(valor):
+    if valor is None or valor != valor:  # NaN / NaT
+        return None
+    if hasattr(valor, "to_pydatetime"):
+        return valor.to_pydatetime()
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    if isinstance(valor, float):
+        # Mesma precisão gravada no XLSX (16 dígitos); inteiros voltam do openpyxl como int
+        valor = float(f"{valor:.16g}")
+        if valor.is_integer():
+            return int(valor)
+    return valor
+
+
+@instrumentar("7.load_case_data")
+def load_case_data(abas_case: dict | None = None, arquivo_case: str | None = None) -> dict:
     """
     Carrega todos os dados Case IH dos XLSX consolidados.
+    Se `abas_case` (nome da aba -> DataFrame, saída da etapa 6) for informado,
+    essas abas entram no lugar de `arquivo_case` (o XLSX que a etapa 6 acabou
+    de gravar); os demais consolidados continuam sendo lidos do disco.
     Retorna dict: { 'DD/MM/YYYY': { 'frota_id': { ...campos... } } }
     """
+    case_data = defaultdict(lambda: defaultdict(dict))
+
     case_files = glob.glob(os.path.join(CASE_DIR, "Consolidado_Case_*.xlsx"))
+    em_memoria = None
+    if abas_case is not None:
+        em_memoria = os.path.abspath(arquivo_case) if arquivo_case else "<memória>"
+        case_files = [os.path.abspath(cf) for cf in case_files]
+        if em_memoria not in case_files:
+            case_files.append(em_memoria)
     if not case_files:
         print("  ⚠️  Nenhum arquivo Case IH encontrado.")
         return {}
 
-    case_data = defaultdict(lambda: defaultdict(dict))
-
     for cf in case_files:
-        print(f"  📂 Carregando Case: {os.path.basename(cf)}")
-        wb = openpyxl.load_workbook(cf, read_only=True)
-
-        # Aba "Resumo" contém dados por frota para o período inteiro
-        if "Resumo" in wb.sheetnames:
-            ws = wb["Resumo"]
-            rows = list(ws.iter_rows(values_only=True))
-            if rows:
-                headers = [str(h) if h else "" for h in rows[0]]
-                for row in rows[1:]:
-                    d = {headers[i]: row[i] for i in range(min(len(headers), len(row)))}
-                    frota = str(d.get("Frota", "")).strip()
-                    if frota:
-                        case_data["_resumo_geral"][frota] = {
-                            "horasMotor": safe_float(d.get("Total Horas Motor (Diferença)")),
-                            "rpm": safe_float(d.get("RPM")),
-                            "temperaturaArrefecimento": safe_float(d.get("Média Temperatura líquido de arrefecimento do motor")),
-                            "temperaturaTransmissao": safe_float(d.get("Média Temperatura do óleo da transmissão")),
-                            "velocidadeMedia": safe_float(d.get("Velocidade Média")),
-                        }
-
-        # Aba "Resumo Diário" contém dados por frota POR DIA
-        if "Resumo Diário" in wb.sheetnames:
-            ws = wb["Resumo Diário"]
-            rows = list(ws.iter_rows(values_only=True))
-            if rows:
-                headers = [str(h) if h else "" for h in rows[0]]
-                for row in rows[1:]:
-                    d = {headers[i]: row[i] for i in range(min(len(headers), len(row)))}
-                    frota = str(d.get("Frota", "")).strip()
-                    data_val = d.get("Data", "")
-                    
-                    # Normalizar data
-                    if isinstance(data_val, datetime):
-                        data_key = data_val.strftime("%d/%m/%Y")
-                    elif isinstance(data_val, str):
-                        data_key = data_val.split(" ")[0] if " " in data_val else data_val
-                    else:
-                        continue
-
-                    if frota and data_key:
-                        case_data[data_key][frota] = {
-                            "horasMotor": safe_float(d.get("Total Horas Motor (Diferença)")),
-                            "rpm": safe_float(d.get("RPM")),
-                            "temperaturaArrefecimento": safe_float(d.get("Média Temperatura líquido de arrefecimento do motor")),
-                            "temperaturaTransmissao": safe_float(d.get("Média Temperatura do óleo da transmissão")),
-                            "velocidadeMedia": safe_float(d.get("Velocidade Média")),
-                        }
-
-        # Aba "Dados" contém intervalos detalhados com coordenadas
-        if "Dados" in wb.sheetnames:
-            ws = wb["Dados"]
-            rows = list(ws.iter_rows(values_only=True))
-            if rows:
-                headers = [str(h) if h else "" for h in rows[0]]
-                for row in rows[1:]:
-                    d = {headers[i]: row[i] for i in range(min(len(headers), len(row)))}
-                    frota = str(d.get("Frota", "")).strip()
-                    data_hora = d.get("Data Hora Local", "")
-                    
-                    if isinstance(data_hora, datetime):
-                        data_key = data_hora.strftime("%d/%m/%Y")
-                    elif isinstance(data_hora, str):
-                        data_key = data_hora.split(" ")[0] if " " in data_hora else ""
-                    else:
-                        continue
-
-                    if frota and data_key:
-                        if "_intervalos" not in case_data[data_key].get(frota, {}):
-                            if frota not in case_data[data_key]:
-                                case_data[data_key][frota] = {}
-                            case_data[data_key][frota].setdefault("_intervalos", [])
-                        
-                        case_data[data_key][frota]["_intervalos"].append({
-                            "inicio": str(data_hora),
-                            "duracao": safe_float(d.get("Duração")),
-                            "operacao": str(d.get("Descrição da Operação", "")),
-                            "grupo": str(d.get("Descrição do Grupo da Operação", "")),
-                            "lat": safe_float(d.get("Latitude")),
-                            "lon": safe_float(d.get("Longitude")),
-                        })
-
-        wb.close()
+        if cf == em_memoria:
+            print(f"  📂 Carregando Case: {os.path.basename(cf)} (abas em memória)")
+            abas = {nome: linhas_dataframe(df) for nome, df in abas_case.items() if nome in ABAS_CASE}
+        else:
+            print(f"  📂 Carregando Case: {os.path.basename(cf)}")
+            wb = openpyxl.load_workbook(cf, read_only=True)
+            abas = {
+                nome: list(wb[nome].iter_rows(values_only=True))
+                for nome in ABAS_CASE
+                if nome in wb.sheetnames
+            }
+            wb.close()
+        _carregar_abas_case(case_data, abas)
 
     return dict(case_data)
 
 
+def _carregar_abas_case(case_data, abas: dict):
+    """Preenche case_data a partir das linhas (cabeçalho + valores) de cada aba."""
+    # Aba "Resumo" contém dados por frota para o período inteiro
+    if "Resumo" in abas:
+        rows = abas["Resumo"]
+        if rows:
+            headers = [str(h) if h else "" for h in rows[0]]
+            for row in rows[1:]:
+                d = {headers[i]: row[i] for i in range(min(len(headers), len(row)))}
+                frota = chave_frota(d.get("Frota"))
+                if frota:
+                    case_data["_resumo_geral"][frota] = {
+                        "horasMotor": safe_float(d.get("Total Horas Motor (Diferença)")),
+                        "rpm": safe_float(d.get("RPM")),
+                        "temperaturaArrefecimento": safe_float(d.get("Média Temperatura líquido de arrefecimento do motor")),
+                        "temperaturaTransmissao": safe_float(d.get("Média Temperatura do óleo da transmissão")),
+                        "velocidadeMedia": safe_float(d.get("Velocidade Média")),
+                    }
+
+    # Aba "Resumo Diário" contém dados por frota POR DIA
+    if "Resumo Diário" in abas:
+        rows = abas["Resumo Diário"]
+        if rows:
+            headers = [str(h) if h else "" for h in rows[0]]
+            for row in rows[1:]:
+                d = {headers[i]: row[i] for i in range(min(len(headers), len(row)))}
+                frota = chave_frota(d.get("Frota"))
+                data_val = d.get("Data", "")
+                
+                # Normalizar data
+                if isinstance(data_val, datetime):
+                    data_key = data_val.strftime("%d/%m/%Y")
+                elif isinstance(data_val, str):
+                    data_key = data_val.split(" ")[0] if " " in data_val else data_val
+                else:
+                    continue
+
+                if frota and data_key:
+                    case_data[data_key][frota] = {
+                        "horasMotor": safe_float(d.get("Total Horas Motor (Diferença)")),
+                        "rpm": safe_float(d.get("RPM")),
+                        "temperaturaArrefecimento": safe_float(d.get("Média Temperatura líquido de arrefecimento do motor")),
+                        "temperaturaTransmissao": safe_float(d.get("Média Temperatura do óleo da transmissão")),
+                        "velocidadeMedia": safe_float(d.get("Velocidade Média")),
+                    }
+
+    # Aba "Dados" contém intervalos detalhados com coordenadas
+    if "Dados" in abas:
+        rows = abas["Dados"]
+        if rows:
+            headers = [str(h) if h else "" for h in rows[0]]
+            for row in rows[1:]:
+                d = {headers[i]: row[i] for i in range(min(len(headers), len(row)))}
+                frota = chave_frota(d.get("Frota"))
+                data_hora = d.get("Data Hora Local", "")
+                
+                if isinstance(data_hora, datetime):
+                    data_key = data_hora.strftime("%d/%m/%Y")
+                elif isinstance(data_hora, str):
+                    data_key = data_hora.split(" ")[0] if " " in data_hora else ""
+                else:
+                    continue
+
+                if frota and data_key:
+                    if "_intervalos" not in case_data[data_key].get(frota, {}):
+                        if frota not in case_data[data_key]:
+                            case_data[data_key][frota] = {}
+                        case_data[data_key][frota].setdefault("_intervalos", [])
+                    
+                    case_data[data_key][frota]["_intervalos"].append({
+                        "inicio": str(data_hora),
+                        "duracao": safe_float(d.get("Duração")),
+                        "operacao": str(d.get("Descrição da Operação", "")),
+                        "grupo": str(d.get("Descrição do Grupo da Operação", "")),
+                        "lat": safe_float(d.get("Latitude")),
+                        "lon": safe_float(d.get("Longitude")),
+                    })
+
+
 # ─── OPC (XLSX diário) ─────────────────────────────────────────────────────────
 
 def load_opc_daily(date_str: str) -> dict | None:
@@ -256,6 +330,7 @@ def load_opc_daily(date_str: str) -> dict | None:
 
 # ─── Consolidação ──────────────────────────────────────────────────────────────
 
+@instrumentar("7.consolidar_dia")
 def consolidar_dia(
     date_str: str,
     solinftec_raw: dict,
@@ -303,8 +378,19 @@ def consolidar_dia(
                     resultado["metadata"]["fontes"] = [f for f in fontes if f != "case"]
             if "dados_case" in resultado:
                 del resultado["dados_case"]
+        # Métricas de trajeto gravadas pela etapa 8 depois da última consolidação
+        dia = datetime.strptime(date_str, "%d-%m-%Y").date()
+        frotas = set(catalogo.frotas_do_json(resultado))
+        frotas.update(str(m.get("nome")) for m in resultado.get("metricas_trajeto") or [])
+        resultado["metricas_trajeto"] = metricas_trajeto.payload(
+            metricas_trajeto.carregar_dia(dia), resultado.get("media_velocidade"), frotas
+        )
         return resultado
 
+    # Mesma chave de frota nas duas fontes: o join com a Case é um acesso direto ao dict
+    if solinftec_raw:
+        solinftec_raw = {chave_frota(k): v for k, v in solinftec_raw.items()}
+
     # Coletar todas as frotas de todas as fontes
     all_frotas = set()
     if solinftec_raw:
@@ -333,7 +419,9 @@ def consolidar_dia(
     horas_por_frota = []
     producao_por_frota = []
 
-    operation_stats = defaultdict(float)  # Para ofensores
+    # Ofensores do dia (grão frente-dia), top-K por heap
+    operation_stats = topk.TopK(k=TOP_OFENSORES)
+    chave_ofensores = topk.chave_grao("frente-dia", {"frente": FRENTE, "data": date_str})
     total_producao = 0.0
     idx = 0
 
@@ -503,13 +591,7 @@ def consolidar_dia(
             grupo = intv.get("Grupo", "")
             descricao = intv.get("Descrição da Operação", "")
 
-            tipo = "Disponível"
-            if grupo == "PRODUTIVA":
-                tipo = "Produtivo"
-            elif grupo == "MANUTENÇÃO":
-                tipo = "Manutenção"
-            if descricao == "SEM APONTAMENTO":
-                tipo = "Falta de Informação"
+            tipo = DIM_OPERACOES.tipo_gantt(grupo, descricao)
 
             intervalos_operacao.append({
                 "equipamento": frota_id,
@@ -517,11 +599,12 @@ def consolidar_dia(
                 "inicio": time_hhmmss(start_str),
                 "duracaoHoras": round(dur, 6),
                 "fonte": "solinftec",
+                "registros": int(safe_float(intv.get("Registros", 1)) or 1),
             })
 
-            # Agregar ofensores
-            if grupo in ("IMPRODUTIVA", "MANUTENÇÃO"):
-                operation_stats[descricao] += dur
+            # Agregar ofensores (grupo de origem da operação, via dimensão)
+            if DIM_OPERACOES.eh_ofensor(grupo, descricao):
+                operation_stats.adicionar(chave_ofensores, descricao, dur)
 
         # Intervalos Case (se houver)
         case_intervals = case_extra.get("_intervalos", [])
@@ -530,11 +613,7 @@ def consolidar_dia(
             grupo = ci.get("grupo", "")
             operacao = ci.get("operacao", "")
             
-            tipo = "Disponível"
-            if "PRODUTIVA" in grupo.upper():
-                tipo = "Produtivo"
-            elif "MANUTENÇÃO" in grupo.upper() or "MANUTENCAO" in grupo.upper():
-                tipo = "Manutenção"
+            tipo = DIM_OPERACOES.tipo_gantt(grupo, operacao)
 
             intervalos_operacao.append({
                 "equipamento": frota_id,
@@ -544,12 +623,22 @@ def consolidar_dia(
                 "fonte": "case",
             })
 
-            if "IMPRODUTIVA" in grupo.upper() or "MANUTENÇÃO" in grupo.upper():
-                operation_stats[operacao] += dur
+            if DIM_OPERACOES.eh_ofensor(grupo, operacao):
+                operation_stats.adicionar(chave_ofensores, operacao, dur)
+
+    # Minutos por categoria e hora do dia (matriz gravada pela etapa 4)
+    dia = datetime.strptime(date_str, "%d-%m-%Y").date()
+    utilizacao = utilizacao_horaria.payload(utilizacao_horaria.periodo(dia, dia), sorted(all_frotas))
+    # Métricas do GPS gravadas pela etapa 8 (conferência da media_velocidade)
+    trajeto = metricas_trajeto.payload(metricas_trajeto.carregar_dia(dia), media_velocidade, all_frotas)
+
+    # Gantt: trechos seguidos do mesmo equipamento/tipo/fonte viram um só
+    if compactacao_intervalos.ativo():
+        intervalos_operacao = compactacao_intervalos.compactar_gantt(intervalos_operacao)
 
     # ── Ofensores (Top 5) ──
-    total_improd = sum(operation_stats.values())
-    ofensores = sorted(operation_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+    total_improd = operation_stats.total(chave_ofensores)
+    ofensores = operation_stats.maiores(chave_ofensores)
     ofensores_list = []
     for i, (op, tempo) in enumerate(ofensores):
         ofensores_list.append({
@@ -565,8 +654,8 @@ def consolidar_dia(
     if solinftec_raw:
         for frota_id, frota_data in solinftec_raw.items():
             for intv in frota_data.get("Intervalos", []):
-                descricao = intv.get("Descrição da Operação", "").upper()
-                if "LAVAGEM" in descricao:
+                descricao = intv.get("Descrição da Operação", "")
+                if DIM_OPERACOES.tem("operacao", descricao, "lavagem"):
                     dur = calc_duration_hours(intv["Início"], intv["Fim"])
                     lavagem.append({
                         "Data": date_display,
@@ -577,7 +666,7 @@ def consolidar_dia(
                         "Intervalo": "Intervalo 1",
                         "Tempo Total do Dia": round(dur, 6),
                     })
-                elif "ROLETE" in descricao or "GIRO DO ROLETE" in descricao:
+                elif DIM_OPERACOES.tem("operacao", descricao, "rolete"):
                     dur = calc_duration_hours(intv["Início"], intv["Fim"])
                     roletes.append({
                         "Data": date_display,
@@ -603,7 +692,7 @@ def consolidar_dia(
         "metadata": {
             "date": iso_date,
             "type": "cd_diario_novo",
-            "frente": "frente5",
+            "frente": FRENTE,
             "generated_at": datetime.now().isoformat(),
             "fontes": fontes_usadas,
         },
@@ -618,6 +707,8 @@ def consolidar_dia(
         "disponibilidade_mecanica": disponibilidade_mecanica,
         "horas_por_frota": horas_por_frota,
         "intervalos_operacao": intervalos_operacao,
+        "utilizacao_horaria": utilizacao,
+        "metricas_trajeto": trajeto,
         "ofensores": ofensores_list,
         "lavagem": lavagem,
         "roletes": roletes,
@@ -643,6 +734,7 @@ def consolidar_dia(
     return resultado
 
 
+@instrumentar("7.consolidar_tratores_case")
 def consolidar_tratores_case(
     date_str: str,
     case_data_by_date: dict,
@@ -667,7 +759,8 @@ def consolidar_tratores_case(
     horas_por_frota = []
     producao_por_frota = []
 
-    operation_stats = defaultdict(float)
+    operation_stats = topk.TopK(k=TOP_OFENSORES)
+    chave_ofensores = topk.chave_grao("frente-dia", {"frente": FRENTE, "data": date_str})
     total_producao = 0.0
     idx = 0
 
@@ -765,11 +858,7 @@ def consolidar_tratores_case(
             grupo = ci.get("grupo", "")
             operacao = ci.get("operacao", "")
 
-            tipo = "Disponível"
-            if "PRODUTIVA" in grupo.upper():
-                tipo = "Produtivo"
-            elif "MANUTENÇÃO" in grupo.upper() or "MANUTENCAO" in grupo.upper():
-                tipo = "Manutenção"
+            tipo = DIM_OPERACOES.tipo_gantt(grupo, operacao)
 
             intervalos_operacao.append({
                 "equipamento": frota_id,
@@ -779,11 +868,14 @@ def consolidar_tratores_case(
                 "fonte": "case",
             })
 
-            if "IMPRODUTIVA" in grupo.upper() or "MANUTENÇÃO" in grupo.upper():
-                operation_stats[operacao] += dur
+            if DIM_OPERACOES.eh_ofensor(grupo, operacao):
+                operation_stats.adicionar(chave_ofensores, operacao, dur)
+
+    if compactacao_intervalos.ativo():
+        intervalos_operacao = compactacao_intervalos.compactar_gantt(intervalos_operacao)
 
-    total_improd = sum(operation_stats.values())
-    ofensores = sorted(operation_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+    total_improd = operation_stats.total(chave_ofensores)
+    ofensores = operation_stats.maiores(chave_ofensores)
     ofensores_list = []
     for i, (op, tempo) in enumerate(ofensores):
         ofensores_list.append({
@@ -793,6 +885,9 @@ def consolidar_tratores_case(
             "porcentagem": round((tempo / total_improd * 100) if total_improd > 0 else 0, 2),
         })
 
+    dia = datetime.strptime(date_str, "%d-%m-%Y").date()
+    trajeto = metricas_trajeto.payload(metricas_trajeto.carregar_dia(dia), media_velocidade, case_frotas_ids)
+
     dados_case = {}
     for frota_id, case_info in case_frotas.items():
         if frota_id.startswith("_"):
@@ -805,7 +900,7 @@ def consolidar_tratores_case(
         "metadata": {
             "date": iso_date,
             "type": "tt_diario_novo",
-            "frente": "frente5",
+            "frente": FRENTE,
             "generated_at": datetime.now().isoformat(),
             "fontes": fontes_usadas,
         },
@@ -820,6 +915,7 @@ def consolidar_tratores_case(
         "disponibilidade_mecanica": disponibilidade_mecanica,
         "horas_por_frota": horas_por_frota,
         "intervalos_operacao": intervalos_operacao,
+        "metricas_trajeto": trajeto,
         "ofensores": ofensores_list,
         "lavagem": [],
         "roletes": [],
@@ -838,7 +934,19 @@ def consolidar_tratores_case(
 
 # ─── Main ──────────────────────────────────────────────────────────────────────
 
-def main():
+def salvar_json_dia(caminho: str, resultado: dict):
+    """Grava o JSON do dia; com ETL_INTERVALOS_COLUNAR=1 os intervalos vão no formato colunar."""
+    if intervalos_colunar.ativo():
+        catalogo.gravar_json(caminho, intervalos_colunar.compactar_relatorio(resultado), etapa="7", compacto=True)
+    else:
+        catalogo.gravar_json(caminho, resultado, etapa="7")
+
+
+def main(abas_case: dict | None = None, datas: set | None = None, arquivo_case: str | None = None):
+    """
+    `datas` (DD-MM-YYYY) restringe a consolidação a esses dias; `abas_case`
+    são as abas de `arquivo_case` já em memória (ver load_case_data).
+    """
     print("=" * 60)
     print("  🔄 Consolidação de JSON Unificado por Dia")
     print("=" * 60)
@@ -848,7 +956,7 @@ def main():
     dates = []
     for sf in solinftec_files:
         d = parse_date_from_filename(os.path.basename(sf))
-        if d:
+        if d and (datas is None or d in datas):
             dates.append(d)
 
     if not dates:
@@ -859,7 +967,7 @@ def main():
 
     # 2. Carregar dados Case (uma vez para todas as datas)
     print("\n  📦 Carregando dados Case IH...")
-    case_data = load_case_data()
+    case_data = load_case_data(abas_case, arquivo_case)
     print(f"     Datas Case disponíveis: {[k for k in case_data.keys() if not k.startswith('_')]}")
 
     # 3. Processar cada data
@@ -891,8 +999,7 @@ def main():
         # Salvar
         output_name = f"colhedora_frota_{date_str}.json"
         output_path = os.path.join(OUTPUT_DIR, output_name)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        salvar_json_dia(output_path, resultado)
 
         n_total = len(resultado.get("eficiencia_energetica", []))
         n_intervalos = len(resultado.get("intervalos_operacao", []))
@@ -905,8 +1012,7 @@ def main():
         os.makedirs(TRATORES_JSON_DIR, exist_ok=True)
         output_name_tratores = f"tratores_frota_{date_str}.json"
         output_path_tratores = os.path.join(TRATORES_JSON_DIR, output_name_tratores)
-        with open(output_path_tratores, "w", encoding="utf-8") as f:
-            json.dump(resultado_tratores, f, ensure_ascii=False, indent=2)
+        salvar_json_dia(output_path_tratores, resultado_tratores)
 
         n_total_tratores = len(resultado_tratores.get("eficiencia_energetica", []))
         n_intervalos_tratores = len(resultado_tratores.get("intervalos_operacao", []))
@@ -915,10 +1021,27 @@ def main():
         print(f"        {n_total_tratores} frotas, {n_intervalos_tratores} intervalos, {n_ofensores_tratores} ofensores")
         print(f"        Fontes: {resultado_tratores['metadata']['fontes']}")
 
+    DIM_OPERACOES.salvar()
+    REGISTRO_FROTAS.salvar()
+    # Depois de gravar: os JSONs Solinftec de entrada foram sobrescritos acima
+    registrar_entradas("7", PADROES_ENTRADA)
+
     print(f"\n{'=' * 60}")
     print(f"  ✅ Consolidação concluída! {len(dates)} dias processados.")
     print(f"{'=' * 60}")
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Consolida JSON unificado por dia.")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Só executa se houver entradas novas/alteradas desde a última consolidação",
+    )
+    args = parser.parse_args()
+
+    if args.check and not ha_entradas_novas("7", PADROES_ENTRADA):
+        print("⏭️  Nenhuma entrada nova para consolidar.")
+        sys.exit(0)
     main()
@@ -11,15 +11,9 @@ Data: 2026-02-04
 import os
 import json
 import re
-import zipfile
-import geopandas as gpd
-import pandas as pd
-import numpy as np
-import folium
+import sys
 from pathlib import Path
 from datetime import datetime, timedelta
-from folium import plugins
-from sklearn.cluster import DBSCAN
 
 # ============================================================================
 # CONFIGURAÇÕES (AJUSTE AQUI)
@@ -31,6 +25,32 @@ PASTA_JSONS = ETL_DIR / "dados" / "separados" / "json" / "colhedora" / "frotas"
 PASTA_ZIPS = ETL_DIR / "dados"
 PASTA_SAIDA = ETL_DIR / "mapas"
 
+if str(ETL_DIR) not in sys.path:
+    sys.path.insert(0, str(ETL_DIR))
+from utils import arquivos_zip, catalogo, compressao, intervalos_colunar, juncao_temporal, metricas_trajeto, shapes_pontos
+from utils.dependencias import disponivel, importar_tardio
+from utils.entradas import ha_entradas_novas, registrar_entradas
+from utils.instrumentacao import instrumentar
+from utils.registro_frotas import obter_registro
+
+# Dependências pesadas: importadas no primeiro uso (folium só ao desenhar;
+# sklearn dentro de separar_por_clusters). Os shapes são lidos por
+# utils/shapes_pontos.py, sem geopandas: os pontos ficam em colunas lat/lon.
+pd = importar_tardio("pandas")
+np = importar_tardio("numpy")
+folium = importar_tardio("folium")
+
+# Entradas observadas pelo --check
+PADROES_ENTRADA = [
+    PASTA_JSONS / "*.json",
+    PASTA_ZIPS / "Colhedora_*.zip",
+    PASTA_ZIPS / "Consolidado_Case_*.xlsx",
+]
+
+# Campos do DBF dos shapes convertidos na leitura (além de lat/lon/timestamp);
+# IsoTime/Time ficam de fora: texto por ponto é o mais caro de converter
+COLUNAS_SHAPE = ("Machine", "Heading", "Speed_kmh")
+
 # --- VISUALIZAÇÃO ---
 # Cores para diferenciar frotas no mapa
 CORES_FROTAS = [
@@ -48,13 +68,23 @@ CORES_FROTAS = [
 ESPESSURA_LINHA_PADRAO = 2      # Espessura inicial das linhas (pixels)
 OPACIDADE_LINHA = 0.8           # Transparência da linha (0.0 a 1.0)
 
+# Cor do trajeto pelo estado do intervalo Solinftec em que cada ponto cai
+# (pontos sem intervalo ficam com a cor da frota)
+COLORIR_POR_ESTADO = True
+CORES_ESTADO = {
+    'Produtivo': '#2ecc71',
+    'Disponível': '#f39c12',
+    'Manutenção': '#e74c3c',
+    'Falta de Informação': '#95a5a6',
+}
+
 # Configurações de Marcadores
 RAIO_MARCADOR_INICIO = 6        # Tamanho do pontinho branco no início
 COR_MARCADOR_INICIO = 'green'   # Cor do ícone de Play
 COR_MARCADOR_FIM = 'red'        # Cor do ícone de Stop
 
 # --- CLUSTERING (SEPARAÇÃO DE ÁREAS) ---
-USAR_CLUSTERING = True          # Se True, separa mapas por áreas distantes
+USAR_CLUSTERING = os.environ.get("ETL_MAPAS_CLUSTERING", "1") != "0"  # Se True, separa mapas por áreas distantes (ETL_MAPAS_CLUSTERING=0 desliga)
 DISTANCIA_MAX_CLUSTER_METROS = 5000  # Distância máxima (5km) para considerar mesma área
 MIN_PONTOS_CLUSTER = 10         # Mínimo de pontos para formar uma área válida
 
@@ -65,28 +95,40 @@ MIN_PONTOS_CLUSTER = 10         # Mínimo de pontos para formar uma área válid
 
 def normalizar_id_frota(identificador):
     """
-    Extrai número do identificador de frota
+    Chave canônica da frota (utils/registro_frotas)
     
     Args:
-        identificador: String como "MB547", "235", "Colhedora_MB469.zip"
+        identificador: String como "MB547", "235", "Colhedora_MB469.zip", 547.0
     
     Returns:
-        str: Número normalizado (ex: "547")
+        str: Número normalizado (ex: "547") ou None
     """
-    # Remove tudo exceto dígitos
-    numeros = re.findall(r'\d+', str(identificador))
-    if numeros:
-        # Pega o maior número (mais provável de ser o ID)
-        return max(numeros, key=len)
-    return None
+    # Nome de arquivo sem prefixo: o maior bloco de dígitos é o ID (regra antiga desta etapa)
+    return obter_registro().chave(identificador, maior_bloco=True)
+
+
+def dados_por_equipamento(consolidado):
+    """{frota: {"intervalos_operacao": [...]}} a partir do JSON consolidado da etapa 7."""
+    intervalos = consolidado.get("intervalos_operacao")
+    if intervalos_colunar.eh_colunar(intervalos):
+        intervalos = intervalos_colunar.decodificar(intervalos)
+    por_frota = {}
+    for intervalo in intervalos or []:
+        if intervalo.get("fonte", "solinftec") != "solinftec":
+            continue
+        frota = por_frota.setdefault(str(intervalo.get("equipamento")), {"intervalos_operacao": []})
+        frota["intervalos_operacao"].append(intervalo)
+    return por_frota
 
 
-def ler_jsons_frotas(pasta_json):
+@instrumentar("8.ler_jsons_frotas")
+def ler_jsons_frotas(pasta_json, datas=None):
     """
     Lê todos os arquivos JSON de frotas e agrupa por ID
     
     Args:
         pasta_json: Path para pasta com JSONs diários
+        datas: set de date; se informado, só abre os JSONs desses dias
     
     Returns:
         dict: {frota_id: {data: dados}}
@@ -109,13 +151,20 @@ def ler_jsons_frotas(pasta_json):
         
         data_str = match.group(1)
         data_obj = datetime.strptime(data_str, "%d-%m-%Y").date()
+        if datas is not None and data_obj not in datas:
+            continue
         
         try:
             with open(arquivo, 'r', encoding='utf-8') as f:
                 dados = json.load(f)
             
+            # JSON já consolidado pela etapa 7: intervalos_operacao de cada equipamento
+            if "intervalos_operacao" in dados:
+                dados = dados_por_equipamento(dados)
+            
             # Cada JSON tem múltiplas frotas
             for frota_id, info_frota in dados.items():
+                frota_id = normalizar_id_frota(frota_id) or frota_id
                 if frota_id not in frotas_dados:
                     frotas_dados[frota_id] = {}
                 
@@ -132,6 +181,7 @@ def ler_jsons_frotas(pasta_json):
     return frotas_dados
 
 
+@instrumentar("8.ler_shapes_frotas")
 def ler_shapes_frotas(pasta_zips):
     """
     Lê arquivos ZIP com shapefiles e organiza por frota
@@ -140,7 +190,7 @@ def ler_shapes_frotas(pasta_zips):
         pasta_zips: Path para pasta com ZIPs
     
     Returns:
-        dict: {frota_id: GeoDataFrame consolidado}
+        dict: {frota_id: DataFrame consolidado (lat, lon, timestamp, campos do DBF)}
     """
     print("\n🗺️  Lendo Shapefiles de frotas...")
     shapes_frotas = {}
@@ -149,10 +199,10 @@ def ler_shapes_frotas(pasta_zips):
         print(f"❌ Pasta não encontrada: {pasta_zips}")
         return shapes_frotas
     
-    arquivos_zip = list(pasta_zips.glob("Colhedora_*.zip"))
-    print(f"  Encontrados {len(arquivos_zip)} arquivos ZIP")
+    zips_frotas = list(pasta_zips.glob("Colhedora_*.zip"))
+    print(f"  Encontrados {len(zips_frotas)} arquivos ZIP")
     
-    for arquivo_zip in arquivos_zip:
+    for arquivo_zip in zips_frotas:
         # Extrai ID da frota do nome do arquivo
         frota_id = normalizar_id_frota(arquivo_zip.name)
         if not frota_id:
@@ -161,32 +211,20 @@ def ler_shapes_frotas(pasta_zips):
         print(f"\n  📦 Processando {arquivo_zip.name} (Frota {frota_id})...")
         
         try:
-            # Lê diretamente do ZIP usando geopandas
-            # Geopandas pode ler ZIPs com shapefiles automaticamente
+            # Lê os shapefiles direto dos bytes do ZIP (sem extrair, sem geopandas);
+            # IsoTime/Time viram a coluna timestamp no próprio leitor
             gdfs = []
             
-            # Lista todos os .shp dentro do ZIP
-            with zipfile.ZipFile(arquivo_zip, 'r') as zip_ref:
-                shapefiles = [name for name in zip_ref.namelist() if name.endswith('.shp')]
-            
-            # Lê cada shapefile
-            for shapefile_path in shapefiles:
-                full_path = f"zip://{arquivo_zip}!{shapefile_path}"
-                try:
-                    gdf = gpd.read_file(full_path)
-                    
-                    # Converte colunas de tempo para datetime
-                    if 'IsoTime' in gdf.columns:
-                        gdf['timestamp'] = pd.to_datetime(gdf['IsoTime'])
-                    elif 'Time' in gdf.columns:
-                        gdf['timestamp'] = pd.to_datetime(gdf['Time'], format='%m/%d/%Y %I:%M:%S %p')
+            with arquivos_zip.abrir_zip(arquivo_zip) as zip_ref:
+                for shapefile_path in zip_ref.nomes(('.shp',)):
+                    try:
+                        gdf = shapes_pontos.ler_membro(zip_ref, shapefile_path, colunas=COLUNAS_SHAPE)
+                        gdfs.append(gdf.rename(columns={'x': 'lon', 'y': 'lat'}))
+                        # print(f"    ✓ {Path(shapefile_path).name}: {len(gdf)} pontos")
                     
-                    gdfs.append(gdf)
-                    # print(f"    ✓ {Path(shapefile_path).name}: {len(gdf)} pontos")
-                
-                except Exception as e:
-                    print(f"    ⚠️ Erro ao ler {shapefile_path}: {e}")
-                    continue
+                    except Exception as e:
+                        print(f"    ⚠️ Erro ao ler {shapefile_path}: {e}")
+                        continue
             
             if gdfs:
                 # Concatena todos os shapefiles da frota
@@ -199,15 +237,16 @@ def ler_shapes_frotas(pasta_zips):
     
     return shapes_frotas
     
+@instrumentar("8.ler_dados_case")
 def ler_dados_case(pasta_dados):
     """
-    Lê o arquivo consolidado da Case IH (Excel) e converte para GeoDataFrame.
+    Lê o arquivo consolidado da Case IH (Excel), com os pontos em colunas lat/lon.
     
     Args:
         pasta_dados: Path para pasta com o Excel consolidado
         
     Returns:
-        dict: {frota_id: GeoDataFrame}
+        dict: {frota_id: DataFrame}
     """
     print("\n🚜 Lendo dados Case IH (Excel)...")
     dados_case = {}
@@ -257,11 +296,10 @@ def ler_dados_case(pasta_dados):
         df['timestamp'] = pd.to_datetime(df['Data/Hora'], dayfirst=True, errors='coerce')
         df = df.dropna(subset=['timestamp', 'Latitude', 'Longitude'])
         
-        # Converter para GeoDataFrame
-        gdf_total = gpd.GeoDataFrame(
-            df, 
-            geometry=gpd.points_from_xy(df['Longitude'], df['Latitude'])
-        )
+        # Mesmas colunas de coordenada dos shapes
+        df['lat'] = pd.to_numeric(df['Latitude'], errors='coerce')
+        df['lon'] = pd.to_numeric(df['Longitude'], errors='coerce')
+        gdf_total = df
         
         # Agrupar por Frota
         frotas = df['Frota'].unique()
@@ -270,7 +308,7 @@ def ler_dados_case(pasta_dados):
         for frota in frotas:
             gdf_frota = gdf_total[gdf_total['Frota'] == frota].copy()
             # Normalizar ID (string)
-            frota_id = str(frota).replace('.0', '')
+            frota_id = normalizar_id_frota(frota) or str(frota)
             dados_case[frota_id] = gdf_frota
             # print(f"    - Frota {frota_id}: {len(gdf_frota)} pontos")
             
@@ -291,7 +329,7 @@ def criar_mapeamento_frotas(frotas_json, frotas_shapes):
     
     Args:
         frotas_json: dict com dados JSON
-        frotas_shapes: dict com GeoDataFrames
+        frotas_shapes: dict com DataFrames de pontos (lat/lon)
     
     Returns:
         dict: {frota_id: {'json': dados, 'shape': gdf}}
@@ -326,7 +364,9 @@ def criar_mapeamento_frotas(frotas_json, frotas_shapes):
 
 def filtrar_coordenadas_por_data(gdf, data_alvo, intervalos=None):
     """
-    Filtra coordenadas que são do dia específico (ignora hora por enquanto para garantir dados)
+    Filtra coordenadas que são do dia específico (ignora hora por enquanto para garantir dados).
+    Com `intervalos` (juncao_temporal.intervalos_frota), cada ponto recebe
+    grupo/operacao/estado do intervalo Solinftec que contém o seu instante.
     """
     if 'timestamp' not in gdf.columns:
         print("      ⚠️ Erro: GDF sem coluna timestamp")
@@ -347,6 +387,9 @@ def filtrar_coordenadas_por_data(gdf, data_alvo, intervalos=None):
         gdf.drop(columns=['data_temp'], inplace=True)
         filtrado.drop(columns=['data_temp'], inplace=True)
         
+        if intervalos is not None and len(intervalos) > 0:
+            filtrado = juncao_temporal.rotular(filtrado, intervalos)
+        
         return filtrado
         
     except Exception as e:
@@ -391,6 +434,19 @@ def criar_mapa_base(centro_lat, centro_lon, dados_bounds=None):
     return mapa
 
 
+def area_do_cluster(id_area, nome, pontos):
+    """Área com bounds ([[lat_min, lon_min], [lat_max, lon_max]]) e centro calculados dos pontos."""
+    lats = pontos[:, 0]
+    lons = pontos[:, 1]
+    return {
+        'id': id_area,
+        'nome': nome,
+        'bounds': [[np.min(lats), np.min(lons)], [np.max(lats), np.max(lons)]],
+        'centro': [np.mean(lats), np.mean(lons)],
+        'pontos': pontos
+    }
+
+@instrumentar("8.separar_por_clusters")
 def separar_por_clusters(mapeamento_dia_filtrado):
     """
     Identifica clusters geográficos nos dados filtrados do dia.
@@ -405,7 +461,7 @@ def separar_por_clusters(mapeamento_dia_filtrado):
         if len(gdf) == 0: continue
         
         # Downsample para clustering se for muito grande
-        coords = np.array(list(zip(gdf.geometry.y, gdf.geometry.x)))
+        coords = gdf[['lat', 'lon']].to_numpy(dtype=float)
         total_pts = len(coords)
         
         if total_pts > 10000:
@@ -425,7 +481,7 @@ def separar_por_clusters(mapeamento_dia_filtrado):
     
     if not USAR_CLUSTERING:
         # Retorna cluster único (todos os pontos)
-        return [{'id': 0, 'nome': 'Geral', 'pontos': todos_pontos_concat, 'bounds': None, 'centro': [np.mean(todos_pontos_concat[:,0]), np.mean(todos_pontos_concat[:,1])]}]
+        return [area_do_cluster(0, 'Geral', todos_pontos_concat)]
 
     # DBSCAN
     # Converte max_dist (metros) para radianos para uso com haversine
@@ -435,6 +491,7 @@ def separar_por_clusters(mapeamento_dia_filtrado):
     epsilon = (DISTANCIA_MAX_CLUSTER_METROS / 1000.0) / kms_per_radian
     
     # Executa clustering (coordenadas em radianos para haversine)
+    from sklearn.cluster import DBSCAN
     coords_rad = np.radians(todos_pontos_concat)
     db = DBSCAN(eps=epsilon, min_samples=MIN_PONTOS_CLUSTER, metric='haversine', algorithm='ball_tree').fit(coords_rad)
     labels = db.labels_
@@ -443,7 +500,7 @@ def separar_por_clusters(mapeamento_dia_filtrado):
     if n_clusters == 0:
         # Se só restar ruído ou algo estranho, retorna tudo como um cluster
         print("      ⚠️ Apenas ruído detectado ou cluster único. Gerando área única.")
-        return [{'id': 0, 'nome': 'Geral', 'pontos': todos_pontos_concat, 'bounds': None, 'centro': [np.mean(todos_pontos_concat[:,0]), np.mean(todos_pontos_concat[:,1])]}]
+        return [area_do_cluster(0, 'Geral', todos_pontos_concat)]
 
     print(f"      ✨ {n_clusters} áreas distintas identificadas.")
     
@@ -458,18 +515,7 @@ def separar_por_clusters(mapeamento_dia_filtrado):
             
         # Pega pontos deste cluster original (não radianos)
         pontos_cluster = todos_pontos_concat[labels == label]
-        
-        # Calcula bounds e centro
-        lats = pontos_cluster[:, 0]
-        lons = pontos_cluster[:, 1]
-        
-        clusters_info.append({
-            'id': int(label),
-            'nome': f"Area {label + 1}",
-            'bounds': [[np.min(lats), np.min(lons)], [np.max(lats), np.max(lons)]],
-            'centro': [np.mean(lats), np.mean(lons)],
-            'pontos': pontos_cluster
-        })
+        clusters_info.append(area_do_cluster(int(label), f"Area {label + 1}", pontos_cluster))
         
     return clusters_info
 
@@ -484,12 +530,29 @@ def obter_cor_frota(frota_id, cores_persistentes):
         cores_persistentes[frota_id] = gerar_cor_aleatoria()
     return cores_persistentes[frota_id]
 
+def trechos_por_estado(gdf):
+    """
+    [(início, fim, estado)] em posições de linha: sequências de pontos com o
+    mesmo estado, cada uma incluindo o primeiro ponto da seguinte para o
+    trajeto não ficar com buracos. Sem rótulos: um trecho só (estado None).
+    """
+    n = len(gdf)
+    if not COLORIR_POR_ESTADO or 'estado' not in gdf.columns or gdf['estado'].isna().all():
+        return [(0, n, None)]
+    estados = gdf['estado'].fillna('').to_numpy(dtype=object)
+    cortes = np.flatnonzero(estados[1:] != estados[:-1]) + 1
+    inicios = np.concatenate([[0], cortes])
+    fins = np.concatenate([cortes, [n]])
+    return [(int(a), int(min(b + 1, n)), estados[a] or None) for a, b in zip(inicios, fins)]
+
+
+@instrumentar("8.criar_mapa_padrao")
 def criar_mapa_padrao(dados_frotas, titulo_legenda, nome_arquivo, pasta_saida, cores_persistentes):
     """
     Função genérica para criar um mapa com n frotas.
     
     Args:
-        dados_frotas: list of dicts {'frota_id': str, 'gdf': GeoDataFrame, 'fonte': str}
+        dados_frotas: list of dicts {'frota_id': str, 'gdf': DataFrame com lat/lon, 'fonte': str}
         titulo_legenda: str (Ex: "Dia 05/10/2025" ou "Período Completo")
         nome_arquivo: str
         pasta_saida: Path
@@ -506,7 +569,7 @@ def criar_mapa_padrao(dados_frotas, titulo_legenda, nome_arquivo, pasta_saida, c
     for item in dados_frotas:
         gdf = item['gdf']
         if len(gdf) > 0:
-            todos_pontos.append(np.array(list(zip(gdf.geometry.y, gdf.geometry.x))))
+            todos_pontos.append(gdf[['lat', 'lon']].to_numpy(dtype=float))
             
     if not todos_pontos:
         return None
@@ -521,6 +584,7 @@ def criar_mapa_padrao(dados_frotas, titulo_legenda, nome_arquivo, pasta_saida, c
     mapa.fit_bounds(bounds, padding=(30, 30))
     
     frotas_na_legenda = []
+    estados_na_legenda = set()
     
     for item in dados_frotas:
         frota_id = item['frota_id']
@@ -529,18 +593,22 @@ def criar_mapa_padrao(dados_frotas, titulo_legenda, nome_arquivo, pasta_saida, c
         
         cor = obter_cor_frota(frota_id, cores_persistentes)
         
-        coords = gdf.geometry.apply(lambda g: [g.y, g.x]).tolist()
+        coords = gdf[['lat', 'lon']].to_numpy(dtype=float).tolist()
         
         frotas_na_legenda.append({'id': frota_id, 'cor': cor, 'fonte': fonte})
         
-        # Linha
-        folium.PolyLine(
-            locations=coords,
-            color=cor,
-            weight=4,
-            opacity=0.8,
-            tooltip=f"Frota {frota_id} ({fonte})"
-        ).add_to(mapa)
+        # Linha: um trecho por sequência de pontos no mesmo estado (ou a frota inteira)
+        for inicio, fim, estado in trechos_por_estado(gdf):
+            cor_trecho = CORES_ESTADO.get(estado, cor)
+            if estado in CORES_ESTADO:
+                estados_na_legenda.add(estado)
+            folium.PolyLine(
+                locations=coords[inicio:fim],
+                color=cor_trecho,
+                weight=4,
+                opacity=0.8,
+                tooltip=f"Frota {frota_id} ({fonte})" + (f" - {estado}" if estado else "")
+            ).add_to(mapa)
         
         # Marcadores Inicio/Fim
         if coords:
@@ -557,6 +625,15 @@ def criar_mapa_padrao(dados_frotas, titulo_legenda, nome_arquivo, pasta_saida, c
         </div>
         """
     
+    for estado, cor_estado in CORES_ESTADO.items():
+        if estado in estados_na_legenda:
+            html_legenda_itens += f"""
+        <div style="display: flex; align-items: center; margin-bottom: 5px;">
+            <div style="width: 15px; height: 4px; background-color: {cor_estado}; margin-right: 8px;"></div>
+            <span style="font-family: sans-serif; font-size: 12px; color: #333;">{estado}</span>
+        </div>
+        """
+    
     html_legenda = f"""
     <div style="
         position: fixed; bottom: 20px; right: 20px; z-index: 9999; 
@@ -572,6 +649,7 @@ def criar_mapa_padrao(dados_frotas, titulo_legenda, nome_arquivo, pasta_saida, c
     # Salvar
     path_arq = pasta_saida / nome_arquivo
     mapa.save(str(path_arq))
+    compressao.agendar(path_arq)
     print(f"      ✅ Salvo: {nome_arquivo}")
     return path_arq
 
@@ -622,8 +700,9 @@ def gerar_mapas_padronizados(mapeamento_solinftec, dados_case, pasta_saida, filt
         for frota_id, dados in mapeamento_solinftec.items():
             # Verifica JSON (se operou no dia)
             if dia_alvo in dados['json']:
-                # Recorta Shape
-                gdf_dia = filtrar_coordenadas_por_data(dados['shape'], dia_alvo)
+                # Recorta Shape e rotula cada ponto com o intervalo de operação do dia
+                intervalos = juncao_temporal.intervalos_frota(dados['json'][dia_alvo], dia_alvo)
+                gdf_dia = filtrar_coordenadas_por_data(dados['shape'], dia_alvo, intervalos)
                 if len(gdf_dia) > 0:
                     dados_dia.append({'frota_id': frota_id, 'gdf': gdf_dia, 'fonte': 'Solinftec'})
         
@@ -658,8 +737,8 @@ def gerar_mapas_padronizados(mapeamento_solinftec, dados_case, pasta_saida, filt
                 gdf = item['gdf']
                 # Clip rápido (bounding box)
                 mask = (
-                    (gdf.geometry.y >= min_lat - margem) & (gdf.geometry.y <= max_lat + margem) &
-                    (gdf.geometry.x >= min_lon - margem) & (gdf.geometry.x <= max_lon + margem)
+                    (gdf['lat'] >= min_lat - margem) & (gdf['lat'] <= max_lat + margem) &
+                    (gdf['lon'] >= min_lon - margem) & (gdf['lon'] <= max_lon + margem)
                 )
                 gdf_cut = gdf[mask]
                 if len(gdf_cut) > 0:
@@ -719,8 +798,8 @@ def gerar_mapas_padronizados(mapeamento_solinftec, dados_case, pasta_saida, filt
             for item in dados_periodo:
                  gdf = item['gdf']
                  mask = (
-                    (gdf.geometry.y >= min_lat - margem) & (gdf.geometry.y <= max_lat + margem) &
-                    (gdf.geometry.x >= min_lon - margem) & (gdf.geometry.x <= max_lon + margem)
+                    (gdf['lat'] >= min_lat - margem) & (gdf['lat'] <= max_lat + margem) &
+                    (gdf['lon'] >= min_lon - margem) & (gdf['lon'] <= max_lon + margem)
                  )
                  gdf_cut = gdf[mask]
                  if len(gdf_cut) > 0:
@@ -744,7 +823,15 @@ def gerar_mapas_padronizados(mapeamento_solinftec, dados_case, pasta_saida, filt
     json_index_path = pasta_saida / "index_mapas.json"
     with open(json_index_path, 'w', encoding='utf-8') as f:
         json.dump(mapas_gerados, f, indent=4)
+    compressao.agendar(json_index_path)
     print(f"\n  index_mapas.json gerado com {len(mapas_gerados)} mapas.")
+
+    for mapa in mapas_gerados:
+        catalogo.registrar(
+            pasta_saida / mapa['arquivo'], etapa="8", categoria="mapas",
+            tipo=mapa['area'], periodo="diario" if mapa['tipo'] == 'DIARIO' else "periodo",
+            data=mapa['data'] if mapa['tipo'] == 'DIARIO' else None, frotas=mapa['frotas'],
+        )
     
     return [Path(m['arquivo']) for m in mapas_gerados]
 
@@ -752,28 +839,66 @@ def gerar_mapas_padronizados(mapeamento_solinftec, dados_case, pasta_saida, filt
 
 
 
+# ============================================================================
+# MÓDULO 4: MÉTRICAS DE TRAJETO
+# ============================================================================
+
+@instrumentar("8.metricas_trajeto")
+def gravar_metricas_trajeto(frotas_shapes, dados_case, filtro_datas=None):
+    """
+    Distância, velocidade, paradas e lacunas por frota-dia a partir dos
+    pontos GPS (shapes OPC + Case), gravadas em parciais/trajetos; a etapa 7
+    as junta ao JSON do dia, ao lado da media_velocidade que elas conferem.
+    """
+    partes = []
+    for origem in (frotas_shapes, dados_case):
+        for frota_id, gdf in origem.items():
+            if 'timestamp' not in gdf.columns or gdf.empty:
+                continue
+            partes.append(pd.DataFrame({
+                'frota': frota_id,
+                'timestamp': gdf['timestamp'].to_numpy(),
+                'lat': gdf['lat'].to_numpy(),
+                'lon': gdf['lon'].to_numpy(),
+            }))
+    if not partes:
+        return
+
+    print("\n📏 Calculando métricas de trajeto...")
+    # Shapes (IsoTime com fuso) e Case (hora local) juntos: passa tudo para hora local antes
+    for parte in partes:
+        parte['timestamp'] = juncao_temporal.hora_local(parte['timestamp'])
+    metricas = metricas_trajeto.calcular(pd.concat(partes, ignore_index=True))
+    if filtro_datas is not None and not metricas.empty:
+        metricas = metricas[metricas['data'].isin(filtro_datas)]
+    dias = metricas_trajeto.salvar(metricas)
+    # Os JSONs consolidados não são regravados aqui: a etapa 7 acrescenta o bloco
+    # metricas_trajeto a partir destes parciais na próxima consolidação
+    print(f"  ✅ {len(metricas)} frota-dias em {len(dias)} dia(s)")
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
 
-def main():
+def main(filtro_datas=None):
+    """`filtro_datas` (set de date) substitui o período do config_automacao.json."""
     print("=" * 80)
     print("🚜 GERADOR DE MAPAS DE FROTAS (DIÁRIO)")
     print("=" * 80)
     
-    # Validação do sklearn
-    try:
-        from sklearn.cluster import DBSCAN
-    except ImportError:
+    # Validação do sklearn (só necessário para o clustering)
+    if USAR_CLUSTERING and not disponivel("sklearn"):
         print("\n❌ ERRO CRÍTICO: scikit-learn não instalado.")
         print("   Por favor execute: pip install scikit-learn")
         return
 
     # 1. Carregar configuração e definir filtro de datas
     config_path = ETL_DIR / "utils" / "config_automacao.json"
-    filtro_datas = None
     
-    if config_path.exists():
+    if filtro_datas is not None:
+        print(f"📅 Datas informadas: {', '.join(d.strftime('%d/%m/%Y') for d in sorted(filtro_datas))}")
+    elif config_path.exists():
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
@@ -820,9 +945,10 @@ def main():
         print("⚠️ Arquivo de configuração não encontrado. Processando tudo.")
 
     # 2. Carregar dados
-    frotas_json = ler_jsons_frotas(PASTA_JSONS)
+    frotas_json = ler_jsons_frotas(PASTA_JSONS, filtro_datas)
     frotas_shapes = ler_shapes_frotas(PASTA_ZIPS)
     dados_case = ler_dados_case(PASTA_ZIPS) # Case fica na mesma pasta de dados brutos/zips
+    gravar_metricas_trajeto(frotas_shapes, dados_case, filtro_datas)
     
     if not frotas_json and not dados_case:
         print("\n❌ Nenhum dado de evento (JSON) ou dado Case encontrado!")
@@ -842,6 +968,7 @@ def main():
     
     # 4. Gerar mapas padronizados
     arquivos = gerar_mapas_padronizados(mapeamento_solinftec, dados_case, PASTA_SAIDA, filtro_datas=filtro_datas)
+    obter_registro().salvar()
     
     if arquivos:
         print("\n" + "=" * 80)
@@ -858,5 +985,19 @@ def main():
     else:
         print("\n⚠️ Nenhum mapa gerado.")
 
+    registrar_entradas("8", PADROES_ENTRADA)
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera mapas diários das frotas.")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Só executa se houver entradas novas/alteradas desde a última geração",
+    )
+    args = parser.parse_args()
+
+    if args.check and not ha_entradas_novas("8", PADROES_ENTRADA):
+        print("⏭️  Nenhuma entrada nova para mapear.")
+        sys.exit(0)
     main()
@@ -0,0 +1,423 @@
+"""
+9_ApiRelatorios.py
+
+API HTTP local (somente leitura) sobre os JSONs gerados pelas etapas 5 e 7
+em dados/separados/json/<categoria>/<tipo>/<periodo>/.
+
+- Cache LRU em memória dos JSONs já parseados, invalidado pelo mtime/tamanho
+  do arquivo (a etapa 7 sobrescreve os diários no lugar).
+- ETag por representação (arquivo + parâmetros) e resposta 304 para
+  If-None-Match, então o navegador só baixa de novo quando o arquivo muda.
+- Projeção de campos e paginação/janela de horário dos intervalos, para cada
+  gráfico buscar só o que desenha.
+
+Rotas:
+    GET /api/relatorios
+        Lista os arquivos disponíveis.
+    GET /api/relatorios/<categoria>/<tipo>/<periodo>/<arquivo>
+        <arquivo> aceita o nome completo ou só a data/período, como nas URLs
+        do frontend (ex.: colhedora/frotas/diario/06-10-2025).
+    GET /api/catalogo?data=06-10-2025&frota=235
+        Consulta o catálogo de artefatos (utils/catalogo.py); filtros
+        categoria, tipo, periodo, formato, data e frota.
+    GET /mapas/<arquivo>
+        Mapas HTML e index_mapas.json gerados pela etapa 8.
+
+Compressão: com Accept-Encoding br/gzip, o arquivo inteiro sai direto da
+cópia .br/.gz gravada pelas etapas (ETL_COMPRESSAO, utils/compressao.py);
+respostas com projeção/filtros são comprimidas na hora.
+
+Parâmetros:
+    campos=eficiencia_energetica,metadata   chaves de primeiro nível
+    equipamento=235                          filtra os intervalos
+    tipo=Manutenção                          filtra os intervalos
+    de=06:00&ate=12:00                       intervalos que tocam a janela
+    pagina=1&por_pagina=500                  pagina os intervalos
+    lista=intervalos_operacao                lista filtrada (padrão)
+    formato=colunar | linhas                 intervalos em arrays paralelos
+                                             (utils/intervalos_colunar.py) ou
+                                             como lista de objetos
+
+Uso:
+    python scripts/9_ApiRelatorios.py --porta 8765
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_JSON = os.path.join(BASE_DIR, "dados", "separados", "json")
+
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from utils import catalogo, compressao, intervalos_colunar
+
+LISTA_PADRAO = "intervalos_operacao"
+POR_PAGINA_MAX = 5000
+CACHE_MB_PADRAO = 256
+PASTA_MAPAS = os.path.join(BASE_DIR, "mapas")
+# Respostas montadas na hora (projeção/filtros): nível baixo, prioriza latência
+NIVEL_COMPRESSAO_NA_HORA = {"gz": 5, "br": 4}
+
+
+# ─── Cache ─────────────────────────────────────────────────────────────────────
+
+class CacheJson:
+    """
+    LRU de JSONs parseados, limitado pelo tamanho somado dos arquivos em disco.
+    Cada acesso confere o stat do arquivo; se mtime ou tamanho mudaram, relê.
+    """
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()  # caminho -> (assinatura, dados)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, caminho):
+        """(assinatura, dados) do arquivo; assinatura = (mtime_ns, tamanho)."""
+        st = os.stat(caminho)
+        assinatura = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            item = self._itens.get(caminho)
+            if item and item[0] == assinatura:
+                self._itens.move_to_end(caminho)
+                self.acertos += 1
+                return item
+
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+
+        with self._lock:
+            self.faltas += 1
+            antigo = self._itens.pop(caminho, None)
+            if antigo:
+                self._bytes -= antigo[0][1]
+            self._itens[caminho] = (assinatura, dados)
+            self._bytes += assinatura[1]
+            while self._bytes > self.limite_bytes and len(self._itens) > 1:
+                _, (assin, _) = self._itens.popitem(last=False)
+                self._bytes -= assin[1]
+        return assinatura, dados
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "arquivos": len(self._itens),
+                "mb": round(self._bytes / (1024 * 1024), 1),
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+            }
+
+
+# ─── Arquivos ──────────────────────────────────────────────────────────────────
+
+def _segmento_valido(segmento):
+    return bool(segmento) and segmento not in (".", "..") and "/" not in segmento and "\\" not in segmento
+
+
+def resolver_arquivo(pasta_raiz, categoria, tipo, periodo, arquivo):
+    """
+    Caminho do JSON pedido, ou None. Aceita o nome exato (com ou sem .json) ou
+    um identificador contido no nome (data DD-MM-YYYY, período...).
+    """
+    if not all(_segmento_valido(s) for s in (categoria, tipo, periodo, arquivo)):
+        return None
+    pasta = os.path.join(pasta_raiz, categoria.lower(), tipo.lower(), periodo.lower())
+    try:
+        nomes = sorted(n for n in os.listdir(pasta) if n.endswith(".json"))
+    except OSError:
+        return None
+
+    for candidato in (arquivo, f"{arquivo}.json"):
+        if candidato in nomes:
+            return os.path.join(pasta, candidato)
+    parecidos = [n for n in nomes if arquivo in n]
+    return os.path.join(pasta, parecidos[0]) if len(parecidos) == 1 else None
+
+
+def listar_arquivos(pasta_raiz):
+    itens = []
+    for raiz, _, arquivos in os.walk(pasta_raiz):
+        partes = os.path.relpath(raiz, pasta_raiz).split(os.sep)
+        if len(partes) != 3:
+            continue
+        for nome in sorted(arquivos):
+            if nome.endswith(".json"):
+                st = os.stat(os.path.join(raiz, nome))
+                itens.append({
+                    "categoria": partes[0],
+                    "tipo": partes[1],
+                    "periodo": partes[2],
+                    "arquivo": nome,
+                    "bytes": st.st_size,
+                })
+    itens.sort(key=lambda i: (i["categoria"], i["tipo"], i["periodo"], i["arquivo"]))
+    return itens
+
+
+# ─── Projeção e filtros ────────────────────────────────────────────────────────
+
+def _segundos(hora):
+    """'HH:MM[:SS]' -> segundos desde 00:00, ou None."""
+    m = re.fullmatch(r"(\d{1,2}):(\d{2})(?::(\d{2}))?", str(hora or "").strip())
+    if not m:
+        return None
+    h, mi, s = m.groups()
+    return int(h) * 3600 + int(mi) * 60 + int(s or 0)
+
+
+def _primeiro(parametros, nome, padrao=None):
+    valores = parametros.get(nome)
+    return valores[0] if valores else padrao
+
+
+def filtrar_intervalos(intervalos, parametros):
+    """Aplica equipamento/tipo/janela de horário e pagina. Retorna (página, paginação)."""
+    equipamentos = {e.strip() for v in parametros.get("equipamento", []) for e in v.split(",") if e.strip()}
+    tipos = {t.strip() for v in parametros.get("tipo", []) for t in v.split(",") if t.strip()}
+    de = _segundos(_primeiro(parametros, "de"))
+    ate = _segundos(_primeiro(parametros, "ate"))
+
+    selecionados = []
+    for item in intervalos:
+        if not isinstance(item, dict):
+            selecionados.append(item)
+            continue
+        if equipamentos and str(item.get("equipamento")) not in equipamentos:
+            continue
+        if tipos and item.get("tipo") not in tipos:
+            continue
+        if de is not None or ate is not None:
+            inicio = _segundos(item.get("inicio"))
+            if inicio is None:
+                continue
+            fim = inicio + float(item.get("duracaoHoras") or 0) * 3600
+            if ate is not None and inicio >= ate:
+                continue
+            if de is not None and fim <= de:
+                continue
+        selecionados.append(item)
+
+    total = len(selecionados)
+    por_pagina = _primeiro(parametros, "por_pagina")
+    if por_pagina is None and "pagina" not in parametros:
+        return selecionados, {"total": total}
+
+    por_pagina = min(max(int(por_pagina or 1000), 1), POR_PAGINA_MAX)
+    pagina = max(int(_primeiro(parametros, "pagina", 1)), 1)
+    inicio = (pagina - 1) * por_pagina
+    return selecionados[inicio:inicio + por_pagina], {
+        "total": total,
+        "pagina": pagina,
+        "por_pagina": por_pagina,
+        "paginas": max((total + por_pagina - 1) // por_pagina, 1),
+    }
+
+
+def montar_resposta(dados, parametros):
+    """Aplica projeção (campos) e filtros da lista de intervalos sem alterar o cache."""
+    if not isinstance(dados, dict):
+        return dados
+
+    campos = [c.strip() for v in parametros.get("campos", []) for c in v.split(",") if c.strip()]
+    resposta = {c: dados[c] for c in campos if c in dados} if campos else dict(dados)
+
+    lista = _primeiro(parametros, "lista", LISTA_PADRAO)
+    formato = _primeiro(parametros, "formato")
+    filtros = {"equipamento", "tipo", "de", "ate", "pagina", "por_pagina"} & set(parametros)
+    if formato == "linhas":
+        resposta = intervalos_colunar.expandir_relatorio(resposta)
+    elif filtros and intervalos_colunar.eh_colunar(resposta.get(lista)):
+        resposta[lista] = intervalos_colunar.decodificar(resposta[lista])
+    if isinstance(resposta.get(lista), list) and filtros:
+        resposta[lista], paginacao = filtrar_intervalos(resposta[lista], parametros)
+        resposta["_paginacao"] = {"lista": lista, **paginacao}
+    if formato == "colunar":
+        resposta = intervalos_colunar.compactar_relatorio(resposta)
+    return resposta
+
+
+def calcular_etag(assinatura, parametros, formato=None):
+    """ETag forte por representação: arquivo, parâmetros e codificação (gz/br)."""
+    consulta = json.dumps(sorted(parametros.items()), ensure_ascii=False)
+    resumo = hashlib.sha1(consulta.encode("utf-8")).hexdigest()[:12]
+    sufixo = f"-{formato}" if formato else ""
+    return f'"{assinatura[0]:x}-{assinatura[1]:x}-{resumo}{sufixo}"'
+
+
+# ─── HTTP ──────────────────────────────────────────────────────────────────────
+
+class ManipuladorRelatorios(BaseHTTPRequestHandler):
+    server_version = "ApiRelatorios/1.0"
+    cache = None
+    pasta_raiz = PASTA_JSON
+    pasta_mapas = PASTA_MAPAS
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+    def _enviar(self, status, dados, tipo, cabecalhos=None, formato=None):
+        """Envia bytes já prontos; `formato` (gz/br) indica que estão comprimidos."""
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Vary", "Accept-Encoding")
+        if formato:
+            self.send_header("Content-Encoding", compressao.CONTENT_ENCODING[formato])
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _enviar_json(self, status, corpo, cabecalhos=None, formato=None):
+        dados = json.dumps(corpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if formato:
+            dados = compressao.comprimir(dados, formato, NIVEL_COMPRESSAO_NA_HORA[formato])
+        self._enviar(status, dados, "application/json; charset=utf-8", cabecalhos, formato)
+
+    def _nao_modificado(self, etag):
+        if etag not in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        return True
+
+    def _servir_mapa(self, nome):
+        """Arquivo de mapas/ (HTML ou index_mapas.json), de preferência pré-comprimido."""
+        caminho = os.path.join(self.pasta_mapas, nome)
+        if not _segmento_valido(nome) or not nome.endswith((".html", ".json")) or not os.path.isfile(caminho):
+            self._enviar_json(404, {"erro": "mapa não encontrado"})
+            return
+        st = os.stat(caminho)
+        aceitos = compressao.formatos_aceitos(self.headers.get("Accept-Encoding"))
+        pronto = compressao.ler_precomprimido(caminho, aceitos)
+        formato = pronto[1] if pronto else compressao.formato_na_hora(aceitos)
+        etag = calcular_etag((st.st_mtime_ns, st.st_size), {}, formato)
+        if self._nao_modificado(etag):
+            return
+        if pronto:
+            dados = pronto[0]
+        else:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+            if formato:
+                dados = compressao.comprimir(dados, formato, NIVEL_COMPRESSAO_NA_HORA[formato])
+        tipo = "text/html; charset=utf-8" if nome.endswith(".html") else "application/json; charset=utf-8"
+        self._enviar(200, dados, tipo, {"ETag": etag, "Cache-Control": "no-cache"}, formato)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        partes = [unquote(p) for p in url.path.strip("/").split("/")]
+        if partes == ["api", "catalogo"]:
+            filtros = {
+                chave: valores[0] for chave, valores in parse_qs(url.query).items()
+                if chave in ("categoria", "tipo", "periodo", "formato", "data", "frota")
+            }
+            artefatos = catalogo.consultar(**filtros)
+            for artefato in artefatos:
+                artefato.pop("caminho_absoluto", None)
+            self._enviar_json(200, {"artefatos": artefatos})
+            return
+        if len(partes) == 2 and partes[0] == "mapas":
+            self._servir_mapa(partes[1])
+            return
+        if partes[:2] != ["api", "relatorios"]:
+            self._enviar_json(404, {"erro": "rota não encontrada"})
+            return
+        if len(partes) == 2:
+            self._enviar_json(200, {"arquivos": listar_arquivos(self.pasta_raiz), "cache": self.cache.estatisticas()})
+            return
+        if len(partes) != 6:
+            self._enviar_json(404, {"erro": "use /api/relatorios/<categoria>/<tipo>/<periodo>/<arquivo>"})
+            return
+
+        caminho = resolver_arquivo(self.pasta_raiz, *partes[2:])
+        if not caminho:
+            self._enviar_json(404, {"erro": "relatório não encontrado"})
+            return
+
+        parametros = parse_qs(url.query)
+        try:
+            assinatura, dados = self.cache.obter(caminho)
+        except FileNotFoundError:
+            self._enviar_json(404, {"erro": "relatório não encontrado"})
+            return
+        except (OSError, ValueError) as e:
+            self._enviar_json(500, {"erro": f"falha ao ler {os.path.basename(caminho)}: {e}"})
+            return
+
+        aceitos = compressao.formatos_aceitos(self.headers.get("Accept-Encoding"))
+        # Arquivo inteiro, sem projeção/filtro: serve a cópia .br/.gz gravada pela etapa
+        pronto = None if parametros else compressao.ler_precomprimido(caminho, aceitos)
+        formato = pronto[1] if pronto else compressao.formato_na_hora(aceitos)
+
+        etag = calcular_etag(assinatura, parametros, formato)
+        cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+        if self._nao_modificado(etag):
+            return
+        if pronto:
+            self._enviar(200, pronto[0], "application/json; charset=utf-8", cabecalhos, formato)
+            return
+
+        try:
+            corpo = montar_resposta(dados, parametros)
+        except ValueError as e:
+            self._enviar_json(400, {"erro": f"parâmetro inválido: {e}"})
+            return
+        self._enviar_json(200, corpo, cabecalhos, formato)
+
+
+def criar_servidor(host, porta, pasta_raiz=PASTA_JSON, cache_mb=CACHE_MB_PADRAO, verboso=False):
+    manipulador = type("Manipulador", (ManipuladorRelatorios,), {
+        "cache": CacheJson(cache_mb * 1024 * 1024),
+        "pasta_raiz": pasta_raiz,
+    })
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    servidor.verboso = verboso
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API local de leitura dos relatórios JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--pasta", default=PASTA_JSON, help="Raiz dos JSONs (padrão: dados/separados/json)")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_MB_PADRAO, help="Limite do cache LRU (MB em disco)")
+    parser.add_argument("--verboso", action="store_true", help="Loga cada requisição")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.pasta):
+        print(f"❌ Pasta não encontrada: {args.pasta}")
+        sys.exit(1)
+
+    servidor = criar_servidor(args.host, args.porta, args.pasta, args.cache_mb, args.verboso)
+    print("=" * 60)
+    print(f"🌐 API de relatórios em http://{args.host}:{args.porta}/api/relatorios")
+    print(f"   Pasta: {args.pasta}")
+    print("=" * 60)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 API encerrada.")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
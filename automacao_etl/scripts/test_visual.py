@@ -11,7 +11,8 @@ sys.path.append(os.path.dirname(__file__))
 
 # Import module with spaces/numbers using importlib
 import importlib.util
-spec = importlib.util.spec_from_file_location("gerador_mapas", "automacao_etl/scripts/3_GerarMapasFrotas.py")
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+spec = importlib.util.spec_from_file_location("gerador_mapas", os.path.join(SCRIPTS_DIR, "8_GerarMapasFrotas.py"))
 gerador_mapas = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(gerador_mapas)
 
@@ -53,11 +54,11 @@ def testar():
         mapeamento[fid] = {'json': frotas_json[fid], 'shape': frotas_shapes[fid]}
         
     # Output Dir
-    pasta_saida = Path("automacao_etl/mapas_teste")
+    pasta_saida = Path(SCRIPTS_DIR).parent / "mapas_teste"
     
     # Run
     try:
-        arquivos = gerador_mapas.gerar_mapas_diarios(mapeamento, pasta_saida)
+        arquivos = gerador_mapas.gerar_mapas_padronizados(mapeamento, {}, pasta_saida)
         
         print(f"\n✅ Gerados {len(arquivos)} arquivos.")
         for arq in arquivos:
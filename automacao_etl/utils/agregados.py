@@ -0,0 +1,287 @@
+"""
+agregados.py
+
+Agregados parciais diários por frota e por operador, e os indicadores de
+dia e de período (semanal, mensal, safra) derivados deles.
+
+Um parcial guarda só quantidades somáveis de um dia: minutos por categoria
+(dur_*_min, dur_grupo_*), contagens (cnt_*) e produtos velocidade×minuto
+(vel_*_x_min). Juntar dias é somar; as razões (eficiências, porcentagens,
+velocidades e tempos médios) saem só no fim, em derivar_indicadores(), e
+nunca como média de razões diárias.
+
+A etapa 4 grava os parciais em dados/separados/parciais/<entidade>/
+DD-MM-YYYY.json, um arquivo por dia (linhas substituídas por chave, então
+reprocessar um dia ou receber outra frente do mesmo dia não duplica nada).
+O rollup de uma janela lê só os arquivos dos dias dela, sem voltar às
+linhas brutas:
+
+    from utils import agregados
+
+    df, (d1, d2) = agregados.rollup("frota", inicio, fim)
+
+Os demais estados por dia (utilizacao_horaria, topk, metricas_trajeto)
+usam o mesmo armazenamento: caminho_dia(), ler_dia() e gravar_atomico().
+"""
+
+import json
+import os
+import unicodedata
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_PARCIAIS = os.environ.get("ETL_PARCIAIS") or os.path.join(BASE_DIR, "dados", "separados", "parciais")
+# Início da safra (DD-MM); o rollup "safra" vai dessa data até o último dia
+INICIO_SAFRA = os.environ.get("ETL_INICIO_SAFRA") or "01-04"
+
+COL_DATA = "Data"
+CHAVES = {
+    "frota": ["Código Equipamento", "Descrição do Equipamento"],
+    "operador": ["Código de Operador", "Nome", "Descrição do Equipamento"],
+}
+PREFIXOS_ADITIVOS = ("dur_", "vel_", "cnt_")
+PREFIXO_GRUPO = "dur_grupo_"
+
+
+def formatar_nome_grupo(grupo_norm):
+    return str(grupo_norm).strip().title().replace(" ", "_")
+
+
+def eh_coluna_horas_manut(coluna):
+    texto = unicodedata.normalize("NFKD", str(coluna))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower().replace("_", "")
+    return texto.startswith("horasmanut")
+
+
+def ordenar_colunas(df, cols_base, cols_ordem):
+    cols = [c for c in cols_base if c in df.columns]
+    for c in cols_ordem:
+        if c in df.columns and c not in cols:
+            cols.append(c)
+    for c in df.columns:
+        if c not in cols:
+            cols.append(c)
+    return df[cols]
+
+
+def colunas_aditivas(df):
+    return [c for c in df.columns if str(c).startswith(PREFIXOS_ADITIVOS)]
+
+
+# ─── Indicadores ───────────────────────────────────────────────────────────────
+
+def _razao(numerador, denominador, padrao=0):
+    return np.where(denominador > 0, numerador / denominador, padrao)
+
+
+def derivar_indicadores(df, chaves, periodo=False, disponibilidade=True):
+    """
+    Indicadores a partir das somas (parciais de um dia ou combinados).
+    Dia: Horas_*, porcentagens, eficiências, manobras/transbordos e
+    velocidades médias. Período (periodo=True): totais com sufixo _total,
+    médias por dia (exige Dias_com_dados) e as mesmas razões.
+    Colunas que não são somas (ex.: Frotas_no_dia) são mantidas.
+    """
+    df = df.copy()
+    t = "_total" if periodo else ""
+    cols_grupo = sorted(c for c in df.columns if c.startswith(PREFIXO_GRUPO))
+    horas_grupo = [f"Horas_{formatar_nome_grupo(c[len(PREFIXO_GRUPO):])}{t}" for c in cols_grupo]
+
+    reg, prod, improd = f"Horas_Registradas{t}", f"Horas_Produtivas{t}", f"Horas_Improdutivas{t}"
+    ocioso, ligado, sem_apont = f"Horas_Motor_Ocioso{t}", f"Horas_Motor_Ligado{t}", f"Tempo_Sem_Apontamento_h{t}"
+
+    df[reg] = df["dur_total_min"] / 60
+    df[prod] = df["dur_prod_min"] / 60
+    df[improd] = df["dur_improd_min"] / 60
+    df[ocioso] = df["dur_motor_ocioso_min"] / 60
+    df[ligado] = df["dur_motor_ligado_min"] / 60
+    for col_dur, col_horas in zip(cols_grupo, horas_grupo):
+        df[col_horas] = df[col_dur] / 60
+    df[sem_apont] = df["dur_sem_apont_min"] / 60
+
+    if periodo:
+        df["Horas_media_por_dia"] = _razao(df[reg], df["Dias_com_dados"])
+        df["Horas_Motor_Ocioso_media_por_dia"] = _razao(df[ocioso], df["Dias_com_dados"])
+
+    df["Porcentagem_Motor_Ligado"] = _razao(df[ligado], df[reg]) * 100
+    df["Porcentagem_Motor_Ocioso"] = _razao(df[ocioso], df[reg]) * 100
+    df["Porcentagem_Sem_Apontamento"] = _razao(df[sem_apont], df[reg]) * 100
+
+    df["Tempo_Total_Manobras_h"] = df["dur_manobra_min"] / 60
+    df["Tempo_Medio_Manobras_min"] = _razao(df["dur_manobra_min"], df["cnt_manobra"])
+    df["Tempo_Total_Transbordo_h"] = df["dur_transbordo_min"] / 60
+    df["Tempo_Medio_Transbordo_min"] = _razao(df["dur_transbordo_min"], df["cnt_transbordo"])
+    df.rename(columns={"cnt_manobra": "Quantidade_Manobras", "cnt_transbordo": "Quantidade_Transbordos"}, inplace=True)
+
+    col_manut = next((c for c in horas_grupo if eh_coluna_horas_manut(c)), None) if disponibilidade else None
+    if col_manut:
+        df["Disponibilidade_Mecanica"] = np.where(df[reg] > 0, 1 - (df[col_manut] / df[reg]), 0)
+    df["Eficiencia_Energetica"] = _razao(df[prod], df[ligado])
+    df["Eficiencia_Operacional"] = _razao(df[prod], df[reg])
+
+    df["Vel_Colheita_media"] = _razao(df["vel_colheita_x_min"], df["dur_colheita_min"], np.nan)
+    df["Vel_Desl_Vazio_media"] = _razao(df["vel_vazio_x_min"], df["dur_vazio_min"], np.nan)
+    df["Vel_Desl_Carregado_media"] = _razao(df["vel_carregado_x_min"], df["dur_carregado_min"], np.nan)
+
+    df.drop(columns=colunas_aditivas(df), inplace=True)
+
+    ordem = [reg, prod, improd]
+    for col in horas_grupo:
+        ordem.append(col)
+        if col == col_manut:
+            ordem.append("Disponibilidade_Mecanica")
+    ordem += [
+        ligado, "Porcentagem_Motor_Ligado",
+        ocioso, "Porcentagem_Motor_Ocioso",
+        sem_apont, "Porcentagem_Sem_Apontamento",
+        "Eficiencia_Energetica", "Eficiencia_Operacional",
+    ]
+    manobras = [
+        "Tempo_Total_Manobras_h", "Quantidade_Manobras", "Tempo_Medio_Manobras_min",
+        "Tempo_Total_Transbordo_h", "Quantidade_Transbordos", "Tempo_Medio_Transbordo_min",
+    ]
+    if periodo:
+        ordem += ["Dias_com_dados", "Horas_media_por_dia", "Horas_Motor_Ocioso_media_por_dia", *manobras,
+                  "Vel_Colheita_media", "Vel_Desl_Vazio_media", "Vel_Desl_Carregado_media"]
+    else:
+        # Velocidades ficam depois das colunas extras (Frotas_no_dia), como sempre saíram
+        ordem += manobras
+    return ordenar_colunas(df, chaves, ordem)
+
+
+def combinar(parciais, chaves):
+    """Soma os parciais por `chaves` (qualquer conjunto de dias) + Dias_com_dados."""
+    aditivas = colunas_aditivas(parciais)
+    df = parciais.copy()
+    df[aditivas] = df[aditivas].fillna(0)
+    agg = {c: (c, "sum") for c in aditivas}
+    agg["Dias_com_dados"] = (COL_DATA, "nunique")
+    combinado = df.groupby(chaves).agg(**agg).reset_index()
+    for c in aditivas:
+        if c.startswith("cnt_"):
+            combinado[c] = combinado[c].astype("int64")
+    return combinado
+
+
+# ─── Armazenamento por dia ─────────────────────────────────────────────────────
+
+def caminho_dia(pasta, dia):
+    """<pasta>/DD-MM-YYYY.json"""
+    return os.path.join(pasta, f"{dia.strftime('%d-%m-%Y')}.json")
+
+
+def ler_dia(pasta, dia):
+    """Conteúdo JSON gravado para o dia em `pasta`, ou None (ausente ou ilegível)."""
+    try:
+        with open(caminho_dia(pasta, dia), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def gravar_atomico(caminho, conteudo, default=None):
+    """
+    Grava `conteudo` em JSON compacto via .tmp + os.replace (leitor nunca vê
+    arquivo pela metade). Conteúdo igual ao gravado não é regravado (mtime
+    intacto para o --check das etapas). True se gravou.
+    """
+    texto = json.dumps(conteudo, ensure_ascii=False, separators=(",", ":"), default=default)
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            if f.read() == texto:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(tmp, caminho)
+    return True
+
+
+def _serializar(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+def _ler_parciais(entidade, dia):
+    conteudo = ler_dia(os.path.join(PASTA_PARCIAIS, entidade), dia)
+    df = pd.DataFrame((conteudo or {}).get("linhas", []))
+    if df.empty:
+        return None
+    df.insert(0, COL_DATA, dia)
+    return df
+
+
+def salvar_parciais(entidade, parciais, chaves):
+    """
+    Grava os parciais de cada dia presente em `parciais` (colunas Data +
+    chaves + somas). Linhas já gravadas com outras chaves no mesmo dia são
+    mantidas; as de mesma chave são substituídas.
+    """
+    colunas = [c for c in chaves if c in parciais.columns] + colunas_aditivas(parciais)
+    pasta = os.path.join(PASTA_PARCIAIS, entidade)
+    for dia, df_dia in parciais.groupby(COL_DATA):
+        dia = pd.Timestamp(dia).date()
+        novas = df_dia[colunas]
+        existentes = _ler_parciais(entidade, dia)
+        if existentes is not None and all(c in existentes.columns for c in chaves):
+            chaves_novas = set(novas[chaves].astype(str).itertuples(index=False, name=None))
+            manter = [t not in chaves_novas for t in existentes[chaves].astype(str).itertuples(index=False, name=None)]
+            novas = pd.concat([existentes.loc[manter].drop(columns=[COL_DATA]), novas], ignore_index=True)
+            aditivas = colunas_aditivas(novas)
+            novas[aditivas] = novas[aditivas].fillna(0)
+
+        conteudo = {
+            "data": dia.strftime("%d-%m-%Y"),
+            "chaves": list(chaves),
+            "linhas": novas.to_dict("records"),
+        }
+        gravar_atomico(caminho_dia(pasta, dia), conteudo, default=_serializar)
+
+
+def carregar_parciais(entidade, inicio, fim):
+    """Parciais gravados de `inicio` a `fim` (datas), lendo um arquivo por dia."""
+    frames = []
+    dia = inicio
+    while dia <= fim:
+        df = _ler_parciais(entidade, dia)
+        if df is not None:
+            frames.append(df)
+        dia += timedelta(days=1)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+# ─── Janelas e rollups ─────────────────────────────────────────────────────────
+
+def inicio_mes(dia):
+    return dia.replace(day=1)
+
+
+def inicio_safra(dia):
+    d, m = (int(p) for p in INICIO_SAFRA.split("-"))
+    inicio = date(dia.year, m, d)
+    return inicio if inicio <= dia else date(dia.year - 1, m, d)
+
+
+def nome_periodo(inicio, fim):
+    return f"{inicio.strftime('%d-%m-%Y')}_{fim.strftime('%d-%m-%Y')}"
+
+
+def rollup(entidade, inicio, fim):
+    """
+    (DataFrame de período, (primeiro, último dia com dados)) para a janela,
+    ou (None, None) se não houver parciais gravados nela.
+    """
+    parciais = carregar_parciais(entidade, inicio, fim)
+    if parciais.empty:
+        return None, None
+    chaves = [c for c in CHAVES[entidade] if c in parciais.columns]
+    df = derivar_indicadores(combinar(parciais, chaves), chaves, periodo=True,
+                             disponibilidade=entidade == "frota")
+    return df, (parciais[COL_DATA].min(), parciais[COL_DATA].max())
@@ -0,0 +1,240 @@
+"""
+arquivos_zip.py
+
+Acesso aos membros dos ZIPs sem extrair para o disco. As etapas recebem
+ZIPs de três fontes (Linha do Tempo Solinftec, CSVs da Case, shapes OPC) e
+antes extraíam tudo ao lado (1 e 4) ou numa pasta temporária (6) só para
+ler de volta em seguida.
+
+- Um membro é identificado por "<caminho do zip>!<membro>" (a mesma notação
+  do zip:// do GDAL). abrir() aceita tanto esse caminho quanto um arquivo
+  comum e devolve um objeto binário para pd.read_excel / pd.read_csv /
+  shapes_pontos: membros pequenos (até ETL_ZIP_LIMITE_MEMORIA_MB) ou de
+  acesso aleatório (.xlsx, .shp...) vêm num BytesIO; os demais são lidos em
+  fluxo, descomprimindo sob demanda.
+- A listagem de membros (nome, tamanho, data) fica em cache por hash do
+  diretório central do ZIP: o mesmo arquivo aberto pelas etapas 4, 6 e 8 (ou
+  a cada lote do modo --monitorar) só é listado uma vez, e um ZIP
+  substituído com o mesmo nome tem hash novo.
+
+    from utils import arquivos_zip
+
+    for caminho in arquivos_zip.entradas(zips, (".xlsx",)):
+        with arquivos_zip.abrir(caminho) as f:
+            df = pd.read_excel(f)
+        nome = arquivos_zip.caminho_logico(caminho)   # nome que a extração gravaria
+
+    with arquivos_zip.abrir_zip("dados/Case.zip") as zf:
+        for nome in zf.nomes((".csv",)):
+            with zf.abrir(nome) as f: ...
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import struct
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+
+SEPARADOR = "!"
+LIMITE_MEMORIA = int(float(os.environ.get("ETL_ZIP_LIMITE_MEMORIA_MB") or 64) * 1024 * 1024)
+# Leitores que fazem seek para trás (xlsx é outro zip; shapefile tem índice)
+ACESSO_ALEATORIO = (".xlsx", ".xlsm", ".xls", ".zip", ".shp", ".shx", ".dbf")
+
+_FIM_DIRETORIO = b"PK\x05\x06"
+_lock = threading.Lock()
+_assinaturas = {}  # (caminho, tamanho, mtime_ns) -> hash
+_listagens = {}    # hash -> {membro: {"tamanho", "comprimido", "modificado"}}
+
+
+# ─── Caminhos de membro ────────────────────────────────────────────────────────
+
+def caminho_membro(caminho_zip, membro):
+    return f"{caminho_zip}{SEPARADOR}{membro}"
+
+
+def separar(caminho):
+    """(caminho do zip, membro) ou (caminho, None) se não for membro de ZIP."""
+    caminho = str(caminho)
+    pos = caminho.lower().rfind(f".zip{SEPARADOR}")
+    if pos < 0:
+        return caminho, None
+    return caminho[:pos + 4], caminho[pos + 5:]
+
+
+def eh_membro(caminho):
+    return separar(caminho)[1] is not None
+
+
+def caminho_logico(caminho):
+    """
+    Caminho que o membro teria se extraído como a etapa 1 fazia: pasta e
+    nome do ZIP com a extensão do membro (o período e o lote estão no nome
+    do ZIP). Arquivo comum volta como está.
+    """
+    caminho_zip, membro = separar(caminho)
+    if membro is None:
+        return caminho_zip
+    return f"{os.path.splitext(caminho_zip)[0]}{os.path.splitext(membro)[1]}"
+
+
+def mtime(caminho):
+    """mtime do arquivo (do ZIP, para membros)."""
+    return os.path.getmtime(separar(caminho)[0])
+
+
+# ─── Listagem em cache ─────────────────────────────────────────────────────────
+
+def _diretorio_central(f, tamanho):
+    """Bytes do diretório central (ou a cauda do arquivo, se não achar o fim)."""
+    cauda = min(tamanho, 22 + 65535)
+    f.seek(tamanho - cauda)
+    bloco = f.read(cauda)
+    pos = bloco.rfind(_FIM_DIRETORIO)
+    if pos < 0 or pos + 22 > len(bloco):
+        return bloco
+    tamanho_dir, inicio_dir = struct.unpack("<II", bloco[pos + 12:pos + 20])
+    if inicio_dir == 0xFFFFFFFF or inicio_dir + tamanho_dir > tamanho:
+        return bloco  # ZIP64 ou deslocado: a cauda já identifica o conteúdo
+    f.seek(inicio_dir)
+    return f.read(tamanho_dir) + bloco[pos:]
+
+
+def assinatura(caminho_zip):
+    """Hash do diretório central do ZIP (nomes, tamanhos e CRCs dos membros)."""
+    st = os.stat(caminho_zip)
+    chave = (os.path.abspath(caminho_zip), st.st_size, st.st_mtime_ns)
+    with _lock:
+        if chave in _assinaturas:
+            return _assinaturas[chave]
+    with open(caminho_zip, "rb") as f:
+        resumo = hashlib.sha1(_diretorio_central(f, st.st_size)).hexdigest()
+    with _lock:
+        _assinaturas[chave] = resumo
+    return resumo
+
+
+def _listar(zf):
+    return {
+        info.filename: {
+            "tamanho": info.file_size,
+            "comprimido": info.compress_size,
+            "modificado": datetime(*info.date_time),
+        }
+        for info in zf.infolist()
+        if not info.is_dir()
+    }
+
+
+def membros(caminho_zip, zf=None):
+    """{membro: {"tamanho", "comprimido", "modificado"}}, em cache pelo hash do ZIP."""
+    resumo = assinatura(caminho_zip)
+    with _lock:
+        listagem = _listagens.get(resumo)
+    if listagem is None:
+        if zf is not None:
+            listagem = _listar(zf)
+        else:
+            with zipfile.ZipFile(caminho_zip, "r") as aberto:
+                listagem = _listar(aberto)
+        with _lock:
+            _listagens[resumo] = listagem
+    return listagem
+
+
+def _filtrar(nomes, extensoes):
+    if not extensoes:
+        return list(nomes)
+    extensoes = tuple(e.lower() for e in extensoes)
+    return [n for n in nomes if n.lower().endswith(extensoes)]
+
+
+def nomes(caminho_zip, extensoes=None):
+    """Membros do ZIP (só os terminados em `extensoes`, se informado)."""
+    return _filtrar(membros(caminho_zip), extensoes)
+
+
+def entradas(arquivos_zip, extensoes=None):
+    """Caminhos "zip!membro" dos membros com `extensoes` de vários ZIPs; ZIP ilegível é avisado e pulado."""
+    resultado = []
+    for caminho_zip in arquivos_zip:
+        try:
+            resultado.extend(caminho_membro(caminho_zip, n) for n in nomes(caminho_zip, extensoes))
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"⚠️ ZIP ilegível {os.path.basename(caminho_zip)}: {e}")
+    return resultado
+
+
+# ─── Leitura ───────────────────────────────────────────────────────────────────
+
+class ArquivoZip:
+    """ZIP aberto uma vez para ler vários membros (listagem vem do cache)."""
+
+    def __init__(self, caminho_zip):
+        self.caminho = str(caminho_zip)
+        self._zf = zipfile.ZipFile(self.caminho, "r")
+        self.membros = membros(self.caminho, self._zf)
+
+    def nomes(self, extensoes=None):
+        return _filtrar(self.membros, extensoes)
+
+    def tamanho(self, membro):
+        return self.membros[membro]["tamanho"]
+
+    def ler(self, membro):
+        return self._zf.read(membro)
+
+    def abrir(self, membro):
+        """Objeto binário do membro: BytesIO se pequeno ou de acesso aleatório, senão fluxo."""
+        if self.tamanho(membro) <= LIMITE_MEMORIA or membro.lower().endswith(ACESSO_ALEATORIO):
+            return io.BytesIO(self._zf.read(membro))
+        return self._zf.open(membro, "r")
+
+    def testar(self):
+        """Primeiro membro com CRC inválido, ou None (zipfile.testzip)."""
+        return self._zf.testzip()
+
+    def close(self):
+        self._zf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def abrir_zip(caminho_zip):
+    return ArquivoZip(caminho_zip)
+
+
+@contextmanager
+def abrir(caminho):
+    """Arquivo binário para leitura, seja arquivo comum ou "zip!membro"."""
+    caminho_zip, membro = separar(caminho)
+    if membro is None:
+        with open(caminho_zip, "rb") as f:
+            yield f
+        return
+    with ArquivoZip(caminho_zip) as zf, zf.abrir(membro) as f:
+        yield f
+
+
+def ler(caminho):
+    """Bytes de um arquivo comum ou de um membro "zip!membro"."""
+    with abrir(caminho) as f:
+        return f.read()
+
+
+def copiar(caminho, destino):
+    """Copia arquivo comum ou membro para `destino` (quando uma cópia em disco é o produto)."""
+    caminho_zip, membro = separar(caminho)
+    if membro is None:
+        shutil.copy2(caminho_zip, destino)
+        return destino
+    with abrir(caminho) as origem, open(destino, "wb") as saida:
+        shutil.copyfileobj(origem, saida)
+    return destino
@@ -0,0 +1,270 @@
+"""
+catalogo.py
+
+Catálogo (SQLite) dos artefatos gerados pelas etapas: JSON/XLSX separados,
+Consolidado_Case e mapas.
+
+Cada registro guarda caminho, etapa, formato, categoria, tipo, período, data
+(ou intervalo de datas), frotas presentes, tamanho, hash do conteúdo e
+horário de geração. Consumidores respondem "o que existe para a data X /
+frota Y" com uma consulta indexada em vez de listar pastas e abrir arquivos.
+
+    from utils import catalogo
+
+    catalogo.gravar_json(caminho, dados, etapa="7")        # grava + registra
+    catalogo.registrar(caminho_xlsx, etapa="5")            # arquivo já gravado
+    catalogo.localizar(categoria="colhedora", tipo="frotas", periodo="diario",
+                       data="06-10-2025")                  # -> [caminhos]
+
+A gravação via gravar_json é atômica (arquivo .tmp + os.replace) e o registro
+no catálogo é uma transação; se o catálogo estiver vazio (pasta gerada antes
+dele existir), localizar() devolve [] e o chamador cai no glob de sempre.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils import compressao
+from utils.historico import data_iso
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_SEPARADOS = os.path.join(BASE_DIR, "dados", "separados")
+ARQUIVO_CATALOGO = os.environ.get("ETL_CATALOGO") or os.path.join(PASTA_SEPARADOS, "catalogo.sqlite")
+
+_lock = threading.Lock()
+_iniciado = set()
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS artefatos (
+    caminho    TEXT PRIMARY KEY,
+    etapa      TEXT,
+    formato    TEXT,
+    categoria  TEXT,
+    tipo       TEXT,
+    periodo    TEXT,
+    data       TEXT,
+    data_fim   TEXT,
+    bytes      INTEGER,
+    hash       TEXT,
+    gerado_em  TEXT
+);
+CREATE TABLE IF NOT EXISTS artefato_frotas (
+    caminho TEXT NOT NULL,
+    frota   TEXT NOT NULL,
+    PRIMARY KEY (caminho, frota)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_artefatos_data ON artefatos (data);
+CREATE INDEX IF NOT EXISTS ix_artefatos_grupo ON artefatos (categoria, tipo, periodo, data);
+CREATE INDEX IF NOT EXISTS ix_artefato_frotas_frota ON artefato_frotas (frota);
+"""
+
+
+def _conectar(arquivo=None):
+    arquivo = arquivo or ARQUIVO_CATALOGO
+    con = sqlite3.connect(arquivo, timeout=30)
+    if arquivo not in _iniciado:
+        os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_ESQUEMA)
+        _iniciado.add(arquivo)
+    return con
+
+
+def _relativo(caminho):
+    return os.path.relpath(os.path.abspath(caminho), BASE_DIR).replace(os.sep, "/")
+
+
+def _absoluto(relativo):
+    return os.path.join(BASE_DIR, *relativo.split("/"))
+
+
+def inferir_metadados(caminho):
+    """
+    Categoria/tipo/período pela posição em dados/separados/json/<c>/<t>/<p>/ e
+    data (ou intervalo) pelo nome do arquivo.
+    """
+    relativo = _relativo(caminho)
+    partes = relativo.split("/")
+    meta = {"formato": os.path.splitext(relativo)[1].lstrip(".").lower() or None}
+    if partes[:3] == ["dados", "separados", "json"] and len(partes) == 7:
+        meta.update(categoria=partes[3], tipo=partes[4], periodo=partes[5])
+
+    datas = re.findall(r"\d{2}-\d{2}-\d{4}", partes[-1])
+    if datas:
+        meta["data"] = data_iso(datas[0])
+        meta["data_fim"] = data_iso(datas[-1])
+    return meta
+
+
+def frotas_do_json(dados):
+    """Frotas presentes num JSON de frotas (formato unificado ou por chave de frota)."""
+    if not isinstance(dados, dict):
+        return []
+    if isinstance(dados.get("eficiencia_energetica"), list):
+        return [str(i.get("nome") or i.get("id")) for i in dados["eficiencia_energetica"] if isinstance(i, dict)]
+    return [str(k) for k in dados if k != "Geral"]
+
+
+def registrar(caminho, etapa, frotas=None, hash_conteudo=None, **meta):
+    """
+    Registra (ou atualiza) um artefato já gravado em disco. `meta` sobrepõe o
+    que inferir_metadados deduz do caminho (categoria, tipo, periodo, data...).
+    Erro no SQLite só gera aviso (retorna False): o arquivo continua válido.
+    """
+    st = os.stat(caminho)
+    if hash_conteudo is None:
+        h = hashlib.sha1()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloco)
+        hash_conteudo = h.hexdigest()
+
+    info = inferir_metadados(caminho)
+    info.update({k: v for k, v in meta.items() if v is not None})
+    for chave in ("data", "data_fim"):
+        info[chave] = data_iso(info.get(chave))
+    if info.get("data") and not info.get("data_fim"):
+        info["data_fim"] = info["data"]
+
+    relativo = _relativo(caminho)
+    registro = (
+        relativo, str(etapa), info.get("formato"), info.get("categoria"), info.get("tipo"),
+        info.get("periodo"), info.get("data"), info.get("data_fim"), st.st_size, hash_conteudo,
+        datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+    )
+    try:
+        with _lock:
+            con = _conectar()
+            try:
+                with con:
+                    con.execute("INSERT OR REPLACE INTO artefatos VALUES (?,?,?,?,?,?,?,?,?,?,?)", registro)
+                    con.execute("DELETE FROM artefato_frotas WHERE caminho = ?", (relativo,))
+                    con.executemany(
+                        "INSERT OR IGNORE INTO artefato_frotas VALUES (?, ?)",
+                        [(relativo, str(f)) for f in (frotas or [])],
+                    )
+            finally:
+                con.close()
+    except sqlite3.Error as e:
+        # Catálogo é índice: falha nele não invalida o arquivo gravado
+        print(f"⚠️  Catálogo não atualizado para {os.path.basename(caminho)}: {e}")
+        return False
+    return True
+
+
+def gravar_json(caminho, dados, etapa, frotas=None, compacto=False, **meta):
+    """
+    Grava o JSON de forma atômica e registra no catálogo (hash do próprio
+    conteúdo). `compacto` grava sem indentação (payloads colunares). Com
+    ETL_COMPRESSAO, as cópias .gz/.br saem em segundo plano (utils/compressao.py).
+    """
+    if compacto:
+        conteudo = json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        conteudo = json.dumps(dados, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+    compressao.agendar(caminho, conteudo)
+
+    if frotas is None and (meta.get("tipo") or inferir_metadados(caminho).get("tipo")) == "frotas":
+        frotas = frotas_do_json(dados)
+    registrar(caminho, etapa, frotas=frotas, hash_conteudo=hashlib.sha1(conteudo).hexdigest(), **meta)
+
+
+def consultar(categoria=None, tipo=None, periodo=None, data=None, frota=None, formato=None, etapa=None):
+    """Registros (dicts) que atendem aos filtros; `data` casa com o intervalo data..data_fim."""
+    condicoes, valores = [], []
+    for coluna, valor in (("categoria", categoria), ("tipo", tipo), ("periodo", periodo),
+                          ("formato", formato), ("etapa", etapa)):
+        if valor is not None:
+            condicoes.append(f"a.{coluna} = ?")
+            valores.append(str(valor))
+    if data is not None:
+        condicoes.append("a.data <= ? AND a.data_fim >= ?")
+        valores += [data_iso(data)] * 2
+    if frota is not None:
+        condicoes.append("a.caminho IN (SELECT caminho FROM artefato_frotas WHERE frota = ?)")
+        valores.append(str(frota))
+
+    sql = "SELECT a.* FROM artefatos a"
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    sql += " ORDER BY a.data, a.caminho"
+
+    if not os.path.exists(ARQUIVO_CATALOGO):
+        return []
+    with _lock:
+        con = _conectar()
+        try:
+            con.row_factory = sqlite3.Row
+            linhas = [dict(r) for r in con.execute(sql, valores)]
+            frotas = {}
+            if linhas:
+                for caminho, frota_ in con.execute(
+                    "SELECT caminho, frota FROM artefato_frotas WHERE caminho IN "
+                    f"({','.join('?' * len(linhas))})", [l["caminho"] for l in linhas]
+                ):
+                    frotas.setdefault(caminho, []).append(frota_)
+        finally:
+            con.close()
+    for linha in linhas:
+        linha["frotas"] = sorted(frotas.get(linha["caminho"], []))
+        linha["caminho_absoluto"] = _absoluto(linha["caminho"])
+    return linhas
+
+
+def localizar(**filtros):
+    """Caminhos absolutos dos artefatos catalogados que ainda existem em disco."""
+    return [r["caminho_absoluto"] for r in consultar(**filtros) if os.path.exists(r["caminho_absoluto"])]
+
+
+def datas_disponiveis(**filtros):
+    """Datas ('DD-MM-YYYY') com artefato catalogado para os filtros."""
+    datas = sorted({r["data"] for r in consultar(**filtros) if r["data"] and os.path.exists(r["caminho_absoluto"])})
+    return [f"{d[8:10]}-{d[5:7]}-{d[0:4]}" for d in datas]
+
+
+def remover(caminhos):
+    """Tira do catálogo os artefatos apagados pelo chamador. Retorna quantos."""
+    relativos = [(_relativo(c),) for c in caminhos]
+    if not relativos or not os.path.exists(ARQUIVO_CATALOGO):
+        return 0
+    try:
+        with _lock:
+            con = _conectar()
+            try:
+                with con:
+                    con.executemany("DELETE FROM artefatos WHERE caminho = ?", relativos)
+                    con.executemany("DELETE FROM artefato_frotas WHERE caminho = ?", relativos)
+            finally:
+                con.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Catálogo não atualizado ao remover {len(relativos)} artefato(s): {e}")
+        return 0
+    return len(relativos)
+
+
+def remover_ausentes():
+    """Tira do catálogo os artefatos que não existem mais em disco. Retorna quantos."""
+    if not os.path.exists(ARQUIVO_CATALOGO):
+        return 0
+    with _lock:
+        con = _conectar()
+        try:
+            ausentes = [
+                (c,) for (c,) in con.execute("SELECT caminho FROM artefatos")
+                if not os.path.exists(_absoluto(c))
+            ]
+            with con:
+                con.executemany("DELETE FROM artefatos WHERE caminho = ?", ausentes)
+                con.executemany("DELETE FROM artefato_frotas WHERE caminho = ?", ausentes)
+        finally:
+            con.close()
+    return len(ausentes)
@@ -0,0 +1,120 @@
+"""
+compactacao_intervalos.py
+
+Junta intervalos consecutivos idênticos de uma mesma frota (run-length):
+a Solinftec quebra a mesma operação a cada apontamento/telemetria, então
+há muitas linhas seguidas com a mesma frota, grupo e operação, o fim de
+uma colado no início da outra.
+
+Tudo vetorizado (pandas/numpy): ordena por frota/início, marca onde começa
+uma sequência nova comparando cada linha com a anterior (shift) — chave
+diferente ou folga maior que a tolerância — e agrega cada sequência
+(primeiro início, último fim, soma das durações) guardando em
+`registros`/`Registros` quantas linhas de origem ela junta.
+
+- compactar_intervalos: DataFrame com Início/Fim datetime (abas
+  Intervalos_* da etapa 4, que alimentam os Intervalos do JSON diário).
+- compactar_gantt: lista intervalos_operacao da etapa 7 (inicio HH:MM:SS +
+  duracaoHoras), juntando por equipamento/tipo/fonte na ordem recebida.
+
+ETL_COMPACTAR_INTERVALOS=0 desliga; ETL_COMPACTAR_TOLERANCIA_S define a
+folga aceita entre fim e início (padrão 1 s).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+TOLERANCIA_PADRAO_S = float(os.environ.get("ETL_COMPACTAR_TOLERANCIA_S") or 1)
+
+
+def ativo():
+    return os.environ.get("ETL_COMPACTAR_INTERVALOS", "1").strip().lower() not in ("0", "nao", "não", "false")
+
+
+def _inicio_de_sequencia(df, chaves, inicio_s, fim_s, tolerancia_s):
+    """Máscara: True onde a linha não continua a anterior."""
+    novo = np.zeros(len(df), dtype=bool)
+    if len(df) == 0:
+        return novo
+    novo[0] = True
+    for chave in chaves:
+        valores = df[chave]
+        anterior = valores.shift()
+        # NaN == NaN conta como mesma chave
+        iguais = (valores == anterior) | (valores.isna() & anterior.isna())
+        novo |= ~iguais.to_numpy()
+    folga = inicio_s[1:] - fim_s[:-1]
+    novo[1:] |= ~(np.abs(folga) <= tolerancia_s)
+    return novo
+
+
+def compactar_intervalos(df, chaves, col_inicio="Início", col_fim="Fim", tolerancia_s=None,
+                         col_contagem="Registros", ordenar_por=None):
+    """
+    Junta linhas consecutivas com as mesmas `chaves` em que o início de uma
+    está a até `tolerancia_s` do fim da anterior. `ordenar_por` (ex.:
+    ["Frota"]) ordena de forma estável por essas colunas + início antes.
+    Colunas fora de chaves/início/fim são descartadas.
+    """
+    if df.empty:
+        return df.assign(**{col_contagem: pd.Series(dtype="int64")})
+    tolerancia_s = TOLERANCIA_PADRAO_S if tolerancia_s is None else tolerancia_s
+    chaves = [c for c in chaves if c in df.columns]
+    if ordenar_por:
+        df = df.sort_values([*ordenar_por, col_inicio], kind="stable")
+    df = df.reset_index(drop=True)
+
+    inicio = pd.to_datetime(df[col_inicio])
+    fim = pd.to_datetime(df[col_fim])
+    inicio_s = (inicio - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+    fim_s = (fim - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+
+    sequencia = np.cumsum(_inicio_de_sequencia(df, chaves, inicio_s, fim_s, tolerancia_s))
+    agregado = df.groupby(sequencia, sort=False).agg(
+        **{c: (c, "first") for c in chaves},
+        **{col_inicio: (col_inicio, "first"), col_fim: (col_fim, "last"), col_contagem: (col_inicio, "size")},
+    )
+    colunas = [c for c in df.columns if c in chaves or c in (col_inicio, col_fim)] + [col_contagem]
+    return agregado[colunas].reset_index(drop=True)
+
+
+def _segundos_hhmmss(serie):
+    partes = serie.fillna("").astype(str).str.extract(r"^(\d{1,2}):(\d{2}):(\d{2})")
+    numeros = partes.apply(pd.to_numeric, errors="coerce")
+    return (numeros[0] * 3600 + numeros[1] * 60 + numeros[2]).to_numpy(dtype=float)
+
+
+def compactar_gantt(intervalos, chaves=("equipamento", "tipo", "fonte"), tolerancia_s=None):
+    """
+    Compacta a lista intervalos_operacao (dicts com inicio 'HH:MM:SS' e
+    duracaoHoras), mantendo a ordem recebida. A duração da sequência é a
+    soma das durações (totais por tipo não mudam); `registros` conta as
+    linhas juntadas.
+    """
+    if not intervalos:
+        return intervalos
+    tolerancia_s = TOLERANCIA_PADRAO_S if tolerancia_s is None else tolerancia_s
+    df = pd.DataFrame(intervalos)
+    chaves = [c for c in chaves if c in df.columns]
+    duracao = pd.to_numeric(df["duracaoHoras"], errors="coerce").fillna(0).to_numpy()
+    inicio_s = _segundos_hhmmss(df["inicio"])
+    fim_s = inicio_s + duracao * 3600
+
+    sequencia = np.cumsum(_inicio_de_sequencia(df, chaves, inicio_s, fim_s, tolerancia_s))
+    outras = [c for c in df.columns if c not in chaves and c not in ("inicio", "duracaoHoras", "registros")]
+    # Intervalos já compactados na etapa 4 trazem quantas linhas de origem representam
+    registros = (df["registros"].fillna(1).astype("int64") if "registros" in df.columns
+                 else pd.Series(1, index=df.index))
+    agregado = df.assign(registros=registros).groupby(sequencia, sort=False).agg(
+        **{c: (c, "first") for c in [*chaves, "inicio", *outras]},
+        duracaoHoras=("duracaoHoras", "sum"),
+        registros=("registros", "sum"),
+    )
+    agregado["duracaoHoras"] = agregado["duracaoHoras"].round(6)
+    colunas = [c for c in df.columns if c != "registros"] + ["registros"]
+    return [
+        {k: (v.item() if isinstance(v, np.generic) else v) for k, v in linha.items()}
+        for linha in agregado[colunas].to_dict("records")
+    ]
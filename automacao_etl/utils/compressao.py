@@ -0,0 +1,172 @@
+"""
+compressao.py
+
+Cópias pré-comprimidas (.gz / .br) dos artefatos gerados (JSONs das etapas
+5 e 7, mapas HTML e index_mapas.json da etapa 8), gravadas ao lado do
+original por um pool de threads em segundo plano (zlib e brotli liberam o
+GIL, então a etapa segue enquanto os arquivos são comprimidos).
+
+Ativação pela variável de ambiente ETL_COMPRESSAO:
+    (vazia)      desligado
+    gz           só gzip (nível padrão 9)
+    gz,br        gzip e brotli (nível padrão 11)
+    gz:6,br:9    níveis explícitos
+
+brotli é opcional (pip install brotli); sem ele o formato br é ignorado com
+um aviso. Nada é instalado em tempo de execução.
+
+A cópia recebe o mesmo mtime do original: ler_precomprimido() só a devolve
+se os mtimes baterem, então um original regravado depois nunca é servido
+com uma cópia comprimida velha.
+"""
+
+import atexit
+import gzip
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.dependencias import disponivel, importar_tardio
+
+NIVEIS_PADRAO = {"gz": 9, "br": 11}
+EXTENSOES = {"gz": ".gz", "br": ".br"}
+CONTENT_ENCODING = {"gz": "gzip", "br": "br"}
+
+brotli = importar_tardio("brotli")
+
+_lock = threading.Lock()
+_executor = None
+_pendentes = []
+
+
+def _ler_configuracao(texto):
+    formatos = {}
+    for item in (texto or "").replace(";", ",").split(","):
+        nome, _, nivel = item.strip().lower().partition(":")
+        if nome not in NIVEIS_PADRAO:
+            continue
+        formatos[nome] = int(nivel) if nivel.strip().isdigit() else NIVEIS_PADRAO[nome]
+    if "br" in formatos and not disponivel("brotli"):
+        print("⚠️  ETL_COMPRESSAO pede br, mas o módulo brotli não está instalado (pip install brotli). Gerando só gz.")
+        formatos.pop("br")
+    return formatos
+
+
+FORMATOS = _ler_configuracao(os.environ.get("ETL_COMPRESSAO"))
+
+
+def ativo():
+    return bool(FORMATOS)
+
+
+def comprimir(conteudo, formato, nivel=None):
+    """Bytes comprimidos em `formato` ('gz' ou 'br')."""
+    nivel = NIVEIS_PADRAO[formato] if nivel is None else nivel
+    if formato == "gz":
+        # mtime=0: mesma entrada gera o mesmo .gz
+        return gzip.compress(conteudo, compresslevel=nivel, mtime=0)
+    if formato == "br":
+        return brotli.compress(conteudo, quality=nivel)
+    raise ValueError(f"Formato de compressão desconhecido: {formato}")
+
+
+def _gravar_copias(caminho, conteudo, mtime_ns, formatos):
+    if conteudo is None:
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+    for formato, nivel in formatos.items():
+        destino = caminho + EXTENSOES[formato]
+        tmp = f"{destino}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(comprimir(conteudo, formato, nivel))
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp, destino)
+
+
+def _obter_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="compressao"
+            )
+            atexit.register(aguardar)
+        return _executor
+
+
+def agendar(caminho, conteudo=None, formatos=None):
+    """
+    Agenda as cópias comprimidas de `caminho` (já gravado). Passe `conteudo`
+    quando os bytes já estiverem em memória, para não reler o arquivo.
+    Sem ETL_COMPRESSAO (e sem `formatos`) não faz nada.
+    """
+    formatos = FORMATOS if formatos is None else formatos
+    if not formatos:
+        return None
+    caminho = str(caminho)
+    mtime_ns = os.stat(caminho).st_mtime_ns
+    futuro = _obter_executor().submit(_gravar_copias, caminho, conteudo, mtime_ns, dict(formatos))
+    with _lock:
+        _pendentes.append((caminho, futuro))
+    return futuro
+
+
+def aguardar():
+    """Espera as compressões pendentes; avisa (sem interromper) as que falharam."""
+    with _lock:
+        pendentes = list(_pendentes)
+        _pendentes.clear()
+    for caminho, futuro in pendentes:
+        try:
+            futuro.result()
+        except Exception as e:
+            print(f"⚠️  Falha ao comprimir {os.path.basename(caminho)}: {e}")
+
+
+def ler_precomprimido(caminho, aceitos):
+    """
+    (bytes, formato) da cópia comprimida válida de `caminho`, na ordem de
+    preferência de `aceitos` (ex.: ['br', 'gz']), ou None.
+    """
+    try:
+        mtime_original = os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+    for formato in aceitos:
+        destino = str(caminho) + EXTENSOES.get(formato, "")
+        try:
+            if formato not in EXTENSOES or os.stat(destino).st_mtime_ns != mtime_original:
+                continue
+            with open(destino, "rb") as f:
+                return f.read(), formato
+        except OSError:
+            continue
+    return None
+
+
+def formatos_aceitos(accept_encoding):
+    """
+    Formatos do cabeçalho Accept-Encoding, br antes de gzip. Inclui br mesmo
+    sem o módulo brotli (cópias .br prontas podem ser servidas assim mesmo);
+    para comprimir na hora use formato_na_hora().
+    """
+    pedidos = set()
+    for item in (accept_encoding or "").split(","):
+        nome, _, parametros = item.strip().lower().partition(";")
+        if parametros.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        pedidos.add(nome.strip())
+    aceitos = []
+    if "br" in pedidos:
+        aceitos.append("br")
+    if "gzip" in pedidos or "*" in pedidos:
+        aceitos.append("gz")
+    return aceitos
+
+
+def formato_na_hora(aceitos):
+    """Primeiro formato de `aceitos` que dá para comprimir neste processo."""
+    for formato in aceitos:
+        if formato == "gz" or (formato == "br" and disponivel("brotli")):
+            return formato
+    return None
@@ -0,0 +1,64 @@
+"""
+dependencias.py
+
+Importação tardia das dependências pesadas (geopandas, folium, sklearn,
+pandas, openpyxl...).
+
+    gpd = importar_tardio("geopandas")
+
+devolve na hora um módulo "vazio" (importlib.util.LazyLoader); o import de
+verdade só acontece no primeiro acesso a um atributo (gpd.read_file...). Assim
+um script que termina cedo (ex.: --check sem entradas novas) não paga o custo
+de carregar bibliotecas que não vai usar.
+
+Dependência ausente não é instalada em tempo de execução: o acesso ao módulo
+levanta ImportError com a instrução de instalação.
+"""
+
+import importlib.util
+import sys
+
+
+class _ModuloAusente:
+    """Marcador para dependência não instalada; falha só quando usada."""
+
+    def __init__(self, nome):
+        self.__nome = nome
+
+    def __getattr__(self, atributo):
+        raise ImportError(
+            f"Dependência '{self.__nome}' não instalada. "
+            f"Instale com: pip install {self.__nome.split('.')[0]}"
+        )
+
+    def __bool__(self):
+        return False
+
+
+def importar_tardio(nome):
+    """Módulo `nome` com import adiado até o primeiro uso."""
+    if nome in sys.modules:
+        return sys.modules[nome]
+    try:
+        spec = importlib.util.find_spec(nome)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None:
+        return _ModuloAusente(nome)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    loader.exec_module(modulo)
+    return modulo
+
+
+def disponivel(nome):
+    """True se a dependência está instalada (sem importá-la)."""
+    if nome in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(nome) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,329 @@
+"""
+dim_operacoes.py
+
+Dimensão persistente de operações compartilhada pelas etapas Solinftec (4),
+Case (6) e consolidação (7).
+
+Cada descrição bruta (operação, grupo da operação ou status Case) é normalizada
+uma única vez e recebe um código inteiro estável, gravado em
+utils/dim_operacoes.json junto com seus indicadores (produtiva, manobra,
+colheita...). As etapas codificam a coluna de texto uma vez e passam a consultar
+os indicadores por índice inteiro, sem repetir comparações de string por linha.
+
+utils/dim_operacoes.json é a semente versionada e pode ser editada à mão para
+reclassificar uma operação. Entradas novas encontradas nos dados são
+classificadas pelas regras abaixo e gravadas no próximo salvar() em
+dados/cadastros/dim_operacoes.json (fora do git); na carga, o que está na
+semente prevalece sobre o aprendido.
+"""
+
+import copy
+import json
+import os
+import threading
+import unicodedata
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+DIM_OPERACOES_FILE = os.path.join(UTILS_DIR, "dim_operacoes.json")
+DIM_OPERACOES_APRENDIDO = os.environ.get("ETL_DIM_OPERACOES_APRENDIDO") or os.path.join(
+    os.path.dirname(UTILS_DIR), "dados", "cadastros", "dim_operacoes.json"
+)
+
+VERSAO_DIMENSAO = 1
+
+# Código reservado para valores vazios / nulos
+CODIGO_VAZIO = 0
+
+# Regras de classificação aplicadas a entradas ainda não cadastradas
+OPERACOES_EXATAS = {
+    "MANOBRA": ["manobra"],
+    "TRANSBORDANDO CANA": ["transbordo"],
+    "SEM APONTAMENTO": ["sem_apontamento"],
+    "CARREGANDO CANA": ["colheita"],
+    "COLHENDO CANA": ["colheita"],
+    "DESL VAZIO": ["desl_vazio"],
+    "DESL CARREGADO": ["desl_carregado"],
+}
+OPERACOES_CONTEM = {
+    "LAVAGEM": "lavagem",
+    "ROLETE": "rolete",
+}
+STATUS_DUTY = {
+    "WORKING": ["trabalhando"],
+    "KEYON": ["chave_ligada"],
+    "OFF": ["desligado"],
+}
+STATUS_DEVICE = {
+    "ON": ["ligado"],
+}
+
+# Categoria do Gantt (aba Intervalos) -> tipo exibido no frontend
+TIPOS_GANTT = {
+    "PRODUTIVA": "Produtivo",
+    "MANUTENCAO": "Manutenção",
+    "DISPONIVEL": "Disponível",
+}
+
+
+def normalizar_descricao(valor) -> str:
+    """Remove acentos, espaços repetidos e coloca em maiúsculas."""
+    if valor is None:
+        return ""
+    texto = str(valor)
+    if texto.lower() in ("nan", "none", "nat"):
+        return ""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.upper().split())
+
+
+def _classificar_grupo(chave: str) -> dict:
+    indicadores = []
+    if chave == "PRODUTIVA":
+        indicadores.append("produtiva")
+    if chave == "IMPRODUTIVA":
+        indicadores.append("improdutiva")
+    if "MANUTEN" in chave:
+        indicadores.append("manutencao")
+    if "improdutiva" in indicadores or "manutencao" in indicadores:
+        indicadores.append("ofensor")
+
+    if "PRODUTIVA" in chave and "IMPRODUTIVA" not in chave:
+        categoria = "PRODUTIVA"
+    elif "MANUTEN" in chave:
+        categoria = "MANUTENCAO"
+    else:
+        categoria = "DISPONIVEL"
+    return {"categoria": categoria, "indicadores": indicadores}
+
+
+def _classificar_operacao(chave: str) -> dict:
+    indicadores = list(OPERACOES_EXATAS.get(chave, []))
+    for trecho, indicador in OPERACOES_CONTEM.items():
+        if trecho in chave:
+            indicadores.append(indicador)
+    return {"grupo": "", "indicadores": indicadores}
+
+
+def _classificar_tabela(tabela):
+    def classificar(chave: str) -> dict:
+        return {"indicadores": list(tabela.get(chave, []))}
+    return classificar
+
+
+CLASSIFICADORES = {
+    "grupo": _classificar_grupo,
+    "operacao": _classificar_operacao,
+    "status_duty": _classificar_tabela(STATUS_DUTY),
+    "status_device": _classificar_tabela(STATUS_DEVICE),
+}
+
+
+class DimensaoOperacoes:
+    """Tabela descrição -> código inteiro + indicadores, por dimensão."""
+
+    def __init__(self, caminho: str = DIM_OPERACOES_FILE, caminho_aprendido: str = DIM_OPERACOES_APRENDIDO):
+        self.caminho = caminho
+        self.caminho_aprendido = caminho_aprendido
+        self._lock = threading.RLock()
+        self._alterada = False
+        self._tabelas = {nome: {} for nome in CLASSIFICADORES}
+        self._por_codigo = {nome: {} for nome in CLASSIFICADORES}
+        self._cache_bruto = {nome: {} for nome in CLASSIFICADORES}
+        self._vetores = {}
+        self._carregar()
+
+    # ── Persistência ──
+
+    @staticmethod
+    def _ler(caminho):
+        if not os.path.exists(caminho):
+            return {}
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                return json.load(f).get("dimensoes", {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Não foi possível ler {os.path.basename(caminho)}: {e}")
+            return {}
+
+    def _carregar(self):
+        for nome, entradas in self._ler(self.caminho).items():
+            if nome not in self._tabelas:
+                continue
+            for chave, entrada in entradas.items():
+                self._tabelas[nome][chave] = entrada
+                self._por_codigo[nome][int(entrada["codigo"])] = chave
+        self._semente = copy.deepcopy(self._tabelas)
+
+        # Aprendido: só acrescenta (chaves novas e campos que a semente não tem)
+        for nome, entradas in self._ler(self.caminho_aprendido).items():
+            if nome not in self._tabelas:
+                continue
+            tabela, por_codigo = self._tabelas[nome], self._por_codigo[nome]
+            for chave, entrada in entradas.items():
+                if chave in tabela:
+                    for campo, valor in entrada.items():
+                        tabela[chave].setdefault(campo, valor)
+                    continue
+                entrada = dict(entrada)
+                if int(entrada["codigo"]) in por_codigo:
+                    # Código tomado por uma entrada nova da semente
+                    entrada["codigo"] = max(por_codigo, default=CODIGO_VAZIO) + 1
+                    self._alterada = True
+                tabela[chave] = entrada
+                por_codigo[int(entrada["codigo"])] = chave
+
+    def salvar(self, forcar: bool = False):
+        """Grava as entradas aprendidas (somente se houve cadastro novo), de forma atômica."""
+        with self._lock:
+            if not self._alterada and not forcar:
+                return
+            conteudo = {
+                "versao": VERSAO_DIMENSAO,
+                "dimensoes": {
+                    nome: {
+                        chave: entrada
+                        for chave, entrada in sorted(tabela.items(), key=lambda kv: kv[1]["codigo"])
+                        if entrada != self._semente[nome].get(chave)
+                    }
+                    for nome, tabela in self._tabelas.items()
+                },
+            }
+            os.makedirs(os.path.dirname(self.caminho_aprendido), exist_ok=True)
+            tmp = f"{self.caminho_aprendido}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(conteudo, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.caminho_aprendido)
+            self._alterada = False
+
+    # ── Consulta por valor ──
+
+    def codigo(self, dimensao: str, valor) -> int:
+        """Código inteiro da descrição bruta (cadastra se for nova)."""
+        cache = self._cache_bruto[dimensao]
+        try:
+            return cache[valor]
+        except (KeyError, TypeError):
+            pass
+
+        chave = normalizar_descricao(valor)
+        if not chave:
+            cod = CODIGO_VAZIO
+        else:
+            with self._lock:
+                tabela = self._tabelas[dimensao]
+                if chave not in tabela:
+                    cod = max(self._por_codigo[dimensao], default=CODIGO_VAZIO) + 1
+                    entrada = {"codigo": cod}
+                    entrada.update(CLASSIFICADORES[dimensao](chave))
+                    tabela[chave] = entrada
+                    self._por_codigo[dimensao][cod] = chave
+                    self._vetores = {k: v for k, v in self._vetores.items() if k[0] != dimensao}
+                    self._alterada = True
+                cod = tabela[chave]["codigo"]
+
+        try:
+            cache[valor] = cod
+        except TypeError:
+            pass
+        return cod
+
+    def entrada(self, dimensao: str, valor) -> dict:
+        cod = self.codigo(dimensao, valor)
+        if cod == CODIGO_VAZIO:
+            return {"codigo": CODIGO_VAZIO, "indicadores": []}
+        return self._tabelas[dimensao][self._por_codigo[dimensao][cod]]
+
+    def tem(self, dimensao: str, valor, indicador: str) -> bool:
+        return indicador in self.entrada(dimensao, valor).get("indicadores", [])
+
+    def categoria_grupo(self, grupo) -> str:
+        return self.entrada("grupo", grupo).get("categoria", "DISPONIVEL")
+
+    def associar_grupo(self, operacao, grupo):
+        """Registra o grupo de origem da operação (usado p/ ofensores após o Gantt)."""
+        entrada = self.entrada("operacao", operacao)
+        chave_grupo = normalizar_descricao(grupo)
+        if entrada["codigo"] != CODIGO_VAZIO and chave_grupo and not entrada.get("grupo"):
+            with self._lock:
+                entrada["grupo"] = chave_grupo
+                self._alterada = True
+
+    def tipo_gantt(self, grupo, operacao="") -> str:
+        """Tipo do intervalo no frontend (Produtivo / Manutenção / Disponível...)."""
+        if self.tem("operacao", operacao, "sem_apontamento"):
+            return "Falta de Informação"
+        return TIPOS_GANTT.get(self.categoria_grupo(grupo), "Disponível")
+
+    def eh_ofensor(self, grupo, operacao="") -> bool:
+        """Tempo improdutivo/manutenção, pelo grupo de origem da operação se conhecido."""
+        grupo_origem = self.entrada("operacao", operacao).get("grupo")
+        return self.tem("grupo", grupo_origem or grupo, "ofensor")
+
+    # ── Consulta vetorizada (pandas / numpy) ──
+
+    def codificar(self, dimensao: str, serie, grupos=None):
+        """
+        Converte uma Series de descrições em array de códigos inteiros.
+        A normalização roda apenas sobre os valores únicos (pd.factorize).
+        Se `grupos` for informado (dimensão operacao), associa o grupo de origem.
+        """
+        import numpy as np
+        import pandas as pd
+
+        codigos_locais, unicos = pd.factorize(serie)
+        mapa = np.array([self.codigo(dimensao, u) for u in unicos] + [CODIGO_VAZIO], dtype=np.int32)
+
+        if grupos is not None and len(unicos):
+            primeiros = pd.Series(np.asarray(grupos)).groupby(codigos_locais).first()
+            for idx, grupo in primeiros.items():
+                if idx >= 0:
+                    self.associar_grupo(unicos[idx], grupo)
+
+        # -1 (nulo) cai na última posição do mapa -> CODIGO_VAZIO
+        return mapa[codigos_locais]
+
+    def vetor_indicador(self, dimensao: str, indicador: str):
+        """Array booleano indexado por código: True onde a entrada tem o indicador."""
+        import numpy as np
+
+        chave_cache = (dimensao, indicador)
+        vetor = self._vetores.get(chave_cache)
+        if vetor is None:
+            with self._lock:
+                tabela = self._tabelas[dimensao]
+                tamanho = max(self._por_codigo[dimensao], default=CODIGO_VAZIO) + 1
+                vetor = np.zeros(tamanho, dtype=bool)
+                for entrada in tabela.values():
+                    if indicador in entrada.get("indicadores", []):
+                        vetor[entrada["codigo"]] = True
+                self._vetores[chave_cache] = vetor
+        return vetor
+
+    def mascara(self, dimensao: str, codigos, indicador: str):
+        """Máscara booleana para um array de códigos já codificado."""
+        return self.vetor_indicador(dimensao, indicador)[codigos]
+
+    def atributo(self, dimensao: str, codigos, campo: str, padrao=""):
+        """Array com o valor de `campo` (ex.: categoria) para cada código."""
+        import numpy as np
+
+        with self._lock:
+            tamanho = max(self._por_codigo[dimensao], default=CODIGO_VAZIO) + 1
+            valores = np.full(tamanho, padrao, dtype=object)
+            for entrada in self._tabelas[dimensao].values():
+                valores[entrada["codigo"]] = entrada.get(campo, padrao)
+        return valores[codigos]
+
+
+_dimensao = None
+_dimensao_lock = threading.Lock()
+
+
+def obter_dimensao() -> DimensaoOperacoes:
+    """Instância compartilhada da dimensão (carregada uma vez por processo)."""
+    global _dimensao
+    with _dimensao_lock:
+        if _dimensao is None:
+            _dimensao = DimensaoOperacoes()
+        return _dimensao
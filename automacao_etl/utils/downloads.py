@@ -0,0 +1,224 @@
+"""
+downloads.py
+
+Detecção de downloads concluídos para os extratores.
+
+- ObservadorDownloads: observa a pasta de download (Selenium / script 1). No
+  Linux usa inotify (via ctypes) e acorda no instante em que o navegador fecha
+  ou renomeia o arquivo final; nos demais sistemas cai para varredura com
+  os.scandir em intervalos crescentes. Em ambos os casos só considera arquivos
+  que não existiam quando o observador foi criado, ignora parciais
+  (.crdownload, .part, .tmp) e confere se o tamanho estabilizou antes de
+  devolver o caminho.
+- salvar_download: gancho sobre page.expect_download do Playwright (scripts 2
+  e 3), que salva o arquivo no destino e mede o tempo.
+
+Ambos informam a vazão (MB/s) do download em `estatisticas`.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+EXTENSOES_PARCIAIS = (".crdownload", ".part", ".tmp", ".download")
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENTO_INOTIFY = struct.Struct("iIII")
+
+logger = logging.getLogger("downloads")
+
+
+def _abrir_inotify(pasta: str):
+    """Descritor inotify observando a pasta, ou None se indisponível."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mascara = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(pasta), mascara) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _ler_eventos(fd) -> list:
+    """Nomes de arquivo dos eventos pendentes no descritor inotify."""
+    nomes = []
+    try:
+        dados = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return nomes
+    pos = 0
+    while pos + _EVENTO_INOTIFY.size <= len(dados):
+        _, _, _, tamanho = _EVENTO_INOTIFY.unpack_from(dados, pos)
+        pos += _EVENTO_INOTIFY.size
+        nome = dados[pos:pos + tamanho].rstrip(b"\0")
+        pos += tamanho
+        if nome:
+            nomes.append(os.fsdecode(nome))
+    return nomes
+
+
+def eh_parcial(nome: str) -> bool:
+    return nome.lower().endswith(EXTENSOES_PARCIAIS)
+
+
+def descrever_vazao(estatisticas: dict) -> str:
+    if not estatisticas:
+        return ""
+    mb = estatisticas["bytes"] / (1024 * 1024)
+    return f"{mb:.2f} MB em {estatisticas['segundos']:.1f}s ({estatisticas['mb_por_s']:.2f} MB/s)"
+
+
+def _estatisticas(caminho: str, inicio: float) -> dict:
+    segundos = max(time.perf_counter() - inicio, 1e-6)
+    tamanho = os.path.getsize(caminho)
+    return {
+        "arquivo": caminho,
+        "bytes": tamanho,
+        "segundos": round(segundos, 3),
+        "mb_por_s": round(tamanho / (1024 * 1024) / segundos, 3),
+    }
+
+
+class ObservadorDownloads:
+    """
+    Aguarda o próximo arquivo completo na pasta de download.
+
+    Crie o observador ANTES de disparar o download (o instante da criação é o
+    início da medição de vazão):
+
+        with ObservadorDownloads(download_path) as obs:
+            botao.click()
+            arquivo = obs.aguardar(timeout=240)
+    """
+
+    def __init__(self, pasta: str, estabilidade_s: float = 0.5):
+        self.pasta = pasta
+        self.estabilidade_s = estabilidade_s
+        self.estatisticas = None
+        os.makedirs(pasta, exist_ok=True)
+        self._fd = _abrir_inotify(pasta)
+        self._existentes = self._listar()
+        self._candidatos = []
+        self._inicio = time.perf_counter()
+
+    @property
+    def usa_inotify(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def fechar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def ignorar(self, nomes):
+        """Marca arquivos como já conhecidos (ex.: gerados pelo próprio processo)."""
+        nomes = {os.path.basename(n) for n in nomes}
+        self._existentes |= nomes
+        self._candidatos = [n for n in self._candidatos if n not in nomes]
+
+    def esquecer_removidos(self):
+        """Esquece arquivos que saíram da pasta, para detectá-los se voltarem."""
+        self._existentes &= self._listar()
+
+    def _listar(self) -> set:
+        try:
+            with os.scandir(self.pasta) as it:
+                return {e.name for e in it if e.is_file()}
+        except OSError:
+            return set()
+
+    def _novos_por_varredura(self) -> list:
+        return [n for n in self._listar() - self._existentes if not eh_parcial(n)]
+
+    def _tamanho_estavel(self, caminho: str) -> bool:
+        """Confere se o arquivo existe, não está vazio e parou de crescer."""
+        try:
+            antes = os.path.getsize(caminho)
+            time.sleep(self.estabilidade_s)
+            return antes > 0 and os.path.getsize(caminho) == antes
+        except OSError:
+            return False
+
+    def aguardar(self, timeout: float = 240, ao_esperar=None):
+        """
+        Caminho do arquivo concluído, ou None se estourar o timeout.
+        `ao_esperar()` é chamado a cada ciclo sem evento (ex.: checar captcha).
+        """
+        limite = time.monotonic() + timeout
+        intervalo = 0.2
+
+        while True:
+            novos = _ler_eventos(self._fd) if self._fd is not None else self._novos_por_varredura()
+            # Um arquivo gera vários eventos (IN_CREATE, IN_CLOSE_WRITE...): entra na fila uma vez
+            for n in novos:
+                if n not in self._existentes and n not in self._candidatos and not eh_parcial(n):
+                    self._candidatos.append(n)
+
+            while self._candidatos:
+                nome = self._candidatos.pop(0)
+                if nome in self._existentes:
+                    continue
+                caminho = os.path.join(self.pasta, nome)
+                if os.path.isfile(caminho) and self._tamanho_estavel(caminho):
+                    self._existentes.add(nome)
+                    self.estatisticas = _estatisticas(caminho, self._inicio)
+                    logger.info(f"Download detectado: {nome} - {descrever_vazao(self.estatisticas)}")
+                    return caminho
+                if os.path.isfile(caminho) and nome not in self._candidatos:
+                    # Ainda crescendo: reavalia no próximo ciclo
+                    self._candidatos.append(nome)
+                    break
+
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            if ao_esperar is not None:
+                ao_esperar()
+
+            espera = min(restante, 1.0 if self._candidatos else 5.0)
+            if self._fd is not None:
+                select.select([self._fd], [], [], espera)
+            else:
+                time.sleep(min(espera, intervalo))
+                intervalo = min(intervalo * 1.5, 2.0)
+
+
+def salvar_download(page, acao, pasta_destino: str, nome_arquivo: str = None, timeout_s: float = 120):
+    """
+    Executa `acao()` dentro de page.expect_download e salva o arquivo em
+    pasta_destino (com o nome sugerido pelo servidor, se nome_arquivo=None).
+    Retorna as estatísticas do download (arquivo, bytes, segundos, mb_por_s).
+    """
+    inicio = time.perf_counter()
+    with page.expect_download(timeout=timeout_s * 1000) as download_info:
+        acao()
+    download = download_info.value
+
+    os.makedirs(pasta_destino, exist_ok=True)
+    caminho = os.path.join(pasta_destino, nome_arquivo or download.suggested_filename)
+    download.save_as(caminho)
+
+    return _estatisticas(caminho, inicio)
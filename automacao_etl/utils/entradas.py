@@ -0,0 +1,95 @@
+"""
+entradas.py
+
+Detecção barata de entradas novas para o modo --check das etapas.
+
+A assinatura das entradas é o conjunto (caminho, tamanho, mtime) dos arquivos
+que casam com os padrões da etapa. Ao final de uma execução bem-sucedida a
+etapa grava a assinatura em logs/entradas_<etapa>.json; com --check, se a
+assinatura atual for igual à gravada, a etapa encerra sem carregar pandas,
+geopandas etc.
+
+Só usa os.scandir/glob e json: roda em poucos milissegundos.
+
+classificar_arquivo() diz de que fonte é um arquivo de dados/ (ou se não é
+entrada do ETL: tratados, consolidados da Case, temporários do Excel);
+orquestrador, etapa 4 e etapa 5 escolhem as entradas por ela.
+"""
+
+import glob
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+
+
+def _arquivo_estado(etapa):
+    return os.path.join(LOGS_DIR, f"entradas_{etapa}.json")
+
+
+def assinatura(padroes, filtro=None):
+    """
+    {caminho relativo: [tamanho, mtime_ns]} dos arquivos que casam com os
+    padrões (e cujo nome passa em `filtro(nome)`, se informado).
+    """
+    resultado = {}
+    for padrao in padroes:
+        for caminho in glob.glob(str(padrao)):
+            if filtro is not None and not filtro(os.path.basename(caminho)):
+                continue
+            try:
+                st = os.stat(caminho)
+            except OSError:
+                continue
+            chave = os.path.relpath(caminho, BASE_DIR).replace(os.sep, "/")
+            resultado[chave] = [st.st_size, st.st_mtime_ns]
+    return resultado
+
+
+def ha_entradas_novas(etapa, padroes, filtro=None):
+    """True se alguma entrada surgiu, mudou ou sumiu desde a última execução."""
+    atual = assinatura(padroes, filtro)
+    if not atual:
+        return False
+    try:
+        with open(_arquivo_estado(etapa), "r", encoding="utf-8") as f:
+            anterior = json.load(f).get("arquivos", {})
+    except (OSError, ValueError):
+        return True
+    return atual != anterior
+
+
+def registrar_entradas(etapa, padroes, filtro=None):
+    """Grava a assinatura atual (chamar depois que a etapa gravou as saídas)."""
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    caminho = _arquivo_estado(etapa)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"arquivos": assinatura(padroes, filtro)}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, caminho)
+
+
+def classificar_arquivo(nome):
+    """Fonte do arquivo baixado em dados/, ou None se não for entrada do ETL."""
+    minusculo = nome.lower()
+    if minusculo.startswith("~$") or "_tratado" in minusculo or minusculo.startswith("consolidado_case_"):
+        return None
+    if minusculo.endswith(".zip"):
+        if minusculo.startswith("case"):
+            return "case"
+        if minusculo.startswith("colhedora_"):
+            return "opc"
+        if "linha_do_tempo" in minusculo:
+            return "solinftec"
+        return None
+    if minusculo.endswith(".xlsx"):
+        return "solinftec"
+    return None
+
+
+def eh_tratado_solinftec(nome):
+    """True para o tratado que a etapa 4 gera de uma planilha Solinftec (<nome>_tratado.xlsx)."""
+    minusculo = os.path.basename(nome).lower()
+    sufixo = "_tratado.xlsx"
+    return minusculo.endswith(sufixo) and classificar_arquivo(minusculo[:-len(sufixo)] + ".xlsx") == "solinftec"
@@ -0,0 +1,280 @@
+"""
+esperas.py
+
+Camada de espera compartilhada pelos extratores (1 Solinftec/Selenium,
+2 OPC e 3 Case/Playwright).
+
+Em vez de pausas fixas (time.sleep / wait_for_timeout), cada passo espera por
+uma condição: estado de elemento, rede ociosa ou resposta HTTP. O tempo que a
+condição levou é registrado por passo em logs/latencias_esperas.json e o
+timeout do passo passa a ser adaptativo:
+
+    timeout = p95(latências recentes) * FATOR_P95
+              limitado a [padrao * LIMITE_INFERIOR, padrao * LIMITE_SUPERIOR]
+
+Sem histórico, vale o timeout padrão informado pelo chamador. Uma espera que
+estoura entra no histórico com o tempo decorrido, então um portal que ficou
+lento ganha mais folga nas execuções seguintes.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LATENCIAS_FILE = os.path.join(BASE_DIR, "logs", "latencias_esperas.json")
+
+# Amostras mantidas por passo
+JANELA_AMOSTRAS = 50
+# Mínimo de amostras para confiar no histórico
+MIN_AMOSTRAS = 3
+FATOR_P95 = 3.0
+LIMITE_INFERIOR = 0.5
+LIMITE_SUPERIOR = 4.0
+
+logger = logging.getLogger("esperas")
+
+
+class HistoricoLatencias:
+    """Latências por passo (segundos), persistidas entre execuções."""
+
+    def __init__(self, caminho: str = LATENCIAS_FILE):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._amostras = {}
+        self._alterado = False
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            self._amostras = {k: list(v)[-JANELA_AMOSTRAS:] for k, v in dados.get("passos", {}).items()}
+        except Exception as e:
+            logger.warning(f"Histórico de latências ignorado ({e})")
+
+    def registrar(self, passo: str, segundos: float):
+        with self._lock:
+            amostras = self._amostras.setdefault(passo, [])
+            amostras.append(round(float(segundos), 3))
+            del amostras[:-JANELA_AMOSTRAS]
+            self._alterado = True
+
+    def p95(self, passo: str) -> float | None:
+        with self._lock:
+            amostras = sorted(self._amostras.get(passo, []))
+        if len(amostras) < MIN_AMOSTRAS:
+            return None
+        idx = min(len(amostras) - 1, math.ceil(0.95 * len(amostras)) - 1)
+        return amostras[idx]
+
+    def timeout(self, passo: str, padrao: float) -> float:
+        """Timeout adaptativo (segundos) para o passo."""
+        p95 = self.p95(passo)
+        if p95 is None:
+            return padrao
+        return max(padrao * LIMITE_INFERIOR, min(padrao * LIMITE_SUPERIOR, p95 * FATOR_P95))
+
+    def resumo(self) -> dict:
+        with self._lock:
+            passos = {k: list(v) for k, v in self._amostras.items()}
+        return {
+            passo: {
+                "amostras": len(v),
+                "ultima_s": v[-1] if v else None,
+                "p95_s": self.p95(passo),
+            }
+            for passo, v in passos.items()
+        }
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            conteudo = {
+                "atualizado_em": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "passos": self._amostras,
+            }
+            try:
+                os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+                tmp = f"{self.caminho}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(conteudo, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.caminho)
+                self._alterado = False
+            except Exception as e:
+                logger.warning(f"Não foi possível salvar latências: {e}")
+
+
+_historico = None
+_historico_lock = threading.Lock()
+
+
+def obter_historico() -> HistoricoLatencias:
+    global _historico
+    with _historico_lock:
+        if _historico is None:
+            _historico = HistoricoLatencias()
+            atexit.register(_historico.salvar)
+        return _historico
+
+
+def timeout_adaptativo(passo: str, padrao_s: float) -> float:
+    return obter_historico().timeout(passo, padrao_s)
+
+
+@contextmanager
+def cronometrar(passo: str):
+    """Registra a duração do bloco como latência do passo (mesmo se falhar)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        obter_historico().registrar(passo, time.perf_counter() - inicio)
+
+
+def _esperar(passo: str, padrao_s: float, condicao, obrigatorio: bool):
+    """Executa condicao(timeout_s); registra latência e trata o timeout."""
+    timeout_s = timeout_adaptativo(passo, padrao_s)
+    inicio = time.perf_counter()
+    try:
+        resultado = condicao(timeout_s)
+        obter_historico().registrar(passo, time.perf_counter() - inicio)
+        return resultado if resultado is not None else True
+    except Exception as e:
+        decorrido = time.perf_counter() - inicio
+        obter_historico().registrar(passo, decorrido)
+        if obrigatorio:
+            raise
+        logger.warning(f"Espera '{passo}' não satisfeita em {decorrido:.1f}s (limite {timeout_s:.1f}s): {e}")
+        return False
+
+
+# ─── Playwright ────────────────────────────────────────────────────────────────
+
+def esperar_estado(locator, passo: str, estado: str = "visible", padrao_s: float = 30, obrigatorio: bool = False):
+    """Aguarda o locator atingir o estado (visible, hidden, attached, detached)."""
+    return _esperar(
+        passo, padrao_s,
+        lambda t: locator.first.wait_for(state=estado, timeout=t * 1000),
+        obrigatorio,
+    )
+
+
+def esperar_rede_ociosa(page, passo: str, padrao_s: float = 30, obrigatorio: bool = False):
+    """Aguarda a página sem requisições pendentes (networkidle)."""
+    return _esperar(
+        passo, padrao_s,
+        lambda t: page.wait_for_load_state("networkidle", timeout=t * 1000),
+        obrigatorio,
+    )
+
+
+def esperar_funcao(page, expressao_js: str, passo: str, padrao_s: float = 30, obrigatorio: bool = False):
+    """Aguarda uma expressão JS retornar verdadeiro na página."""
+    return _esperar(
+        passo, padrao_s,
+        lambda t: page.wait_for_function(expressao_js, timeout=t * 1000),
+        obrigatorio,
+    )
+
+
+def esperar_primeiro_visivel(page, locators, passo: str, padrao_s: float = 30, intervalo_ms: int = 200):
+    """
+    Aguarda o primeiro de vários locators (ex.: botão na página OU no iframe)
+    ficar visível e o retorna; None se nenhum aparecer no tempo.
+    """
+    def condicao(t):
+        limite = time.monotonic() + t
+        while True:
+            for loc in locators:
+                try:
+                    if loc.first.is_visible():
+                        return loc
+                except Exception:
+                    pass
+            if time.monotonic() >= limite:
+                raise TimeoutError("nenhum elemento visível")
+            page.wait_for_timeout(intervalo_ms)
+
+    resultado = _esperar(passo, padrao_s, condicao, obrigatorio=False)
+    return resultado or None
+
+
+def esperar_texto_diferente(page, locator, texto_anterior: str, passo: str, padrao_s: float = 5, intervalo_ms: int = 50):
+    """Aguarda o texto do locator mudar (ex.: título do calendário após 'próximo mês')."""
+    def condicao(t):
+        limite = time.monotonic() + t
+        while (locator.text_content() or "").strip() == (texto_anterior or "").strip():
+            if time.monotonic() >= limite:
+                raise TimeoutError("texto não mudou")
+            page.wait_for_timeout(intervalo_ms)
+        return True
+
+    return _esperar(passo, padrao_s, condicao, obrigatorio=False)
+
+
+def esperar_resposta(page, predicado, acao, passo: str, padrao_s: float = 60, obrigatorio: bool = False):
+    """
+    Executa `acao()` e aguarda uma resposta HTTP que satisfaça `predicado(response)`.
+    Retorna a Response (ou False se não chegou a tempo).
+    """
+    def condicao(t):
+        with page.expect_response(predicado, timeout=t * 1000) as info:
+            acao()
+        return info.value
+
+    return _esperar(passo, padrao_s, condicao, obrigatorio)
+
+
+# ─── Selenium ──────────────────────────────────────────────────────────────────
+
+def esperar_selenium(driver, condicao, passo: str, padrao_s: float = 20, obrigatorio: bool = True):
+    """
+    WebDriverWait(driver, timeout_adaptativo).until(condicao).
+    Por padrão propaga o TimeoutException, como o WebDriverWait original.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    return _esperar(
+        passo, padrao_s,
+        lambda t: WebDriverWait(driver, t, poll_frequency=0.2).until(condicao),
+        obrigatorio,
+    )
+
+
+def esperar_documento_pronto(driver, passo: str, padrao_s: float = 20):
+    """Aguarda document.readyState == 'complete'."""
+    return esperar_selenium(
+        driver,
+        lambda d: d.execute_script("return document.readyState") == "complete",
+        passo, padrao_s, obrigatorio=False,
+    )
+
+
+def esperar_sem_loader(driver, seletor_css: str, passo: str, padrao_s: float = 30):
+    """Aguarda o indicador de carregamento (ex.: .router-animation-loader) sumir."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
+    return esperar_selenium(
+        driver,
+        EC.invisibility_of_element_located((By.CSS_SELECTOR, seletor_css)),
+        passo, padrao_s, obrigatorio=False,
+    )
+
+
+def esperar_atributo_mudar(driver, elemento, atributo: str, valor_anterior, passo: str, padrao_s: float = 5):
+    """Aguarda o atributo do elemento mudar (ex.: class de checkbox após clique)."""
+    return esperar_selenium(
+        driver,
+        lambda d: (elemento.get_attribute(atributo) or "") != (valor_anterior or ""),
+        passo, padrao_s, obrigatorio=False,
+    )
@@ -0,0 +1,647 @@
+"""
+gerador_carga.py
+
+Gera dados sintéticos (determinísticos, a partir de uma semente) nos mesmos
+formatos de entrada do ETL, para testes de carga e benchmarks offline:
+
+- Solinftec: "Linha_do_tempo-DD-MM-YYYY_DD-MM-YYYY.xlsx" (relatório
+  Regional/Unidade/Frente/Equipamento - Detalhado, aba Plan1). Acima do limite
+  de linhas do Excel o período é dividido em fragmentos
+  "__lote-<id>__frag-<n>", como na extração fragmentada do script 1.
+- Case IH: "Case<AAAAmmdd>000000.zip" com um CSV longo por trator
+  (metrics/CEQ..._AAAAmmdd-AAAAmmdd.csv).
+- OPC: "Colhedora_MB<frota>.zip" com shapefiles de pontos (um por dia).
+
+As três fontes saem da mesma linha do tempo por frota (operação, velocidade,
+trajeto), então os cruzamentos entre elas (etapas 7 e 8) fazem sentido.
+O mix de operações e as durações médias vêm da semana real de out/2025.
+
+Uso:
+    python utils/gerador_carga.py --saida /tmp/carga --escala 10
+    python utils/gerador_carga.py --saida /tmp/carga --frotas 48 --dias 14 --intervalo 10
+"""
+
+import argparse
+import json
+import os
+import struct
+import zipfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_SAIDA_PADRAO = os.path.join(BASE_DIR, "dados_sinteticos")
+
+# Limite de linhas de uma planilha do Excel (menos o cabeçalho)
+LIMITE_LINHAS_XLSX = 1_048_575
+
+# Volume da semana de referência (escala 1)
+FROTAS_REFERENCIA = 24
+DIAS_REFERENCIA = 8
+DATA_INICIO_PADRAO = "2025-10-05"
+CENTRO_PADRAO = (-19.5706, -49.6806)
+
+CATALOGO_OPERACOES = {
+    1000: ("COLHENDO CANA", "PRODUTIVA"),
+    1001: ("MANOBRA", "PRODUTIVA"),
+    1002: ("CARREGANDO CANA", "PRODUTIVA"),
+    1003: ("DESL VAZIO", "PRODUTIVA"),
+    1004: ("DESL CARREGADO", "PRODUTIVA"),
+    1005: ("TRANSBORDANDO CANA", "PRODUTIVA"),
+    2002: ("PARADA PROGRAMADA", "IMPRODUTIVA"),
+    2008: ("FALTA DE TRANSBORDO", "IMPRODUTIVA"),
+    2009: ("SEM APONTAMENTO", "IMPRODUTIVA"),
+    2011: ("AGUARDANDO COLHEDORA", "IMPRODUTIVA"),
+    2012: ("FALTA DE CONJUNTO VAZIO", "IMPRODUTIVA"),
+    2040: ("AG MANOBRA TRANSBORDO", "IMPRODUTIVA"),
+    3000: ("DESLOCAMENTO INTERNO", "AUXILIAR"),
+    3004: ("REFEICAO E NECESSIDADES", "AUXILIAR"),
+    3005: ("ABASTECENDO- LUBRIFICANDO", "AUXILIAR"),
+    3006: ("TROCA DE TURNO", "AUXILIAR"),
+    3007: ("FILA PARA TRANSBORDAR", "AUXILIAR"),
+    4000: ("CHUVA  SOLO UMIDO", "CLIMÁTICO"),
+    5000: ("TROCA DE FAQUINHA", "MANUTENCAO"),
+    5001: ("MANUTENCAO", "MANUTENCAO"),
+}
+
+# Por tipo: (código da operação, ocorrências na semana real, duração média s, velocidade média km/h)
+MIX_PADRAO = {
+    "COLHEDORA DE CANA": [
+        (1000, 7253, 195, 4.8), (1001, 6251, 72, 3.3), (3000, 641, 212, 4.1),
+        (2009, 567, 3100, 0), (2008, 257, 1315, 0), (2040, 247, 287, 0),
+        (3006, 69, 1720, 0), (5001, 65, 9000, 0), (4000, 45, 16900, 0),
+        (3004, 23, 675, 0), (5000, 21, 1390, 0), (2002, 21, 1270, 0), (3005, 7, 1240, 0),
+    ],
+    "TRATOR TRANSBORDO": [
+        (1002, 4630, 166, 4.8), (1001, 3484, 77, 4.9), (1004, 2104, 267, 6.6),
+        (1003, 1454, 346, 7.1), (2009, 1316, 1622, 0), (2011, 800, 919, 0),
+        (1005, 780, 206, 3.3), (3007, 110, 395, 0), (3006, 96, 971, 0),
+        (2012, 94, 2392, 0), (2002, 57, 2027, 0), (4000, 43, 24693, 0),
+    ],
+    "GRUNNER": [
+        (1002, 636, 204, 5.6), (1001, 499, 73, 5.7), (1003, 277, 453, 10.5),
+        (1004, 170, 252, 10.7), (2009, 153, 899, 0), (1005, 139, 151, 5.3),
+        (2011, 39, 790, 0), (3007, 11, 1399, 0), (4000, 6, 9624, 0), (3006, 3, 1248, 0),
+    ],
+}
+
+# Frotas por tipo na semana de referência (10 colhedoras, 12 transbordos, 2 grunners)
+PROPORCAO_FROTAS = {"COLHEDORA DE CANA": 10, "TRATOR TRANSBORDO": 12, "GRUNNER": 2}
+
+COLUNAS_SOLINFTEC = [
+    "Descrição Regional", "Descrição da Unidade", "Descrição do Grupo de Equipamento",
+    "Código Equipamento", "Descrição do Equipamento", "Código de Operador", "Nome",
+    "Data Hora Local", "Hora Inicial", "Hora Final", "Código da Operação",
+    "Descrição da Operação", "Descrição do Grupo da Operação", "Código da Fazenda",
+    "Código da Zona", "Código do Talhão", "Descrição da Fazenda",
+    "Horímetro/Odometro Inicial", "Horímetro/Odometro Final",
+    "Horímetro/Odometro Secundário", "Velocidade Média",
+]
+
+COLUNAS_CASE = ["ceqid", "nickname", "vin", "name", "numeric_value", "text_value", "uom", "event_timestamp", "lat", "lon"]
+
+# Métricas Case numéricas com motor ligado: nome -> (média, desvio, unidade)
+METRICAS_CASE_MOTOR = {
+    "Carga do Motor": (57.0, 26.7, "%"),
+    "Temperatura do líquido de arrefecimento do motor": (90.0, 5.0, "DEG_C"),
+    "Tensão bateria": (13.3, 0.35, "V"),
+    "Pressão óleo motor": (3.9, 0.9, "BAR"),
+    "Temperatura do óleo da transmissão": (70.8, 15.2, "DEG_C"),
+}
+
+# A Case grava o fuso local no timestamp
+FUSO_CASE = "-03:00"
+
+RAIO_AREA_M = 2500
+METROS_POR_GRAU = 111_320.0
+
+
+# ─── Frotas e linha do tempo ───────────────────────────────────────────────────
+
+def _rng(semente, *chave):
+    """Gerador independente por (semente, chave): o resultado de uma frota não
+    depende de quantas outras foram geradas antes dela."""
+    return np.random.default_rng(np.random.SeedSequence([semente, *chave]))
+
+
+def distribuir_frotas(total):
+    """Quantidade de frotas por tipo, na proporção da semana de referência."""
+    soma = sum(PROPORCAO_FROTAS.values())
+    quantidades = {t: max(1, int(total * p / soma)) for t, p in PROPORCAO_FROTAS.items()}
+    # Sobra do arredondamento vai para os transbordos
+    quantidades["TRATOR TRANSBORDO"] += max(0, total - sum(quantidades.values()))
+    return quantidades
+
+
+def montar_frotas(total, semente):
+    """Lista de frotas (código, tipo, frente, operadores) com códigos únicos."""
+    rng = _rng(semente, 0)
+    quantidades = distribuir_frotas(total)
+    n = sum(quantidades.values())
+    codigos = rng.choice(np.arange(100, 100 + max(1000, n * 10)), size=n, replace=False)
+
+    frotas = []
+    n_frentes = max(1, quantidades["COLHEDORA DE CANA"] // 2)
+    centros = [
+        (CENTRO_PADRAO[0] + rng.uniform(-0.15, 0.15), CENTRO_PADRAO[1] + rng.uniform(-0.15, 0.15))
+        for _ in range(n_frentes)
+    ]
+    i = 0
+    for tipo, qtd in quantidades.items():
+        for j in range(qtd):
+            codigo = int(codigos[i])
+            frente = j % n_frentes
+            operadores = [(10000 + codigo * 3 + k, f"OPERADOR {codigo}-{k + 1}") for k in range(3)]
+            frotas.append({
+                "indice": i,
+                "codigo": codigo,
+                "tipo": tipo,
+                "frente": frente,
+                "centro": centros[frente],
+                "operadores": operadores,
+            })
+            i += 1
+    return frotas
+
+
+def _tabela_mix(tipo, mix_improdutivo):
+    tabela = np.array(MIX_PADRAO[tipo], dtype=float)
+    codigos = tabela[:, 0].astype(int)
+    pesos = tabela[:, 1].copy()
+    produtiva = np.array([CATALOGO_OPERACOES[c][1] == "PRODUTIVA" for c in codigos])
+    pesos[~produtiva] *= mix_improdutivo
+    return codigos, pesos / pesos.sum(), tabela[:, 2], tabela[:, 3]
+
+
+def gerar_linha_tempo(frota, dias, semente, mix_improdutivo=1.0):
+    """
+    Intervalos contínuos de operação da frota, dia a dia (cada dia de 00:00:00
+    a 23:59:59, como no relatório Solinftec). Tempos em segundos desde o
+    início do período.
+    """
+    rng = _rng(semente, 1, frota["indice"])
+    codigos, probs, duracoes, velocidades = _tabela_mix(frota["tipo"], mix_improdutivo)
+    duracao_esperada = float(probs @ duracoes)
+
+    partes = {"inicio": [], "fim": [], "operacao": [], "velocidade": []}
+    for dia in range(dias):
+        escolhas, tempos = [], []
+        total = 0
+        while total < 86400:
+            n = int(86400 / duracao_esperada * 1.5) + 16
+            idx = rng.choice(len(codigos), size=n, p=probs)
+            dur = np.maximum(5, rng.exponential(duracoes[idx])).astype(np.int64)
+            escolhas.append(idx)
+            tempos.append(dur)
+            total += int(dur.sum())
+        idx = np.concatenate(escolhas)
+        fim = np.cumsum(np.concatenate(tempos))
+        n = int(np.searchsorted(fim, 86399)) + 1
+        idx, fim = idx[:n], fim[:n]
+        fim[-1] = 86399
+        inicio = np.concatenate(([0], fim[:-1]))
+
+        vel = velocidades[idx] * rng.lognormal(0, 0.25, size=n)
+        partes["inicio"].append(inicio + dia * 86400)
+        partes["fim"].append(fim + dia * 86400)
+        partes["operacao"].append(codigos[idx])
+        partes["velocidade"].append(np.round(vel, 2))
+
+    return {k: np.concatenate(v) for k, v in partes.items()}
+
+
+def amostrar_estado(linha_tempo, segundos):
+    """Operação e velocidade (km/h) vigentes em cada instante amostrado."""
+    pos = np.searchsorted(linha_tempo["inicio"], segundos, side="right") - 1
+    pos = np.clip(pos, 0, len(linha_tempo["inicio"]) - 1)
+    return linha_tempo["operacao"][pos], linha_tempo["velocidade"][pos]
+
+
+def gerar_trajeto(rng, segundos, velocidade_kmh, centro):
+    """
+    Trajeto plausível: passo proporcional à velocidade, rumo com deriva suave
+    e meia-volta ocasional (fim de linha), rebatido para ficar na área da frente.
+    """
+    n = len(segundos)
+    dt = np.diff(segundos, prepend=segundos[:1]).astype(float)
+    passo = velocidade_kmh / 3.6 * dt
+    giro = rng.normal(0, 3, size=n) + np.where(rng.random(n) < 0.01, 180.0, 0.0)
+    rumo = (rng.uniform(0, 360) + np.cumsum(giro)) % 360
+    rad = np.radians(rumo)
+
+    def rebater(v):
+        # Onda triangular: mantém a coordenada em [-RAIO_AREA_M, RAIO_AREA_M]
+        return np.abs((v + RAIO_AREA_M) % (4 * RAIO_AREA_M) - 2 * RAIO_AREA_M) - RAIO_AREA_M
+
+    x = rebater(rng.uniform(-RAIO_AREA_M, RAIO_AREA_M) + np.cumsum(passo * np.sin(rad)))
+    y = rebater(rng.uniform(-RAIO_AREA_M, RAIO_AREA_M) + np.cumsum(passo * np.cos(rad)))
+    lat = centro[0] + y / METROS_POR_GRAU
+    lon = centro[1] + x / (METROS_POR_GRAU * np.cos(np.radians(centro[0])))
+    return lat, lon, rumo
+
+
+def _instantes(rng, dias, intervalo_s):
+    """Instantes de amostragem (s) com jitter de ±30% no intervalo."""
+    n = int(dias * 86400 / intervalo_s) + 1
+    passos = np.maximum(1, np.round(intervalo_s * rng.uniform(0.7, 1.3, size=n))).astype(np.int64)
+    segundos = np.cumsum(passos) - passos[0]
+    return segundos[segundos < dias * 86400]
+
+
+def _motor_ligado(operacoes, velocidades):
+    produtiva = np.isin(operacoes, [c for c, (_, g) in CATALOGO_OPERACOES.items() if g == "PRODUTIVA"])
+    return produtiva | (velocidades > 0)
+
+
+# ─── Solinftec (XLSX) ──────────────────────────────────────────────────────────
+
+def _hhmmss(segundos):
+    s = segundos % 86400
+    return [f"{h:02d}:{m:02d}:{x:02d}" for h, m, x in zip(s // 3600, s % 3600 // 60, s % 60)]
+
+
+def _decimal_br(valores, casas, largura=0):
+    return [f"{v:0{largura}.{casas}f}".replace(".", ",") for v in valores]
+
+
+def linhas_solinftec_dia(frota, linha_tempo, dia, data_inicio, horimetro_inicial):
+    """Linhas do relatório Solinftec da frota no dia; devolve (linhas, horímetro final)."""
+    inicio_dia, fim_dia = dia * 86400, (dia + 1) * 86400
+    mascara = (linha_tempo["inicio"] >= inicio_dia) & (linha_tempo["inicio"] < fim_dia)
+    ini = linha_tempo["inicio"][mascara]
+    fim = linha_tempo["fim"][mascara]
+    ops = linha_tempo["operacao"][mascara]
+    vel = linha_tempo["velocidade"][mascara]
+    if len(ini) == 0:
+        return [], horimetro_inicial
+
+    ligado = _motor_ligado(ops, vel)
+    horas = np.where(ligado, (fim - ini) / 3600, 0.0)
+    hor_fim = horimetro_inicial + np.cumsum(horas)
+    hor_ini = np.concatenate(([horimetro_inicial], hor_fim[:-1]))
+
+    hora_local = (ini % 86400) // 3600
+    turno = np.where((hora_local >= 7) & (hora_local < 15), 0, np.where((hora_local >= 15) & (hora_local < 23), 1, 2))
+    data_str = (data_inicio + timedelta(days=dia)).strftime("%d/%m/%Y")
+
+    linhas = []
+    for a, b, op, t, h0, h1, v in zip(
+        _hhmmss(ini), _hhmmss(fim), ops, turno,
+        _decimal_br(hor_ini, 2, 8), _decimal_br(hor_fim, 2, 8),
+        _decimal_br(vel, 2),
+    ):
+        descricao, grupo = CATALOGO_OPERACOES[int(op)]
+        cod_operador, nome = frota["operadores"][t]
+        linhas.append([
+            "CERRADÃO", "CERRADÃO", "GRUPO BRUNOZZI", frota["codigo"], frota["tipo"],
+            cod_operador, nome, data_str, a, b, int(op), descricao, grupo,
+            0, 0, 0, "Não cadastrado", h0, h1, "0,0", v if v != "0,00" else "0",
+        ])
+    return linhas, float(hor_fim[-1])
+
+
+class _EscritorFragmentos:
+    """Grava as linhas em XLSX de até LIMITE_LINHAS_XLSX linhas cada."""
+
+    def __init__(self, pasta, data_inicio, lote):
+        self.pasta = pasta
+        self.data_inicio = data_inicio
+        self.lote = lote
+        self.fragmentos = []
+        self._wb = None
+
+    def _abrir(self):
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet("Plan1")
+        self._ws.append(COLUNAS_SOLINFTEC)
+        self._linhas = 0
+        self._dias = []
+
+    def escrever_dia(self, dia, linhas):
+        if self._wb is not None and self._linhas + len(linhas) > LIMITE_LINHAS_XLSX:
+            self._fechar()
+        while linhas:
+            if self._wb is None:
+                self._abrir()
+            espaco = LIMITE_LINHAS_XLSX - self._linhas
+            for linha in linhas[:espaco]:
+                self._ws.append(linha)
+            self._linhas += min(espaco, len(linhas))
+            self._dias.append(dia)
+            linhas = linhas[espaco:]
+            if linhas:
+                self._fechar()
+
+    def _fechar(self):
+        if self._wb is None:
+            return
+        d1 = (self.data_inicio + timedelta(days=min(self._dias))).strftime("%d-%m-%Y")
+        d2 = (self.data_inicio + timedelta(days=max(self._dias))).strftime("%d-%m-%Y")
+        tmp = os.path.join(self.pasta, f".fragmento_{len(self.fragmentos)}.xlsx")
+        self._wb.save(tmp)
+        self.fragmentos.append({"tmp": tmp, "periodo": f"{d1}_{d2}", "linhas": self._linhas})
+        self._wb = None
+
+    def finalizar(self):
+        """Renomeia para o padrão do script 1; devolve [(caminho, linhas)]."""
+        self._fechar()
+        saida = []
+        for i, frag in enumerate(self.fragmentos, start=1):
+            sufixo = f"__lote-{self.lote}__frag-{i}" if len(self.fragmentos) > 1 else ""
+            destino = os.path.join(self.pasta, f"Linha_do_tempo-{frag['periodo']}{sufixo}.xlsx")
+            os.replace(frag["tmp"], destino)
+            saida.append((destino, frag["linhas"]))
+        return saida
+
+
+def gerar_solinftec(pasta, frotas, linhas_tempo, dias, data_inicio, semente):
+    rng = _rng(semente, 2)
+    horimetros = {f["codigo"]: float(rng.uniform(500, 30000)) for f in frotas}
+    escritor = _EscritorFragmentos(pasta, data_inicio, lote=data_inicio.strftime("%Y%m%d000000"))
+    for dia in range(dias):
+        linhas_dia = []
+        for frota in frotas:
+            linhas, horimetros[frota["codigo"]] = linhas_solinftec_dia(
+                frota, linhas_tempo[frota["codigo"]], dia, data_inicio, horimetros[frota["codigo"]]
+            )
+            linhas_dia.extend(linhas)
+        escritor.escrever_dia(dia, linhas_dia)
+    return escritor.finalizar()
+
+
+# ─── Case IH (ZIP de CSVs longos) ──────────────────────────────────────────────
+
+def _metrica(nome, segundos, lat, lon, numerico=None, texto=None, unidade=None):
+    n = len(segundos)
+    return pd.DataFrame({
+        "_s": segundos,
+        "name": nome,
+        "numeric_value": numerico if numerico is not None else np.full(n, np.nan),
+        "text_value": texto if texto is not None else None,
+        "uom": unidade,
+        "lat": lat,
+        "lon": lon,
+    })
+
+
+def csv_case_frota(frota, linha_tempo, dias, data_inicio, intervalo_s, semente):
+    """DataFrame longo (uma linha por métrica por instante) de um trator Case."""
+    rng = _rng(semente, 3, frota["indice"])
+    segundos = _instantes(rng, dias, intervalo_s)
+    ops, vel = amostrar_estado(linha_tempo, segundos)
+    ligado = _motor_ligado(ops, vel)
+    # Desligado, o módulo só manda um sinal de vida a cada ~10 min
+    mantem = ligado | (segundos % 600 < intervalo_s)
+    segundos, ops, vel, ligado = segundos[mantem], ops[mantem], vel[mantem], ligado[mantem]
+    n = len(segundos)
+
+    velocidade = np.where(ligado, vel, 0.0)
+    lat, lon, rumo = gerar_trajeto(rng, segundos, velocidade, frota["centro"])
+    dt = np.diff(segundos, prepend=segundos[:1])
+    horas_motor = rng.uniform(3000, 9000) + np.cumsum(np.where(ligado, dt, 0)) / 3600
+    rpm = np.where(velocidade > 0, rng.normal(1850, 150, n), rng.normal(900, 60, n))
+    consumo = np.clip(np.where(velocidade > 0, rng.normal(38, 8, n), rng.normal(8, 2, n)), 0, None)
+    nivel = 100 - (np.cumsum(consumo * dt / 3600) % 400) / 4
+
+    blocos = [
+        _metrica("GPS_SPEED", segundos, lat, lon, np.round(velocidade, 2), unidade="KM/H"),
+        _metrica("GPS_DIR", segundos, lat, lon, np.round(rumo, 1), unidade="DEG"),
+        _metrica("GPS_SAT", segundos, lat, lon, np.round(rng.normal(30, 6, n)).clip(4, 45)),
+        _metrica("STATUS_DUTY", segundos, lat, lon, texto=np.where(ligado, "WORKING", "OFF")),
+        _metrica("STATUS_DEVICE", segundos, lat, lon, texto=np.where(ligado, "on", "standby")),
+    ]
+    s, la, lo = segundos[ligado], lat[ligado], lon[ligado]
+    m = int(ligado.sum())
+    blocos += [
+        _metrica("Latitude", s, la, lo, la, unidade="DEGREE"),
+        _metrica("Longitude", s, la, lo, lo, unidade="DEGREE"),
+        _metrica("Horas de Motor", s, la, lo, np.round(horas_motor[ligado], 2), unidade="H"),
+        _metrica("Velocidade de Deslocamento", s, la, lo, np.round(velocidade[ligado], 2), unidade="KM/H"),
+        _metrica("Rotação do Motor Baixa", s, la, lo, np.round(rpm[ligado]), unidade="RPM"),
+        _metrica("Taxa de combustível do motor", s, la, lo, np.round(consumo[ligado], 3), unidade="L/H"),
+        _metrica("Nível de combustível", s, la, lo, np.round(nivel[ligado], 1), unidade="%"),
+        _metrica("Gear Selected", s, la, lo, texto=rng.choice(["F3", "F4", "F5", "F6"], size=m)),
+    ]
+    for nome, (media, desvio, unidade) in METRICAS_CASE_MOTOR.items():
+        blocos.append(_metrica(nome, s, la, lo, np.round(rng.normal(media, desvio, m).clip(0), 2), unidade=unidade))
+
+    df = pd.concat(blocos, ignore_index=True).sort_values("_s", kind="stable")
+    instantes = pd.Timestamp(data_inicio) + pd.to_timedelta(df.pop("_s"), unit="s")
+    df["event_timestamp"] = instantes.dt.strftime("%Y-%m-%dT%H:%M:%S") + FUSO_CASE
+    df["ceqid"] = f"CEQ{458000 + frota['indice']:09d}"
+    df["nickname"] = f"MB{frota['codigo']} -Trator Magnum 340 MB{frota['codigo']}"
+    df["vin"] = f"HCCZM340SINT{frota['codigo']:05d}"
+    return df[COLUNAS_CASE]
+
+
+def _info_zip(nome, data):
+    info = zipfile.ZipInfo(nome, date_time=(data.year, data.month, data.day, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def gerar_case(pasta, frotas_case, linhas_tempo, dias, data_inicio, intervalo_s, semente):
+    caminho = os.path.join(pasta, f"Case{data_inicio:%Y%m%d}000000.zip")
+    d1 = data_inicio.strftime("%Y%m%d")
+    d2 = (data_inicio + timedelta(days=dias - 1)).strftime("%Y%m%d")
+    linhas = 0
+    with zipfile.ZipFile(caminho, "w") as zf:
+        for frota in frotas_case:
+            df = csv_case_frota(frota, linhas_tempo[frota["codigo"]], dias, data_inicio, intervalo_s, semente)
+            nome = f"metrics/CEQ{458000 + frota['indice']:09d}_{d1}-{d2}.csv"
+            zf.writestr(_info_zip(nome, data_inicio), df.to_csv(index=False))
+            linhas += len(df)
+    return caminho, linhas
+
+
+# ─── OPC (ZIP de shapefiles de pontos) ─────────────────────────────────────────
+
+def _cabecalho_shp(tamanho_palavras, bbox):
+    return (
+        struct.pack(">7i", 9994, 0, 0, 0, 0, 0, tamanho_palavras)
+        + struct.pack("<2i", 1000, 1)
+        + struct.pack("<8d", *bbox, 0.0, 0.0, 0.0, 0.0)
+    )
+
+
+def shapefile_pontos(lon, lat, campos):
+    """
+    Bytes (.shp, .shx, .dbf) de um shapefile de pontos.
+    campos: lista de (nome, tipo 'C'|'N', tamanho, decimais, valores).
+    """
+    n = len(lon)
+    registros = np.zeros(n, dtype=[("num", ">i4"), ("tam", ">i4"), ("tipo", "<i4"), ("x", "<f8"), ("y", "<f8")])
+    registros["num"] = np.arange(1, n + 1)
+    registros["tam"] = 10
+    registros["tipo"] = 1
+    registros["x"] = lon
+    registros["y"] = lat
+    bbox = (float(np.min(lon)), float(np.min(lat)), float(np.max(lon)), float(np.max(lat))) if n else (0.0,) * 4
+
+    shp = _cabecalho_shp((100 + 28 * n) // 2, bbox) + registros.tobytes()
+    indice = np.zeros(n, dtype=[("offset", ">i4"), ("tam", ">i4")])
+    indice["offset"] = (100 + 28 * np.arange(n)) // 2
+    indice["tam"] = 10
+    shx = _cabecalho_shp((100 + 8 * n) // 2, bbox) + indice.tobytes()
+
+    tamanho_registro = 1 + sum(c[2] for c in campos)
+    data_fixa = datetime(2000, 1, 1)
+    cabecalho = struct.pack(
+        "<BBBBIHH20x", 3, data_fixa.year - 1900, data_fixa.month, data_fixa.day,
+        n, 32 + 32 * len(campos) + 1, tamanho_registro,
+    )
+    descritores = b"".join(
+        struct.pack("<11sc4xBB14x", nome.encode("ascii"), tipo.encode("ascii"), tamanho, decimais)
+        for nome, tipo, tamanho, decimais, _ in campos
+    )
+    colunas = [np.full(n, b" ", dtype="S1")]
+    for _, tipo, tamanho, decimais, valores in campos:
+        if tipo == "N":
+            texto = np.char.rjust(np.char.mod(f"%.{decimais}f", np.asarray(valores, dtype=float)), tamanho)
+        else:
+            texto = np.char.ljust(np.asarray(valores, dtype=str), tamanho)
+        colunas.append(np.char.encode(texto, "ascii").astype(f"S{tamanho}"))
+    tabela = np.zeros(n, dtype=[(f"c{i}", c.dtype) for i, c in enumerate(colunas)])
+    for i, c in enumerate(colunas):
+        tabela[f"c{i}"] = c
+    dbf = cabecalho + descritores + b"\r" + tabela.tobytes() + b"\x1a"
+    return shp, shx, dbf
+
+
+PRJ_WGS84 = (
+    'GEOGCS["GCS_WGS_1984",DATUM["D_WGS_1984",SPHEROID["WGS_1984",6378137.0,298.257223563]],'
+    'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]'
+)
+
+
+def gerar_opc(pasta, colhedoras, linhas_tempo, dias, data_inicio, intervalo_s, semente):
+    """Um Colhedora_MB<frota>.zip por colhedora, com um shapefile por dia."""
+    arquivos, pontos = [], 0
+    for frota in colhedoras:
+        rng = _rng(semente, 4, frota["indice"])
+        segundos = _instantes(rng, dias, intervalo_s)
+        ops, vel = amostrar_estado(linhas_tempo[frota["codigo"]], segundos)
+        ligado = _motor_ligado(ops, vel)
+        segundos, vel = segundos[ligado], vel[ligado]
+        lat, lon, rumo = gerar_trajeto(rng, segundos, vel, frota["centro"])
+
+        # IsoTime em UTC (a Operations Center exporta com 'Z')
+        local = pd.Timestamp(data_inicio) + pd.to_timedelta(segundos, unit="s")
+        utc = local + pd.Timedelta(hours=3)
+        iso = np.asarray(utc.strftime("%Y-%m-%dT%H:%M:%S.000Z"))
+        hora = np.asarray(local.strftime("%m/%d/%Y %I:%M:%S %p"))
+        dia_ponto = segundos // 86400
+
+        caminho = os.path.join(pasta, f"Colhedora_MB{frota['codigo']}.zip")
+        with zipfile.ZipFile(caminho, "w") as zf:
+            for dia in range(dias):
+                m = dia_ponto == dia
+                if not m.any():
+                    continue
+                campos = [
+                    ("Machine", "C", 20, 0, np.full(int(m.sum()), f"MB {frota['codigo']}")),
+                    ("IsoTime", "C", 24, 0, iso[m]),
+                    ("Time", "C", 22, 0, hora[m]),
+                    ("Heading", "N", 8, 2, rumo[m]),
+                    ("Speed_kmh", "N", 8, 2, vel[m]),
+                ]
+                shp, shx, dbf = shapefile_pontos(lon[m], lat[m], campos)
+                base = f"Colhedora_MB{frota['codigo']}_{(data_inicio + timedelta(days=dia)):%Y%m%d}"
+                for ext, conteudo in ((".shp", shp), (".shx", shx), (".dbf", dbf), (".prj", PRJ_WGS84)):
+                    zf.writestr(_info_zip(base + ext, data_inicio), conteudo)
+        arquivos.append(caminho)
+        pontos += len(segundos)
+    return arquivos, pontos
+
+
+# ─── Orquestração ──────────────────────────────────────────────────────────────
+
+def gerar_carga(
+    pasta_saida=PASTA_SAIDA_PADRAO,
+    frotas=FROTAS_REFERENCIA,
+    dias=DIAS_REFERENCIA,
+    data_inicio=DATA_INICIO_PADRAO,
+    intervalo_s=15,
+    mix_improdutivo=1.0,
+    semente=42,
+    fontes=("solinftec", "case", "opc"),
+):
+    """
+    Gera as entradas sintéticas em pasta_saida e grava manifesto_carga.json.
+    Retorna o manifesto (parâmetros, arquivos e volumes por fonte).
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    inicio = datetime.strptime(data_inicio, "%Y-%m-%d")
+    lista_frotas = montar_frotas(frotas, semente)
+    linhas_tempo = {f["codigo"]: gerar_linha_tempo(f, dias, semente, mix_improdutivo) for f in lista_frotas}
+
+    manifesto = {
+        "parametros": {
+            "frotas": frotas, "dias": dias, "data_inicio": data_inicio, "intervalo_s": intervalo_s,
+            "mix_improdutivo": mix_improdutivo, "semente": semente, "fontes": list(fontes),
+        },
+        "frotas": {tipo: [f["codigo"] for f in lista_frotas if f["tipo"] == tipo] for tipo in MIX_PADRAO},
+        "arquivos": {},
+    }
+
+    if "solinftec" in fontes:
+        print("🧪 Gerando Solinftec...")
+        fragmentos = gerar_solinftec(pasta_saida, lista_frotas, linhas_tempo, dias, inicio, semente)
+        manifesto["arquivos"]["solinftec"] = [
+            {"arquivo": os.path.basename(c), "linhas": n} for c, n in fragmentos
+        ]
+
+    if "case" in fontes:
+        transbordos = [f for f in lista_frotas if f["tipo"] == "TRATOR TRANSBORDO"]
+        frotas_case = transbordos[:max(1, len(transbordos) // 4)]
+        print(f"🧪 Gerando Case ({len(frotas_case)} tratores)...")
+        caminho, linhas = gerar_case(pasta_saida, frotas_case, linhas_tempo, dias, inicio, intervalo_s, semente)
+        manifesto["arquivos"]["case"] = [{"arquivo": os.path.basename(caminho), "linhas": linhas}]
+
+    if "opc" in fontes:
+        colhedoras = [f for f in lista_frotas if f["tipo"] == "COLHEDORA DE CANA"]
+        print(f"🧪 Gerando OPC ({len(colhedoras)} colhedoras)...")
+        arquivos, pontos = gerar_opc(pasta_saida, colhedoras, linhas_tempo, dias, inicio, intervalo_s, semente)
+        manifesto["arquivos"]["opc"] = [{"arquivo": os.path.basename(a)} for a in arquivos]
+        manifesto["pontos_opc"] = pontos
+
+    with open(os.path.join(pasta_saida, "manifesto_carga.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    return manifesto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera entradas sintéticas (Solinftec, Case, OPC) para testes de carga.")
+    parser.add_argument("--saida", default=PASTA_SAIDA_PADRAO, help="Pasta de saída")
+    parser.add_argument("--escala", type=float, help=f"Múltiplo do volume de referência ({FROTAS_REFERENCIA} frotas); sobrepõe --frotas")
+    parser.add_argument("--frotas", type=int, default=FROTAS_REFERENCIA, help="Total de frotas")
+    parser.add_argument("--dias", type=int, default=DIAS_REFERENCIA, help="Dias de dados")
+    parser.add_argument("--inicio", default=DATA_INICIO_PADRAO, help="Primeiro dia (AAAA-MM-DD)")
+    parser.add_argument("--intervalo", type=float, default=15, help="Intervalo de amostragem Case/OPC (s)")
+    parser.add_argument("--mix-improdutivo", type=float, default=1.0,
+                        help="Multiplicador do peso das operações não produtivas (1 = mix real)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--fontes", default="solinftec,case,opc", help="Fontes a gerar (separadas por vírgula)")
+    args = parser.parse_args()
+
+    frotas = max(3, round(FROTAS_REFERENCIA * args.escala)) if args.escala else args.frotas
+    manifesto = gerar_carga(
+        pasta_saida=args.saida,
+        frotas=frotas,
+        dias=args.dias,
+        data_inicio=args.inicio,
+        intervalo_s=args.intervalo,
+        mix_improdutivo=args.mix_improdutivo,
+        semente=args.semente,
+        fontes=tuple(f.strip() for f in args.fontes.split(",") if f.strip()),
+    )
+    print(f"✅ Carga sintética gerada em {args.saida}")
+    for fonte, arquivos in manifesto["arquivos"].items():
+        print(f"   {fonte}: {len(arquivos)} arquivo(s)")
+
+
+if __name__ == "__main__":
+    main()
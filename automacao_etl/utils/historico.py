@@ -0,0 +1,217 @@
+"""
+historico.py
+
+Histórico (SQLite) dos indicadores diários, acumulado a cada execução:
+frota-dia e operador-dia da etapa 4 (Solinftec) e o Resumo Diário da Case
+(etapa 6). Responde "como evoluiu a Eficiencia_Energetica da frota 279 na
+safra" com uma consulta indexada, sem abrir um JSON por dia.
+
+Cada linha é um fato (fonte, entidade, data, chave, tipo, métrica, valor):
+métricas novas (ex.: um grupo de operação que aparece no meio da safra) não
+exigem mudança de esquema. A chave primária já serve às consultas por
+(data, frota/operador) e o índice ix_fatos_serie às séries de uma chave ao
+longo do tempo; o custo da consulta depende do trecho pedido, não do
+tamanho do histórico.
+
+    from utils import historico
+
+    historico.registrar_dia("solinftec", "frota", df_dia_frota,
+                            col_chave="Código Equipamento", col_tipo="Descrição do Equipamento")
+    historico.serie("frota", 279, "Eficiencia_Energetica", inicio="01-04-2025")
+    # -> [("2025-10-06", 0.61), ("2025-10-07", 0.58), ...]
+
+Reprocessar um dia é idempotente: os fatos de cada (data, chave, tipo)
+recebidos substituem os anteriores numa única transação.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVO_HISTORICO = os.environ.get("ETL_HISTORICO") or os.path.join(BASE_DIR, "dados", "separados", "historico.sqlite")
+
+_lock = threading.Lock()
+_iniciado = set()
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS fatos (
+    fonte    TEXT NOT NULL,
+    entidade TEXT NOT NULL,
+    data     TEXT NOT NULL,
+    chave    TEXT NOT NULL,
+    tipo     TEXT NOT NULL DEFAULT '',
+    metrica  TEXT NOT NULL,
+    valor    REAL,
+    PRIMARY KEY (fonte, entidade, data, chave, tipo, metrica)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_fatos_serie ON fatos (fonte, entidade, chave, metrica, data, valor);
+CREATE TABLE IF NOT EXISTS entidades (
+    fonte         TEXT NOT NULL,
+    entidade      TEXT NOT NULL,
+    chave         TEXT NOT NULL,
+    rotulo        TEXT,
+    atualizado_em TEXT,
+    PRIMARY KEY (fonte, entidade, chave)
+) WITHOUT ROWID;
+"""
+
+
+def _conectar():
+    con = sqlite3.connect(ARQUIVO_HISTORICO, timeout=30)
+    if ARQUIVO_HISTORICO not in _iniciado:
+        os.makedirs(os.path.dirname(ARQUIVO_HISTORICO), exist_ok=True)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_ESQUEMA)
+        _iniciado.add(ARQUIVO_HISTORICO)
+    return con
+
+
+def data_iso(data):
+    """date/Timestamp, 'DD/MM/YYYY', 'DD-MM-YYYY' ou 'YYYY-MM-DD' -> 'YYYY-MM-DD'."""
+    if data is None:
+        return None
+    if hasattr(data, "strftime"):
+        return data.strftime("%Y-%m-%d")
+    texto = str(data).strip()[:10]
+    m = re.fullmatch(r"(\d{2})[-/](\d{2})[-/](\d{4})", texto)
+    if m:
+        return f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+    return texto
+
+
+def chave_codigo(valor):
+    """Código como texto estável: 102.0 e '102' viram '102'."""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _numero(valor):
+    if isinstance(valor, bool):
+        return float(valor)
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(numero) or math.isinf(numero) else numero
+
+
+def registrar_dia(fonte, entidade, df, col_chave, col_data="Data", col_tipo=None, col_rotulo=None):
+    """
+    Grava as colunas numéricas de `df` (uma linha por dia/chave[/tipo]) como
+    fatos. Os fatos já existentes para cada (data, chave, tipo) presente em
+    `df` são substituídos. Erro no SQLite só gera aviso (retorna False).
+    """
+    if df is None or df.empty or col_chave not in df.columns or col_data not in df.columns:
+        return False
+    ignorar = {col_data, col_chave, col_tipo, col_rotulo}
+    colunas = [c for c in df.columns if c not in ignorar]
+
+    grupos, fatos, rotulos = set(), [], {}
+    for linha in df.to_dict("records"):
+        data = data_iso(linha[col_data])
+        chave = linha[col_chave]
+        if not data or chave is None or (isinstance(chave, float) and math.isnan(chave)):
+            continue
+        chave = chave_codigo(chave)
+        tipo = str(linha.get(col_tipo) or "") if col_tipo else ""
+        grupos.add((fonte, entidade, data, chave, tipo))
+        for metrica in colunas:
+            valor = _numero(linha[metrica])
+            if valor is not None:
+                fatos.append((fonte, entidade, data, chave, tipo, str(metrica), valor))
+        if col_rotulo and linha.get(col_rotulo) is not None:
+            rotulos[chave] = str(linha[col_rotulo])
+
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with _lock:
+            con = _conectar()
+            try:
+                with con:
+                    con.executemany(
+                        "DELETE FROM fatos WHERE fonte = ? AND entidade = ? AND data = ? AND chave = ? AND tipo = ?",
+                        sorted(grupos),
+                    )
+                    con.executemany("INSERT OR REPLACE INTO fatos VALUES (?,?,?,?,?,?,?)", fatos)
+                    con.executemany(
+                        "INSERT OR REPLACE INTO entidades VALUES (?,?,?,?,?)",
+                        [(fonte, entidade, c, r, agora) for c, r in rotulos.items()],
+                    )
+            finally:
+                con.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Histórico não atualizado ({fonte}/{entidade}): {e}")
+        return False
+    return True
+
+
+def _consultar(sql, valores):
+    if not os.path.exists(ARQUIVO_HISTORICO):
+        return []
+    with _lock:
+        con = _conectar()
+        try:
+            return con.execute(sql, valores).fetchall()
+        finally:
+            con.close()
+
+
+def serie(entidade, chave, metrica, inicio=None, fim=None, fonte="solinftec", tipo=None):
+    """[(data 'YYYY-MM-DD', valor)] de uma métrica de uma frota/operador, em ordem de data."""
+    sql = "SELECT data, valor FROM fatos WHERE fonte = ? AND entidade = ? AND chave = ? AND metrica = ?"
+    valores = [fonte, entidade, chave_codigo(chave), metrica]
+    if inicio:
+        sql += " AND data >= ?"
+        valores.append(data_iso(inicio))
+    if fim:
+        sql += " AND data <= ?"
+        valores.append(data_iso(fim))
+    if tipo is not None:
+        sql += " AND tipo = ?"
+        valores.append(str(tipo))
+    return _consultar(sql + " ORDER BY data", valores)
+
+
+def consultar(entidade, inicio=None, fim=None, chaves=None, metricas=None, fonte="solinftec"):
+    """
+    Fatos do intervalo como dicts {data, chave, tipo, metrica, valor},
+    opcionalmente restritos a algumas chaves e/ou métricas.
+    """
+    sql = "SELECT data, chave, tipo, metrica, valor FROM fatos WHERE fonte = ? AND entidade = ?"
+    valores = [fonte, entidade]
+    if inicio:
+        sql += " AND data >= ?"
+        valores.append(data_iso(inicio))
+    if fim:
+        sql += " AND data <= ?"
+        valores.append(data_iso(fim))
+    for coluna, filtro in (("chave", chaves), ("metrica", metricas)):
+        if filtro:
+            filtro = [chave_codigo(f) if coluna == "chave" else str(f) for f in filtro]
+            sql += f" AND {coluna} IN ({','.join('?' * len(filtro))})"
+            valores += filtro
+    linhas = _consultar(sql + " ORDER BY data, chave, tipo, metrica", valores)
+    return [dict(zip(("data", "chave", "tipo", "metrica", "valor"), l)) for l in linhas]
+
+
+def metricas(entidade, fonte="solinftec"):
+    """Métricas já gravadas para a entidade."""
+    linhas = _consultar(
+        "SELECT DISTINCT metrica FROM fatos WHERE fonte = ? AND entidade = ? ORDER BY metrica",
+        [fonte, entidade],
+    )
+    return [m for (m,) in linhas]
+
+
+def rotulo(entidade, chave, fonte="solinftec"):
+    """Nome associado à chave (ex.: nome do operador), se houver."""
+    linhas = _consultar(
+        "SELECT rotulo FROM entidades WHERE fonte = ? AND entidade = ? AND chave = ?",
+        [fonte, entidade, chave_codigo(chave)],
+    )
+    return linhas[0][0] if linhas else None
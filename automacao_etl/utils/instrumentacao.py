@@ -0,0 +1,307 @@
+"""
+instrumentacao.py
+
+Medição por trecho (span) das etapas de processamento (scripts 4 a 8).
+
+Cada trecho nomeado registra tempo de parede, tempo de CPU da thread, linhas
+de entrada/saída e memória (pico de RSS do processo e, opcionalmente, pico do
+tracemalloc). Ao final do processo, um relatório JSON é gravado em
+dados/desempenho/ (ou na pasta de ETL_INSTRUMENTACAO_DIR).
+
+Ativação pela variável de ambiente ETL_INSTRUMENTACAO:
+    (vazia / 0)  desativado - medir() devolve um objeto nulo e instrumentar()
+                 apenas chama a função, custo praticamente zero
+    1            tempos, linhas e pico de RSS
+    memoria      idem + tracemalloc (pico alocado pelo Python em cada trecho;
+                 deixa a execução sensivelmente mais lenta)
+
+Uso:
+    from utils.instrumentacao import medir, instrumentar, registrar_linhas
+
+    @instrumentar("5.separar_abas")
+    def separar_abas(dfs, ...):
+        ...
+
+    with medir("5.dia", rotulo="05/10/2025", linhas_entrada=len(df)) as span:
+        ...
+        span.linhas_saida = len(df_dia)
+
+Funções decoradas contam as linhas de saída automaticamente quando retornam
+DataFrame, lista ou dict de DataFrames.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_RELATORIOS = os.environ.get("ETL_INSTRUMENTACAO_DIR") or os.path.join(BASE_DIR, "dados", "desempenho")
+
+_modo = os.environ.get("ETL_INSTRUMENTACAO", "").strip().lower()
+_ativo = _modo not in ("", "0", "false", "nao", "não")
+_memoria = _modo == "memoria"
+
+_lock = threading.Lock()
+_spans = []
+_pilha = threading.local()
+_inicio_execucao = None
+_atexit_registrado = False
+
+
+def _rss_pico_mb():
+    """Pico de RSS do processo (MB), ou None sem o módulo resource."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(pico / divisor, 1)
+
+
+def _contar_linhas(valor):
+    if valor is None:
+        return None
+    if hasattr(valor, "shape") and hasattr(valor, "__len__"):
+        return len(valor)
+    if isinstance(valor, dict):
+        tabelas = [v for v in valor.values() if hasattr(v, "shape")]
+        return sum(len(t) for t in tabelas) if tabelas else None
+    if isinstance(valor, (list, tuple)):
+        return len(valor)
+    return None
+
+
+def ativo():
+    return _ativo
+
+
+def ativar(memoria=False):
+    """Liga a instrumentação em tempo de execução (ex.: flag --instrumentar)."""
+    global _ativo, _memoria
+    with _lock:
+        _ativo = True
+        _memoria = _memoria or memoria
+    _garantir_inicio()
+
+
+def _garantir_inicio():
+    global _inicio_execucao, _atexit_registrado
+    with _lock:
+        if _inicio_execucao is None:
+            _inicio_execucao = datetime.now()
+        if _memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if not _atexit_registrado:
+            atexit.register(salvar_relatorio)
+            _atexit_registrado = True
+
+
+class Span:
+    """Trecho medido; use via medir()."""
+
+    __slots__ = (
+        "nome", "rotulo", "linhas_entrada", "linhas_saida", "pai",
+        "_t0", "_cpu0", "_rss0", "_mem_pico", "_mem_base",
+    )
+
+    def __init__(self, nome, rotulo=None, linhas_entrada=None, linhas_saida=None):
+        self.nome = nome
+        self.rotulo = rotulo
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = linhas_saida
+        self.pai = None
+        self._mem_pico = 0
+        self._mem_base = 0
+
+    def __enter__(self):
+        pilha = _pilha_thread()
+        self.pai = pilha[-1].nome if pilha else None
+        pilha.append(self)
+        if tracemalloc.is_tracing():
+            self._mem_base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._rss0 = _rss_pico_mb()
+        self._cpu0 = time.thread_time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_exc, *_):
+        parede = time.perf_counter() - self._t0
+        cpu = time.thread_time() - self._cpu0
+        rss = _rss_pico_mb()
+        pilha = _pilha_thread()
+        if pilha and pilha[-1] is self:
+            pilha.pop()
+
+        registro = {
+            "nome": self.nome,
+            "rotulo": self.rotulo,
+            "pai": self.pai,
+            "thread": threading.current_thread().name,
+            "parede_s": round(parede, 4),
+            "cpu_s": round(cpu, 4),
+            "linhas_entrada": self.linhas_entrada,
+            "linhas_saida": self.linhas_saida,
+            "linhas_por_s": _vazao(self.linhas_entrada, self.linhas_saida, parede),
+            "rss_pico_mb": rss,
+            "rss_pico_aumento_mb": round(rss - self._rss0, 1) if rss is not None else None,
+            "erro": tipo_exc.__name__ if tipo_exc else None,
+        }
+        if tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            pico = max(pico, self._mem_pico)
+            registro["tracemalloc_pico_mb"] = round((pico - self._mem_base) / (1024 * 1024), 1)
+            # O reset_peak dos trechos internos zera o pico do externo: repassa
+            if pilha:
+                pilha[-1]._mem_pico = max(pilha[-1]._mem_pico, pico)
+
+        with _lock:
+            _spans.append(registro)
+        return False
+
+
+class _SpanNulo:
+    """Substituto sem custo quando a instrumentação está desligada."""
+
+    __slots__ = ()
+    nome = rotulo = linhas_entrada = linhas_saida = pai = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def __setattr__(self, nome, valor):
+        pass
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+def _pilha_thread():
+    pilha = getattr(_pilha, "spans", None)
+    if pilha is None:
+        pilha = _pilha.spans = []
+    return pilha
+
+
+def _vazao(entrada, saida, segundos):
+    linhas = entrada if entrada is not None else saida
+    if linhas is None or segundos <= 0:
+        return None
+    return round(linhas / segundos, 1)
+
+
+def medir(nome, rotulo=None, linhas_entrada=None, linhas_saida=None):
+    """Context manager que mede o trecho `nome` (nulo se desativado)."""
+    if not _ativo:
+        return _SPAN_NULO
+    _garantir_inicio()
+    return Span(nome, rotulo, linhas_entrada, linhas_saida)
+
+
+def instrumentar(nome=None):
+    """Decorador: mede cada chamada da função como um trecho."""
+    def decorador(func):
+        nome_span = nome or func.__qualname__
+
+        @wraps(func)
+        def envoltorio(*args, **kwargs):
+            if not _ativo:
+                return func(*args, **kwargs)
+            with medir(nome_span) as span:
+                resultado = func(*args, **kwargs)
+                if span.linhas_saida is None:
+                    span.linhas_saida = _contar_linhas(resultado)
+                return resultado
+
+        return envoltorio
+
+    return decorador
+
+
+def registrar_linhas(entrada=None, saida=None):
+    """Informa linhas de entrada/saída do trecho em andamento nesta thread."""
+    if not _ativo:
+        return
+    pilha = _pilha_thread()
+    if not pilha:
+        return
+    if entrada is not None:
+        pilha[-1].linhas_entrada = entrada
+    if saida is not None:
+        pilha[-1].linhas_saida = saida
+
+
+def resumir(spans):
+    """Agrega os trechos por nome (chamadas, somas e picos)."""
+    resumo = {}
+    for s in spans:
+        r = resumo.setdefault(s["nome"], {
+            "chamadas": 0, "parede_s": 0.0, "cpu_s": 0.0,
+            "linhas_entrada": 0, "linhas_saida": 0, "rss_pico_mb": None,
+        })
+        r["chamadas"] += 1
+        r["parede_s"] = round(r["parede_s"] + s["parede_s"], 4)
+        r["cpu_s"] = round(r["cpu_s"] + s["cpu_s"], 4)
+        r["linhas_entrada"] += s["linhas_entrada"] or 0
+        r["linhas_saida"] += s["linhas_saida"] or 0
+        if s["rss_pico_mb"] is not None:
+            r["rss_pico_mb"] = max(r["rss_pico_mb"] or 0, s["rss_pico_mb"])
+        if "tracemalloc_pico_mb" in s:
+            r["tracemalloc_pico_mb"] = max(r.get("tracemalloc_pico_mb", 0), s["tracemalloc_pico_mb"])
+    return resumo
+
+
+def salvar_relatorio(pasta=None):
+    """
+    Grava o relatório JSON da execução (chamado automaticamente na saída).
+    Retorna o caminho gravado, ou None se não houver trechos.
+    """
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+    if not spans:
+        return None
+
+    script = os.path.splitext(os.path.basename(sys.argv[0] or "etl"))[0] or "etl"
+    agora = datetime.now()
+    relatorio = {
+        "script": script,
+        "modo": "memoria" if _memoria else "basico",
+        "iniciado_em": (_inicio_execucao or agora).strftime("%Y-%m-%d %H:%M:%S"),
+        "finalizado_em": agora.strftime("%Y-%m-%d %H:%M:%S"),
+        "rss_pico_mb": _rss_pico_mb(),
+        "resumo": resumir(spans),
+        "trechos": spans,
+    }
+
+    pasta = pasta or PASTA_RELATORIOS
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"desempenho_{script}_{agora.strftime('%Y%m%d_%H%M%S')}.json")
+        tmp = f"{caminho}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp, caminho)
+        print(f"📊 Relatório de desempenho: {caminho}")
+        return caminho
+    except Exception as e:
+        print(f"⚠️  Não foi possível salvar o relatório de desempenho: {e}")
+        return None
+
+
+if _ativo:
+    _garantir_inicio()
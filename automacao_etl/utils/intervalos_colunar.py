@@ -0,0 +1,266 @@
+"""
+intervalos_colunar.py
+
+Codificação colunar compacta das listas de intervalos (Gantt):
+`intervalos_operacao` da etapa 7 e `Intervalos` por frota da etapa 5.
+
+Em vez de um objeto por intervalo, repetindo as chaves, cada coluna vira um
+array paralelo:
+
+    {
+      "formato": "colunar", "versao": 1, "total": 2846,
+      "colunas": ["equipamento", "tipo", "inicio", "duracaoHoras", "fonte"],
+      "grupo": "equipamento",
+      "codificacao": {
+        "tipo":         {"tipo": "dicionario", "valores": ["Disponível", ...]},
+        "inicio":       {"tipo": "tempo", "formato": "%H:%M:%S", "base": "00:00:00"},
+        "duracaoHoras": {"tipo": "quantizado", "escala": 3600, "casas": 6},
+        "fonte":        {"tipo": "dicionario", "valores": ["solinftec"]}
+      },
+      "grupos": {"235": {"n": 310, "tipo": [0, 1, ...], "inicio": [0, 74, ...], ...}}
+    }
+
+- dicionario: índice no array de valores distintos (tipo, operação, grupo...)
+- tempo: segundos desde a base; dentro de cada grupo cada valor é a diferença
+  para o anterior (delta), então inícios consecutivos viram números pequenos
+- quantizado: inteiro = valor * escala (horas -> segundos, ou 10^casas),
+  usado só se a volta reproduz exatamente o valor original
+- bruto: valores como estão
+
+Sem `grupo` (Intervalos de uma frota), os arrays ficam em "valores" e "n".
+A decodificação devolve a lista original de dicts, na mesma ordem desde que
+as linhas de cada grupo venham contíguas (como a etapa 7 já gera); a chave
+do grupo volta como string.
+
+No relatório da etapa 7, metadata.versao_intervalos = 2 indica
+intervalos_operacao colunar (ausente / 1 = lista de objetos).
+Ativação: ETL_INTERVALOS_COLUNAR=1 (etapas 5 e 7) ou ?formato=colunar na API.
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+
+VERSAO = 1
+VERSAO_INTERVALOS_COLUNAR = 2
+ESCALAS_QUANTIZACAO = (3600, 1, 10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6)
+
+_FORMATOS_TEMPO = (
+    (re.compile(r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}"), "%d/%m/%Y %H:%M:%S"),
+    (re.compile(r"\d{2}:\d{2}:\d{2}"), "%H:%M:%S"),
+)
+
+
+def ativo():
+    """True se as etapas devem gravar os intervalos no formato colunar."""
+    return os.environ.get("ETL_INTERVALOS_COLUNAR", "").strip().lower() in ("1", "sim", "true")
+
+
+def eh_colunar(valor):
+    return isinstance(valor, dict) and valor.get("formato") == "colunar"
+
+
+# ─── Codificação por coluna ────────────────────────────────────────────────────
+
+def _formato_tempo(valores):
+    """Formato strftime comum a todos os valores (strings de data/hora), ou None."""
+    for padrao, formato in _FORMATOS_TEMPO:
+        if all(isinstance(v, str) and padrao.fullmatch(v) for v in valores):
+            return formato
+    return None
+
+
+def _casas_decimais(valor):
+    texto = repr(float(valor))
+    if "e" in texto or "n" in texto:  # notação científica, nan, inf
+        return 99
+    return len(texto.split(".")[1].rstrip("0"))
+
+
+def _escolher_codificacao(valores):
+    presentes = [v for v in valores if v is not None]
+    if not presentes or len(presentes) != len(valores):
+        if presentes and all(isinstance(v, str) for v in presentes):
+            return {"tipo": "dicionario"}
+        return {"tipo": "bruto"}
+
+    formato = _formato_tempo(presentes)
+    if formato:
+        instantes = [datetime.strptime(v, formato) for v in presentes]
+        if all(i.strftime(formato) == v for i, v in zip(instantes, presentes)):
+            base = min(instantes).replace(hour=0, minute=0, second=0)
+            return {"tipo": "tempo", "formato": formato, "base": base.strftime(formato)}
+
+    if all(isinstance(v, str) for v in presentes):
+        return {"tipo": "dicionario"}
+
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in presentes):
+        if all(isinstance(v, int) for v in presentes):
+            return {"tipo": "bruto"}
+        casas = max(_casas_decimais(v) for v in presentes)
+        if casas <= 6:
+            for escala in ESCALAS_QUANTIZACAO:
+                if all(round(round(v * escala) / escala, casas) == v for v in presentes):
+                    return {"tipo": "quantizado", "escala": escala, "casas": casas}
+    return {"tipo": "bruto"}
+
+
+def _instante(valor, cod):
+    return datetime.strptime(valor, cod["formato"])
+
+
+def codificar(linhas, grupo=None):
+    """Lista de dicts -> objeto colunar (agrupado pela chave `grupo`, se informada)."""
+    colunas = []
+    for linha in linhas:
+        for chave in linha:
+            if chave not in colunas:
+                colunas.append(chave)
+
+    codificacao = {}
+    for coluna in colunas:
+        if coluna == grupo:
+            continue
+        cod = _escolher_codificacao([linha.get(coluna) for linha in linhas])
+        if cod["tipo"] == "dicionario":
+            cod["valores"] = list(dict.fromkeys(linha.get(coluna) for linha in linhas))
+        codificacao[coluna] = cod
+
+    indices = {c: {v: i for i, v in enumerate(cod["valores"])}
+               for c, cod in codificacao.items() if cod["tipo"] == "dicionario"}
+    bases = {c: _instante(cod["base"], cod) for c, cod in codificacao.items() if cod["tipo"] == "tempo"}
+
+    grupos = {}
+    for linha in linhas:
+        chave_grupo = str(linha.get(grupo)) if grupo else ""
+        destino = grupos.get(chave_grupo)
+        if destino is None:
+            destino = grupos[chave_grupo] = {"n": 0, "_anterior": {}}
+            destino.update({c: [] for c in codificacao})
+        destino["n"] += 1
+        for coluna, cod in codificacao.items():
+            if coluna not in linha:
+                destino.setdefault("_ausentes", {}).setdefault(coluna, []).append(destino["n"] - 1)
+            valor = linha.get(coluna)
+            tipo = cod["tipo"]
+            if tipo == "dicionario":
+                valor = indices[coluna][valor]
+            elif tipo == "tempo":
+                segundos = int((_instante(valor, cod) - bases[coluna]).total_seconds())
+                valor = segundos - destino["_anterior"].get(coluna, 0)
+                destino["_anterior"][coluna] = segundos
+            elif tipo == "quantizado":
+                valor = round(valor * cod["escala"])
+            destino[coluna].append(valor)
+
+    for destino in grupos.values():
+        destino.pop("_anterior")
+        if "_ausentes" in destino:
+            destino["ausentes"] = destino.pop("_ausentes")
+
+    resultado = {
+        "formato": "colunar",
+        "versao": VERSAO,
+        "total": len(linhas),
+        "colunas": colunas,
+        "codificacao": codificacao,
+    }
+    if grupo:
+        resultado["grupo"] = grupo
+        resultado["grupos"] = grupos
+    else:
+        unico = grupos.get("", {"n": 0, **{c: [] for c in codificacao}})
+        resultado["n"] = unico.pop("n")
+        if "ausentes" in unico:
+            resultado["ausentes"] = unico.pop("ausentes")
+        resultado["valores"] = unico
+    return resultado
+
+
+def _decodificar_grupo(colunar, valores, n, chave_grupo, ausentes):
+    codificacao = colunar["codificacao"]
+    grupo = colunar.get("grupo")
+    decodificadas = {}
+    for coluna, cod in codificacao.items():
+        brutos = valores[coluna]
+        tipo = cod["tipo"]
+        if tipo == "dicionario":
+            dicionario = cod["valores"]
+            decodificadas[coluna] = [dicionario[i] for i in brutos]
+        elif tipo == "tempo":
+            base = _instante(cod["base"], cod)
+            acumulado = 0
+            saida = []
+            for delta in brutos:
+                acumulado += delta
+                saida.append((base + timedelta(seconds=acumulado)).strftime(cod["formato"]))
+            decodificadas[coluna] = saida
+        elif tipo == "quantizado":
+            escala, casas = cod["escala"], cod["casas"]
+            decodificadas[coluna] = [round(v / escala, casas) for v in brutos]
+        else:
+            decodificadas[coluna] = list(brutos)
+
+    faltantes = {c: set(p) for c, p in (ausentes or {}).items()}
+    linhas = []
+    for i in range(n):
+        linha = {}
+        for coluna in colunar["colunas"]:
+            if coluna == grupo:
+                linha[coluna] = chave_grupo
+            elif i not in faltantes.get(coluna, ()):
+                linha[coluna] = decodificadas[coluna][i]
+        linhas.append(linha)
+    return linhas
+
+
+def decodificar(colunar):
+    """Objeto colunar -> lista de dicts (a própria lista, se já vier expandida)."""
+    if not eh_colunar(colunar):
+        return colunar
+    if "grupos" not in colunar:
+        return _decodificar_grupo(colunar, colunar["valores"], colunar["n"], None, colunar.get("ausentes"))
+    linhas = []
+    for chave, valores in colunar["grupos"].items():
+        linhas.extend(_decodificar_grupo(colunar, valores, valores["n"], chave, valores.get("ausentes")))
+    return linhas
+
+
+# ─── Relatórios inteiros ───────────────────────────────────────────────────────
+
+def compactar_relatorio(dados):
+    """
+    Converte os intervalos de um relatório para o formato colunar:
+    intervalos_operacao (etapa 7, agrupado por equipamento, com
+    metadata.versao_intervalos) ou Intervalos de cada frota (etapa 5).
+    """
+    if not isinstance(dados, dict):
+        return dados
+    resultado = dict(dados)
+    if isinstance(resultado.get("intervalos_operacao"), list):
+        resultado["intervalos_operacao"] = codificar(resultado["intervalos_operacao"], grupo="equipamento")
+        if isinstance(resultado.get("metadata"), dict):
+            resultado["metadata"] = {**resultado["metadata"], "versao_intervalos": VERSAO_INTERVALOS_COLUNAR}
+        return resultado
+    for frota, conteudo in resultado.items():
+        if isinstance(conteudo, dict) and isinstance(conteudo.get("Intervalos"), list):
+            resultado[frota] = {**conteudo, "Intervalos": codificar(conteudo["Intervalos"])}
+    return resultado
+
+
+def expandir_relatorio(dados):
+    """Inverso de compactar_relatorio: intervalos de volta como lista de objetos."""
+    if not isinstance(dados, dict):
+        return dados
+    resultado = dict(dados)
+    if eh_colunar(resultado.get("intervalos_operacao")):
+        resultado["intervalos_operacao"] = decodificar(resultado["intervalos_operacao"])
+        if isinstance(resultado.get("metadata"), dict):
+            metadata = dict(resultado["metadata"])
+            metadata.pop("versao_intervalos", None)
+            resultado["metadata"] = metadata
+        return resultado
+    for frota, conteudo in resultado.items():
+        if isinstance(conteudo, dict) and eh_colunar(conteudo.get("Intervalos")):
+            resultado[frota] = {**conteudo, "Intervalos": decodificar(conteudo["Intervalos"])}
+    return resultado
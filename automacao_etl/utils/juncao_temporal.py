@@ -0,0 +1,135 @@
+"""
+juncao_temporal.py
+
+Junção por tempo entre pontos (GPS dos shapes OPC, Case) e os intervalos de
+operação da Solinftec: cada ponto recebe o grupo, a operação e o estado do
+Gantt (Produtivo / Disponível / Manutenção / Falta de Informação) do
+intervalo que contém o seu instante.
+
+A junção é vetorizada: pontos e intervalos ordenados por tempo e
+pd.merge_asof (busca binária, O(pontos · log intervalos)) pega o último
+início <= instante; se o instante já passou do fim desse intervalo, o ponto
+fica sem rótulo. Com `por` (ex.: "frota") a busca é feita dentro de cada
+frota, numa única chamada.
+
+    from utils import juncao_temporal
+
+    intervalos = juncao_temporal.intervalos_frota(json_do_dia["547"], dia)
+    pontos = juncao_temporal.rotular(gdf_dia, intervalos)   # + grupo, operacao, estado
+
+Os shapes trazem IsoTime em UTC; hora_local() passa para o fuso dos
+relatórios (ETL_FUSO, padrão America/Sao_Paulo) antes de comparar.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import intervalos_colunar
+from utils.dim_operacoes import obter_dimensao
+
+FUSO_LOCAL = os.environ.get("ETL_FUSO") or "America/Sao_Paulo"
+COLUNAS_ROTULO = ("grupo", "operacao", "estado")
+
+
+def hora_local(serie):
+    """Instantes sem fuso, no horário local dos relatórios."""
+    serie = pd.to_datetime(serie, errors="coerce")
+    if getattr(serie.dt, "tz", None) is not None:
+        serie = serie.dt.tz_convert(FUSO_LOCAL).dt.tz_localize(None)
+    return serie
+
+
+def _lista(valor):
+    if intervalos_colunar.eh_colunar(valor):
+        return intervalos_colunar.decodificar(valor)
+    return valor if isinstance(valor, list) else []
+
+
+def _estados(grupos, operacoes):
+    """Tipo do Gantt por linha, calculado uma vez por par (grupo, operação)."""
+    dim = obter_dimensao()
+    pares = pd.DataFrame({"g": grupos, "o": operacoes}).fillna("")
+    unicos = pares.drop_duplicates()
+    tipos = [dim.tipo_gantt(g, o) for g, o in unicos.itertuples(index=False)]
+    mapa = dict(zip(unicos.itertuples(index=False, name=None), tipos))
+    return [mapa[p] for p in pares.itertuples(index=False, name=None)]
+
+
+def intervalos_frota(info_frota, dia=None):
+    """
+    DataFrame (inicio, fim, grupo, operacao, estado) ordenado por início, a
+    partir do JSON diário de uma frota: lista Intervalos da etapa 5
+    (Início/Fim/Grupo/Descrição da Operação) ou, no JSON já consolidado pela
+    etapa 7, os intervalos_operacao da frota (inicio HH:MM:SS + duracaoHoras,
+    só estado; exige `dia`).
+    """
+    vazio = pd.DataFrame(columns=["inicio", "fim", *COLUNAS_ROTULO])
+    if not isinstance(info_frota, dict):
+        return vazio
+
+    intervalos = _lista(info_frota.get("Intervalos"))
+    if intervalos:
+        df = pd.DataFrame(intervalos)
+        if not {"Início", "Fim"} <= set(df.columns):
+            return vazio
+        grupo = df.get("Grupo", pd.Series(index=df.index, dtype=object))
+        operacao = df.get("Descrição da Operação", pd.Series(index=df.index, dtype=object))
+        df = pd.DataFrame({
+            "inicio": pd.to_datetime(df["Início"], dayfirst=True, errors="coerce"),
+            "fim": pd.to_datetime(df["Fim"], dayfirst=True, errors="coerce"),
+            "grupo": grupo,
+            "operacao": operacao,
+            "estado": _estados(grupo, operacao),
+        })
+    else:
+        gantt = _lista(info_frota.get("intervalos_operacao"))
+        if not gantt or dia is None:
+            return vazio
+        df = pd.DataFrame(gantt)
+        inicio = pd.Timestamp(dia) + pd.to_timedelta(df["inicio"].astype(str), errors="coerce")
+        duracao = pd.to_numeric(df["duracaoHoras"], errors="coerce")
+        df = pd.DataFrame({
+            "inicio": inicio,
+            "fim": inicio + pd.to_timedelta(duracao, unit="h"),
+            "grupo": None,
+            "operacao": None,
+            "estado": df.get("tipo"),
+        })
+
+    # Intervalo que passa da meia-noite: Fim tem a data do início (duração ajustada na etapa 4)
+    virada = df["fim"] < df["inicio"]
+    df.loc[virada, "fim"] += pd.Timedelta(days=1)
+    return df.dropna(subset=["inicio", "fim"]).sort_values("inicio", kind="stable").reset_index(drop=True)
+
+
+def rotular(pontos, intervalos, col_tempo="timestamp", por=None, colunas=COLUNAS_ROTULO):
+    """
+    Cópia de `pontos` com as `colunas` do intervalo que contém cada instante
+    (NaN fora de qualquer intervalo). Mantém a ordem e o índice dos pontos.
+    `por`: coluna presente nos dois lados para casar só dentro do mesmo grupo.
+    """
+    pontos = pontos.copy()
+    for coluna in colunas:
+        pontos[coluna] = np.nan
+    if len(pontos) == 0 or intervalos is None or len(intervalos) == 0:
+        return pontos
+
+    chaves = [por] if por else []
+    esquerda = pd.DataFrame({"_t": hora_local(pontos[col_tempo]).to_numpy(), "_pos": np.arange(len(pontos))})
+    for c in chaves:
+        esquerda[c] = pontos[c].to_numpy()
+    esquerda = esquerda.dropna(subset=["_t"]).sort_values("_t", kind="stable")
+
+    direita = intervalos[[*chaves, "inicio", "fim", *colunas]].rename(columns={"inicio": "_t"})
+    direita = direita.astype({"_t": esquerda["_t"].dtype}).sort_values("_t", kind="stable")
+
+    casado = pd.merge_asof(esquerda, direita, on="_t", by=por, direction="backward")
+    dentro = (casado["_t"] < casado["fim"]).to_numpy()
+    posicoes = casado["_pos"].to_numpy()[dentro]
+    for coluna in colunas:
+        valores = pontos[coluna].to_numpy(dtype=object)
+        valores[posicoes] = casado[coluna].to_numpy(dtype=object)[dentro]
+        pontos[coluna] = valores
+    return pontos
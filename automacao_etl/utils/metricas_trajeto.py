@@ -0,0 +1,222 @@
+"""
+metricas_trajeto.py
+
+Métricas de trajeto por frota-dia a partir dos pontos GPS (shapes OPC e
+Case): distância (haversine), distribuição de velocidade, paradas e lacunas
+de sinal. Servem de conferência para a media_velocidade dos relatórios,
+que vem só da coluna Velocidade Média (Solinftec) / Velocidade (Case).
+
+Tudo em NumPy sobre os arrays ordenados por (frota-dia, instante): os passos
+entre pontos vizinhos são calculados de uma vez, passos que cruzam de uma
+frota-dia para outra são descartados e as somas por grupo saem de
+np.bincount; percentis por grupo usam uma única ordenação e
+offsets de cada grupo. Nenhum laço por ponto — milhões de pontos por dia
+levam segundos.
+
+    from utils import metricas_trajeto
+
+    df = metricas_trajeto.calcular(pontos)   # colunas frota, timestamp, lat, lon
+    metricas_trajeto.salvar(df)              # parciais/trajetos/DD-MM-YYYY.json
+    metricas_trajeto.payload(metricas_trajeto.carregar_dia(dia), media_velocidade)
+
+Limiares (segundos / km/h) ajustáveis por ETL_TRAJETO_LACUNA_S,
+ETL_TRAJETO_PARADA_KMH e ETL_TRAJETO_PARADA_MIN_S.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import agregados
+from utils.juncao_temporal import hora_local
+
+PASTA_TRAJETOS = os.path.join(agregados.PASTA_PARCIAIS, "trajetos")
+RAIO_TERRA_M = 6371008.8
+# Passo maior que isso é falta de sinal (máquina desligada / sem cobertura)
+LACUNA_S = float(os.environ.get("ETL_TRAJETO_LACUNA_S") or 300)
+# Abaixo dessa velocidade o passo conta como parado
+PARADA_KMH = float(os.environ.get("ETL_TRAJETO_PARADA_KMH") or 1.0)
+# Episódio parado mais curto que isso não conta como parada
+PARADA_MIN_S = float(os.environ.get("ETL_TRAJETO_PARADA_MIN_S") or 120)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distância em metros entre pares de coordenadas (graus), vetorizada."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _ordem(grupo, valores):
+    """Ordem por (grupo, valor): duas ordenações estáveis, a do grupo inteiro é radix."""
+    ordem = np.argsort(valores, kind="stable")
+    return ordem[np.argsort(grupo[ordem], kind="stable")]
+
+
+def _percentis(grupo, valores, n_grupos, quantis):
+    """Percentis (posição mais próxima) de `valores` por grupo; NaN em grupo vazio."""
+    saida = np.full((n_grupos, len(quantis)), np.nan)
+    if len(valores) == 0:
+        return saida
+    ordem = _ordem(grupo, valores)
+    grupo, valores = grupo[ordem], valores[ordem]
+    contagem = np.bincount(grupo, minlength=n_grupos)
+    inicio = np.concatenate([[0], np.cumsum(contagem)[:-1]])
+    tem = contagem > 0
+    for j, q in enumerate(quantis):
+        pos = inicio[tem] + np.round(q * (contagem[tem] - 1)).astype(np.int64)
+        saida[tem, j] = valores[pos]
+    return saida
+
+
+def calcular(pontos, col_chave="frota", col_tempo="timestamp", col_lat="lat", col_lon="lon"):
+    """
+    DataFrame com uma linha por (frota, data) e as métricas do trajeto.
+    A data é a do horário local do ponto (ver juncao_temporal.hora_local).
+    """
+    tempo = hora_local(pontos[col_tempo])
+    lat = pd.to_numeric(pontos[col_lat], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(pontos[col_lon], errors="coerce").to_numpy(dtype=float)
+    valido = tempo.notna().to_numpy() & np.isfinite(lat) & np.isfinite(lon) & pontos[col_chave].notna().to_numpy()
+    if not valido.any():
+        return pd.DataFrame()
+
+    segundos = (tempo[valido] - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+    lat, lon = lat[valido], lon[valido]
+    # Grupo = (frota, dia) a partir dos códigos inteiros, sem montar tuplas por ponto
+    cod_frota, frotas = pd.factorize(pontos[col_chave][valido].astype(str))
+    dia = (segundos // 86400).astype(np.int64)
+    grupo, combinacoes = pd.factorize(cod_frota.astype(np.int64) * (dia.max() + 1) + dia)
+    rotulos = [(frotas[c // (dia.max() + 1)], (pd.Timestamp(0) + pd.Timedelta(days=int(c % (dia.max() + 1)))).date())
+               for c in combinacoes]
+
+    ordem = _ordem(grupo, segundos)
+    grupo, segundos, lat, lon = grupo[ordem], segundos[ordem], lat[ordem], lon[ordem]
+    n = len(rotulos)
+
+    # Passos entre pontos vizinhos da mesma frota-dia
+    mesmo = grupo[1:] == grupo[:-1]
+    dt = np.diff(segundos)
+    dist = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    g_passo = grupo[1:]
+    lacuna = mesmo & (dt > LACUNA_S)
+    passo = mesmo & (dt > 0) & ~lacuna
+    vel = np.zeros_like(dt)
+    vel[passo] = dist[passo] / dt[passo] * 3.6
+
+    def soma(pesos, mascara):
+        return np.bincount(g_passo[mascara], weights=pesos[mascara], minlength=n)
+
+    distancia_m = soma(dist, passo)
+    tempo_sinal_s = soma(dt, passo)
+    movendo = passo & (vel >= PARADA_KMH)
+    tempo_movendo_s = soma(dt, movendo)
+
+    # Episódios parados: sequências de passos parados seguidos na mesma frota-dia
+    parado = passo & (vel < PARADA_KMH)
+    anterior = np.concatenate([[False], parado[:-1]])
+    episodio = np.cumsum(parado & ~anterior) * parado
+    dur_episodio = np.bincount(episodio, weights=np.where(parado, dt, 0))[1:]
+    grupo_episodio = np.zeros(len(dur_episodio), dtype=np.int64)
+    grupo_episodio[episodio[parado] - 1] = g_passo[parado]
+    conta = dur_episodio >= PARADA_MIN_S
+    paradas = np.bincount(grupo_episodio[conta], minlength=n)
+    tempo_parado_s = np.bincount(grupo_episodio[conta], weights=dur_episodio[conta], minlength=n)
+    maior_parada_s = np.zeros(n)
+    np.maximum.at(maior_parada_s, grupo_episodio[conta], dur_episodio[conta])
+
+    lacunas = np.bincount(g_passo[lacuna], minlength=n)
+    tempo_lacunas_s = soma(dt, lacuna)
+    maior_lacuna_s = np.zeros(n)
+    np.maximum.at(maior_lacuna_s, g_passo[lacuna], dt[lacuna])
+
+    vel_pct = _percentis(g_passo[movendo], vel[movendo], n, (0.5, 0.9, 1.0))
+    dt_mediano = _percentis(g_passo[mesmo], dt[mesmo], n, (0.5,))[:, 0]
+
+    pontos_por_grupo = np.bincount(grupo, minlength=n)
+    primeiro = np.full(n, np.inf)
+    ultimo = np.full(n, -np.inf)
+    np.minimum.at(primeiro, grupo, segundos)
+    np.maximum.at(ultimo, grupo, segundos)
+
+    def razao(a, b):
+        return np.where(b > 0, a / np.where(b > 0, b, 1), np.nan)
+
+    return pd.DataFrame({
+        "frota": [r[0] for r in rotulos],
+        "data": [r[1] for r in rotulos],
+        "pontos": pontos_por_grupo,
+        "inicio": pd.to_datetime(primeiro, unit="s").strftime("%H:%M:%S"),
+        "fim": pd.to_datetime(ultimo, unit="s").strftime("%H:%M:%S"),
+        "distancia_km": distancia_m / 1000,
+        "tempo_com_sinal_h": tempo_sinal_s / 3600,
+        "tempo_movendo_h": tempo_movendo_s / 3600,
+        "velocidade_media_kmh": razao(distancia_m / 1000, tempo_sinal_s / 3600),
+        "velocidade_movendo_kmh": razao(distancia_m / 1000, tempo_movendo_s / 3600),
+        "velocidade_p50_kmh": vel_pct[:, 0],
+        "velocidade_p90_kmh": vel_pct[:, 1],
+        "velocidade_max_kmh": vel_pct[:, 2],
+        "paradas": paradas,
+        "tempo_parado_h": tempo_parado_s / 3600,
+        "maior_parada_min": maior_parada_s / 60,
+        "lacunas": lacunas,
+        "tempo_lacunas_h": tempo_lacunas_s / 3600,
+        "maior_lacuna_min": maior_lacuna_s / 60,
+        "intervalo_mediano_s": dt_mediano,
+    }).sort_values(["data", "frota"], kind="stable").reset_index(drop=True)
+
+
+# ─── Armazenamento por dia ─────────────────────────────────────────────────────
+
+def _valor(v):
+    if isinstance(v, (np.floating, float)):
+        return None if np.isnan(v) else round(float(v), 4)
+    if isinstance(v, np.integer):
+        return int(v)
+    return v
+
+
+def carregar_dia(dia):
+    """{frota: {métricas}} gravadas para o dia (vazio se não houver)."""
+    return (agregados.ler_dia(PASTA_TRAJETOS, dia) or {}).get("frotas", {})
+
+
+def salvar(metricas):
+    """
+    Grava as métricas de cada dia; frotas já gravadas no dia e ausentes aqui
+    são mantidas. Dia sem mudança não é regravado (o arquivo é entrada do
+    --check da etapa 7).
+    """
+    if metricas is None or metricas.empty:
+        return []
+    dias = []
+    for dia, df_dia in metricas.groupby("data"):
+        frotas = carregar_dia(dia)
+        for linha in df_dia.drop(columns=["data"]).to_dict("records"):
+            frota = str(linha.pop("frota"))
+            frotas[frota] = {k: _valor(v) for k, v in linha.items()}
+        conteudo = {"data": dia.strftime("%d-%m-%Y"), "frotas": dict(sorted(frotas.items()))}
+        agregados.gravar_atomico(agregados.caminho_dia(PASTA_TRAJETOS, dia), conteudo)
+        dias.append(dia)
+    return dias
+
+
+def payload(metricas_dia, media_velocidade=None, frotas=None):
+    """
+    Lista para o JSON consolidado (uma entrada por frota, só as de `frotas`
+    se informado). Com a media_velocidade do relatório, acrescenta
+    velocidade_relatorio e a diferença para a velocidade média em movimento
+    do GPS.
+    """
+    relatorio = {str(m.get("nome")): m.get("velocidade") for m in (media_velocidade or [])}
+    selecionadas = metricas_dia if frotas is None else [f for f in map(str, frotas) if f in metricas_dia]
+    saida = []
+    for frota in sorted(selecionadas, key=lambda f: (len(f), f)):
+        item = {"nome": frota, **metricas_dia[frota]}
+        velocidade = relatorio.get(frota)
+        if velocidade and item.get("velocidade_movendo_kmh") is not None:
+            item["velocidade_relatorio"] = velocidade
+            item["diferenca_velocidade_kmh"] = round(item["velocidade_movendo_kmh"] - velocidade, 4)
+        saida.append(item)
+    return saida
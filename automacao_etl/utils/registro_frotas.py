@@ -0,0 +1,244 @@
+"""
+registro_frotas.py
+
+Registro único de identidade das frotas, compartilhado por Solinftec (4/5),
+OPC (2, shapes do 8) e Case (6/7).
+
+Cada fonte escreve a frota de um jeito: 547, 547.0, "MB 547 COLHEDORA",
+"Colhedora_MB547.zip", "FROTA 547"... chave() resolve qualquer um desses para
+a chave canônica ("547") uma única vez por valor bruto (cache em memória) e
+tipo() devolve Colhedora/Trator. Os apelidos já vistos e o tipo de cada frota
+seguem o esquema da dim_operacoes.json: utils/registro_frotas.json é a
+semente versionada, editável à mão (ex.: apelido sem número -> frota), e as
+entradas novas vão no próximo salvar() para dados/cadastros/registro_frotas.json
+(fora do git); a semente prevalece sobre o aprendido.
+
+    from utils.registro_frotas import obter_registro
+
+    registro = obter_registro()
+    registro.chave("Colhedora_MB469.zip")  # "469"
+    registro.tipo("MB 469")                # "Colhedora"
+"""
+
+import copy
+import json
+import os
+import re
+import threading
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRO_FROTAS_FILE = os.path.join(UTILS_DIR, "registro_frotas.json")
+REGISTRO_FROTAS_APRENDIDO = os.environ.get("ETL_REGISTRO_FROTAS_APRENDIDO") or os.path.join(
+    os.path.dirname(UTILS_DIR), "dados", "cadastros", "registro_frotas.json"
+)
+
+VERSAO_REGISTRO = 1
+
+# Colunas em que os relatórios trazem a frota, na ordem de preferência
+CAMPOS_FROTA = ("Frota", "Código Equipamento", "Equipamento")
+
+# Prefixos usados pelas fontes antes do número (OPC "MB 547", Case "FROTA 547" / "NO. 547")
+_PREFIXADO = re.compile(r"(?:MB|FROTA|NO\.)\s*(\d+)", re.IGNORECASE)
+_NO_INICIO = re.compile(r"^\s*(\d+)")
+_DIGITOS = re.compile(r"\d+")
+
+
+def extrair_numero(valor, maior_bloco=False):
+    """
+    Número da frota num valor bruto, sem consultar o registro (None se não
+    houver): prefixo conhecido (MB/FROTA/NO.) ou dígitos no início. Com
+    `maior_bloco`, sem nenhum dos dois vale o maior bloco de dígitos (nomes de
+    arquivo da etapa 8); apelidos Case não usam, pois trazem o modelo
+    ("Magnum 340") e sem prefixo a frota é desconhecida.
+    """
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, float):
+        if valor != valor:  # NaN
+            return None
+        if valor.is_integer():
+            return str(int(valor))
+    if isinstance(valor, int):
+        return str(valor)
+    texto = str(valor).strip()
+    if re.fullmatch(r"\d+\.0+", texto):
+        return texto.split(".")[0]
+    for padrao in (_PREFIXADO, _NO_INICIO):
+        m = padrao.search(texto)
+        if m:
+            return m.group(1)
+    if not maior_bloco:
+        return None
+    numeros = _DIGITOS.findall(texto)
+    # Sem prefixo conhecido: o maior bloco de dígitos é o mais provável de ser o ID
+    return max(numeros, key=len) if numeros else None
+
+
+def tipo_pelo_nome(valor):
+    texto = str(valor).lower()
+    if "colhedora" in texto:
+        return "Colhedora"
+    if "trator" in texto:
+        return "Trator"
+    return None
+
+
+def campo_frota(item):
+    """(coluna, valor) da frota num registro dict, ou (None, None)."""
+    for campo in CAMPOS_FROTA:
+        if campo in item:
+            return campo, item[campo]
+    return None, None
+
+
+class RegistroFrotas:
+    """Valor bruto -> chave canônica da frota, com tipo e apelidos persistidos."""
+
+    def __init__(self, caminho: str = REGISTRO_FROTAS_FILE, caminho_aprendido: str = REGISTRO_FROTAS_APRENDIDO):
+        self.caminho = caminho
+        self.caminho_aprendido = caminho_aprendido
+        self._lock = threading.RLock()
+        self._alterado = False
+        self._frotas = {}
+        self._apelidos = {}
+        self._cache = {False: {}, True: {}}
+        self._carregar()
+
+    # ── Persistência ──
+
+    @staticmethod
+    def _ler(caminho):
+        if not os.path.exists(caminho):
+            return {}
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Não foi possível ler {os.path.basename(caminho)}: {e}")
+            return {}
+
+    def _carregar(self):
+        semente = self._ler(self.caminho)
+        self._frotas = copy.deepcopy(semente.get("frotas", {}))
+        self._apelidos = {self._normalizar_apelido(a): c for a, c in semente.get("apelidos", {}).items()}
+        self._semente = (copy.deepcopy(self._frotas), dict(self._apelidos))
+
+        # Aprendido: só acrescenta (frotas/apelidos novos e campos que a semente não tem)
+        aprendido = self._ler(self.caminho_aprendido)
+        for chave, entrada in aprendido.get("frotas", {}).items():
+            destino = self._frotas.setdefault(chave, {})
+            for campo, valor in entrada.items():
+                destino.setdefault(campo, valor)
+        for apelido, chave in aprendido.get("apelidos", {}).items():
+            self._apelidos.setdefault(self._normalizar_apelido(apelido), chave)
+
+    def salvar(self, forcar: bool = False):
+        """Grava as entradas aprendidas (somente se houve cadastro novo), de forma atômica."""
+        with self._lock:
+            if not self._alterado and not forcar:
+                return
+            frotas_semente, apelidos_semente = self._semente
+            conteudo = {
+                "versao": VERSAO_REGISTRO,
+                "frotas": {
+                    chave: entrada
+                    for chave, entrada in sorted(self._frotas.items(), key=lambda kv: (len(kv[0]), kv[0]))
+                    if entrada != frotas_semente.get(chave)
+                },
+                "apelidos": {
+                    apelido: chave
+                    for apelido, chave in sorted(self._apelidos.items())
+                    if apelidos_semente.get(apelido) != chave
+                },
+            }
+            os.makedirs(os.path.dirname(self.caminho_aprendido), exist_ok=True)
+            tmp = f"{self.caminho_aprendido}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(conteudo, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.caminho_aprendido)
+            self._alterado = False
+
+    @staticmethod
+    def _normalizar_apelido(valor):
+        return " ".join(str(valor).upper().split())
+
+    # ── Consulta ──
+
+    def chave(self, valor, tipo=None, maior_bloco=False):
+        """
+        Chave canônica ("547") de um valor bruto de qualquer fonte, ou None.
+        Cadastra a frota (e o apelido, se for texto diferente da chave) na
+        primeira vez; `tipo` informado pela fonte é gravado se ainda não houver.
+        `maior_bloco` como em extrair_numero.
+        """
+        cache = self._cache[bool(maior_bloco)]
+        try:
+            chave = cache[valor]
+        except (KeyError, TypeError):
+            chave = self._resolver(valor, maior_bloco)
+            try:
+                cache[valor] = chave
+            except TypeError:
+                pass
+        if chave is not None and tipo and not self._frotas.get(chave, {}).get("tipo"):
+            self._registrar(chave, tipo)
+        return chave
+
+    def _resolver(self, valor, maior_bloco=False):
+        apelido = self._normalizar_apelido(valor) if isinstance(valor, str) else None
+        if apelido and apelido in self._apelidos:
+            return self._apelidos[apelido]
+        chave = extrair_numero(valor)
+        # Só pelo maior bloco de dígitos não vira apelido (seria visto pelas consultas estritas)
+        confiavel = chave is not None
+        if chave is None and maior_bloco:
+            chave = extrair_numero(valor, maior_bloco=True)
+        if chave is None:
+            return None
+        with self._lock:
+            if chave not in self._frotas:
+                self._registrar(chave, None)
+            if confiavel and apelido and not re.fullmatch(r"\d+(\.0+)?", apelido) and apelido not in self._apelidos:
+                self._apelidos[apelido] = chave
+                self._alterado = True
+            tipo = tipo_pelo_nome(valor) if apelido else None
+            if tipo and not self._frotas[chave].get("tipo"):
+                self._registrar(chave, tipo)
+        return chave
+
+    def _registrar(self, chave, tipo):
+        with self._lock:
+            entrada = self._frotas.setdefault(chave, {})
+            if tipo:
+                entrada["tipo"] = tipo
+            self._alterado = True
+
+    def tipo(self, valor, padrao=None):
+        """Colhedora/Trator pelo nome ou pelo registro; `padrao` se desconhecido."""
+        pelo_nome = tipo_pelo_nome(valor) if isinstance(valor, str) else None
+        chave = self.chave(valor, tipo=pelo_nome)
+        if pelo_nome:
+            return pelo_nome
+        return self._frotas.get(chave, {}).get("tipo") or padrao
+
+    def chave_ou(self, valor, padrao=None):
+        """chave(), devolvendo `padrao` (ex.: o próprio valor) quando não há número."""
+        chave = self.chave(valor)
+        return padrao if chave is None else chave
+
+    def frotas(self, tipo=None):
+        return sorted((c for c, e in self._frotas.items() if tipo is None or e.get("tipo") == tipo),
+                      key=lambda c: (len(c), c))
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def obter_registro() -> RegistroFrotas:
+    """Instância compartilhada do registro (carregada uma vez por processo)."""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = RegistroFrotas()
+        return _registro
@@ -0,0 +1,248 @@
+"""
+shapes_pontos.py
+
+Leitor de shapefiles de pontos (trajetos do Operations Center) direto em
+NumPy, sem geopandas/Fiona: os ZIPs Colhedora_MB*.zip só trazem pontos e
+poucos campos (Machine, IsoTime, Time, Heading, Speed_kmh), e o
+gpd.read_file monta um objeto Shapely e um dict de atributos por ponto.
+
+- .shp: registros de ponto têm tamanho fixo, então viram um array
+  estruturado com np.frombuffer sobre os bytes (sem cópia); com registros
+  nulos no meio, as posições vêm do .shx.
+- .dbf: as linhas têm largura fixa; um dtype estruturado com um campo S<n>
+  por coluna lê a tabela inteira de uma vez e cada coluna é convertida
+  vetorizada (N/F -> float, C -> texto, D -> data, L -> bool).
+- IsoTime ("2025-10-05T09:00:00.000Z") é decodificado a partir dos bytes:
+  dígitos nas posições fixas viram ano/mês/dia/hora em inteiros e daí
+  datetime64, sem parse de texto por linha.
+- Geometria Shapely só se alguém pedir: geometria(df) monta o GeoDataFrame.
+
+    from utils import shapes_pontos
+
+    with arquivos_zip.abrir_zip(caminho) as zf:
+        for nome in zf.nomes((".shp",)):
+            df = shapes_pontos.ler_membro(zf, nome)   # x, y, campos do DBF, timestamp
+    # colunas=("Speed_kmh",) converte só os campos pedidos (texto é o mais caro)
+    df = shapes_pontos.ler_arquivo("pasta/trajeto.shp")  # extraído: memmap
+
+Arquivos fora do formato esperado levantam ValueError (o chamador decide se
+pula o shapefile).
+"""
+
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from utils.dependencias import importar_tardio
+
+gpd = importar_tardio("geopandas")
+
+CODIGO_SHP = 9994
+# Point, PointM, PointZ: x e y nas mesmas posições do registro
+TIPOS_PONTO = {1: "Point", 11: "PointZ", 21: "PointM"}
+CODIFICACAO_DBF = os.environ.get("ETL_DBF_CODIFICACAO") or "latin-1"
+FORMATO_TIME = "%m/%d/%Y %I:%M:%S %p"
+
+
+# ─── .shp ──────────────────────────────────────────────────────────────────────
+
+def _bytes(conteudo):
+    """Array uint8 sem cópia sobre bytes, memoryview ou np.memmap."""
+    if isinstance(conteudo, np.ndarray):
+        return conteudo.view(np.uint8).ravel()
+    return np.frombuffer(conteudo, dtype=np.uint8)
+
+
+def ler_shp(conteudo, shx=None):
+    """(x, y) float64 dos registros de um .shp de pontos; NaN nos registros nulos."""
+    buf = _bytes(conteudo)
+    if len(buf) < 100:
+        raise ValueError("arquivo .shp truncado")
+    codigo, palavras = struct.unpack(">i20xi", buf[:28].tobytes())
+    tipo = struct.unpack("<i", buf[32:36].tobytes())[0]
+    if codigo != CODIGO_SHP:
+        raise ValueError("não é um arquivo .shp")
+    if tipo not in TIPOS_PONTO:
+        raise ValueError(f"shapefile de tipo {tipo}, esperado ponto")
+    fim = min(len(buf), palavras * 2)
+    if fim <= 100:
+        return np.empty(0), np.empty(0)
+
+    # Tamanho fixo: todo registro tem o tamanho do primeiro (caso dos trajetos)
+    tamanho = 8 + 2 * struct.unpack(">i", buf[104:108].tobytes())[0]
+    n = (fim - 100) // tamanho
+    if tamanho >= 28 and (fim - 100) % tamanho == 0:
+        campos = [("num", ">i4"), ("tam", ">i4"), ("tipo", "<i4"), ("x", "<f8"), ("y", "<f8")]
+        if tamanho > 28:
+            campos.append(("resto", f"V{tamanho - 28}"))
+        registros = np.frombuffer(buf, dtype=np.dtype(campos), count=n, offset=100)
+        if (registros["tam"] == registros["tam"][0]).all():
+            nulo = registros["tipo"] == 0
+            x, y = registros["x"].astype(float), registros["y"].astype(float)
+            x[nulo] = np.nan
+            y[nulo] = np.nan
+            return x, y
+
+    # Tamanhos variados (registros nulos): posição de cada registro pelo .shx
+    if shx is None:
+        raise ValueError("registros de tamanho variado e sem .shx")
+    indice = np.frombuffer(_bytes(shx), dtype=">i4", offset=100).reshape(-1, 2)
+    posicao = indice[:, 0].astype(np.int64) * 2
+    completo = (posicao + 28 <= len(buf)) & (indice[:, 1] >= 10)
+    x = np.full(len(posicao), np.nan)
+    y = np.full(len(posicao), np.nan)
+    p = posicao[completo]
+    tipos = buf[p[:, None] + np.arange(8, 12)].view("<i4").ravel()
+    ponto = tipos != 0
+    x[np.flatnonzero(completo)[ponto]] = buf[p[ponto, None] + np.arange(12, 20)].view("<f8").ravel()
+    y[np.flatnonzero(completo)[ponto]] = buf[p[ponto, None] + np.arange(20, 28)].view("<f8").ravel()
+    return x, y
+
+
+# ─── .dbf ──────────────────────────────────────────────────────────────────────
+
+def ler_dbf(conteudo):
+    """
+    (tabela, campos): array estruturado com os bytes de cada coluna e a
+    lista (nome, tipo, tamanho, decimais). `_apagado` marca linhas excluídas.
+    """
+    buf = _bytes(conteudo)
+    n, tamanho_cabecalho, tamanho_registro = struct.unpack("<IHH", buf[4:12].tobytes())
+    campos = []
+    for pos in range(32, tamanho_cabecalho - 1, 32):
+        descritor = buf[pos:pos + 32].tobytes()
+        if descritor[0] == 0x0D:
+            break
+        nome = descritor[:11].split(b"\x00")[0].decode("ascii", errors="replace").strip()
+        campos.append((nome, chr(descritor[11]), descritor[16], descritor[17]))
+
+    colunas = [("_apagado", "S1")] + [(nome, f"S{tamanho}") for nome, _, tamanho, _ in campos]
+    dtype = np.dtype(colunas)
+    if dtype.itemsize < tamanho_registro:
+        dtype = np.dtype(colunas + [("_resto", f"V{tamanho_registro - dtype.itemsize}")])
+    if dtype.itemsize != tamanho_registro:
+        raise ValueError("descritores do .dbf não batem com o tamanho do registro")
+    n = min(n, (len(buf) - tamanho_cabecalho) // tamanho_registro)
+    return np.frombuffer(buf, dtype=dtype, count=n, offset=tamanho_cabecalho), campos
+
+
+def converter(bruto, tipo, codificacao=CODIFICACAO_DBF):
+    """Coluna S<n> do .dbf convertida pelo tipo do campo."""
+    texto = np.char.strip(bruto)
+    if tipo in ("N", "F"):
+        try:
+            return np.where(texto == b"", b"nan", texto).astype(float)
+        except ValueError:
+            # Estouro de largura ("****") e afins viram NaN
+            return pd.to_numeric(pd.Series(np.char.decode(texto, "ascii", errors="replace")), errors="coerce").to_numpy()
+    if tipo == "L":
+        return np.isin(texto, (b"T", b"t", b"Y", b"y"))
+    if tipo == "D":
+        return pd.to_datetime(np.char.decode(texto, "ascii", errors="replace"), format="%Y%m%d", errors="coerce")
+    # Texto costuma repetir (Machine é a mesma em todo o arquivo): decodifica só os distintos
+    distintos, posicao = np.unique(texto, return_inverse=True)
+    return np.char.decode(distintos, codificacao, errors="replace").astype(object)[posicao.ravel()]
+
+
+# ─── Tempo ─────────────────────────────────────────────────────────────────────
+
+def _digitos(matriz, inicio, fim):
+    valor = np.zeros(len(matriz), dtype=np.int64)
+    for pos in range(inicio, fim):
+        valor = valor * 10 + matriz[:, pos]
+    return valor
+
+
+def timestamp_iso(bruto):
+    """
+    Instantes de uma coluna IsoTime em bytes (S<n>), decodificados pelas
+    posições fixas de "AAAA-MM-DDTHH:MM:SS[.fff][Z]". Com 'Z' o resultado é
+    UTC com fuso (como pd.to_datetime faria); fora desse padrão, cai no
+    pd.to_datetime do texto.
+    """
+    bruto = np.char.strip(np.asarray(bruto))
+    largura = bruto.dtype.itemsize
+    if len(bruto) == 0 or largura < 19:
+        return pd.to_datetime(pd.Series(np.char.decode(bruto, "ascii", errors="replace")), errors="coerce")
+    matriz = np.frombuffer(bruto.astype(f"S{largura}").tobytes(), dtype=np.uint8).reshape(len(bruto), largura)
+    separadores = {4: b"-", 7: b"-", 10: b"T", 13: b":", 16: b":"}
+    posicoes_digito = [p for p in range(19) if p not in separadores]
+    padrao = np.all(matriz[:, posicoes_digito] - 48 <= 9, axis=1)
+    for pos, sep in separadores.items():
+        padrao &= (matriz[:, pos] == sep[0]) | ((pos == 10) & (matriz[:, pos] == ord(" ")))
+    utc = matriz[np.arange(len(bruto)), np.char.str_len(bruto) - 1] == ord("Z")
+    if not padrao.all() or utc.any() != utc.all():
+        return pd.to_datetime(pd.Series(np.char.decode(bruto, "ascii", errors="replace")), errors="coerce")
+
+    digitos = matriz.astype(np.int64) - 48
+    meses = (_digitos(digitos, 0, 4) - 1970) * 12 + _digitos(digitos, 5, 7) - 1
+    instante = (
+        meses.astype("datetime64[M]").astype("datetime64[D]")
+        + (_digitos(digitos, 8, 10) - 1).astype("timedelta64[D]")
+        + (_digitos(digitos, 11, 13) * 3600 + _digitos(digitos, 14, 16) * 60 + _digitos(digitos, 17, 19)).astype("timedelta64[s]")
+    ).astype("datetime64[ms]")
+    if largura >= 23:
+        fracao = (matriz[:, 19] == ord(".")) & np.all(matriz[:, 20:23] - 48 <= 9, axis=1)
+        instante = instante + np.where(fracao, _digitos(digitos, 20, 23), 0).astype("timedelta64[ms]")
+    serie = pd.Series(instante)
+    return serie.dt.tz_localize("UTC") if utc.all() else serie
+
+
+# ─── Leitura ───────────────────────────────────────────────────────────────────
+
+def ler_pontos(shp, dbf, shx=None, colunas=None, codificacao=CODIFICACAO_DBF):
+    """
+    DataFrame com x, y, as colunas do .dbf (só as de `colunas`, se
+    informado) e `timestamp` (de IsoTime ou Time).
+    """
+    x, y = ler_shp(shp, shx)
+    tabela, campos = ler_dbf(dbf)
+    if len(tabela) != len(x):
+        raise ValueError(f".shp com {len(x)} pontos e .dbf com {len(tabela)} linhas")
+
+    df = pd.DataFrame({"x": x, "y": y})
+    for nome, tipo, _, _ in campos:
+        if colunas is None or nome in colunas:
+            df[nome] = converter(tabela[nome], tipo, codificacao)
+    nomes = {nome for nome, _, _, _ in campos}
+    if "IsoTime" in nomes:
+        df["timestamp"] = timestamp_iso(tabela["IsoTime"])
+    elif "Time" in nomes:
+        hora = df["Time"] if "Time" in df.columns else converter(tabela["Time"], "C", codificacao)
+        df["timestamp"] = pd.to_datetime(pd.Series(hora), format=FORMATO_TIME, errors="coerce")
+
+    apagado = tabela["_apagado"] == b"*"
+    if apagado.any():
+        df = df[~apagado].reset_index(drop=True)
+    return df
+
+
+def ler_membro(zf, nome_shp, colunas=None, codificacao=CODIFICACAO_DBF):
+    """Lê um shapefile de dentro do ZIP (arquivos_zip.ArquivoZip; bytes em memória, sem extrair)."""
+    base = nome_shp[:-4]
+    nomes = {n.lower(): n for n in zf.nomes()}
+    dbf = nomes.get(f"{base}.dbf".lower())
+    if dbf is None:
+        raise ValueError(f"{base}.dbf ausente no ZIP")
+    shx = nomes.get(f"{base}.shx".lower())
+    return ler_pontos(zf.ler(nome_shp), zf.ler(dbf), zf.ler(shx) if shx else None, colunas, codificacao)
+
+
+def ler_arquivo(caminho_shp, colunas=None, codificacao=CODIFICACAO_DBF):
+    """Lê um shapefile já extraído, com os arquivos mapeados em memória (memmap)."""
+    base = os.path.splitext(caminho_shp)[0]
+    shx = f"{base}.shx"
+    return ler_pontos(
+        np.memmap(caminho_shp, dtype=np.uint8, mode="r"),
+        np.memmap(f"{base}.dbf", dtype=np.uint8, mode="r"),
+        np.memmap(shx, dtype=np.uint8, mode="r") if os.path.exists(shx) else None,
+        colunas,
+        codificacao,
+    )
+
+
+def geometria(df, crs="EPSG:4326"):
+    """GeoDataFrame com pontos Shapely a partir de x/y (só para quem precisa da geometria)."""
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["x"], df["y"]), crs=crs)
@@ -0,0 +1,212 @@
+"""
+topk.py
+
+Top-K de ofensores (maiores somas de tempo improdutivo por operação) em
+qualquer grão: frota-dia, tipo-dia, operador-semana, frente-período...
+
+    from utils import topk
+
+    ranking = topk.TopK(k=5)
+    for intervalo in intervalos:                        # uma passada
+        chave = topk.chave_grao("frente-dia", intervalo)  # ex.: ("frente5", "06-10-2025")
+        ranking.adicionar(chave, intervalo["operacao"], intervalo["duracao"])
+    ranking.maiores(chave)                              # [(operacao, soma), ...] (K)
+
+O estado guarda a soma de cada item por grupo (o vocabulário de operações é
+o da dimensão, dezenas de itens) e a seleção usa heapq.nlargest, O(n log K)
+em vez de ordenar tudo. Somas são mescláveis: a etapa 4 grava o estado de
+cada dia no grão mais fino (GRAO_DIA: tipo, frota, operador e frente) em
+dados/separados/parciais/ofensores/DD-MM-YYYY.json (salvar_dias) e o top-K
+de um período em qualquer grão sai de periodo(), que mescla os dias gravados
+sem revisitar os intervalos nem reordenar o conjunto:
+
+    topk.periodo(inicio, fim, grao="operador-semana").resultado()
+A ordem em empates é a de inserção, como em sorted(..., reverse=True).
+"""
+
+import heapq
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from utils import agregados
+
+PASTA_OFENSORES = os.path.join(agregados.PASTA_PARCIAIS, "ofensores")
+
+# Grão -> (campos do registro que compõem a chave, recorte de tempo)
+GRAOS = {
+    "detalhe-dia": (("tipo", "frota", "operador", "frente"), "dia"),
+    "frota-dia": (("tipo", "frota"), "dia"),
+    "tipo-dia": (("tipo",), "dia"),
+    "tipo-periodo": (("tipo",), None),
+    "operador-dia": (("operador",), "dia"),
+    "operador-semana": (("operador",), "semana"),
+    "frente-dia": (("frente",), "dia"),
+    "frente-periodo": (("frente",), None),
+}
+# Grão dos estados gravados por dia: os demais saem dele por reagrupamento
+GRAO_DIA = "detalhe-dia"
+
+
+def _como_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()[:10]
+    for formato in ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data não reconhecida: {valor!r}")
+
+
+def chave_grao(grao, registro):
+    """
+    Chave de grupo de `registro` (dict com os campos do grão e "data") no
+    grão pedido. Nos grãos por dia a data (DD-MM-YYYY) é o último campo;
+    semana = ISO (AAAA-Sss); período = sem recorte de tempo.
+    """
+    campos, tempo = GRAOS[grao]
+    chave = tuple(registro.get(c) for c in campos)
+    if tempo == "dia":
+        chave += (_como_data(registro["data"]).strftime("%d-%m-%Y"),)
+    elif tempo == "semana":
+        ano, semana, _ = _como_data(registro["data"]).isocalendar()
+        chave += (f"{ano}-S{semana:02d}",)
+    return chave
+
+
+def reagrupador(grao, origem=GRAO_DIA):
+    """Função para mesclar()/periodo() que leva chaves do grão `origem` (com dia) para `grao`."""
+    campos = GRAOS[origem][0]
+
+    def reagrupar(grupo):
+        return chave_grao(grao, {**dict(zip(campos, grupo[:-1])), "data": grupo[-1]})
+    return reagrupar
+
+
+class TopK:
+    """Somas por (grupo, item) e os K maiores itens de cada grupo."""
+
+    def __init__(self, k=5):
+        self.k = k
+        self._somas = defaultdict(dict)
+        self._totais = defaultdict(float)
+
+    def adicionar(self, grupo, item, valor):
+        somas = self._somas[grupo]
+        somas[item] = somas.get(item, 0.0) + valor
+
+    def adicionar_total(self, grupo, valor):
+        """Denominador do grupo (ex.: tempo total do dia), se não for a soma dos itens."""
+        self._totais[grupo] += valor
+
+    def total(self, grupo):
+        if grupo in self._totais:
+            return self._totais[grupo]
+        return sum(self._somas.get(grupo, {}).values())
+
+    def grupos(self):
+        """Grupos com itens ou só com total."""
+        return list(dict.fromkeys([*self._somas, *self._totais]))
+
+    def maiores(self, grupo, k=None):
+        """[(item, soma)] do grupo, da maior soma para a menor (no máximo K)."""
+        itens = self._somas.get(grupo, {})
+        return heapq.nlargest(k or self.k, itens.items(), key=lambda par: par[1])
+
+    def resultado(self, k=None):
+        return {grupo: self.maiores(grupo, k) for grupo in self._somas}
+
+    def mesclar(self, outro, reagrupar=None):
+        """
+        Soma o estado de `outro` a este. `reagrupar(grupo)` troca a chave de
+        grupo na mescla (ex.: frota-dia -> tipo-período).
+        """
+        for grupo, itens in outro._somas.items():
+            destino = reagrupar(grupo) if reagrupar else grupo
+            for item, valor in itens.items():
+                self.adicionar(destino, item, valor)
+        for grupo, valor in outro._totais.items():
+            self.adicionar_total(reagrupar(grupo) if reagrupar else grupo, valor)
+        return self
+
+    def estado(self):
+        """Estado serializável em JSON (chaves e itens em listas)."""
+        return {
+            "k": self.k,
+            "grupos": [
+                {"grupo": list(g) if isinstance(g, tuple) else g,
+                 "itens": [[list(i) if isinstance(i, tuple) else i, v] for i, v in self._somas.get(g, {}).items()],
+                 **({"total": self._totais[g]} if g in self._totais else {})}
+                for g in self.grupos()
+            ],
+        }
+
+    @classmethod
+    def de_estado(cls, estado):
+        topk = cls(estado.get("k", 5))
+        for registro in estado.get("grupos", []):
+            grupo = registro["grupo"]
+            grupo = tuple(grupo) if isinstance(grupo, list) else grupo
+            for item, valor in registro["itens"]:
+                topk.adicionar(grupo, tuple(item) if isinstance(item, list) else item, valor)
+            if "total" in registro:
+                topk.adicionar_total(grupo, registro["total"])
+        return topk
+
+
+# ─── Estados por dia ───────────────────────────────────────────────────────────
+
+def _ler_dia(dia):
+    """Estado gravado do dia; arquivo de outro grão (versão anterior) conta como ausente."""
+    estado = agregados.ler_dia(PASTA_OFENSORES, dia)
+    if not isinstance(estado, dict) or estado.get("grao") != GRAO_DIA:
+        return None
+    try:
+        return TopK.de_estado(estado)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def salvar_dias(ranking):
+    """
+    Grava o estado de cada dia de `ranking` (grupos no GRAO_DIA, com a data
+    como último campo da chave), substituindo os grupos já gravados.
+    """
+    por_dia = defaultdict(lambda: TopK(ranking.k))
+    for grupo in ranking.grupos():
+        destino = por_dia[_como_data(grupo[-1])]
+        for item, valor in ranking._somas.get(grupo, {}).items():
+            destino.adicionar(grupo, item, valor)
+        if grupo in ranking._totais:
+            destino.adicionar_total(grupo, ranking._totais[grupo])
+
+    for dia, novo in por_dia.items():
+        existente = _ler_dia(dia)
+        if existente is not None:
+            for grupo in novo.grupos():
+                existente._somas.pop(grupo, None)
+                existente._totais.pop(grupo, None)
+            novo = existente.mesclar(novo)
+        agregados.gravar_atomico(agregados.caminho_dia(PASTA_OFENSORES, dia), {"grao": GRAO_DIA, **novo.estado()})
+
+
+def periodo(inicio, fim, grao=None, reagrupar=None, k=5):
+    """
+    TopK com os estados gravados de `inicio` a `fim` mesclados no `grao`
+    pedido (ou com `reagrupar` próprio, como em mesclar; sem nenhum dos dois
+    fica no GRAO_DIA).
+    """
+    if grao is not None:
+        reagrupar = reagrupador(grao)
+    ranking = TopK(k)
+    dia = inicio
+    while dia <= fim:
+        estado = _ler_dia(dia)
+        dia += timedelta(days=1)
+        if estado is not None:
+            ranking.mesclar(estado, reagrupar)
+    return ranking
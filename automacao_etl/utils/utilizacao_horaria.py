@@ -0,0 +1,189 @@
+"""
+utilizacao_horaria.py
+
+Matriz frotas × categorias × faixas do dia (minutos), para ver em que
+horário cada frota está produtiva, improdutiva, em manutenção ou sem
+apontamento — sem reproduzir o intervalos_operacao no navegador.
+
+A varredura é vetorizada (NumPy): cada intervalo vira dois eventos
+(+1 no início, -1 no fim) acumulados por célula na primeira borda de faixa
+depois deles; com as somas acumuladas de `delta` e `delta×posição`, o
+tempo coberto até a borda t é t·C(t) − S(t), e a diferença entre bordas
+vizinhas dá os minutos de cada faixa. Intervalos que atravessam várias
+faixas são divididos sem laço por intervalo.
+
+A etapa 4 grava uma matriz por frota e dia em dados/separados/parciais/
+utilizacao/DD-MM-YYYY.json (linhas substituídas por frota, como os
+parciais de agregados.py). Matrizes somam: o período é a soma dos dias.
+
+    from utils import utilizacao_horaria
+
+    matrizes = utilizacao_horaria.periodo(inicio, fim)
+    utilizacao_horaria.payload(matrizes, ["531", "532"])
+    # -> {"passo_min": 60, "categorias": [...], "frotas": [...], "minutos": [[[...24]...]...]}
+    utilizacao_horaria.bloco(matrizes, "531")   # só uma frota (JSON de período)
+
+ETL_UTILIZACAO_PASSO_MIN define a faixa (60 padrão; 15, 30... divisores de 1440).
+"""
+
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils import agregados
+from utils.historico import chave_codigo
+
+PASTA_UTILIZACAO = os.path.join(agregados.PASTA_PARCIAIS, "utilizacao")
+PASSO_MIN = int(os.environ.get("ETL_UTILIZACAO_PASSO_MIN") or 60)
+MINUTOS_DIA = 1440
+CATEGORIAS = ("PRODUTIVA", "IMPRODUTIVA", "MANUTENCAO", "SEM_APONTAMENTO", "OUTROS")
+
+if MINUTOS_DIA % PASSO_MIN:
+    raise ValueError(f"ETL_UTILIZACAO_PASSO_MIN={PASSO_MIN} não divide o dia em faixas iguais")
+
+
+def categorizar(dim, cod_grupo, cod_op):
+    """Índice em CATEGORIAS por linha; sem apontamento vale sobre o grupo."""
+    return np.select(
+        [
+            dim.mascara("operacao", cod_op, "sem_apontamento"),
+            dim.mascara("grupo", cod_grupo, "produtiva"),
+            dim.mascara("grupo", cod_grupo, "manutencao"),
+            dim.mascara("grupo", cod_grupo, "improdutiva"),
+        ],
+        [
+            CATEGORIAS.index("SEM_APONTAMENTO"),
+            CATEGORIAS.index("PRODUTIVA"),
+            CATEGORIAS.index("MANUTENCAO"),
+            CATEGORIAS.index("IMPRODUTIVA"),
+        ],
+        default=CATEGORIAS.index("OUTROS"),
+    )
+
+
+def varrer(linha, categoria, inicio_min, fim_min, n_linhas, passo=PASSO_MIN):
+    """
+    Minutos por (linha, categoria, faixa) dos intervalos [inicio_min, fim_min)
+    em minutos desde 00:00, recortados ao dia. Retorna array
+    (n_linhas, len(CATEGORIAS), 1440 / passo).
+    """
+    n_faixas = MINUTOS_DIA // passo
+    n_celulas = n_linhas * len(CATEGORIAS)
+    largura = n_faixas + 2  # bordas 0..n_faixas + uma sobra para eventos em 24:00
+
+    inicio = np.clip(np.asarray(inicio_min, dtype=float), 0, MINUTOS_DIA)
+    fim = np.clip(np.asarray(fim_min, dtype=float), 0, MINUTOS_DIA)
+    valido = np.isfinite(inicio) & np.isfinite(fim) & (fim > inicio)
+    celula = (np.asarray(linha) * len(CATEGORIAS) + np.asarray(categoria))[valido]
+
+    posicao = np.concatenate([inicio[valido], fim[valido]])
+    delta = np.concatenate([np.ones(len(celula)), -np.ones(len(celula))])
+    celula = np.concatenate([celula, celula])
+    borda = np.floor(posicao / passo).astype(np.int64) + 1  # primeira borda depois do evento
+
+    indice = celula * largura + borda
+    inclinacao = np.bincount(indice, weights=delta, minlength=n_celulas * largura)
+    deslocamento = np.bincount(indice, weights=delta * posicao, minlength=n_celulas * largura)
+    C = np.cumsum(inclinacao.reshape(n_celulas, largura)[:, : n_faixas + 1], axis=1)
+    S = np.cumsum(deslocamento.reshape(n_celulas, largura)[:, : n_faixas + 1], axis=1)
+
+    bordas = np.arange(n_faixas + 1) * passo
+    coberto = bordas * C - S
+    return np.diff(coberto, axis=1).reshape(n_linhas, len(CATEGORIAS), n_faixas)
+
+
+def calcular(df, categoria, col_data="Data", col_chave="Código Equipamento", col_tipo="Descrição do Equipamento",
+             col_inicio="dt_inicial", col_duracao="Duracao_min", passo=PASSO_MIN):
+    """
+    {dia (date): {frota: {"tipo", "minutos" (categorias × faixas)}}} a partir
+    das linhas de `df`. O intervalo conta a partir do início em relação à
+    meia-noite de `col_data`, pela duração já corrigida; o que passa das
+    24:00 fica de fora do dia.
+    """
+    validas = (pd.to_datetime(df[col_data], errors="coerce").notna() & df[col_chave].notna()).to_numpy()
+    df, categoria = df[validas], np.asarray(categoria)[validas]
+    if df.empty:
+        return {}
+    dias = pd.to_datetime(df[col_data])
+    inicio_min = (pd.to_datetime(df[col_inicio]) - dias.dt.normalize()).dt.total_seconds().to_numpy() / 60
+    fim_min = inicio_min + pd.to_numeric(df[col_duracao], errors="coerce").to_numpy()
+
+    chaves = pd.MultiIndex.from_arrays([dias.dt.date, df[col_chave].map(chave_codigo)])
+    cod_linha, linhas = pd.factorize(chaves)
+    matrizes = varrer(cod_linha, categoria, inicio_min, fim_min, len(linhas), passo)
+
+    tipos = df[col_tipo].astype(str).to_numpy() if col_tipo in df.columns else np.full(len(df), "")
+    tipo_linha = pd.Series(tipos).groupby(cod_linha).first()
+
+    resultado = {}
+    for i, (dia, frota) in enumerate(linhas):
+        resultado.setdefault(dia, {})[frota] = {"tipo": tipo_linha.get(i, ""), "minutos": matrizes[i]}
+    return resultado
+
+
+def _reamostrar(minutos, passo_origem, passo):
+    """Soma faixas finas em faixas maiores (15 -> 60); None se não encaixar."""
+    if passo_origem == passo:
+        return minutos
+    if passo % passo_origem:
+        return None
+    fator = passo // passo_origem
+    return minutos.reshape(minutos.shape[0], -1, fator).sum(axis=2)
+
+
+def salvar(matrizes, passo=PASSO_MIN):
+    """Grava as matrizes de cada dia, substituindo as frotas já gravadas."""
+    for dia, frotas in matrizes.items():
+        existente = agregados.ler_dia(PASTA_UTILIZACAO, dia)
+        conteudo = {"data": dia.strftime("%d-%m-%Y"), "passo_min": passo, "categorias": list(CATEGORIAS), "frotas": {}}
+        if existente and existente.get("passo_min") == passo and existente.get("categorias") == list(CATEGORIAS):
+            conteudo["frotas"] = existente.get("frotas", {})
+        for frota, dados in frotas.items():
+            conteudo["frotas"][frota] = {"tipo": dados["tipo"], "minutos": np.round(dados["minutos"], 2).tolist()}
+        agregados.gravar_atomico(agregados.caminho_dia(PASTA_UTILIZACAO, dia), conteudo)
+
+
+def periodo(inicio, fim, passo=PASSO_MIN):
+    """{frota: {"tipo", "minutos", "dias"}} somando os dias gravados de `inicio` a `fim`."""
+    soma = {}
+    dia = inicio
+    while dia <= fim:
+        conteudo = agregados.ler_dia(PASTA_UTILIZACAO, dia)
+        dia += timedelta(days=1)
+        if not conteudo or conteudo.get("categorias") != list(CATEGORIAS):
+            continue
+        for frota, dados in conteudo.get("frotas", {}).items():
+            minutos = _reamostrar(np.asarray(dados["minutos"], dtype=float), conteudo.get("passo_min"), passo)
+            if minutos is None:
+                continue
+            atual = soma.setdefault(frota, {"tipo": dados.get("tipo", ""), "minutos": 0.0, "dias": 0})
+            atual["minutos"] = atual["minutos"] + minutos
+            atual["dias"] += 1
+    return soma
+
+
+def payload(matrizes, frotas=None, passo=PASSO_MIN):
+    """Bloco compacto para o JSON: uma matriz categorias × faixas por frota, na ordem de `frotas`."""
+    frotas = [chave_codigo(f) for f in (frotas if frotas is not None else sorted(matrizes))]
+    frotas = [f for f in frotas if f in matrizes]
+    return {
+        "passo_min": passo,
+        "categorias": list(CATEGORIAS),
+        "frotas": frotas,
+        "minutos": [np.round(matrizes[f]["minutos"], 1).tolist() for f in frotas],
+    }
+
+
+def bloco(matrizes, frota, passo=PASSO_MIN):
+    """Matriz categorias × faixas de uma frota (com os dias somados), ou None."""
+    dados = matrizes.get(chave_codigo(frota))
+    if dados is None:
+        return None
+    return {
+        "passo_min": passo,
+        "categorias": list(CATEGORIAS),
+        "dias": dados.get("dias", 1),
+        "minutos": np.round(dados["minutos"], 1).tolist(),
+    }